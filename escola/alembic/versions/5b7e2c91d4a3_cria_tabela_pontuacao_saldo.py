@@ -0,0 +1,37 @@
+"""Cria tabela pontuacao_saldo (saldo acumulado por aluno/data)
+
+Revision ID: 5b7e2c91d4a3
+Revises: 14c9f0ab5dbc
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e2c91d4a3'
+down_revision: Union[str, Sequence[str], None] = '14c9f0ab5dbc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('pontuacao_saldo',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('aluno_id', sa.Integer(), nullable=False),
+    sa.Column('data', sa.Date(), nullable=False),
+    sa.Column('saldo', sa.Float(), nullable=False),
+    sa.Column('ultima_perda', sa.Date(), nullable=True),
+    sa.Column('atualizado_em', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['aluno_id'], ['alunos.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('aluno_id', 'data', name='uq_pontuacao_saldo_aluno_data')
+    )
+    # Depois do upgrade, popular com:
+    #   py -m scripts.pontuacao_rotinas reconstruir_saldo_pontuacao
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('pontuacao_saldo')
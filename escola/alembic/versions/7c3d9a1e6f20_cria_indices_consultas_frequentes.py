@@ -0,0 +1,56 @@
+"""Cria índices para as consultas frequentes (histórico, ocorrências, FMD, alunos, médias)
+
+Revision ID: 7c3d9a1e6f20
+Revises: 5b7e2c91d4a3
+Create Date: 2026-10-18 11:04:52.530917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3d9a1e6f20'
+down_revision: Union[str, Sequence[str], None] = '5b7e2c91d4a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (nome, tabela, colunas)
+INDICES = [
+    ('ix_pontuacao_historico_aluno_ano_bimestre', 'pontuacao_historico', ['aluno_id', 'ano', 'bimestre']),
+    ('ix_pontuacao_historico_aluno_tipo_criado', 'pontuacao_historico', ['aluno_id', 'tipo_evento', 'criado_em']),
+    ('ix_pontuacao_historico_tipo_criado', 'pontuacao_historico', ['tipo_evento', 'criado_em']),
+    ('ix_pontuacao_bimestral_aluno_ano_bimestre', 'pontuacao_bimestral', ['aluno_id', 'ano', 'bimestre']),
+    ('ix_ocorrencias_status', 'ocorrencias', ['status']),
+    ('ix_ocorrencias_aluno_id', 'ocorrencias', ['aluno_id']),
+    ('ix_ocorrencias_rfo_id', 'ocorrencias', ['rfo_id']),
+    ('ix_ficha_medida_disciplinar_fmd_id', 'ficha_medida_disciplinar', ['fmd_id']),
+    ('ix_ficha_medida_disciplinar_rfo_id', 'ficha_medida_disciplinar', ['rfo_id']),
+    ('ix_ficha_medida_disciplinar_aluno_id', 'ficha_medida_disciplinar', ['aluno_id']),
+    ('ix_alunos_matricula', 'alunos', ['matricula']),
+    ('ix_alunos_serie_turma_lider', 'alunos', ['serie', 'turma', 'lider']),
+]
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for nome, tabela, colunas in INDICES:
+        op.create_index(nome, tabela, colunas, unique=False)
+
+    # medias_bimestrais: uma média por aluno/ano/bimestre.
+    # Remove duplicatas antigas (mantém a de menor id, a que as rotinas já liam) antes da unique.
+    op.execute(sa.text("""
+        DELETE FROM medias_bimestrais
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM medias_bimestrais GROUP BY aluno_id, ano, bimestre
+        )
+    """))
+    with op.batch_alter_table('medias_bimestrais') as batch_op:
+        batch_op.create_unique_constraint('uq_medias_bimestrais_aluno_ano_bimestre', ['aluno_id', 'ano', 'bimestre'])
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('medias_bimestrais') as batch_op:
+        batch_op.drop_constraint('uq_medias_bimestrais_aluno_ano_bimestre', type_='unique')
+    for nome, tabela, _ in reversed(INDICES):
+        op.drop_index(nome, table_name=tabela)
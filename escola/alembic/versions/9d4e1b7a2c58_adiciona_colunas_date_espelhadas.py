@@ -0,0 +1,40 @@
+"""Adiciona colunas Date espelhadas (_dt) das datas gravadas como texto, com backfill em lotes
+
+Revision ID: 9d4e1b7a2c58
+Revises: 7c3d9a1e6f20
+Create Date: 2026-10-18 13:27:09.841562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from services.datas import COLUNAS_DATA, preencher_colunas_data
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4e1b7a2c58'
+down_revision: Union[str, Sequence[str], None] = '7c3d9a1e6f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for tabela, _, destino in COLUNAS_DATA:
+        op.add_column(tabela, sa.Column(destino, sa.Date(), nullable=True))
+
+    # Converte os formatos mistos ('DD/MM/YYYY', 'YYYY-MM-DD', com hora...) em lotes por id.
+    # Linhas gravadas depois do deploy já chegam preenchidas; para completar o backfill
+    # fora da migração (commit por lote): py -m scripts.preencher_datas
+    preencher_colunas_data(op.get_bind())
+
+    op.create_index('ix_pontuacao_historico_aluno_criado_em_dt', 'pontuacao_historico', ['aluno_id', 'criado_em_dt'], unique=False)
+    op.create_index('ix_ocorrencias_data_ocorrencia_dt', 'ocorrencias', ['data_ocorrencia_dt'], unique=False)
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_ocorrencias_data_ocorrencia_dt', table_name='ocorrencias')
+    op.drop_index('ix_pontuacao_historico_aluno_criado_em_dt', table_name='pontuacao_historico')
+    for tabela, _, destino in reversed(COLUNAS_DATA):
+        with op.batch_alter_table(tabela) as batch_op:
+            batch_op.drop_column(destino)
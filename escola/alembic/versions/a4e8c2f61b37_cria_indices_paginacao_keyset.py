@@ -0,0 +1,36 @@
+"""Cria índices de expressão para a paginação keyset das listagens (RFO, FMD, prontuário)
+
+Revision ID: a4e8c2f61b37
+Revises: 9d4e1b7a2c58
+Create Date: 2026-10-18 19:32:40.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4e8c2f61b37'
+down_revision: Union[str, Sequence[str], None] = '9d4e1b7a2c58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (nome, tabela, expressões) — mesma ordem usada em services/listagens.pagina_keyset
+INDICES = [
+    ('ix_ocorrencias_keyset_data_ocorrencia', 'ocorrencias', ["coalesce(data_ocorrencia, '')", 'id']),
+    ('ix_ocorrencias_keyset_data_registro', 'ocorrencias', ["coalesce(data_registro, '')", 'id']),
+    ('ix_ficha_medida_disciplinar_keyset', 'ficha_medida_disciplinar',
+     ["coalesce(data_fmd, '')", "coalesce(created_at, '')", 'id']),
+    ('ix_prontuarios_keyset', 'prontuarios', ["coalesce(created_at, '')", 'id']),
+]
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for nome, tabela, expressoes in INDICES:
+        op.create_index(nome, tabela, [sa.text(e) if '(' in e else e for e in expressoes], unique=False)
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for nome, tabela, _ in reversed(INDICES):
+        op.drop_index(nome, table_name=tabela)
@@ -0,0 +1,30 @@
+"""Adiciona alunos.nome_busca (nome sem acentos, minúsculo) para a busca de alunos, com backfill em lotes
+
+Revision ID: b7f3d1a9e2c4
+Revises: a4e8c2f61b37
+Create Date: 2026-10-18 20:41:12.507318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from services.texto import preencher_nome_busca
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7f3d1a9e2c4'
+down_revision: Union[str, Sequence[str], None] = 'a4e8c2f61b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('alunos', sa.Column('nome_busca', sa.String(), nullable=True))
+    # Alunos cadastrados depois do deploy já chegam com nome_busca (default da coluna)
+    preencher_nome_busca(op.get_bind())
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('alunos') as batch_op:
+        batch_op.drop_column('nome_busca')
@@ -0,0 +1,40 @@
+"""Cria tabela fotos_alunos (índice dos arquivos de foto em static/uploads/alunos)
+
+Revision ID: c2a6e8f05d17
+Revises: b7f3d1a9e2c4
+Create Date: 2026-10-18 21:58:03.662190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2a6e8f05d17'
+down_revision: Union[str, Sequence[str], None] = 'b7f3d1a9e2c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('fotos_alunos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('arquivo', sa.String(), nullable=False),
+    sa.Column('chave', sa.String(), nullable=True),
+    sa.Column('aluno_id', sa.Integer(), nullable=True),
+    sa.Column('mtime', sa.Float(), nullable=True),
+    sa.Column('tamanho', sa.Integer(), nullable=True),
+    sa.Column('atualizado_em', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['aluno_id'], ['alunos.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('arquivo', name='uq_fotos_alunos_arquivo')
+    )
+    op.create_index('ix_fotos_alunos_aluno_id', 'fotos_alunos', ['aluno_id'], unique=False)
+    # Depois do upgrade, popular com:
+    #   py sync_fotos_alunos.py
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_fotos_alunos_aluno_id', table_name='fotos_alunos')
+    op.drop_table('fotos_alunos')
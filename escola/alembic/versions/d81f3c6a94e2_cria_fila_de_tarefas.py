@@ -0,0 +1,50 @@
+"""Cria tabela tarefas_fila e o status do envio por e-mail da FMD
+
+Revision ID: d81f3c6a94e2
+Revises: c2a6e8f05d17
+Create Date: 2026-10-18 23:12:41.508317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd81f3c6a94e2'
+down_revision: Union[str, Sequence[str], None] = 'c2a6e8f05d17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('tarefas_fila',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('tipo', sa.String(length=50), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('tentativas', sa.Integer(), nullable=False),
+    sa.Column('max_tentativas', sa.Integer(), nullable=False),
+    sa.Column('proxima_tentativa_em', sa.String(), nullable=True),
+    sa.Column('ultimo_erro', sa.Text(), nullable=True),
+    sa.Column('criado_em', sa.String(), nullable=True),
+    sa.Column('iniciado_em', sa.String(), nullable=True),
+    sa.Column('concluido_em', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_tarefas_fila_status_proxima', 'tarefas_fila', ['status', 'proxima_tentativa_em'], unique=False)
+    op.add_column('ficha_medida_disciplinar', sa.Column('email_status', sa.String(length=20), nullable=True))
+    op.add_column('ficha_medida_disciplinar', sa.Column('email_erro', sa.Text(), nullable=True))
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # No SQLite o batch recria a tabela e perde o índice de expressão da paginação keyset
+    # (a4e8c2f61b37): remove antes e recria igual depois.
+    op.drop_index('ix_ficha_medida_disciplinar_keyset', table_name='ficha_medida_disciplinar')
+    with op.batch_alter_table('ficha_medida_disciplinar') as batch_op:
+        batch_op.drop_column('email_erro')
+        batch_op.drop_column('email_status')
+    op.create_index('ix_ficha_medida_disciplinar_keyset', 'ficha_medida_disciplinar',
+                    [sa.text("coalesce(data_fmd, '')"), sa.text("coalesce(created_at, '')"), 'id'], unique=False)
+    op.drop_index('ix_tarefas_fila_status_proxima', table_name='tarefas_fila')
+    op.drop_table('tarefas_fila')
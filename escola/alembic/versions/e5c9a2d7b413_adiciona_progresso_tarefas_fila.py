@@ -0,0 +1,30 @@
+"""Adiciona progresso e resultado em tarefas_fila
+
+Revision ID: e5c9a2d7b413
+Revises: d81f3c6a94e2
+Create Date: 2026-10-18 23:58:17.240953
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c9a2d7b413'
+down_revision: Union[str, Sequence[str], None] = 'd81f3c6a94e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tarefas_fila', sa.Column('progresso_atual', sa.Integer(), nullable=True))
+    op.add_column('tarefas_fila', sa.Column('progresso_total', sa.Integer(), nullable=True))
+    op.add_column('tarefas_fila', sa.Column('resultado', sa.Text(), nullable=True))
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('tarefas_fila') as batch_op:
+        batch_op.drop_column('resultado')
+        batch_op.drop_column('progresso_total')
+        batch_op.drop_column('progresso_atual')
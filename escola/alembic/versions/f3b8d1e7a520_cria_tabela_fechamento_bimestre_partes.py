@@ -0,0 +1,40 @@
+"""Cria tabela fechamento_bimestre_partes
+
+Revision ID: f3b8d1e7a520
+Revises: e5c9a2d7b413
+Create Date: 2026-10-19 00:41:06.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d1e7a520'
+down_revision: Union[str, Sequence[str], None] = 'e5c9a2d7b413'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('fechamento_bimestre_partes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ano', sa.Integer(), nullable=False),
+    sa.Column('bimestre', sa.Integer(), nullable=False),
+    sa.Column('etapa', sa.String(length=20), nullable=False),
+    sa.Column('parte', sa.Integer(), nullable=False),
+    sa.Column('aluno_ids', sa.Text(), nullable=False),
+    sa.Column('alunos', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('processados', sa.Integer(), nullable=True),
+    sa.Column('erro', sa.Text(), nullable=True),
+    sa.Column('criado_em', sa.String(), nullable=True),
+    sa.Column('concluido_em', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('ano', 'bimestre', 'etapa', 'parte', name='uq_fechamento_bimestre_partes')
+    )
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('fechamento_bimestre_partes')
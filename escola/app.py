@@ -68,6 +68,22 @@ app.config['MOMENT_DEFAULT_FORMAT'] = 'DD/MM/YYYY'
 app.config['JSON_AS_ASCII'] = False
 app.config['TEMPLATES_AUTO_RELOAD'] = True
 
+# Geração de PDF (services/renderizador_pdf.py)
+app.config['PDF_BACKEND'] = os.environ.get('PDF_BACKEND', '')  # vazio = motor padrão de cada documento
+app.config['WKHTMLTOPDF_PATH'] = os.environ.get('WKHTMLTOPDF_PATH', '')
+app.config['PDF_CACHE_DIR'] = os.environ.get('PDF_CACHE_DIR') or os.path.join(app.root_path, 'tmp', 'pdf_cache')
+app.config['PDF_CACHE_MAX_MB'] = int(os.environ.get('PDF_CACHE_MAX_MB', 500))
+
+# Fila de tarefas em segundo plano (services/fila_tarefas): threads por processo
+app.config['FILA_WORKERS'] = int(os.environ.get('FILA_WORKERS', 2))
+
+# Envio de FMDs em lote: PDFs gerados em paralelo e intervalo entre mensagens (limite do SMTP)
+app.config['PDF_LOTE_WORKERS'] = int(os.environ.get('PDF_LOTE_WORKERS', 4))
+app.config['EMAIL_LOTE_INTERVALO'] = float(os.environ.get('EMAIL_LOTE_INTERVALO', 1.0))
+
+# Fechamento de bimestre: partes de alunos processadas em paralelo (cada uma com sua sessão)
+app.config['FECHAMENTO_WORKERS'] = int(os.environ.get('FECHAMENTO_WORKERS', 4))
+
 # blueprints existentes
 app.register_blueprint(auth_bp, url_prefix='/auth')
 app.register_blueprint(alunos_bp, url_prefix='/alunos')
@@ -109,6 +125,9 @@ def load_logged_in_user():
         db = get_db()
         g.user = db.query(Usuario).filter_by(id=user_id).first()
 
+from services.fila_tarefas import iniciar_fila
+iniciar_fila(app)
+
 @app.teardown_appcontext
 def teardown_db(e=None):
     close_db(e)
@@ -126,6 +145,7 @@ def inject_globals():
 from markupsafe import Markup, escape
 from models_sqlalchemy import Aluno, Ocorrencia, Usuario, FichaMedidaDisciplinar
 from sqlalchemy import func
+from services.contadores_dashboard import contadores, obter_contadores
 
 @app.template_filter('data_br')
 def formatar_data_br(data_str):
@@ -200,18 +220,7 @@ def index():
 @utils.login_required
 def dashboard():
     db = get_db()
-    total_alunos = db.query(func.count(Aluno.id)).scalar()
-    total_ocorrencias = db.query(func.count(Ocorrencia.id)).filter(Ocorrencia.status == 'TRATADO').scalar()
-    rfos_pendentes = db.query(func.count(Ocorrencia.id)).filter(Ocorrencia.status == 'AGUARDANDO TRATAMENTO').scalar()
-    total_usuarios = db.query(func.count(Usuario.id)).scalar()
-    total_fmd = db.query(func.count(FichaMedidaDisciplinar.id)).scalar()
-
-    return render_template('dashboard.html',
-                           total_alunos=total_alunos,
-                           total_ocorrencias=total_ocorrencias,
-                           rfos_pendentes=rfos_pendentes,
-                           total_usuarios=total_usuarios,
-                           total_fmd=total_fmd)
+    return render_template('dashboard.html', **obter_contadores(db))
 
 from models_sqlalchemy import Aluno, Ocorrencia, Usuario, FichaMedidaDisciplinar, FaltaDisciplinar
 from sqlalchemy import func
@@ -220,19 +229,15 @@ from sqlalchemy import func
 @utils.login_required
 def api_dashboard_stats():
     db = get_db()
-    total_alunos = db.query(func.count(Aluno.id)).scalar()
-    total_ocorrencias = db.query(func.count(Ocorrencia.id)).filter(Ocorrencia.status == 'TRATADO').scalar()
-    rfos_pendentes = db.query(func.count(Ocorrencia.id)).filter(Ocorrencia.status == 'AGUARDANDO TRATAMENTO').scalar()
-    total_usuarios = db.query(func.count(Usuario.id)).scalar()
-    total_fmd = db.query(func.count(FichaMedidaDisciplinar.id)).scalar()
-
-    return jsonify({
-        'total_alunos': total_alunos,
-        'total_ocorrencias': total_ocorrencias,
-        'rfos_pendentes': rfos_pendentes,
-        'total_usuarios': total_usuarios,
-        'total_fmd': total_fmd
-    })
+    valores, etag, atualizado_em = contadores.obter(db)
+
+    # Polling: devolve 304 se o cliente já tem esses números (If-None-Match / If-Modified-Since)
+    resp = jsonify(valores)
+    resp.set_etag(etag)
+    resp.last_modified = atualizado_em
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True
+    return resp.make_conditional(request)
 
 @app.route('/api/faltas_por_natureza')
 @utils.login_required
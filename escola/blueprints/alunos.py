@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, make_response, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, make_response, jsonify, current_app
 from database import get_db  # Garante session SQLAlchemy do projeto
 import csv
 import io
@@ -6,6 +6,12 @@ import pandas as pd
 from datetime import datetime
 
 from .utils import login_required, admin_required, admin_secundario_required, validar_matricula, validar_email
+from services.contadores_dashboard import invalidar_contadores
+from services.busca_alunos import (
+    buscar_alunos, aluno_em_cache, atualizar_alunos_na_busca, remover_alunos_da_busca, invalidar_busca_alunos
+)
+from services.importacao_alunos import ler_planilha_alunos, importar_alunos_df
+from services.exportacao_csv import resposta_csv
 
 # Definição da Blueprint
 alunos_bp = Blueprint('alunos_bp', __name__)
@@ -121,6 +127,8 @@ def adicionar_aluno():
                 )
                 db.add(novo)
                 db.commit()
+                invalidar_contadores()
+                atualizar_alunos_na_busca(db, ids=[novo.id])
                 flash(f'Aluno "{data["nome"]}" cadastrado com sucesso!', 'success')
                 return redirect(url_for('alunos_bp.listar_alunos'))
             except Exception as e:
@@ -172,6 +180,7 @@ def editar_aluno(aluno_id):
                     setattr(aluno, k, v)
                 aluno.serie_numerica = extrair_numero_serie(data.get('serie', ''))
                 db.commit()
+                atualizar_alunos_na_busca(db, ids=[aluno.id])
                 flash(f'Dados do aluno "{data["nome"]}" atualizados com sucesso!', 'success')
                 return redirect(url_for('alunos_bp.listar_alunos'))
             except Exception as e:
@@ -198,6 +207,8 @@ def excluir_aluno(aluno_id):
         # Exclui o aluno
         db.delete(aluno)
         db.commit()
+        invalidar_contadores()
+        remover_alunos_da_busca([aluno_id])
         flash(f'Aluno "{nome_aluno}" e suas ocorrências excluídos com sucesso.', 'success')
     except Exception as e:
         db.rollback()
@@ -221,104 +232,42 @@ def importar_alunos():
             flash('Nenhum arquivo selecionado.', 'danger')
             return redirect(request.url)
 
-        erros_importacao = []
-        sucessos = 0
         db = get_db()
+        atualizar = request.form.get('modo') == 'atualizar'
         try:
-            filename = arquivo.filename.lower()
-            if filename.endswith(('.xls', '.xlsx')):
-                df = pd.read_excel(arquivo, dtype=str, engine='openpyxl')
-                df = df.fillna('')
-                df = df.dropna(how='all')
-                df.columns = df.columns.str.strip().str.upper()
-                print(f"? Colunas encontradas no Excel: {list(df.columns)}")
-                registros = df.to_dict('records')
-            elif filename.endswith('.csv'):
-                try:
-                    stream = io.StringIO(arquivo.stream.read().decode("utf-8"))
-                except UnicodeDecodeError:
-                    arquivo.stream.seek(0)
-                    stream = io.StringIO(arquivo.stream.read().decode("latin-1"))
-                reader = csv.DictReader(stream, delimiter=';')
-                registros = list(reader)
-                registros_temp = []
-                for row in registros:
-                    normalized_row = {k.upper().strip(): str(v).strip() for k, v in row.items()}
-                    registros_temp.append(normalized_row)
-                registros = registros_temp
-            else:
-                flash('Formato de arquivo não suportado. Use CSV, XLSX ou XLS.', 'danger')
-                return redirect(request.url)
+            df = ler_planilha_alunos(arquivo.stream, arquivo.filename, request.form.get('tipo_separador', ';'))
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return redirect(request.url)
         except Exception as e:
             flash(f'Erro ao ler o arquivo: {str(e)}', 'danger')
             return redirect(request.url)
 
-        print(f"? Total de registros a processar: {len(registros)}")
-        for i, row in enumerate(registros, start=2):
-            try:
-                matricula = str(row.get('MATRICULA', row.get('MATRÍCULA', ''))).strip()
-                nome = str(row.get('NOME', '')).strip()
-                data_nascimento = str(row.get('DATA_NASCIMENTO', '')).strip()
-                data_matricula = str(row.get('DATA_MATRICULA', row.get('DATA_MATRÍCULA', ''))).strip()
-                serie = str(row.get('SERIE', row.get('SÉRIE', ''))).strip()
-                turma = str(row.get('TURMA', '')).strip()
-                turno = str(row.get('TURNO', '')).strip()
-                pai = str(row.get('PAI', '')).strip()
-                mae = str(row.get('MAE', row.get('MÃE', ''))).strip()
-                responsavel = str(row.get('RESPONSAVEL', row.get('RESPONSÁVEL', ''))).strip()
-                email = str(row.get('E-MAIL', row.get('EMAIL', ''))).strip()
-                endereco_unico = str(row.get('ENDERECO', row.get('ENDEREÇO', ''))).strip()
-                rua = str(row.get('RUA', endereco_unico)).strip()
-                numero = str(row.get('NUMERO', row.get('NÚMERO', ''))).strip()
-                complemento = str(row.get('COMPLEMENTO', '')).strip()
-                bairro = str(row.get('BAIRRO', '')).strip()
-                cidade = str(row.get('CIDADE', '')).strip()
-                estado = str(row.get('ESTADO', '')).strip()
-                if not matricula or not nome:
-                    erros_importacao.append({'linha': i, 'matricula': matricula or 'N/A', 'nome': nome or 'N/A', 'erro': 'Matrícula e Nome são obrigatórios.'})
-                    continue
-                if db.query(Aluno).filter_by(matricula=matricula).first():
-                    erros_importacao.append({'linha': i, 'matricula': matricula, 'nome': nome, 'erro': 'Matrícula já existente.'})
-                    continue
-                telefones = []
-                for j in range(1, 4):
-                    tel = str(row.get(f'TELEFONE {j}', row.get(f'TELEFONE{j}', ''))).strip()
-                    if tel:
-                        telefones.append(tel)
-                if not telefones:
-                    tel_unico = str(row.get('TELEFONE', row.get('TELEFONES', ''))).strip()
-                    if tel_unico:
-                        telefones = [t.strip() for t in tel_unico.split(',') if t.strip()]
-                telefone_str = ', '.join(telefones[:3])
-                aluno = Aluno(
-                    matricula=matricula, nome=nome, data_nascimento=data_nascimento, data_matricula=data_matricula,
-                    serie=serie, turma=turma, serie_numerica=extrair_numero_serie(serie), turno=turno, 
-                    pai=pai, mae=mae, responsavel=responsavel,
-                    telefone=telefone_str, email=email, rua=rua, numero=numero, complemento=complemento,
-                    bairro=bairro, cidade=cidade, estado=estado
-                )
-                db.add(aluno)
-                sucessos += 1
-                print(f"? Aluno {nome} cadastrado com sucesso!")
-            except Exception as e:
-                erros_importacao.append({
-                    'linha': i,
-                    'matricula': matricula if 'matricula' in locals() else 'N/A',
-                    'nome': nome if 'nome' in locals() else 'N/A',
-                    'erro': f'Erro ao processar: {str(e)}'
-                })
-                print(f"? Erro na linha {i}: {str(e)}")
+        def _progresso(etapa, feitos, total):
+            current_app.logger.info("Importação de alunos (%s): %s/%s", etapa, feitos, total)
+
         try:
+            resultado = importar_alunos_df(db, df, atualizar=atualizar, progresso=_progresso,
+                                           usuario_id=session.get('user_id'))
             db.commit()
-            if erros_importacao:
-                session['erros_importacao'] = erros_importacao
-                flash(f'Importação concluída: {sucessos} alunos cadastrados, {len(erros_importacao)} erro(s).', 'warning')
-                return redirect(url_for('alunos_bp.erros_importacao'))
-            else:
-                flash(f'Importação concluída com sucesso! {sucessos} alunos cadastrados.', 'success')
-        except IntegrityError as e:
+            invalidar_contadores()
+            atualizar_alunos_na_busca(db, ids=resultado['ids_atualizados'],
+                                      matriculas=resultado['matriculas_inseridas'])
+        except Exception as e:
             db.rollback()
+            current_app.logger.exception("Erro na importação de alunos")
             flash(f'Erro ao salvar dados no banco: {e}', 'danger')
+            return redirect(url_for('alunos_bp.listar_alunos'))
+
+        erros_importacao = resultado['erros']
+        resumo = f"{resultado['inseridos']} alunos cadastrados"
+        if atualizar:
+            resumo += f", {resultado['atualizados']} atualizados, {resultado['inalterados']} sem alteração"
+        if erros_importacao:
+            session['erros_importacao'] = erros_importacao
+            flash(f'Importação concluída: {resumo}, {len(erros_importacao)} erro(s).', 'warning')
+            return redirect(url_for('alunos_bp.erros_importacao'))
+        flash(f'Importação concluída com sucesso! {resumo}.', 'success')
         return redirect(url_for('alunos_bp.listar_alunos'))
     return render_template('importar_alunos.html')
 
@@ -332,28 +281,18 @@ def erros_importacao():
 @alunos_bp.route('/backup_alunos')
 @admin_secundario_required
 def backup_alunos():
-    """Exporta todos os dados dos alunos para um arquivo CSV."""
+    """Exporta todos os dados dos alunos para um arquivo CSV (em streaming; ?gzip=1 compacta)."""
     db = get_db()
-    alunos = db.query(Aluno).order_by(Aluno.nome).all()
-    if not alunos:
+    if db.query(Aluno.id).first() is None:
         flash('Nenhum aluno encontrado para backup.', 'warning')
         return redirect(url_for('alunos_bp.listar_alunos'))
 
-    output = io.StringIO()
-    # Pega todos os campos definidos no modelo.
-    fieldnames = [
-        c.name for c in Aluno.__table__.columns
-    ]
-    writer = csv.DictWriter(output, fieldnames=fieldnames, delimiter=';')
-    writer.writeheader()
-    for aluno in alunos:
-        row = {k: getattr(aluno, k, "") for k in fieldnames}
-        writer.writerow(row)
-    response = make_response(output.getvalue())
+    # Todos os campos definidos no modelo, lidos como linhas (sem montar objetos ORM)
+    colunas = list(Aluno.__table__.columns)
+    linhas = db.query(*colunas).order_by(Aluno.nome).yield_per(1000)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    response.headers["Content-Disposition"] = f"attachment; filename=backup_alunos_{timestamp}.csv"
-    response.headers["Content-type"] = "text/csv; charset=utf-8"
-    return response
+    return resposta_csv([c.name for c in colunas], linhas, f"backup_alunos_{timestamp}.csv",
+                        delimitador=';', compactar=request.args.get('gzip') == '1')
 
 @alunos_bp.route('/excluir_todos', methods=['POST'])
 @admin_required
@@ -365,6 +304,8 @@ def excluir_todos():
         db.query(Aluno).delete()
         db.query(RFOSequencia).delete()
         db.commit()
+        invalidar_contadores()
+        invalidar_busca_alunos()
         flash('TODOS os alunos e ocorrências foram excluídos. O sistema foi reiniciado.', 'success')
     except Exception as e:
         db.rollback()
@@ -384,18 +325,10 @@ def buscar_aluno_json():
     resultados = []
 
     if termo_busca:
-        alunos = (
-            db.query(Aluno)
-            .filter(or_(
-                Aluno.nome.ilike(f'%{termo_busca}%'),
-                Aluno.matricula.ilike(f'%{termo_busca}%')
-            ))
-            .order_by(Aluno.nome)
-            .limit(10)
-            .all()
-        )
+        alunos = buscar_alunos(db, termo_busca, limite=10)
     elif aluno_id:
-        alunos = db.query(Aluno).filter_by(id=aluno_id).all()
+        aluno = aluno_em_cache(db, aluno_id)
+        alunos = [aluno] if aluno else []
     else:
         return jsonify([])
 
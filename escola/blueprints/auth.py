@@ -3,12 +3,22 @@ from database import get_db
 from werkzeug.security import check_password_hash, generate_password_hash
 from datetime import datetime, timedelta
 
-from .utils import login_required, admin_required, NIVEL_MAP, gerar_token_seguro
+from .utils import login_required, admin_required, NIVEL_MAP, gerar_token_seguro, enviar_email
 from models_sqlalchemy import Usuario, RecuperacaoSenhaToken, DadosEscola
+from services.fila_tarefas import tarefa, enfileirar, acordar_fila, ErroDefinitivo
+from services.email_envio import credenciais_escola
 
 # Definição da Blueprint
 auth_bp = Blueprint('auth_bp', __name__)
 
+@tarefa('email_recuperacao_senha')
+def _tarefa_email_recuperacao_senha(db, payload):
+    # credenciais lidas na hora do envio (a senha de app não vai para a fila)
+    remetente, senha_app = credenciais_escola(db)
+    if not remetente:
+        raise ErroDefinitivo("E-mail institucional e/ou senha de aplicativo não cadastrados.")
+    enviar_email(remetente=remetente, senha=senha_app, **payload)
+
 @auth_bp.route('/recuperar_senha', methods=['GET', 'POST'])
 def recuperar_senha():
     if request.method == 'POST':
@@ -59,19 +69,19 @@ def recuperar_senha():
                 f"<p style='color: #555;'>Se não foi você, ignore este e-mail.</p>"
             )
 
-            # Envio do e-mail – enviar ambos (texto puro + HTML)
+            # Envio do e-mail – enviar ambos (texto puro + HTML), em segundo plano pela fila
             try:
-                from .utils import enviar_email  # ajuste se necessário
-                enviar_email(
-                    destinatario=email,
-                    assunto=f"Recuperação de senha - {nome_sistema}",
-                    corpo=corpo_email,
-                    corpo_html=corpo_email_html,
-                    remetente=remetente,
-                    senha=senha_app
-                )
+                enfileirar(db, 'email_recuperacao_senha', {
+                    'destinatario': email,
+                    'assunto': f"Recuperação de senha - {nome_sistema}",
+                    'corpo': corpo_email,
+                    'corpo_html': corpo_email_html,
+                })
+                db.commit()
+                acordar_fila()
                 flash('Se o e-mail informado estiver cadastrado, você receberá as instruções para redefinir sua senha.', 'info')
             except Exception as e:
+                db.rollback()
                 print("Erro detalhado ao enviar email:", e)
                 flash('Houve um erro ao enviar o e-mail. Tente novamente mais tarde.', 'danger')
 
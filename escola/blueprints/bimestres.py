@@ -1,9 +1,12 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app, jsonify
 from database import get_db
 from .utils import admin_required
 from datetime import datetime
+import json
 from sqlalchemy import func, and_
-from models_sqlalchemy import Bimestre
+from models_sqlalchemy import Bimestre, TarefaFila, FechamentoBimestreParte
+from services.calendario_bimestres import invalidar_calendario
+from services.fila_tarefas import tarefa, enfileirar, acordar_fila, registrar_progresso, situacao_tarefa, ErroDefinitivo
 
 bimestres_bp = Blueprint('bimestres_bp', __name__, url_prefix='/cadastros/bimestres')
 
@@ -74,6 +77,7 @@ def gerenciar_bimestres():
             # Excluir bimestres antigos do ano antes de adicionar novos
             db.query(Bimestre).filter(Bimestre.ano == str(ano)).delete()
             db.commit()
+            invalidar_calendario(ano)
 
             # Adiciona/insere os novos bimestres
             for numero, inicio, fim in dados:
@@ -86,6 +90,7 @@ def gerenciar_bimestres():
                 )
                 db.add(bimestre)
             db.commit()
+            invalidar_calendario(ano)
             flash(f'Bimestres do ano {ano} salvos com sucesso.', 'success')
 
             if request.form.get('iframe') == '1' or request.args.get('iframe') == '1':
@@ -130,6 +135,7 @@ def excluir_bimestres(ano):
     try:
         db.query(Bimestre).filter(Bimestre.ano == str(ano)).delete()
         db.commit()
+        invalidar_calendario(ano)
         flash(f'Bimestres do ano {ano} excluídos.', 'success')
     except Exception as e:
         db.rollback()
@@ -216,11 +222,14 @@ def gestao_bimestres():
                 {"data_fim": bim.fim}
             ).scalar()
             
+            fechamento = situacao_fechamento(db, ano_selecionado, bim.numero)
+
             bimestres_info.append({
                 'numero': bim.numero,
                 'inicio': bim.inicio,
                 'fim': bim.fim,
-                'fechado': bonus_aplicado > 0,
+                'fechado': bonus_aplicado > 0 or bool(fechamento and fechamento['status'] == 'concluido'),
+                'fechamento': fechamento,
                 'alunos_processados': alunos_processados,
                 'total_alunos': total_alunos
             })
@@ -230,26 +239,98 @@ def gestao_bimestres():
                           ano_selecionado=ano_selecionado,
                           bimestres=bimestres_info)
 
+@tarefa('fechamento_bimestre')
+def _tarefa_fechamento_bimestre(db, payload):
+    from scripts.pontuacao_rotinas import fechar_bimestre_em_partes
+    try:
+        return fechar_bimestre_em_partes(db, payload['ano'], payload['bimestre'], ao_progredir=registrar_progresso)
+    except ValueError as e:  # bimestre não cadastrado
+        raise ErroDefinitivo(str(e))
+
+def _tarefa_do_fechamento(db, ano, bimestre):
+    """Tarefa mais recente de fechamento do bimestre (ou None)."""
+    tarefas = (
+        db.query(TarefaFila)
+        .filter(TarefaFila.tipo == 'fechamento_bimestre')
+        .order_by(TarefaFila.id.desc())
+        .limit(50)
+        .all()
+    )
+    for t in tarefas:
+        payload = json.loads(t.payload or '{}')
+        if payload.get('ano') == ano and payload.get('bimestre') == bimestre:
+            return t
+    return None
+
+def situacao_fechamento(db, ano, bimestre):
+    """
+    Andamento do fechamento pelas partes gravadas (fechamento_bimestre_partes) e pela tarefa:
+    status 'executando', 'interrompido' (há partes pendentes e nenhuma tarefa ativa),
+    'concluido' ou None (nunca fechado por partes).
+    """
+    partes = db.query(FechamentoBimestreParte).filter_by(ano=ano, bimestre=bimestre).all()
+    t = _tarefa_do_fechamento(db, ano, bimestre)
+    ativa = t is not None and t.status in ('pendente', 'executando')
+    if not partes and not ativa:
+        return None
+    etapas = {}
+    for p in partes:
+        e = etapas.setdefault(p.etapa, {'partes': 0, 'concluidas': 0, 'alunos': 0, 'feitos': 0, 'processados': 0})
+        e['partes'] += 1
+        e['alunos'] += p.alunos
+        if p.status == 'concluida':
+            e['concluidas'] += 1
+            e['feitos'] += p.alunos
+            e['processados'] += p.processados or 0
+    pendentes = any(p.status != 'concluida' for p in partes)
+    if ativa and not pendentes:
+        partes = []  # partes de um fechamento anterior; a tarefa vai planejar outras
+    if ativa:
+        status = 'executando'
+    elif pendentes or not partes:
+        status = 'interrompido'
+    else:
+        status = 'concluido'
+    erro = next((p.erro for p in partes if p.status == 'erro'), None) or (t.ultimo_erro if t and t.status == 'erro' else None)
+    return {
+        'status': status,
+        'etapas': etapas,
+        'alunos': sum(p.alunos for p in partes),
+        'feitos': sum(p.alunos for p in partes if p.status == 'concluida'),
+        'erro': erro,
+        'tarefa': situacao_tarefa(db, t.id) if t else None,
+    }
+
 @bimestres_bp.route('/fechar_bimestre/<int:ano>/<int:bimestre>', methods=['POST'])
 @admin_required
 def fechar_bimestre(ano, bimestre):
-    """Fecha um bimestre específico"""
+    """
+    Fecha um bimestre específico em segundo plano (fila de tarefas), em partes de alunos.
+    Se um fechamento anterior parou no meio, continua das partes que faltam.
+    """
+    db = get_db()
     try:
-        from scripts.pontuacao_rotinas import (
-            calcular_e_salvar_pontuacao_final_bimestre,
-            apply_bimestral_bonus
-        )
-        
-        # 1. Calcular pontuação final
-        calcular_e_salvar_pontuacao_final_bimestre(ano, bimestre, force=True)
-        
-        # 2. Aplicar bônus bimestral
-        apply_bimestral_bonus(ano, bimestre)
-        
-        flash(f'{bimestre}º Bimestre de {ano} fechado com sucesso!', 'success')
+        t = _tarefa_do_fechamento(db, ano, bimestre)
+        if t is not None and t.status in ('pendente', 'executando'):
+            flash(f'O fechamento do {bimestre}º Bimestre de {ano} já está em andamento.', 'info')
+        else:
+            situacao = situacao_fechamento(db, ano, bimestre)
+            enfileirar(db, 'fechamento_bimestre', {'ano': ano, 'bimestre': bimestre}, max_tentativas=3)
+            db.commit()
+            acordar_fila()
+            if situacao and situacao['status'] == 'interrompido':
+                flash(f'Fechamento do {bimestre}º Bimestre de {ano} retomado de onde parou.', 'success')
+            else:
+                flash(f'Fechamento do {bimestre}º Bimestre de {ano} iniciado. Acompanhe o andamento nesta página.', 'success')
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        db.rollback()
+        current_app.logger.exception('Erro ao iniciar o fechamento do bimestre')
         flash(f'Erro ao fechar bimestre: {e}', 'danger')
-    
+
     return redirect(url_for('bimestres_bp.gestao_bimestres', ano=ano))
+
+@bimestres_bp.route('/fechamento/<int:ano>/<int:bimestre>')
+@admin_required
+def andamento_fechamento(ano, bimestre):
+    """Andamento do fechamento (JSON, consultado pela página de gestão enquanto executa)."""
+    return jsonify(situacao_fechamento(get_db(), ano, bimestre) or {'status': None})
@@ -7,13 +7,25 @@ from models_sqlalchemy import (
     Ocorrencia, FichaMedidaDisciplinar, Aluno, TipoOcorrencia, Usuario, 
     PontuacaoBimestral, PontuacaoHistorico, Comportamento, FaltaDisciplinar,
     OcorrenciaFalta, OcorrenciaAluno, TabelaDisciplinarConfig, Bimestre,
-    Cabecalho, DadosEscola, 
+    Cabecalho, DadosEscola, TarefaFila,
     # Inclua outras conforme necessário para as rotas!
 )
 
 from services.escolar_helper import get_tipos_ocorrencia, get_proximo_fmd_id, get_faltas_disciplinares
 from services.escolar_helper import compute_pontuacao_corrente, _infer_comportamento_por_faixa
 from services.escolar_helper import _calcular_delta_por_medida, _get_config_values, _apply_delta_pontuacao, compute_pontuacao_em_data
+from services.saldo_pontuacao import registrar_evento_no_saldo
+from services.log_pontuacao import logger, contar
+from services.calendario_bimestres import get_bimestre_for_date
+from services.contadores_dashboard import invalidar_contadores
+from services.renderizador_pdf import resposta_pdf, gerar_pdf, WKHTMLTOPDF
+from services.fila_tarefas import tarefa, enfileirar, acordar_fila, registrar_progresso, situacao_tarefa, ErroDefinitivo
+from services.email_envio import credenciais_escola, montar_mensagem, enviar_mensagem, ConexaoSMTP
+from services.busca_alunos import buscar_alunos, aluno_em_cache
+from services.listagens import (
+    filtros_da_requisicao, tamanho_da_pagina, filtrar_texto, filtrar_serie_turma, filtrar_periodo,
+    chave_texto, pagina_keyset
+)
 # ...
 from .utils import (
     login_required,
@@ -29,10 +41,10 @@ from .utils import (
 from datetime import datetime, date
 import re
 import os
-import pdfkit
-import shutil
+import json
+from urllib.parse import quote
 from werkzeug.utils import secure_filename
-from sqlalchemy import or_
+from sqlalchemy import or_, update, func, cast, String
 from blueprints.prontuario_utils import create_or_append_prontuario_por_rfo
 
 disciplinar_bp = Blueprint('disciplinar_bp', __name__, url_prefix='/disciplinar')
@@ -66,6 +78,7 @@ def _create_fmd_for_aluno(db, aluno_id, medida_aplicada, descricao, data_fmd=Non
         fmd = FichaMedidaDisciplinar(**fmd_kwargs)
         db.add(fmd)
         db.commit()
+        invalidar_contadores()
         return True
     except Exception:
         db.rollback()
@@ -234,39 +247,10 @@ def _get_config_values(db):
 
 def _get_bimestre_for_date(db, data_str):
     """
-    Determina (ano_int, bimestre_int) consultando a tabela 'bimestres' com SQLAlchemy.
+    Determina (ano_int, bimestre_int) pelo calendário de bimestres (cache compartilhado).
     Se não encontrar ou erro, faz fallback para 4 bimestres por ano.
     """
-    try:
-        d = datetime.strptime(data_str[:10], '%Y-%m-%d').date()
-    except Exception:
-        d = date.today()
-    ano = d.year
-    try:
-        rows = db.query(Bimestre).filter_by(ano=ano).order_by(Bimestre.numero).all()
-        if rows:
-            for r in rows:
-                num = int(getattr(r, 'numero')) if getattr(r, 'numero') is not None else None
-                inicio = getattr(r, 'inicio')
-                fim = getattr(r, 'fim')
-                try:
-                    inicio_date = datetime.strptime(str(inicio)[:10], '%Y-%m-%d').date() if inicio else None
-                except Exception:
-                    inicio_date = None
-                try:
-                    fim_date = datetime.strptime(str(fim)[:10], '%Y-%m-%d').date() if fim else None
-                except Exception:
-                    fim_date = None
-                if (inicio_date is None or inicio_date <= d) and (fim_date is None or fim_date >= d):
-                    if num is not None:
-                        return ano, num
-    except Exception:
-        try:
-            current_app.logger.debug("Erro ao consultar tabela bimestres; usando fallback.")
-        except Exception:
-            pass
-    b = ((d.month - 1) // 3) + 1
-    return ano, b
+    return get_bimestre_for_date(db, data_str)
 
 from unidecode import unidecode
 import re
@@ -277,12 +261,12 @@ def _calcular_delta_por_medida(medida_aplicada, qtd, config):
     Aceita variações como advertencia oral, advertência oral, adv oral, advert oral, etc.
     """
     if not medida_aplicada:
-        print("DEBUG - medida_aplicada vazia.")
+        logger.debug("medida_aplicada vazia")
         return 0.0
 
     # Remove acentos, coloca maiúsculo e remove espaços duplicados
     m = unidecode(str(medida_aplicada)).upper().replace("  ", " ").strip()
-    print(f"DEBUG _calcular_delta_por_medida - Original: '{medida_aplicada}', Normalizado: '{m}'")
+    logger.debug("_calcular_delta_por_medida - original: %r, normalizado: %r", medida_aplicada, m)
     
     try:
         qtd = float(qtd or 1)
@@ -292,13 +276,13 @@ def _calcular_delta_por_medida(medida_aplicada, qtd, config):
     # ADVERTÊNCIA ORAL (inclui mais variações)
     if any(x in m for x in ['ADVERTENCIA ORAL', 'ADV ORAL', 'ADVERT ORAL', 'ORAL']):
         delta = qtd * float(config.get('advertencia_oral', -0.1))
-        print(f"DEBUG - ADVERTÊNCIA ORAL identificada! Delta calculado: {delta} (qtd={qtd}, config={config.get('advertencia_oral', -0.1)})")
+        logger.debug("ADVERTÊNCIA ORAL: delta %s (qtd=%s)", delta, qtd)
         return delta
     
     # ADVERTÊNCIA ESCRITA
     if any(x in m for x in ['ADVERTENCIA ESCRITA', 'ADV ESCRITA', 'ADVERT ESCRITA', 'ESCRITA']):
         delta = qtd * float(config.get('advertencia_escrita', -0.3))
-        print(f"DEBUG - ADVERTÊNCIA ESCRITA identificada! Delta calculado: {delta}")
+        logger.debug("ADVERTÊNCIA ESCRITA: delta %s", delta)
         return delta
     
     # SUSPENSÃO
@@ -306,7 +290,7 @@ def _calcular_delta_por_medida(medida_aplicada, qtd, config):
         nums = re.findall(r'(\d+)', m)
         dias = int(nums[0]) if nums else int(qtd)
         delta = dias * float(config.get('suspensao_dia', -0.5))
-        print(f"DEBUG - SUSPENSÃO identificada! Delta calculado: {delta} (dias={dias})")
+        logger.debug("SUSPENSÃO: delta %s (dias=%s)", delta, dias)
         return delta
     
     # AÇÃO EDUCATIVA
@@ -314,25 +298,25 @@ def _calcular_delta_por_medida(medida_aplicada, qtd, config):
         nums = re.findall(r'(\d+)', m)
         dias = int(nums[0]) if nums else int(qtd)
         delta = dias * float(config.get('acao_educativa_dia', -1.0))
-        print(f"DEBUG - AÇÃO EDUCATIVA identificada! Delta calculado: {delta} (dias={dias})")
+        logger.debug("AÇÃO EDUCATIVA: delta %s (dias=%s)", delta, dias)
         return delta
     
     # ELOGIOS
     if 'ELOGIO' in m:
         if 'INDIVIDU' in m:
             delta = qtd * float(config.get('elogio_individual', 0.5))
-            print(f"DEBUG - ELOGIO INDIVIDUAL identificado! Delta calculado: {delta}")
+            logger.debug("ELOGIO INDIVIDUAL: delta %s", delta)
             return delta
         if 'COLET' in m:
             delta = qtd * float(config.get('elogio_coletivo', 0.3))
-            print(f"DEBUG - ELOGIO COLETIVO identificado! Delta calculado: {delta}")
+            logger.debug("ELOGIO COLETIVO: delta %s", delta)
             return delta
         # Elogio genérico
         delta = qtd * float(config.get('elogio_individual', 0.5))
-        print(f"DEBUG - ELOGIO GENÉRICO identificado! Delta calculado: {delta}")
+        logger.debug("ELOGIO (genérico): delta %s", delta)
         return delta
 
-    print(f"DEBUG - NENHUM CASO IDENTIFICADO para '{m}'. Retornando delta 0.0")
+    logger.debug("nenhum caso identificado para %r; delta 0.0", m)
     return 0.0
 
 def _next_fmd_sequence(db):
@@ -417,7 +401,7 @@ def _apply_delta_pontuacao(db, aluno_id, data_tratamento_str, delta, ocorrencia_
         criado_em = datetime.now().strftime('%d/%m/%Y')
 
     try:
-        print(f"DEBUG _apply_delta_pontuacao: aluno_id={aluno_id}, delta={delta}, criado_em={criado_em}")
+        logger.debug("_apply_delta_pontuacao: aluno_id=%s, delta=%s, criado_em=%s", aluno_id, delta, criado_em)
         row = db.query(PontuacaoBimestral).filter_by(aluno_id=aluno_id, ano=ano, bimestre=bimestre).first()
         if row:
             atual = float(row.pontuacao_atual)
@@ -447,7 +431,9 @@ def _apply_delta_pontuacao(db, aluno_id, data_tratamento_str, delta, ocorrencia_
             criado_em=criado_em
         )
         db.add(hist)
+        registrar_evento_no_saldo(db, aluno_id, criado_em, delta)
         db.commit()
+        contar("deltas_aplicados")
     except Exception:
         print("EXCEPTION _apply_delta_pontuacao:", aluno_id, delta, criado_em)
         current_app.logger.exception('Erro ao aplicar delta pontuacao (possível tabela ausente).')
@@ -471,19 +457,15 @@ def buscar_alunos_json():
     try:
         if termo_busca.isdigit() or (matricula_part and matricula_part.isdigit()):
             num = matricula_part if matricula_part and matricula_part.isdigit() else termo_busca
-            alunos = db.query(Aluno).filter(
-                (Aluno.id == int(num)) |
-                (Aluno.matricula.ilike(f"%{num}%")) |
-                (Aluno.nome.ilike(f"%{num}%"))
-            ).order_by(Aluno.nome).limit(20).all()
+            alunos = buscar_alunos(db, num, limite=20)
+            # número também pode ser o id do aluno (vem primeiro, como match exato)
+            por_id = aluno_em_cache(db, int(num))
+            if por_id is not None:
+                alunos = ([por_id] + [a for a in alunos if a.id != por_id.id])[:20]
         else:
             if len(termo_busca) < 3:
                 return jsonify([])
-            q_like = f'%{termo_busca}%'
-            alunos = db.query(Aluno).filter(
-                (Aluno.matricula.ilike(q_like)) |
-                (Aluno.nome.ilike(q_like))
-            ).order_by(Aluno.nome).limit(20).all()
+            alunos = buscar_alunos(db, termo_busca, limite=20)
 
         for aluno in alunos:
             resultados.append({
@@ -668,6 +650,7 @@ def registrar_rfo():
                 except Exception:
                     pass
             db.commit()
+            invalidar_contadores()
 
             flash(f'RFO {rfo_id_final} registrado com sucesso!', 'success')
             return redirect(url_for('disciplinar_bp.listar_rfo'))
@@ -700,22 +683,35 @@ def registrar_rfo():
     alunos_nome_map={}
 )
 
-@disciplinar_bp.route('/listar_rfo')
-@admin_secundario_required
-def listar_rfo():
-    db = get_db()
+def _mapa_lideres(db):
+    """(serie_numerica, turma) -> (nome, matricula) dos líderes de turma, carregado uma vez por requisição."""
+    mapa = getattr(g, '_mapa_lideres', None)
+    if mapa is None:
+        mapa = {}
+        lideres = (
+            db.query(Aluno.serie_numerica, Aluno.turma, Aluno.nome, Aluno.matricula)
+            .filter(Aluno.lider == True)
+            .order_by(Aluno.id)
+        )
+        for serie_numerica, turma, nome, matricula in lideres:
+            mapa.setdefault((str(serie_numerica), turma), (nome, matricula))
+        g._mapa_lideres = mapa
+    return mapa
+
+def _pagina_rfos_pendentes(db, args):
+    """Uma página (keyset em data_registro, id) dos RFOs aguardando tratamento, com os filtros dos args."""
     from sqlalchemy.orm import aliased
     from sqlalchemy import func, cast, String
 
-    from models_sqlalchemy import LiderAluno, Aluno as AlunoModel
-
+    filtros = filtros_da_requisicao(args)
     Aluno1 = aliased(Aluno)
-    
-    ocorrencias = (
+
+    query = (
         db.query(
             Ocorrencia.id,
             Ocorrencia.rfo_id,
             Ocorrencia.data_ocorrencia,
+            Ocorrencia.data_registro,
             Ocorrencia.tipo_ocorrencia_id,
             Ocorrencia.status,
             Ocorrencia.relato_observador,
@@ -736,27 +732,19 @@ def listar_rfo():
         .join(Usuario, Usuario.id == Ocorrencia.responsavel_registro_id, isouter=True)
         .join(TipoOcorrencia, TipoOcorrencia.id == Ocorrencia.tipo_ocorrencia_id, isouter=True)
         .filter(Ocorrencia.status == 'AGUARDANDO TRATAMENTO')
-        .group_by(
-            Ocorrencia.id,
-            Ocorrencia.rfo_id,
-            Ocorrencia.data_ocorrencia,
-            Ocorrencia.tipo_ocorrencia_id,
-            Ocorrencia.status,
-            Ocorrencia.relato_observador,
-            Ocorrencia.advertencia_oral,
-            Ocorrencia.material_recolhido,
-            Aluno1.matricula,
-            Aluno1.nome,
-            Aluno1.serie,
-            Aluno1.turma,
-            Aluno1.serie_numerica,
-            Usuario.username,
-            TipoOcorrencia.nome,
-            Ocorrencia.subtipo_elogio,
-            Ocorrencia.tipo_rfo
-        )
-        .order_by(Ocorrencia.data_registro.desc())
-        .all()
+    )
+    query = filtrar_serie_turma(query, filtros['serie'], filtros['turma'], Aluno1.serie, Aluno1.turma)
+    query = filtrar_periodo(query, filtros['data_inicio'], filtros['data_fim'],
+                            Ocorrencia.data_ocorrencia, Ocorrencia.data_ocorrencia_dt)
+    query = filtrar_texto(query, filtros['q'], [
+        Aluno1.nome, Aluno1.matricula, Ocorrencia.rfo_id, Ocorrencia.relato_observador
+    ])
+    ocorrencias, proximo = pagina_keyset(
+        query,
+        [chave_texto(Ocorrencia.data_registro), Ocorrencia.id],
+        lambda r: [r.data_registro or '', r.id],
+        cursor=args.get('cursor'),
+        tamanho=tamanho_da_pagina(args)
     )
 
     rfos_list = [dict(rfo._asdict()) for rfo in ocorrencias]
@@ -767,25 +755,34 @@ def listar_rfo():
         subtipo = (rfo.get('subtipo_elogio') or '').lower()
         tipo_ocorrencia = (rfo.get('tipo_ocorrencia_nome') or '').lower()
 
-        # Se for elogio coletivo, busca o líder real da turma
+        # Se for elogio coletivo, usa o líder real da turma
         if (tipo_rfo == 'elogio' or 'elogio' in tipo_ocorrencia) and subtipo == 'coletivo':
             serie_numerica = rfo.get("serie_numerica")
             turma = rfo.get("turma_lider")
 
             if serie_numerica and turma:
-                lider_obj = db.query(AlunoModel).filter(
-                    AlunoModel.serie_numerica == str(serie_numerica),
-                    AlunoModel.turma == turma,
-                    AlunoModel.lider == True
-                ).first()
-                
-                if lider_obj:
-                    rfo["nome_aluno"] = lider_obj.nome
-                    rfo["matricula"] = lider_obj.matricula
+                lider = _mapa_lideres(db).get((str(serie_numerica), turma))
+                if lider:
+                    rfo["nome_aluno"], rfo["matricula"] = lider
                 else:
                     rfo["nome_aluno"] = "Líder não encontrado"
 
-    return render_template('disciplinar/listar_rfo.html', rfos=rfos_list)
+    return rfos_list, proximo, filtros
+
+@disciplinar_bp.route('/listar_rfo')
+@admin_secundario_required
+def listar_rfo():
+    db = get_db()
+    rfos_list, proximo, filtros = _pagina_rfos_pendentes(db, request.args)
+    return render_template('disciplinar/listar_rfo.html', rfos=rfos_list, filtros=filtros, proximo_cursor=proximo)
+
+@disciplinar_bp.route('/api/listar_rfo')
+@admin_secundario_required
+def api_listar_rfo():
+    """Mesma página de /listar_rfo em JSON (rolagem infinita: passe 'proximo' como ?cursor=)."""
+    db = get_db()
+    rfos_list, proximo, _ = _pagina_rfos_pendentes(db, request.args)
+    return jsonify({'itens': rfos_list, 'proximo': proximo})
 
 @disciplinar_bp.route('/visualizar_rfo/<int:ocorrencia_id>')
 @admin_secundario_required
@@ -940,10 +937,13 @@ def imprimir_rfo(ocorrencia_id):
     }
     return render_template('formularios/rfo_impressao.html', rfo=rfo_dict)
 
-@disciplinar_bp.route('/export_prontuario/<int:ocorrencia_id>')
-@admin_secundario_required
-def export_prontuario_pdf(ocorrencia_id):
-    db = get_db()
+# Opções do PDF de cada documento (as mesmas em todas as rotas, para reaproveitar o cache)
+OPCOES_PDF_RFO = {'backend': WKHTMLTOPDF, 'tamanho': 'A4', 'margens': ('10mm', '10mm', '10mm', '10mm'),
+                  'opcoes_wkhtmltopdf': {'print-media-type': None}}
+OPCOES_PDF_FMD = {'backend': WKHTMLTOPDF}
+
+def html_pdf_rfo(db, ocorrencia_id):
+    """(HTML do prontuário do RFO para o PDF, dados do RFO) ou (None, None) se não existir."""
     from sqlalchemy import func, cast, String
 
     rfo = (
@@ -969,44 +969,26 @@ def export_prontuario_pdf(ocorrencia_id):
     )
 
     if not rfo:
-        flash('RFO não encontrado.', 'danger')
-        return redirect(url_for('disciplinar_bp.listar_rfo'))
-
+        return None, None
     rfo_dict = dict(rfo._asdict() if hasattr(rfo, "_asdict") else rfo)
+    return render_template('disciplinar/prontuario_pdf.html', rfo=rfo_dict), rfo_dict
 
-    html = render_template('disciplinar/prontuario_pdf.html', rfo=rfo_dict)
-
-    wk_path = shutil.which('wkhtmltopdf')
-    if not wk_path:
-        wk_path = r'C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe'
-
-    if not os.path.isfile(wk_path):
-        abort(500, description=f"wkhtmltopdf não encontrado em: {wk_path}")
-
-    config = pdfkit.configuration(wkhtmltopdf=wk_path)
-    options = {
-        'page-size': 'A4',
-        'encoding': 'UTF-8',
-        'enable-local-file-access': None,
-        'print-media-type': None,
-        'margin-top': '10mm',
-        'margin-bottom': '10mm',
-        'margin-left': '10mm',
-        'margin-right': '10mm',
-    }
-
-    pdf_bytes = pdfkit.from_string(html, False, configuration=config, options=options)
-    if not pdf_bytes:
-        abort(500, description="Falha ao gerar o PDF.")
+@disciplinar_bp.route('/export_prontuario/<int:ocorrencia_id>')
+@admin_secundario_required
+def export_prontuario_pdf(ocorrencia_id):
+    db = get_db()
+    html, rfo_dict = html_pdf_rfo(db, ocorrencia_id)
+    if not html:
+        flash('RFO não encontrado.', 'danger')
+        return redirect(url_for('disciplinar_bp.listar_rfo'))
 
     nome_aluno = rfo_dict.get('nome_aluno') or 'aluno'
     safe_name = secure_filename(f"prontuario_{nome_aluno}.pdf")
-
-    headers = {
-        'Content-Type': 'application/pdf',
-        'Content-Disposition': f'attachment; filename="{safe_name}"'
-    }
-    return Response(pdf_bytes, headers=headers)
+    try:
+        return resposta_pdf(html, safe_name, anexo=True, **OPCOES_PDF_RFO)
+    except Exception:
+        current_app.logger.exception("Erro ao gerar o PDF do prontuário do RFO %s", ocorrencia_id)
+        abort(500, description="Falha ao gerar o PDF.")
 
 @disciplinar_bp.route('/gerar_ficha_medida/<int:ocorrencia_id>')
 @admin_secundario_required
@@ -1194,15 +1176,14 @@ def tratar_rfo(ocorrencia_id):
 
                 # ✅ MOVIDO PARA FORA DO LOOP: cria prontuário DEPOIS de salvar tudo
                 try:
-                    print(f"DEBUG: Criando prontuários para {len(alunos_coletivo)} alunos")
+                    logger.debug("criando prontuários para %s alunos", len(alunos_coletivo))
                     for oa in alunos_coletivo:
-                        print(f"DEBUG: Chamando create_or_append_prontuario_por_rfo para aluno_id={oa.aluno_id}")
                         result = create_or_append_prontuario_por_rfo(db, ocorrencia_id, session.get('username'), aluno_id=oa.aluno_id)
-                        print(f"DEBUG: Resultado: {result}")
-                except Exception as e:
-                    print(f"DEBUG ERRO ao criar prontuário coletivo: {e}")
+                        logger.debug("prontuário aluno_id=%s: %s", oa.aluno_id, result)
+                except Exception:
                     current_app.logger.exception('Erro ao criar prontuário coletivo')
 
+                invalidar_contadores()
                 flash('RFO de elogio aprovado com sucesso. Pontuação somada ao aluno.', 'success')
                 return redirect(url_for('disciplinar_bp.listar_rfo'))
     
@@ -1291,7 +1272,7 @@ def tratar_rfo(ocorrencia_id):
 
                 # Usa a data de DESPACHO (tratamento) se existir, senão usa hoje
                 data_trat = data_despacho if data_despacho else datetime.now().strftime('%Y-%m-%d')
-                print(f"DEBUG data_trat: {data_trat}, data_despacho: {data_despacho}")
+                logger.debug("data_trat: %s, data_despacho: %s", data_trat, data_despacho)
 
                 # Atualiza a ocorrência
                 oc_obj = db.query(Ocorrencia).filter_by(id=ocorrencia_id).one_or_none()
@@ -1338,7 +1319,6 @@ def tratar_rfo(ocorrencia_id):
                             delta = _calcular_delta_por_medida(medida_aplicada, qtd_form, config)
                             aluno_id_local = getattr(oc_obj, 'aluno_id', None)
                             data_fmd = data_trat  # USA A DATA DO RFO, NÃO A DATA DE HOJE!
-                            print(f"DEBUG data_trat: {data_trat}, tipo: {type(data_trat)}")
                             _apply_delta_pontuacao(db, oc_obj.aluno_id, data_trat, delta, ocorrencia_id, medida_aplicada, data_despacho=data_trat)
                             db.commit()
                             resultado = compute_pontuacao_em_data(aluno_id_local, data_fmd, congelar=True)
@@ -1421,6 +1401,7 @@ def tratar_rfo(ocorrencia_id):
 
                 try:
                     db.commit()
+                    invalidar_contadores()
                 except Exception as e:
                     db.rollback()
                     flash(f'Erro ao tratar RFO: {e}', 'danger')
@@ -1551,6 +1532,7 @@ def excluir_ocorrencia(ocorrencia_id):
 
         db.delete(ocorrencia)
         db.commit()
+        invalidar_contadores()
 
         flash(f'Oorrência/RFO {rfo_id_nome} excluído com sucesso.', 'success')
 
@@ -1638,6 +1620,7 @@ def registrar_fmd():
                 )
                 db.add(nova_fmd)
                 db.commit()
+                invalidar_contadores()
                 flash(f'FMD {fmd_id_final} registrada com sucesso!', 'success')
                 return redirect(url_for('visualizacoes_bp.listar_fmds'))
             except Exception as e:
@@ -1727,6 +1710,7 @@ def excluir_fmd(fmd_id):
 
         db.delete(fmd)
         db.commit()
+        invalidar_contadores()
 
         flash(f'FMD {fmd_id_nome} excluída com sucesso.', 'success')
     except Exception as e:
@@ -1879,6 +1863,15 @@ from flask import render_template, g
 from flask import request
 import sqlite3
 
+def html_pdf_fmd(contexto):
+    """HTML da FMD para o PDF; o logotipo vai como file:// (lido do disco pelo renderizador)."""
+    logo_relativo = contexto.get('escola', {}).get('logotipo_url', '')
+    logo = ''
+    if logo_relativo:
+        caminho_absoluto = os.path.join(current_app.root_path, logo_relativo.lstrip('/'))
+        logo = "file:///" + quote(caminho_absoluto.replace("\\", "/").lstrip('/'))
+    return render_template('disciplinar/fmd_novo_pdf.html', **dict(contexto, logo_pdfkit_path=logo))
+
 def montar_contexto_fmd(db, fmd_id, usuario_sessao_override=None):
     fmd = db.query(FichaMedidaDisciplinar).filter_by(fmd_id=fmd_id).first()
     aluno = db.query(Aluno).filter_by(id=fmd.aluno_id).first() if fmd else None
@@ -1926,6 +1919,8 @@ def montar_contexto_fmd(db, fmd_id, usuario_sessao_override=None):
     envio = {
         'data_hora': getattr(fmd, 'email_enviado_data', None),
         'email_destinatario': getattr(fmd, 'email_enviado_para', None),
+        'status': getattr(fmd, 'email_status', None),
+        'erro': getattr(fmd, 'email_erro', None),
     }
     # AQUI, TROQUE O QUE ESTAVA POR ISSO:
     pontuacao = getattr(fmd, 'pontuacao_no_documento', None)
@@ -1991,7 +1986,7 @@ def fmd_novo_real(fmd_id):
             # Fallback: infere pelo valor de pontuação
             comportamento = _infer_comportamento_por_faixa(pontuacao)
 
-        print(f"DEBUG FMD {fmd_id} - Pontuação congelada: {pontuacao}, Comportamento: {comportamento}")
+        logger.debug("FMD %s - pontuação congelada: %s, comportamento: %s", fmd_id, pontuacao, comportamento)
 
     # ==== 4. Busca ocorrência relacionada (RFO) ====
     try:
@@ -2064,83 +2059,23 @@ def fmd_novo_real(fmd_id):
     contexto = montar_contexto_fmd(db, fmd_id, usuario_sessao)
 
     if request.args.get('salvar_pdf') == '1':
-        import pdfkit, os
-        from urllib.parse import quote
-
-        logo_relativo = contexto.get('escola', {}).get('logotipo_url', '')
-        if logo_relativo:
-            logo_relativo = logo_relativo.lstrip("/")
-            caminho_absoluto = os.path.join(
-                r"C:\Users\Usuário\Documents\GitHub\escolar\escola", logo_relativo
-            )
-            contexto['logo_pdfkit_path'] = "file:///" + quote(caminho_absoluto.replace("\\", "/"))
-        else:
-            contexto['logo_pdfkit_path'] = ""
-
-        html = render_template('disciplinar/fmd_novo_pdf.html', **contexto)
-        temp_dir = 'tmp'
-        if not os.path.exists(temp_dir):
-            os.makedirs(temp_dir)
-        safe_fmd_id = str(fmd_id).replace('/', '_')
-        pdf_path = os.path.join(temp_dir, f"{safe_fmd_id}.pdf")
-        config = pdfkit.configuration(wkhtmltopdf=r'C:\Arquivos de Programas\wkhtmltopdf\bin\wkhtmltopdf.exe')
-        options = {'encoding': 'UTF-8', 'enable-local-file-access': None}
-        pdfkit.from_string(html, pdf_path, configuration=config, options=options)
+        # Deixa o PDF pronto no cache do renderizador (reaproveitado no envio por e-mail)
+        gerar_pdf(html_pdf_fmd(contexto), **OPCOES_PDF_FMD)
 
     return render_template('disciplinar/fmd_novo.html', **contexto)
 
-@disciplinar_bp.route('/enviar_email_fmd/<path:fmd_id>', methods=['POST'])
-def enviar_email_fmd(fmd_id):
-    from flask import redirect, url_for, flash
-    import datetime
-    import smtplib
-    from email.mime.multipart import MIMEMultipart
-    from email.mime.text import MIMEText
-    import os
-    from email.mime.application import MIMEApplication
-
-    db = get_db()
-    user_id = session.get('user_id')
-    usuario_obj = db.query(Usuario).filter(Usuario.id == user_id).first() if user_id else None
-    nome_usuario = getattr(usuario_obj, 'username', 'Usuário do sistema')
-    cargo_usuario = getattr(usuario_obj, 'cargo', '')
-
-    # Busca os dados da FMD
-    fmd = db.query(FichaMedidaDisciplinar).filter_by(fmd_id=fmd_id).first()
-    if not fmd:
-        flash('FMD não encontrada!', 'alert-danger')
-        return redirect(url_for('disciplinar_bp.fmd_novo_real', fmd_id=fmd_id))
-
-    # Busca o aluno e seu e-mail
-    aluno = db.query(Aluno).filter_by(id=fmd.aluno_id).first()
-    email_destinatario = getattr(aluno, 'email', None) if aluno else None
-
-    if not email_destinatario:
-        flash('Não existe e-mail cadastrado para este aluno.', 'alert-danger')
-        return redirect(url_for('disciplinar_bp.fmd_novo_real', fmd_id=fmd_id))
-
-    # Busca o e-mail e a senha de app da escola
-    dados_escola = db.query(DadosEscola).first()
-    email_remetente = getattr(dados_escola, 'email_remetente', None)
-    senha_email_app = getattr(dados_escola, 'senha_email_app', None)
-    telefone_escola = getattr(dados_escola, 'telefone', '')
-
-    if not email_remetente or not senha_email_app:
-        flash('Não há e-mail institucional e/ou senha de aplicativo cadastrados para a escola.', 'danger')
-        return redirect(url_for('disciplinar_bp.fmd_novo_real', fmd_id=fmd_id))
-
-    assunto = "Ficha de Medida Disciplinar"
-
+def corpo_email_fmd(fmd, aluno, dados_escola, nome_usuario, cargo_usuario):
     def get_fmd_field(row, key):
         try:
             return getattr(row, key, '')
         except Exception:
             return ''
-        
+
     def safe_value(val):
         return val if val not in (None, '', 'None') else '—'
 
-    corpo_html = f"""
+    telefone_escola = getattr(dados_escola, 'telefone', '')
+    return f"""
     <html>
     <body>
         <p>Prezado responsável,<br>
@@ -2161,37 +2096,475 @@ def enviar_email_fmd(fmd_id):
     </html>
     """
 
+def _falha_email_fmd(db, payload, erro, nova_tentativa):
+    fmd = db.query(FichaMedidaDisciplinar).filter_by(fmd_id=payload['fmd_id']).first()
+    if fmd:
+        fmd.email_status = 'pendente' if nova_tentativa else 'erro'
+        fmd.email_erro = erro
+
+@tarefa('email_fmd', ao_falhar=_falha_email_fmd)
+def _tarefa_email_fmd(db, payload):
+    """Gera (ou reaproveita do cache) o PDF da FMD e envia ao e-mail do aluno."""
+    fmd_id = payload['fmd_id']
+    fmd = db.query(FichaMedidaDisciplinar).filter_by(fmd_id=fmd_id).first()
+    if not fmd:
+        raise ErroDefinitivo(f"FMD {fmd_id} não encontrada.")
+    aluno = db.query(Aluno).filter_by(id=fmd.aluno_id).first()
+    email_destinatario = getattr(aluno, 'email', None) if aluno else None
+    if not email_destinatario:
+        raise ErroDefinitivo("Não existe e-mail cadastrado para este aluno.")
+    email_remetente, senha_email_app = credenciais_escola(db)
+    if not email_remetente:
+        raise ErroDefinitivo("Não há e-mail institucional e/ou senha de aplicativo cadastrados para a escola.")
+
+    fmd.email_status = 'enviando'
+    db.commit()
+
+    usuario_id = payload.get('usuario_id')
+    usuario_obj = db.query(Usuario).filter(Usuario.id == usuario_id).first() if usuario_id else None
+    dados_escola = db.query(DadosEscola).first()
+    corpo_html = corpo_email_fmd(fmd, aluno, dados_escola,
+                                 getattr(usuario_obj, 'username', 'Usuário do sistema'),
+                                 getattr(usuario_obj, 'cargo', ''))
+
+    pdf = gerar_pdf(html_pdf_fmd(montar_contexto_fmd(db, fmd_id, usuario_obj)), **OPCOES_PDF_FMD)
+    anexo = (f"{str(fmd_id).replace('/', '_')}.pdf", pdf, 'application/pdf')
+
+    msg = montar_mensagem(email_remetente, email_destinatario, "Ficha de Medida Disciplinar", corpo_html,
+                          anexos=[anexo])
+    enviar_mensagem(msg, email_remetente, senha_email_app)
+
+    fmd.email_enviado_data = datetime.now().strftime('%d/%m/%Y %H:%M')
+    fmd.email_enviado_para = email_destinatario
+    fmd.email_status = 'enviado'
+    fmd.email_erro = None
+
+@disciplinar_bp.route('/enviar_email_fmd/<path:fmd_id>', methods=['POST'])
+def enviar_email_fmd(fmd_id):
+    db = get_db()
+
+    # Busca os dados da FMD
+    fmd = db.query(FichaMedidaDisciplinar).filter_by(fmd_id=fmd_id).first()
+    if not fmd:
+        flash('FMD não encontrada!', 'alert-danger')
+        return redirect(url_for('disciplinar_bp.fmd_novo_real', fmd_id=fmd_id))
+
+    # Busca o aluno e seu e-mail
+    aluno = db.query(Aluno).filter_by(id=fmd.aluno_id).first()
+    if not (getattr(aluno, 'email', None) if aluno else None):
+        flash('Não existe e-mail cadastrado para este aluno.', 'alert-danger')
+        return redirect(url_for('disciplinar_bp.fmd_novo_real', fmd_id=fmd_id))
+
+    if not credenciais_escola(db)[0]:
+        flash('Não há e-mail institucional e/ou senha de aplicativo cadastrados para a escola.', 'danger')
+        return redirect(url_for('disciplinar_bp.fmd_novo_real', fmd_id=fmd_id))
+
+    # PDF e SMTP ficam com a fila de tarefas; a página mostra o andamento (email_status)
     try:
-        temp_dir = "tmp"
-        safe_fmd_id = str(fmd_id).replace('/', '_')
-        pdf_path = os.path.join(temp_dir, f"{safe_fmd_id}.pdf")
-        if not os.path.exists(pdf_path):
-            flash('O PDF da FMD não foi gerado corretamente. Por favor, gere novamente a FMD antes de enviar por e-mail.', 'danger')
-            return redirect(url_for('disciplinar_bp.fmd_novo_real', fmd_id=fmd_id))
-
-        msg = MIMEMultipart()
-        msg['From'] = email_remetente
-        msg['To'] = email_destinatario
-        msg['Subject'] = assunto
-        msg.attach(MIMEText(corpo_html, 'html'))
-
-        with open(pdf_path, "rb") as f:
-            part = MIMEApplication(f.read(), Name=os.path.basename(pdf_path))
-            part['Content-Disposition'] = f'attachment; filename="{os.path.basename(pdf_path)}"'
-            msg.attach(part)
-
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(email_remetente, senha_email_app)
-        server.sendmail(email_remetente, email_destinatario, msg.as_string())
-        server.quit()
-
-        data_envio = datetime.datetime.now().strftime('%d/%m/%Y %H:%M')
-        fmd.email_enviado_data = data_envio
-        fmd.email_enviado_para = email_destinatario
+        enfileirar(db, 'email_fmd', {'fmd_id': fmd_id, 'usuario_id': session.get('user_id')})
+        fmd.email_status = 'pendente'
+        fmd.email_erro = None
         db.commit()
-        flash("FMD enviada por e-mail com sucesso!", "success")
     except Exception as e:
+        db.rollback()
+        current_app.logger.exception("Erro ao enfileirar o envio da FMD %s", fmd_id)
         flash(f"Erro ao enviar o e-mail: {e}", "danger")
+        return redirect(url_for('disciplinar_bp.fmd_novo_real', fmd_id=fmd_id))
 
+    acordar_fila()
+    flash("FMD na fila de envio por e-mail. O envio é feito em segundo plano.", "success")
     return redirect(url_for('disciplinar_bp.fmd_novo_real', fmd_id=fmd_id))
+
+# ==== Envio em lote das FMDs ainda não enviadas ====
+
+def fmds_pendentes_de_envio(db):
+    """[(fmd_id, email do aluno ou None)] das FMDs ativas sem email_enviado_data."""
+    return (
+        db.query(FichaMedidaDisciplinar.fmd_id, Aluno.email)
+        .outerjoin(Aluno, Aluno.id == FichaMedidaDisciplinar.aluno_id)
+        .filter(FichaMedidaDisciplinar.email_enviado_data.is_(None),
+                (FichaMedidaDisciplinar.baixa == '0') | (FichaMedidaDisciplinar.baixa == None))
+        .order_by(FichaMedidaDisciplinar.id)
+        .all()
+    )
+
+def _gerar_pdf_no_app(app, html, opcoes):
+    """Para os pools de threads: o renderizador precisa do contexto do app."""
+    with app.app_context():
+        return gerar_pdf(html, **opcoes)
+
+def enviar_fmds_em_lote(db, fmd_ids, usuario_id=None, ao_enviar=None, ao_progredir=None):
+    """
+    Envia as FMDs indicadas que ainda não foram enviadas, numa única sessão SMTP.
+
+    Os PDFs que não estão no cache são gerados em paralelo (PDF_LOTE_WORKERS) e cada
+    mensagem sai assim que o seu PDF fica pronto, respeitando EMAIL_LOTE_INTERVALO segundos
+    entre envios. Se o servidor derrubar a conexão, reconecta uma vez. O resultado de cada
+    FMD (email_status, email_erro, email_enviado_para/data) é gravado e commitado antes do
+    próximo envio, então uma falha no meio (ou outro worker retomando a tarefa) não reenvia
+    o que já saiu.
+
+    ao_enviar(resultado) é chamada para cada FMD; ao_progredir(feitas, total) depois de cada
+    uma (na fila: registrar_progresso, que também mantém a tarefa longe de
+    TRAVADA_APOS_SEGUNDOS). Retorna a lista de resultados:
+    {'fmd_id', 'aluno', 'email', 'situacao': 'enviado' | 'erro' | 'sem_email', 'erro'}.
+    """
+    import smtplib
+    import time
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    email_remetente, senha_email_app = credenciais_escola(db)
+    if not email_remetente:
+        raise ErroDefinitivo("Não há e-mail institucional e/ou senha de aplicativo cadastrados para a escola.")
+
+    linhas = (
+        db.query(FichaMedidaDisciplinar, Aluno)
+        .outerjoin(Aluno, Aluno.id == FichaMedidaDisciplinar.aluno_id)
+        .filter(FichaMedidaDisciplinar.fmd_id.in_(list(fmd_ids)),
+                FichaMedidaDisciplinar.email_enviado_data.is_(None))
+        .order_by(FichaMedidaDisciplinar.id)
+        .all()
+    )
+    usuario_obj = db.query(Usuario).filter(Usuario.id == usuario_id).first() if usuario_id else None
+    nome_usuario = getattr(usuario_obj, 'username', 'Usuário do sistema')
+    cargo_usuario = getattr(usuario_obj, 'cargo', '')
+    dados_escola = db.query(DadosEscola).first()
+
+    resultados = []
+
+    def _registrar(fmd, aluno, situacao, erro=None, quando=None):
+        resultado = {'fmd_id': fmd.fmd_id, 'aluno': getattr(aluno, 'nome', None),
+                     'email': getattr(aluno, 'email', None), 'situacao': situacao, 'erro': erro}
+        resultados.append(resultado)
+        linha = {'id': fmd.id, 'email_status': 'erro' if situacao != 'enviado' else 'enviado', 'email_erro': erro}
+        if situacao == 'enviado':
+            linha.update(email_enviado_para=aluno.email, email_enviado_data=quando)
+        db.execute(update(FichaMedidaDisciplinar), [linha])
+        db.commit()
+        if ao_enviar:
+            ao_enviar(resultado)
+        if ao_progredir:
+            ao_progredir(len(resultados), len(linhas))
+
+    # HTML de cada FMD (consultas ao banco: na thread atual, com a sessão do lote)
+    a_enviar = []
+    for fmd, aluno in linhas:
+        if not getattr(aluno, 'email', None):
+            _registrar(fmd, aluno, 'sem_email', "Não existe e-mail cadastrado para este aluno.")
+            continue
+        html_pdf = html_pdf_fmd(montar_contexto_fmd(db, fmd.fmd_id, usuario_obj))
+        a_enviar.append((fmd, aluno, html_pdf))
+
+    app = current_app._get_current_object()
+    intervalo = float(current_app.config.get('EMAIL_LOTE_INTERVALO', 1.0))
+    workers = int(current_app.config.get('PDF_LOTE_WORKERS', 4))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor, \
+            ConexaoSMTP(email_remetente, senha_email_app) as conexao:
+        futuros = {executor.submit(_gerar_pdf_no_app, app, html_pdf, OPCOES_PDF_FMD): (fmd, aluno)
+                   for fmd, aluno, html_pdf in a_enviar}
+        ultimo_envio = 0.0
+        for futuro in as_completed(futuros):
+            fmd, aluno = futuros[futuro]
+            try:
+                anexo = (f"{str(fmd.fmd_id).replace('/', '_')}.pdf", futuro.result(), 'application/pdf')
+                corpo_html = corpo_email_fmd(fmd, aluno, dados_escola, nome_usuario, cargo_usuario)
+                msg = montar_mensagem(email_remetente, aluno.email, "Ficha de Medida Disciplinar", corpo_html,
+                                      anexos=[anexo])
+            except Exception as e:
+                current_app.logger.exception("Erro ao gerar o PDF da FMD %s", fmd.fmd_id)
+                _registrar(fmd, aluno, 'erro', f"Falha ao gerar o PDF: {e}")
+                continue
+
+            espera = intervalo - (time.monotonic() - ultimo_envio)
+            if espera > 0:
+                time.sleep(espera)
+            try:
+                try:
+                    conexao.enviar(msg)
+                except smtplib.SMTPServerDisconnected:
+                    conexao.fechar()
+                    conexao.abrir()
+                    conexao.enviar(msg)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError, smtplib.SMTPSenderRefused) as e:
+                _registrar(fmd, aluno, 'erro', f"{type(e).__name__}: {e}")
+            else:
+                _registrar(fmd, aluno, 'enviado', quando=datetime.now().strftime('%d/%m/%Y %H:%M'))
+            ultimo_envio = time.monotonic()
+    return resultados
+
+def _falha_email_fmds_lote(db, payload, erro, nova_tentativa):
+    # Sem nova tentativa, o que ficou para trás (não enviado) aparece como erro
+    if nova_tentativa:
+        return
+    db.execute(
+        update(FichaMedidaDisciplinar)
+        .where(FichaMedidaDisciplinar.fmd_id.in_(payload['fmd_ids']),
+               FichaMedidaDisciplinar.email_enviado_data.is_(None),
+               FichaMedidaDisciplinar.email_status.in_(['pendente', 'enviando']))
+        .values(email_status='erro', email_erro=erro)
+    )
+
+@tarefa('email_fmds_lote', ao_falhar=_falha_email_fmds_lote)
+def _tarefa_email_fmds_lote(db, payload):
+    enviar_fmds_em_lote(db, payload['fmd_ids'], payload.get('usuario_id'), ao_progredir=registrar_progresso)
+
+@disciplinar_bp.route('/enviar_fmds_pendentes', methods=['POST'])
+@admin_required
+def enviar_fmds_pendentes():
+    """Coloca na fila o envio de todas as FMDs ainda não enviadas por e-mail."""
+    db = get_db()
+    quer_json = request.is_json or request.accept_mimetypes.best == 'application/json'
+    if not credenciais_escola(db)[0]:
+        mensagem = 'Não há e-mail institucional e/ou senha de aplicativo cadastrados para a escola.'
+        if quer_json:
+            return jsonify({'ok': False, 'erro': mensagem}), 400
+        flash(mensagem, 'danger')
+        return redirect(url_for('visualizacoes_bp.listar_fmds'))
+
+    pendentes = fmds_pendentes_de_envio(db)
+    fmd_ids = [fmd_id for fmd_id, email in pendentes if email]
+    sem_email = len(pendentes) - len(fmd_ids)
+    tarefa_id = None
+    if fmd_ids:
+        t = enfileirar(db, 'email_fmds_lote', {'fmd_ids': fmd_ids, 'usuario_id': session.get('user_id')},
+                       max_tentativas=3)
+        tarefa_id = t.id
+        db.execute(
+            update(FichaMedidaDisciplinar)
+            .where(FichaMedidaDisciplinar.fmd_id.in_(fmd_ids))
+            .values(email_status='pendente', email_erro=None)
+        )
+        db.commit()
+        acordar_fila()
+
+    if quer_json:
+        return jsonify({'ok': True, 'tarefa_id': tarefa_id, 'na_fila': len(fmd_ids), 'sem_email': sem_email,
+                        'situacao_url': url_for('disciplinar_bp.situacao_envio_fmds', tarefa_id=tarefa_id) if tarefa_id else None})
+    if tarefa_id:
+        flash(f"{len(fmd_ids)} FMD(s) na fila de envio por e-mail"
+              f"{f' ({sem_email} sem e-mail cadastrado)' if sem_email else ''}. "
+              f"Acompanhe em {url_for('disciplinar_bp.situacao_envio_fmds', tarefa_id=tarefa_id)}", 'success')
+    else:
+        flash('Não há FMDs pendentes de envio com e-mail cadastrado.', 'info')
+    return redirect(url_for('visualizacoes_bp.listar_fmds'))
+
+@disciplinar_bp.route('/envio_fmds_lote/<int:tarefa_id>')
+@admin_required
+def situacao_envio_fmds(tarefa_id):
+    """Situação do envio em lote, por destinatário (JSON)."""
+    db = get_db()
+    t = db.get(TarefaFila, tarefa_id)
+    if t is None or t.tipo != 'email_fmds_lote':
+        return jsonify({'ok': False, 'erro': 'Envio não encontrado.'}), 404
+    fmd_ids = json.loads(t.payload or '{}').get('fmd_ids', [])
+    linhas = (
+        db.query(FichaMedidaDisciplinar.fmd_id, FichaMedidaDisciplinar.email_status, FichaMedidaDisciplinar.email_erro,
+                 FichaMedidaDisciplinar.email_enviado_para, FichaMedidaDisciplinar.email_enviado_data,
+                 Aluno.nome, Aluno.email)
+        .outerjoin(Aluno, Aluno.id == FichaMedidaDisciplinar.aluno_id)
+        .filter(FichaMedidaDisciplinar.fmd_id.in_(fmd_ids))
+        .order_by(FichaMedidaDisciplinar.id)
+        .all()
+    )
+    destinatarios = [{
+        'fmd_id': l.fmd_id, 'aluno': l.nome, 'email': l.email_enviado_para or l.email,
+        'situacao': l.email_status or 'pendente', 'erro': l.email_erro, 'enviado_em': l.email_enviado_data,
+    } for l in linhas]
+    resumo = {}
+    for d in destinatarios:
+        resumo[d['situacao']] = resumo.get(d['situacao'], 0) + 1
+    return jsonify({'ok': True, 'tarefa': {'id': t.id, 'status': t.status, 'tentativas': t.tentativas,
+                                           'erro': t.ultimo_erro},
+                    'resumo': resumo, 'destinatarios': destinatarios})
+
+# ==== Pacote de PDFs (todas as FMDs / RFOs de um filtro num único arquivo) ====
+
+PACOTE_MAX_DOCUMENTOS = 1000
+PACOTE_VALIDADE_SEGUNDOS = 24 * 3600  # pacotes mais antigos são apagados na próxima geração
+TIPOS_PACOTE = {'fmd': 'FMDs', 'rfo': 'RFOs'}
+
+def pasta_pacotes():
+    return os.path.join(current_app.root_path, 'tmp', 'pacotes')
+
+def ids_documentos_pacote(db, tipo, filtros):
+    """ids (fmd_id das FMDs / id das ocorrências) com os mesmos filtros das listagens, por série, turma e aluno."""
+    if tipo == 'fmd':
+        query = (
+            db.query(FichaMedidaDisciplinar.fmd_id)
+            .outerjoin(Aluno, Aluno.id == FichaMedidaDisciplinar.aluno_id)
+            .filter((FichaMedidaDisciplinar.baixa == '0') | (FichaMedidaDisciplinar.baixa == None))
+        )
+        if filtros['status']:
+            query = query.filter(func.upper(FichaMedidaDisciplinar.status) == filtros['status'])
+        query = filtrar_periodo(query, filtros['data_inicio'], filtros['data_fim'], FichaMedidaDisciplinar.data_fmd)
+        query = filtrar_texto(query, filtros['q'], [
+            Aluno.nome, Aluno.matricula, cast(FichaMedidaDisciplinar.fmd_id, String), FichaMedidaDisciplinar.medida_aplicada
+        ])
+        ordem = [FichaMedidaDisciplinar.data_fmd, FichaMedidaDisciplinar.id]
+    else:
+        status = filtros['status'] or 'TRATADO'  # mesmo padrão da listagem de RFOs
+        query = db.query(Ocorrencia.id).outerjoin(Aluno, Aluno.id == Ocorrencia.aluno_id)
+        if status != 'TODOS':
+            query = query.filter(Ocorrencia.status == status)
+        else:
+            query = query.filter(Ocorrencia.status.in_(['TRATADO', 'AGUARDANDO TRATAMENTO']))
+        query = filtrar_periodo(query, filtros['data_inicio'], filtros['data_fim'],
+                                Ocorrencia.data_ocorrencia, Ocorrencia.data_ocorrencia_dt)
+        query = filtrar_texto(query, filtros['q'], [
+            Aluno.nome, Aluno.matricula, Ocorrencia.rfo_id, Ocorrencia.relato_observador
+        ])
+        ordem = [Ocorrencia.data_ocorrencia, Ocorrencia.id]
+    query = filtrar_serie_turma(query, filtros['serie'], filtros['turma'], Aluno.serie, Aluno.turma)
+    query = query.order_by(Aluno.serie, Aluno.turma, Aluno.nome, *ordem)
+    return [doc_id for (doc_id,) in query.limit(PACOTE_MAX_DOCUMENTOS + 1)]
+
+def _apagar_pacotes_antigos(pasta):
+    import time
+    limite = time.time() - PACOTE_VALIDADE_SEGUNDOS
+    with os.scandir(pasta) as entradas:
+        for e in entradas:
+            if e.is_file() and e.stat().st_mtime < limite:
+                try:
+                    os.remove(e.path)
+                except OSError:
+                    pass
+
+def gerar_pacote_pdf(db, tipo, ids, formato='pdf', usuario_id=None, ao_progredir=None):
+    """
+    Junta os PDFs dos documentos num único PDF (PyPDF2) ou num ZIP, na ordem de ids.
+
+    O HTML de cada documento é montado aqui (consultas na sessão do chamador); os PDFs saem
+    do cache do renderizador ou são gerados em paralelo (PDF_LOTE_WORKERS). Documentos que
+    falharem ficam fora do pacote e são listados em 'erros'.
+    ao_progredir(atual, total) é chamada a cada PDF pronto.
+    Retorna {'arquivo', 'nome_download', 'documentos', 'erros'}.
+    """
+    import tempfile
+    import uuid
+    import zipfile
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from PyPDF2 import PdfWriter
+
+    total = len(ids)
+    opcoes = OPCOES_PDF_FMD if tipo == 'fmd' else OPCOES_PDF_RFO
+    usuario_obj = db.query(Usuario).filter(Usuario.id == usuario_id).first() if usuario_id else None
+    if ao_progredir:
+        ao_progredir(0, total)
+
+    documentos, erros = [], []
+    for doc_id in ids:
+        try:
+            if tipo == 'fmd':
+                contexto = montar_contexto_fmd(db, doc_id, usuario_obj)
+                html = html_pdf_fmd(contexto)
+                nome = f"{doc_id if str(doc_id).upper().startswith('FMD') else f'FMD_{doc_id}'}_{contexto['aluno'].get('nome') or ''}"
+            else:
+                html, rfo_dict = html_pdf_rfo(db, doc_id)
+                if not html:
+                    erros.append({'id': doc_id, 'erro': 'RFO não encontrado.'})
+                    continue
+                nome = f"{rfo_dict.get('rfo_id') or f'RFO_{doc_id}'}_{rfo_dict.get('nome_aluno') or ''}"
+            documentos.append((doc_id, secure_filename(nome) + '.pdf', html))
+        except Exception as e:
+            current_app.logger.exception("Erro ao montar o documento %s (%s) do pacote", doc_id, tipo)
+            erros.append({'id': doc_id, 'erro': f"{type(e).__name__}: {e}"})
+
+    pasta = pasta_pacotes()
+    os.makedirs(pasta, exist_ok=True)
+    _apagar_pacotes_antigos(pasta)
+    carimbo = datetime.now().strftime('%Y%m%d_%H%M%S')
+    extensao = 'zip' if formato == 'zip' else 'pdf'
+    arquivo = f"{tipo}_{carimbo}_{uuid.uuid4().hex[:12]}.{extensao}"
+    temporario = os.path.join(pasta, arquivo + '.tmp')
+
+    # Cada PDF é copiado para uma pasta só deste pacote assim que fica pronto: o arquivo no
+    # cache do renderizador pode ser removido pela limpeza antes de o pacote ser montado.
+    app = current_app._get_current_object()
+    caminhos = {}
+    prontos = len(erros)
+    with tempfile.TemporaryDirectory(dir=pasta) as pasta_docs:
+        with ThreadPoolExecutor(max_workers=max(1, int(current_app.config.get('PDF_LOTE_WORKERS', 4)))) as executor:
+            futuros = {executor.submit(_gerar_pdf_no_app, app, html, opcoes): doc_id for doc_id, _, html in documentos}
+            for n, futuro in enumerate(as_completed(futuros)):
+                doc_id = futuros[futuro]
+                try:
+                    caminho = os.path.join(pasta_docs, f"{n}.pdf")
+                    with open(caminho, 'wb') as f:
+                        f.write(futuro.result())
+                    caminhos[doc_id] = caminho
+                except Exception as e:
+                    current_app.logger.exception("Erro ao gerar o PDF do documento %s (%s) do pacote", doc_id, tipo)
+                    erros.append({'id': doc_id, 'erro': f"{type(e).__name__}: {e}"})
+                prontos += 1
+                if ao_progredir:
+                    ao_progredir(prontos, total)
+
+        incluidos = [(nome, caminhos[doc_id]) for doc_id, nome, _ in documentos if doc_id in caminhos]
+        if extensao == 'zip':
+            # PDFs já são comprimidos: só armazenar
+            with zipfile.ZipFile(temporario, 'w', compression=zipfile.ZIP_STORED) as z:
+                for nome, caminho in incluidos:
+                    z.write(caminho, arcname=nome)
+        else:
+            writer = PdfWriter()
+            for _, caminho in incluidos:
+                writer.append(caminho)
+            with open(temporario, 'wb') as f:
+                writer.write(f)
+    os.replace(temporario, os.path.join(pasta, arquivo))
+    return {'arquivo': arquivo, 'nome_download': f"{TIPOS_PACOTE[tipo]}_{carimbo}.{extensao}",
+            'documentos': len(incluidos), 'erros': erros}
+
+@tarefa('pacote_pdf')
+def _tarefa_pacote_pdf(db, payload):
+    return gerar_pacote_pdf(db, payload['tipo'], payload['ids'], payload.get('formato', 'pdf'),
+                            payload.get('usuario_id'), ao_progredir=registrar_progresso)
+
+@disciplinar_bp.route('/pacote_pdf', methods=['GET', 'POST'])
+@admin_required
+def pacote_pdf():
+    """Exporta num único PDF (ou ZIP) todas as FMDs / RFOs do filtro (período, série/turma, aluno)."""
+    db = get_db()
+    dados = request.form if request.method == 'POST' else request.args
+    tipo = dados.get('tipo') if dados.get('tipo') in TIPOS_PACOTE else 'fmd'
+    filtros = filtros_da_requisicao(dados)
+    ids = ids_documentos_pacote(db, tipo, filtros)
+
+    if request.method == 'GET':
+        return render_template('disciplinar/pacote_pdf.html', tipo=tipo, nome_tipo=TIPOS_PACOTE[tipo],
+                               filtros=filtros, total=len(ids), maximo=PACOTE_MAX_DOCUMENTOS)
+
+    if not ids:
+        return jsonify({'ok': False, 'erro': 'Nenhum documento encontrado com esses filtros.'}), 400
+    if len(ids) > PACOTE_MAX_DOCUMENTOS:
+        return jsonify({'ok': False, 'erro': f'Mais de {PACOTE_MAX_DOCUMENTOS} documentos: refine os filtros.'}), 400
+    formato = 'zip' if dados.get('formato') == 'zip' else 'pdf'
+    t = enfileirar(db, 'pacote_pdf', {'tipo': tipo, 'ids': ids, 'formato': formato,
+                                      'usuario_id': session.get('user_id')}, max_tentativas=2)
+    db.commit()
+    acordar_fila()
+    return jsonify({'ok': True, 'tarefa_id': t.id, 'total': len(ids),
+                    'situacao_url': url_for('disciplinar_bp.situacao_pacote_pdf', tarefa_id=t.id)})
+
+@disciplinar_bp.route('/pacote_pdf/<int:tarefa_id>')
+@admin_required
+def situacao_pacote_pdf(tarefa_id):
+    situacao = situacao_tarefa(get_db(), tarefa_id)
+    if situacao is None or situacao['tipo'] != 'pacote_pdf':
+        return jsonify({'ok': False, 'erro': 'Exportação não encontrada.'}), 404
+    if situacao['status'] == 'concluida':
+        situacao['download_url'] = url_for('disciplinar_bp.baixar_pacote_pdf', tarefa_id=tarefa_id)
+    return jsonify({'ok': True, **situacao})
+
+@disciplinar_bp.route('/pacote_pdf/<int:tarefa_id>/arquivo')
+@admin_required
+def baixar_pacote_pdf(tarefa_id):
+    from flask import send_file
+    situacao = situacao_tarefa(get_db(), tarefa_id)
+    resultado = (situacao or {}).get('resultado') or {}
+    caminho = os.path.join(pasta_pacotes(), os.path.basename(resultado.get('arquivo') or ''))
+    if situacao is None or situacao['tipo'] != 'pacote_pdf' or not os.path.isfile(caminho):
+        flash('Arquivo não encontrado ou expirado. Gere a exportação novamente.', 'warning')
+        return redirect(url_for('disciplinar_bp.pacote_pdf'))
+    mimetype = 'application/zip' if caminho.endswith('.zip') else 'application/pdf'
+    return send_file(caminho, mimetype=mimetype, as_attachment=True, download_name=resultado.get('nome_download'))
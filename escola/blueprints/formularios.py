@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, request, jsonify, current_app
 from database import get_db
-from .utils import login_required, admin_secundario_required
+from .utils import login_required, admin_required, admin_secundario_required
 from datetime import datetime, date
 from sqlalchemy import text
 from models_sqlalchemy import (
@@ -207,6 +207,33 @@ def api_config():
             current_app.logger.exception('Erro ao salvar config de tabela disciplinar')
             return jsonify({'success': False, 'error': str(e)}), 500
 
+@formularios_bp.route('/api/config/simular', methods=['POST'])
+@admin_required
+def api_config_simular():
+    """
+    Simula uma tabela disciplinar candidata sem gravar: recalcula a pontuação corrente de
+    todos os alunos com o histórico inteiro e os pesos novos (services.simulador_pontuacao).
+    Recebe o mesmo JSON do POST de /api/config (só as chaves que mudam bastam) e,
+    opcionalmente, 'data' (YYYY-MM-DD; padrão hoje).
+    Response: { success, data_referencia, distribuicao, media_atual, media_simulada, mudancas, ... }
+    """
+    from services.simulador_pontuacao import simular_config, ConfigInvalida
+    db = get_db()
+    payload = dict(request.get_json(force=True, silent=True) or {})
+    try:
+        data_referencia = None
+        if payload.get('data'):
+            data_referencia = datetime.strptime(str(payload.pop('data')), '%Y-%m-%d').date()
+        else:
+            payload.pop('data', None)
+        resultado = simular_config(db, payload, data_referencia)
+        return jsonify(dict(resultado, success=True))
+    except (ConfigInvalida, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        current_app.logger.exception('Erro ao simular config de tabela disciplinar')
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @formularios_bp.route('/api/aluno_pontuacao')
 @login_required
 def api_aluno_pontuacao():
@@ -6,6 +6,7 @@ from models_sqlalchemy import Cabecalho
 import json
 import unicodedata
 from models_sqlalchemy import Ata, Aluno
+from services.busca_alunos import alunos_em_ordem_alfabetica
 
 formularios_ata_bp = Blueprint('formularios_ata_bp', __name__, url_prefix='/formularios/atas')
 
@@ -98,7 +99,7 @@ def list_atas():
 def nova_ata():
     db = get_db()
     db.rollback()
-    alunos_query = db.query(Aluno).order_by(Aluno.nome).all()
+    alunos_query = alunos_em_ordem_alfabetica(db)
     alunos = [
         {
             'id': a.id,
@@ -302,7 +303,7 @@ def edit_ata(ata_id):
         return redirect(url_for('formularios_ata_bp.list_atas'))
 
     # TRANSFORMA a lista de Alunos em lista de dicionários:
-    alunos_query = db.query(Aluno).order_by(Aluno.nome).all()
+    alunos_query = alunos_em_ordem_alfabetica(db)
     alunos = [
         {
             'id': a.id,
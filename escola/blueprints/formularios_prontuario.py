@@ -6,6 +6,12 @@ import typing
 from urllib.parse import unquote
 import json
 
+from services.busca_alunos import buscar_alunos
+from services.fotos_alunos import arquivo_da_foto
+from services.miniaturas_fotos import (
+    TAMANHOS, FORMATOS, CACHE_VERSIONADA_SEGUNDOS, miniatura, formato_aceito, mimetype_do_arquivo, url_foto_aluno
+)
+
 # Tenta usar flask-login se disponível
 try:
     from flask_login import current_user
@@ -192,9 +198,21 @@ def pick_field(obj, candidates, default=''):
             return val
     return default
 
-def build_photo_url_from_row(obj) -> str:
+def _arquivo_local_da_foto(db, obj):
+    """Nome do arquivo da foto em static/uploads/alunos (campo do aluno ou índice de fotos), ou None."""
+    for c in ('photo', 'foto_filename', 'foto_file', 'foto_path', 'arquivo_foto', 'foto_nome'):
+        val = obj.get(c, None) if isinstance(obj, dict) else getattr(obj, c, None)
+        if val and isinstance(val, str):
+            norm = unquote(val).strip().replace('\\', '/')
+            if not norm.startswith(('http://', 'https://')):
+                return os.path.basename(norm) or None
+    aluno_id = obj.get('id') if isinstance(obj, dict) else getattr(obj, 'id', None)
+    return arquivo_da_foto(db, aluno_id) if aluno_id else None
+
+def build_photo_url_from_row(obj, tamanho=None) -> str:
     """
     Obtém URL pública da foto do aluno a partir dos dados do objeto SQLAlchemy ou dict.
+    Com tamanho ('p', 'm' ou 'g'), devolve a URL da miniatura (api_aluno_foto?tamanho=...).
     Retorna:
       - URL absoluta (http/https) ou path iniciando por /static/
       - url_for() para endpoint api_aluno_foto se não for arquivo físico
@@ -202,6 +220,16 @@ def build_photo_url_from_row(obj) -> str:
     """
     if not obj:
         return ''
+    if tamanho in TAMANHOS:
+        aluno_id = obj.get('id') if isinstance(obj, dict) else getattr(obj, 'id', None)
+        if aluno_id:
+            try:
+                db = get_db()
+                arquivo = _arquivo_local_da_foto(db, obj)
+                if arquivo:
+                    return url_foto_aluno(db, aluno_id, arquivo, tamanho)
+            except Exception:
+                current_app.logger.exception("Erro ao montar URL da miniatura do aluno")
     filename_candidates = [
         'foto_url', 'foto_path', 'foto_file', 'foto_filename', 'arquivo_foto',
         'photo', 'foto', 'imagem', 'foto_nome', 'caminho_foto'
@@ -226,17 +254,19 @@ def build_photo_url_from_row(obj) -> str:
                     return url_for('static', filename=f"uploads/alunos/{filename}")
                 except Exception:
                     return f"/static/uploads/alunos/{filename}"
-    # se houver id, tentar deduzir por arquivos em static/uploads/alunos
+    # se houver id, procurar no índice de fotos (services/fotos_alunos) em vez de listar a pasta
     aluno_id = obj.get('id') if isinstance(obj, dict) else getattr(obj, 'id', None)
     if aluno_id:
-        uploads_dir = os.path.join(current_app.static_folder, 'uploads', 'alunos')
-        if os.path.isdir(uploads_dir):
-            for fname in sorted(os.listdir(uploads_dir), reverse=True):
-                if fname.startswith(f"{aluno_id}_") or fname.startswith(f"{aluno_id}.") or fname == f"{aluno_id}.jpg":
-                    try:
-                        return url_for('static', filename=f"uploads/alunos/{fname}")
-                    except Exception:
-                        return f"/static/uploads/alunos/{fname}"
+        try:
+            fname = arquivo_da_foto(get_db(), aluno_id)
+        except Exception:
+            current_app.logger.exception("Erro ao consultar o índice de fotos")
+            fname = None
+        if fname:
+            try:
+                return url_for('static', filename=f"uploads/alunos/{fname}")
+            except Exception:
+                return f"/static/uploads/alunos/{fname}"
     # fallback: rota dinâmica
     if aluno_id:
         try:
@@ -322,46 +352,78 @@ def load_document_header(db):
     return None
 
 from models_sqlalchemy import Prontuario, Aluno
+from services.listagens import (
+    filtros_da_requisicao, tamanho_da_pagina, filtrar_texto, filtrar_serie_turma, filtrar_periodo,
+    chave_texto, pagina_keyset
+)
 
 @formularios_prontuario_bp.route('/prontuario', methods=['GET'])
 def prontuario():
     """Renderiza formulário de novo prontuário."""
     return render_template('formularios/prontuario.html')
 
+def _pagina_prontuarios(db, args, show_deleted):
+    """Uma página (keyset em created_at, id) dos prontuários, com os filtros dos args."""
+    filtros = filtros_da_requisicao(args)
+    # Nome do aluno vem no mesmo SELECT (sem consulta por linha)
+    prontuario_query = db.query(Prontuario, Aluno.nome.label('aluno_nome')).outerjoin(Aluno, Aluno.id == Prontuario.aluno_id)
+    if not show_deleted:
+        prontuario_query = prontuario_query.filter((Prontuario.deleted == None) | (Prontuario.deleted == '0'))
+    prontuario_query = filtrar_serie_turma(prontuario_query, filtros['serie'], filtros['turma'],
+                                           Prontuario.serie, Prontuario.turma)
+    prontuario_query = filtrar_periodo(prontuario_query, filtros['data_inicio'], filtros['data_fim'], Prontuario.created_at)
+    prontuario_query = filtrar_texto(prontuario_query, filtros['q'], [
+        Aluno.nome, Aluno.matricula, Prontuario.numero, Prontuario.responsavel
+    ])
+    rows, proximo = pagina_keyset(
+        prontuario_query,
+        [chave_texto(Prontuario.created_at), Prontuario.id],
+        lambda r: [r[0].created_at or '', r[0].id],
+        cursor=args.get('cursor'),
+        tamanho=tamanho_da_pagina(args)
+    )
+    pronts = []
+    for p, aluno_nome in rows:
+        pronts.append({
+            'id': p.id,
+            'numero': p.numero,
+            'aluno_id': p.aluno_id,
+            'aluno_nome': aluno_nome,
+            'responsavel': p.responsavel,
+            'serie': p.serie,
+            'turma': p.turma,
+            'created_at': p.created_at,
+            'deleted': getattr(p, 'deleted', 0)
+        })
+    return pronts, proximo, filtros
+
 @formularios_prontuario_bp.route('/prontuarios', methods=['GET'])
 def listar_prontuarios():
     """
-    Lista prontuários cadastrados.
+    Lista prontuários cadastrados (paginado; filtros de série/turma, período e texto).
     """
     db = get_db()
     try:
         show_deleted = request.args.get('show_deleted') == '1' and session.get('nivel') == 1
-        prontuario_query = db.query(Prontuario)
-        if not show_deleted:
-            prontuario_query = prontuario_query.filter((Prontuario.deleted == None) | (Prontuario.deleted == '0'))
-        rows = prontuario_query.order_by(Prontuario.created_at.desc(), Prontuario.id.desc()).all()
-        pronts = []
-        for p in rows:
-            aluno_nome = None
-            if p.aluno_id:
-                aluno_obj = db.query(Aluno).filter_by(id=p.aluno_id).first()
-                if aluno_obj:
-                    aluno_nome = aluno_obj.nome
-            pronts.append({
-                'id': p.id,
-                'numero': p.numero,
-                'aluno_id': p.aluno_id,
-                'aluno_nome': aluno_nome,
-                'responsavel': p.responsavel,
-                'serie': p.serie,
-                'turma': p.turma,
-                'created_at': p.created_at,
-                'deleted': getattr(p, 'deleted', 0)
-            })
-        return render_template('formularios/listar_prontuarios.html', prontuarios=pronts, show_deleted=show_deleted)
+        pronts, proximo, filtros = _pagina_prontuarios(db, request.args, show_deleted)
+        return render_template('formularios/listar_prontuarios.html', prontuarios=pronts, show_deleted=show_deleted,
+                               filtros=filtros, proximo_cursor=proximo)
     except Exception:
         current_app.logger.exception("Erro ao listar prontuários")
-        return render_template('formularios/listar_prontuarios.html', prontuarios=[], show_deleted=False), 500
+        return render_template('formularios/listar_prontuarios.html', prontuarios=[], show_deleted=False,
+                               filtros=filtros_da_requisicao(request.args), proximo_cursor=None), 500
+
+@formularios_prontuario_bp.route('/api/prontuarios', methods=['GET'])
+def api_listar_prontuarios():
+    """Mesma página de /prontuarios em JSON (rolagem infinita: passe 'proximo' como ?cursor=)."""
+    db = get_db()
+    try:
+        show_deleted = request.args.get('show_deleted') == '1' and session.get('nivel') == 1
+        pronts, proximo, _ = _pagina_prontuarios(db, request.args, show_deleted)
+        return jsonify({'itens': pronts, 'proximo': proximo})
+    except Exception:
+        current_app.logger.exception("Erro no endpoint /formularios/api/prontuarios")
+        return jsonify({'itens': [], 'proximo': None}), 500
 
 @formularios_prontuario_bp.route('/api/alunos', methods=['GET'])
 def api_alunos_autocomplete():
@@ -373,14 +435,7 @@ def api_alunos_autocomplete():
         return jsonify([])
     db = get_db()
     try:
-        like_q = f"%{q}%"
-        alunos = (
-            db.query(Aluno)
-            .filter((Aluno.nome.ilike(like_q)) | (Aluno.matricula.ilike(like_q)))
-            .order_by(Aluno.nome)
-            .limit(50)
-            .all()
-        )
+        alunos = buscar_alunos(db, q, limite=50)
         out = []
         for a in alunos:
             out.append({
@@ -394,7 +449,7 @@ def api_alunos_autocomplete():
                 'telefone2': getattr(a, 'telefone2', ''),
                 'turno': getattr(a, 'turno', ''),
                 'responsavel': getattr(a, 'responsavel', ''),
-                'foto_url': build_photo_url_from_row(a)
+                'foto_url': build_photo_url_from_row(a, tamanho='p')
             })
         return jsonify(out)
     except Exception:
@@ -473,16 +528,31 @@ def api_aluno_get(aluno_id):
             'telefone2': getattr(a, 'telefone2', ''),
             'turno': getattr(a, 'turno', ''),
             'responsavel': getattr(a, 'responsavel', ''),
-            'foto_url': build_photo_url_from_row(a),
+            'foto_url': build_photo_url_from_row(a, tamanho='m'),
         })
     except Exception:
         current_app.logger.exception("Erro no endpoint /formularios/api/aluno/<id>")
         return jsonify({}), 500
 
+def _cache_da_foto(resp):
+    """URL versionada (?v=): cache longo; sem versão: o navegador revalida pelo ETag."""
+    resp.cache_control.public = False
+    resp.cache_control.private = True
+    if request.args.get('v'):
+        resp.cache_control.no_cache = None  # send_file marca no-cache por padrão
+        resp.cache_control.max_age = CACHE_VERSIONADA_SEGUNDOS
+        resp.cache_control.immutable = True
+    else:
+        resp.cache_control.max_age = 0
+        resp.cache_control.no_cache = True
+    return resp
+
 @formularios_prontuario_bp.route('/api/aluno/<int:aluno_id>/foto', methods=['GET'])
 def api_aluno_foto(aluno_id):
     """
     Serve foto do aluno (blob ou arquivo estático).
+    ?tamanho=p|m|g serve a miniatura (WebP se o navegador aceitar, senão JPEG); com ?v=
+    (versão posta por url_foto_aluno) a resposta pode ficar no cache do navegador por 1 ano.
     """
     db = get_db()
     try:
@@ -490,6 +560,17 @@ def api_aluno_foto(aluno_id):
         if not aluno:
             return '', 404
 
+        tamanho = request.args.get('tamanho')
+        if tamanho in TAMANHOS:
+            arquivo = _arquivo_local_da_foto(db, aluno)
+            if arquivo:
+                formato = formato_aceito(request.accept_mimetypes)
+                caminho = miniatura(arquivo, tamanho, formato)
+                if caminho:
+                    resp = send_file(caminho, mimetype=FORMATOS[formato][1], conditional=True, etag=True)
+                    resp.vary.add('Accept')
+                    return _cache_da_foto(resp)
+
         # Tenta construir uma URL com as heurísticas existentes
         try:
             photo_url = build_photo_url_from_row(aluno)
@@ -522,7 +603,9 @@ def api_aluno_foto(aluno_id):
                     continue
                 static_path = os.path.join(uploads_dir, filename)
                 if os.path.exists(static_path):
-                    return send_file(static_path, mimetype='image/jpeg', as_attachment=False, download_name=filename)
+                    resp = send_file(static_path, mimetype=mimetype_do_arquivo(static_path), as_attachment=False,
+                                     download_name=filename, conditional=True, etag=True)
+                    return _cache_da_foto(resp)
 
         # Nada encontrado
         return '', 404
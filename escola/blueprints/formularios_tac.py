@@ -2,6 +2,8 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from database import get_db
 from .tac_utils import get_next_tac_number
 from .utils import login_required, admin_secundario_required
+from services.busca_alunos import buscar_alunos, ultimos_alunos
+from services.renderizador_pdf import resposta_pdf
 from datetime import datetime
 import os
 import time
@@ -311,12 +313,10 @@ def tac_excluir(id):
 def alunos_autocomplete():
     q = request.args.get('q','').strip()
     db = get_db()
-    query = db.query(Aluno)
     if q and len(q) > 0:
-        ilike = f"%{q.upper()}%"
-        alunos = query.filter(Aluno.nome.ilike(ilike)).order_by(Aluno.nome).limit(30).all()
+        alunos = buscar_alunos(db, q, limite=30, incluir_matricula=False)
     else:
-        alunos = query.order_by(Aluno.id.desc()).limit(30).all()
+        alunos = ultimos_alunos(db, 30)
     return jsonify([{'id': a.id, 'nome': a.nome} for a in alunos])
 
 @formularios_tac_bp.route('/api/aluno')
@@ -457,7 +457,6 @@ def export_docx_template_docxtpl(id):
 def tac_pdf(id):
     import io
     import os
-    from weasyprint import HTML
     from flask import request, send_file
 
     db = get_db()
@@ -579,11 +578,4 @@ def tac_pdf(id):
     else:
         html = '<base href="' + base + '">' + html
 
-    pdfbytes = HTML(string=html).write_pdf()
-
-    return send_file(
-        io.BytesIO(pdfbytes),
-        mimetype="application/pdf",
-        as_attachment=False,
-        download_name=f"tac_{id}.pdf"
-    )
+    return resposta_pdf(html, f"tac_{id}.pdf", base_url=request.url_root)
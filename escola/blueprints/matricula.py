@@ -13,6 +13,7 @@ Retorno JSON:
 from flask import Blueprint, request, jsonify, current_app
 from database import get_db
 from models_sqlalchemy import Aluno, PontuacaoBimestral
+from services.saldo_pontuacao import registrar_evento_no_saldo
 from datetime import datetime
 
 bp_matricula = Blueprint("matricula_bp", __name__)
@@ -113,6 +114,7 @@ def update_data_matricula(aluno_id):
                     tipo_evento="INICIO_ANO"
                 )
                 db.add(hist)
+                registrar_evento_no_saldo(db, aluno_id, hist.criado_em, 8.0)
         # --- FIM: Bloco de pontuação automática ---
 
         db.commit()
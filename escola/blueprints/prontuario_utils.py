@@ -1,9 +1,10 @@
 from datetime import datetime
 from flask import session, current_app
+from services.log_pontuacao import logger
 
 def create_or_append_prontuario_por_rfo(db, ocorrencia_id, usuario=None, aluno_id=None):
     """..."""
-    print(f"DEBUG create_or_append_prontuario_por_rfo: ocorrencia_id={ocorrencia_id}, aluno_id={aluno_id}, usuario={usuario}")
+    logger.debug("create_or_append_prontuario_por_rfo: ocorrencia_id=%s, aluno_id=%s, usuario=%s", ocorrencia_id, aluno_id, usuario)
     
     if not usuario:
         try:
@@ -11,8 +12,7 @@ def create_or_append_prontuario_por_rfo(db, ocorrencia_id, usuario=None, aluno_i
             usuario = session.get('username', 'system')
         except Exception:
             usuario = 'system'
-    
-    print(f"DEBUG usuario final: {usuario}")
+
     """
     Integra um RFO (ocorrencia_id) ao prontuário do aluno. Usa ORM/SQLAlchemy.
     - Evita duplicação consultando ProntuarioRFO.
@@ -100,7 +100,7 @@ def create_or_append_prontuario_por_rfo(db, ocorrencia_id, usuario=None, aluno_i
             prontuario_id=prontuario.id
         ).first()
         if existing_link:
-            print(f"DEBUG: Vínculo já existe, ATUALIZANDO prontuário {prontuario.id}")
+            logger.debug("vínculo já existe, atualizando prontuário %s", prontuario.id)
             # ✅ ATUALIZA as circunstâncias mesmo que o vínculo já exista
             atenuante = getattr(ocorrencia, 'circunstancias_atenuantes', '') or 'Não há'
             agravante = getattr(ocorrencia, 'circunstancias_agravantes', '') or 'Não há'
@@ -113,7 +113,7 @@ def create_or_append_prontuario_por_rfo(db, ocorrencia_id, usuario=None, aluno_i
             prontuario.circunstancias_atenuantes = atenuante
             prontuario.circunstancias_agravantes = agravante
             db.commit()
-            print(f"DEBUG: Prontuário atualizado - atenuantes: {atenuante}, agravantes: {agravante}")
+            logger.debug("prontuário atualizado - atenuantes: %s, agravantes: %s", atenuante, agravante)
             return True, 'Prontuário atualizado com circunstâncias'
 
     try:
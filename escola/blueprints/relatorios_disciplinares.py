@@ -2,8 +2,10 @@ from flask import Blueprint, render_template, request, send_file, make_response
 from database import get_db
 from .utils import admin_required
 from datetime import datetime
-from weasyprint import HTML
-import io
+from sqlalchemy import or_, and_
+from services.datas import parse_data
+from services.exportacao_csv import resposta_csv
+from services.renderizador_pdf import resposta_pdf
 import csv
 
 from models_sqlalchemy import (
@@ -57,9 +59,7 @@ def coletar_parametros_form():
     }
     return parametros
 
-def get_ocorrencias_estatisticas(data_inicio, data_fim, ids_filtrar):
-    db = get_db()
-
+def _query_ocorrencias(db, data_inicio, data_fim, ids_filtrar):
     # Montar query ORM com todos os joins necessários
     query = (
         db.query(
@@ -77,15 +77,29 @@ def get_ocorrencias_estatisticas(data_inicio, data_fim, ids_filtrar):
         .join(FaltaDisciplinar, FaltaDisciplinar.id == OcorrenciaFalta.falta_id)
         .join(Aluno, Aluno.id == Ocorrencia.aluno_id)
     )
-    if data_inicio:
+    # Filtro pela coluna Date (usa índice); linhas ainda sem data_ocorrencia_dt caem na comparação de texto
+    inicio_dt, fim_dt = parse_data(data_inicio), parse_data(data_fim)
+    if inicio_dt:
+        query = query.filter(or_(
+            Ocorrencia.data_ocorrencia_dt >= inicio_dt,
+            and_(Ocorrencia.data_ocorrencia_dt.is_(None), Ocorrencia.data_ocorrencia >= data_inicio)
+        ))
+    elif data_inicio:
         query = query.filter(Ocorrencia.data_ocorrencia >= data_inicio)
-    if data_fim:
+    if fim_dt:
+        query = query.filter(or_(
+            Ocorrencia.data_ocorrencia_dt <= fim_dt,
+            and_(Ocorrencia.data_ocorrencia_dt.is_(None), Ocorrencia.data_ocorrencia <= data_fim)
+        ))
+    elif data_fim:
         query = query.filter(Ocorrencia.data_ocorrencia <= data_fim)
     if ids_filtrar:
         query = query.filter(FaltaDisciplinar.id.in_(ids_filtrar))
-    query = query.order_by(Ocorrencia.data_ocorrencia.desc(), Ocorrencia.id.desc())
+    return query.order_by(Ocorrencia.data_ocorrencia.desc(), Ocorrencia.id.desc())
 
-    ocorrencias = query.all()
+def get_ocorrencias_estatisticas(data_inicio, data_fim, ids_filtrar):
+    db = get_db()
+    ocorrencias = _query_ocorrencias(db, data_inicio, data_fim, ids_filtrar).all()
 
     estatisticas = {}
     for oc in ocorrencias:
@@ -141,30 +155,28 @@ def exportar_pdf():
         estatisticas=estatisticas,
         data_inicio=parametros['data_inicio'], data_fim=parametros['data_fim']
     )
-    pdf_file = io.BytesIO()
-    HTML(string=rendered).write_pdf(pdf_file)
-    pdf_file.seek(0)
     filename = f"relatorio_ocorrencias_{parametros['data_inicio']}_a_{parametros['data_fim']}.pdf"
-    return send_file(pdf_file, as_attachment=True, download_name=filename, mimetype='application/pdf')
+    return resposta_pdf(rendered, filename, anexo=True, base_url=request.url_root)
 
 @relatorios_disciplinares_bp.route('/exportar_csv', methods=['POST'])
 @admin_required
 def exportar_csv():
     parametros = coletar_parametros_form()
-    ocorrencias, estatisticas = get_ocorrencias_estatisticas(
+    query = _query_ocorrencias(
+        get_db(),
         parametros['data_inicio'],
         parametros['data_fim'],
         parametros['ids_filtrar']
     )
-    si = io.StringIO()
-    cw = csv.writer(si)
-    cw.writerow(['Data', 'Aluno', 'Turma', 'Série', 'ID Falta', 'Natureza', 'Descrição da Falta', 'Medida Aplicada'])
-    for oc in ocorrencias:
-        cw.writerow([
-            oc.data_ocorrencia, oc.aluno_nome, oc.turma, oc.serie,
-            oc.falta_id, oc.natureza, oc.descricao, oc.medida_aplicada
-        ])
-    output = make_response(si.getvalue())
-    output.headers["Content-Disposition"] = f"attachment; filename=relatorio_ocorrencias_{parametros['data_inicio']}_a_{parametros['data_fim']}.csv"
-    output.headers["Content-type"] = "text/csv"
-    return output
+    # Cursor no servidor: as linhas vão sendo escritas na resposta conforme chegam do banco
+    linhas = (
+        (oc.data_ocorrencia, oc.aluno_nome, oc.turma, oc.serie,
+         oc.falta_id, oc.natureza, oc.descricao, oc.medida_aplicada)
+        for oc in query.yield_per(1000)
+    )
+    return resposta_csv(
+        ['Data', 'Aluno', 'Turma', 'Série', 'ID Falta', 'Natureza', 'Descrição da Falta', 'Medida Aplicada'],
+        linhas,
+        f"relatorio_ocorrencias_{parametros['data_inicio']}_a_{parametros['data_fim']}.csv",
+        compactar=request.form.get('gzip') == '1'
+    )
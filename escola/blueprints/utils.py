@@ -198,20 +198,8 @@ def get_proximo_rfo_id(incrementar=False):
             db.commit()
     return f"RFO-{seq:04d}/{year}"
 
-import smtplib
-import ssl
-from email.message import EmailMessage
+from services.email_envio import montar_mensagem, enviar_mensagem
 
 def enviar_email(destinatario, assunto, corpo, corpo_html, remetente, senha):
-    msg = EmailMessage()
-    msg["Subject"] = assunto
-    msg["From"] = remetente
-    msg["To"] = destinatario
-
-    msg.set_content(corpo)
-    msg.add_alternative(corpo_html, subtype="html")
-
-    context = ssl._create_unverified_context()
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465, context=context) as server:
-        server.login(remetente, senha)
-        server.send_message(msg)
+    msg = montar_mensagem(remetente, destinatario, assunto, corpo_html, corpo_texto=corpo)
+    enviar_mensagem(msg, remetente, senha)
@@ -8,6 +8,15 @@ import base64
 from werkzeug.utils import secure_filename
 from datetime import datetime
 from models_sqlalchemy import DadosEscola
+from sqlalchemy import func, cast, String
+from services.busca_alunos import atualizar_alunos_na_busca, remover_alunos_da_busca
+from services.fotos_alunos import registrar_foto, invalidar_fotos
+from services.miniaturas_fotos import gerar_miniaturas, url_foto_aluno
+from services.renderizador_pdf import resposta_pdf
+from services.listagens import (
+    filtros_da_requisicao, tamanho_da_pagina, filtrar_texto, filtrar_serie_turma, filtrar_periodo,
+    chave_texto, pagina_keyset
+)
 import typing
 import json
 import atexit
@@ -219,7 +228,7 @@ def visualizar_aluno(aluno_id):
     photo = aluno_d.get('photo') or aluno_d.get('foto') or aluno_d.get('arquivo_foto') or aluno_d.get('foto_filename') or None
     if photo:
         filename = os.path.basename(str(photo).replace('\\', '/'))
-        aluno_d['photo_url'] = url_for('static', filename=f'uploads/alunos/{filename}')
+        aluno_d['photo_url'] = url_foto_aluno(db, a.id, filename, tamanho='m')
     else:
         aluno_d['photo_url'] = None
     return jsonify({'aluno': aluno_d})
@@ -283,9 +292,18 @@ def upload_foto(aluno_id):
         current_app.logger.exception('Falha ao salvar arquivo de foto')
         return jsonify({'success': False, 'error': 'Falha ao salvar arquivo.'}), 500
 
+    try:
+        gerar_miniaturas(save_path, forcar=True)
+    except Exception:
+        # sem miniatura a foto continua válida; api_aluno_foto tenta gerar de novo quando for pedida
+        current_app.logger.exception('Falha ao gerar miniaturas da foto')
+
     try:
         a.photo = filename
+        registrar_foto(db, a.id, filename, save_path)
         db.commit()
+        invalidar_fotos()
+        atualizar_alunos_na_busca(db, ids=[aluno_id])
         return jsonify({'success': True, 'filename': filename})
     except Exception:
         db.rollback()
@@ -304,6 +322,7 @@ def excluir_aluno(aluno_id):
             return redirect(url_for('visualizacoes_bp.listar_alunos'))
         db.delete(aluno)
         db.commit()
+        remover_alunos_da_busca([aluno_id])
         flash(f'Aluno ID {aluno_id} excluído com sucesso.', 'success')
     except Exception as e:
         db.rollback()
@@ -355,6 +374,7 @@ def excluir_alunos_selecionados():
                 errors[str(i)] = str(e)
         try:
             db.commit()
+            remover_alunos_da_busca(deleted)
         except Exception as e:
             db.rollback()
             current_app.logger.exception("Erro no commit da exclusão em massa")
@@ -380,14 +400,10 @@ def _pick_field_from_obj(obj, candidates, default=''):
             return obj[c]
     return default
 
-@visualizacoes_bp.route('/rfos')
-@login_required
-def listar_rfos():
-    """
-    Lista RFOs para visualização.
-    """
-    db = get_db()
-    q_status = (request.args.get('status') or 'TRATADO').strip().upper()
+def _pagina_rfos(db, args):
+    """Uma página (keyset em data_ocorrencia, id) da listagem de RFOs com os filtros dos args."""
+    filtros = filtros_da_requisicao(args)
+    q_status = filtros['status'] or 'TRATADO'
 
     # Monta query ORM com os joins necessários para os campos nomeados
     query = (
@@ -410,13 +426,25 @@ def listar_rfos():
     else:
         query = query.filter(Ocorrencia.status == q_status)
 
-    rows = query.order_by(Ocorrencia.data_ocorrencia.desc(), Ocorrencia.id.desc()).all()
+    query = filtrar_serie_turma(query, filtros['serie'], filtros['turma'], Aluno.serie, Aluno.turma)
+    query = filtrar_periodo(query, filtros['data_inicio'], filtros['data_fim'],
+                            Ocorrencia.data_ocorrencia, Ocorrencia.data_ocorrencia_dt)
+    query = filtrar_texto(query, filtros['q'], [
+        Aluno.nome, Aluno.matricula, Ocorrencia.rfo_id, Ocorrencia.relato_observador
+    ])
+
+    rows, proximo = pagina_keyset(
+        query,
+        [chave_texto(Ocorrencia.data_ocorrencia), Ocorrencia.id],
+        lambda r: [r[0].data_ocorrencia or '', r[0].id],
+        cursor=args.get('cursor'),
+        tamanho=tamanho_da_pagina(args)
+    )
 
     rfos = []
     for r in rows:
         # r = (Ocorrencia, matricula, nome_aluno, serie, turma, registrado_por)
         o = r[0]
-        as_dict = o.__dict__.copy()
         # "falta_descricao": preferencialmente descricao_detalhada > relato_observador > ''
         falta_descricao = getattr(o, 'descricao_detalhada', None) or getattr(o, 'relato_observador', None) or ''
         rfos.append({
@@ -433,8 +461,26 @@ def listar_rfos():
             'responsavel_registro_username': r[5],
             'status': getattr(o, 'status', '') or '',
         })
+    return rfos, proximo, q_status, filtros
+
+@visualizacoes_bp.route('/rfos')
+@login_required
+def listar_rfos():
+    """
+    Lista RFOs para visualização (paginado; filtros de status, série/turma, período e texto).
+    """
+    db = get_db()
+    rfos, proximo, q_status, filtros = _pagina_rfos(db, request.args)
+    return render_template('visualizacoes/listar_rfos.html', rfos=rfos, status_filter=q_status,
+                           filtros=filtros, proximo_cursor=proximo)
 
-    return render_template('visualizacoes/listar_rfos.html', rfos=rfos, status_filter=q_status)
+@visualizacoes_bp.route('/api/rfos')
+@login_required
+def api_listar_rfos():
+    """Mesma página de /rfos em JSON (rolagem infinita: passe 'proximo' como ?cursor=)."""
+    db = get_db()
+    rfos, proximo, _, _ = _pagina_rfos(db, request.args)
+    return jsonify({'itens': rfos, 'proximo': proximo})
 
 from models_sqlalchemy import Ocorrencia, TAC, Aluno
 from sqlalchemy import or_
@@ -610,42 +656,70 @@ def reativar_tac(id):
 def is_admin():
     return str(session.get("nivel")) in ["1", "2"]
 
+def _pagina_fmds(db, args, show_baixados):
+    """Uma página (keyset em data_fmd, created_at, id) da listagem de FMDs com os filtros dos args."""
+    filtros = filtros_da_requisicao(args)
+    fmd_query = db.query(
+        FichaMedidaDisciplinar,
+        Aluno.matricula.label('aluno_matricula'),
+        Aluno.nome.label('aluno_nome'),
+        Aluno.serie,
+        Aluno.turma
+    ).outerjoin(Aluno, Aluno.id == FichaMedidaDisciplinar.aluno_id)
+    if not show_baixados:
+        # Corrigi comparação, agora verifica como string
+        fmd_query = fmd_query.filter((FichaMedidaDisciplinar.baixa == '0') | (FichaMedidaDisciplinar.baixa == None))
+    if filtros['status']:
+        fmd_query = fmd_query.filter(func.upper(FichaMedidaDisciplinar.status) == filtros['status'])
+    fmd_query = filtrar_serie_turma(fmd_query, filtros['serie'], filtros['turma'], Aluno.serie, Aluno.turma)
+    fmd_query = filtrar_periodo(fmd_query, filtros['data_inicio'], filtros['data_fim'], FichaMedidaDisciplinar.data_fmd)
+    fmd_query = filtrar_texto(fmd_query, filtros['q'], [
+        Aluno.nome, Aluno.matricula, cast(FichaMedidaDisciplinar.fmd_id, String), FichaMedidaDisciplinar.medida_aplicada
+    ])
+
+    rows, proximo = pagina_keyset(
+        fmd_query,
+        [chave_texto(FichaMedidaDisciplinar.data_fmd), chave_texto(FichaMedidaDisciplinar.created_at),
+         FichaMedidaDisciplinar.id],
+        lambda r: [r[0].data_fmd or '', r[0].created_at or '', r[0].id],
+        cursor=args.get('cursor'),
+        tamanho=tamanho_da_pagina(args)
+    )
+    fmds = []
+    for r in rows:
+        f, matricula, nome, serie, turma = r
+        d = {c.name: getattr(f, c.name) for c in f.__table__.columns}
+        d['aluno_matricula'] = matricula
+        d['aluno_nome'] = nome
+        d['serie'] = serie
+        d['turma'] = turma
+        fmds.append(d)
+    return fmds, proximo, filtros
+
 @visualizacoes_bp.route('/fmds')
 def listar_fmds():
     """
     Lista FMDs para visualização. Usuários veem por padrão apenas FMDs não baixadas (baixa='0').
-    Se show_baixados=1 nos args, mostra todas.
+    Se show_baixados=1 nos args, mostra todas. Paginado; filtros de série/turma, período e texto.
     """
     db = get_db()
     show_baixados = request.args.get('show_baixados') == '1'
     try:
-        fmd_query = db.query(
-            FichaMedidaDisciplinar,
-            Aluno.matricula.label('aluno_matricula'),
-            Aluno.nome.label('aluno_nome'),
-            Aluno.serie,
-            Aluno.turma
-        ).outerjoin(Aluno, Aluno.id == FichaMedidaDisciplinar.aluno_id)
-        if not show_baixados:
-            # Corrigi comparação, agora verifica como string
-            fmd_query = fmd_query.filter((FichaMedidaDisciplinar.baixa == '0') | (FichaMedidaDisciplinar.baixa == None))
-        rows = fmd_query.order_by(
-            FichaMedidaDisciplinar.data_fmd.desc().nullslast(),
-            FichaMedidaDisciplinar.created_at.desc()
-        ).all()
-        fmds = []
-        for r in rows:
-            f, matricula, nome, serie, turma = r
-            d = f.__dict__.copy()
-            d['aluno_matricula'] = matricula
-            d['aluno_nome'] = nome
-            d['serie'] = serie
-            d['turma'] = turma
-            fmds.append(d)
-        return render_template('visualizacoes/listar_fmd.html', fmds=fmds, show_baixados=show_baixados, is_admin=is_admin())
+        fmds, proximo, filtros = _pagina_fmds(db, request.args, show_baixados)
+        return render_template('visualizacoes/listar_fmd.html', fmds=fmds, show_baixados=show_baixados, is_admin=is_admin(),
+                               filtros=filtros, proximo_cursor=proximo)
     except Exception:
         current_app.logger.exception("Erro ao listar FMDs")
-        return render_template('visualizacoes/listar_fmd.html', fmds=[], show_baixados=show_baixados, is_admin=is_admin())
+        return render_template('visualizacoes/listar_fmd.html', fmds=[], show_baixados=show_baixados, is_admin=is_admin(),
+                               filtros=filtros_da_requisicao(request.args), proximo_cursor=None)
+
+@visualizacoes_bp.route('/api/fmds')
+@login_required
+def api_listar_fmds():
+    """Mesma página de /fmds em JSON (rolagem infinita: passe 'proximo' como ?cursor=)."""
+    db = get_db()
+    fmds, proximo, _ = _pagina_fmds(db, request.args, request.args.get('show_baixados') == '1')
+    return jsonify({'itens': fmds, 'proximo': proximo})
 
 @visualizacoes_bp.route('/fmd/<int:id>/baixar', methods=['POST'])
 @admin_secundario_required
@@ -700,21 +774,6 @@ def ata_pdf(ata_id):
     from flask import render_template, send_file, jsonify, request, url_for
     from datetime import datetime, date
     # Se possível, deixe essas funções auxiliares fora da view em versão final!
-    import pdfkit
-
-    def generate_pdf_bytes(html):
-        import pdfkit
-        # Use o mesmo CAMINHO do FMD, geralmente:
-        config = pdfkit.configuration(wkhtmltopdf=r'C:\Arquivos de Programas\wkhtmltopdf\bin\wkhtmltopdf.exe')
-        options = {
-            'encoding': 'UTF-8',
-            'enable-local-file-access': None,
-            'margin-top': '20mm',
-            'margin-bottom': '18mm',
-            'margin-left': '25mm',
-            'margin-right': '25mm'
-        }
-        return pdfkit.from_string(html, False, configuration=config, options=options)
 
     def num_to_words_pt(n):
         units = {0:"zero",1:"um",2:"dois",3:"três",4:"quatro",5:"cinco",6:"seis",7:"sete",8:"oito",9:"nove",
@@ -914,13 +973,6 @@ def ata_pdf(ata_id):
         else:
             html = '<base href="' + base + '">' + html
 
-        from weasyprint import HTML
-
-        pdfbytes = HTML(string=html).write_pdf()
+        return resposta_pdf(html, f"ata_{ata_id}.pdf", base_url=request.url_root)
     except Exception as e:
-        return jsonify({"error": "Erro ao gerar PDF: " + str(e)}), 500
-
-    return send_file(io.BytesIO(pdfbytes),
-                     mimetype="application/pdf",
-                     as_attachment=False,
-                     download_name=f"ata_{ata_id}.pdf")
\ No newline at end of file
+        return jsonify({"error": "Erro ao gerar PDF: " + str(e)}), 500
\ No newline at end of file
@@ -1,5 +1,8 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, Numeric, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, Numeric, Boolean, Float, Date, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import event, inspect, func
+from services.datas import default_data_de, parse_data
+from services.texto import default_normalizado_de, normalizar_busca
 
 Base = declarative_base()
 
@@ -19,9 +22,14 @@ class Usuario(Base):
 # Alunos
 class Aluno(Base):
     __tablename__ = "alunos"
+    __table_args__ = (
+        Index("ix_alunos_matricula", "matricula"),
+        Index("ix_alunos_serie_turma_lider", "serie", "turma", "lider"),
+    )
     id = Column(Integer, primary_key=True)
     matricula = Column(String)
     nome = Column(String)
+    nome_busca = Column(String, default=default_normalizado_de("nome"))  # nome sem acento/minúsculo (services/busca_alunos)
     serie = Column(String)
     turma = Column(String)
     turno = Column(String)
@@ -41,6 +49,7 @@ class Aluno(Base):
     telefone = Column(String)
     photo = Column(String)
     data_matricula = Column(String)
+    data_matricula_dt = Column(Date, default=default_data_de("data_matricula"))  # espelho tipado de data_matricula
     data_nascimento = Column(String)
     lider = Column(Boolean, default=False)
 
@@ -66,11 +75,18 @@ class TipoOcorrencia(Base):
 # Ocorrências
 class Ocorrencia(Base):
     __tablename__ = "ocorrencias"
+    __table_args__ = (
+        Index("ix_ocorrencias_status", "status"),
+        Index("ix_ocorrencias_aluno_id", "aluno_id"),
+        Index("ix_ocorrencias_rfo_id", "rfo_id"),
+        Index("ix_ocorrencias_data_ocorrencia_dt", "data_ocorrencia_dt"),
+    )
     id = Column(Integer, primary_key=True)
     rfo_id = Column(String)
     aluno_id = Column(Integer, ForeignKey("alunos.id"))
     tipo_ocorrencia_id = Column(Integer, ForeignKey("tipos_ocorrencia.id"))
     data_ocorrencia = Column(String)
+    data_ocorrencia_dt = Column(Date, default=default_data_de("data_ocorrencia"))  # espelho tipado
     observador_id = Column(Integer, ForeignKey("usuarios.id"))
     relato_observador = Column(String)
     advertencia_oral = Column(String)
@@ -83,6 +99,7 @@ class Ocorrencia(Base):
     descricao_detalhada = Column(String)
     status = Column(String)
     data_tratamento = Column(String)
+    data_tratamento_dt = Column(Date, default=default_data_de("data_tratamento"))  # espelho tipado
     tipo_falta = Column(String)
     medida_aplicada = Column(String)
     observacao_tratamento = Column(String)
@@ -151,6 +168,8 @@ class Bimestre(Base):
     numero = Column(Integer)
     inicio = Column(String)
     fim = Column(String)
+    inicio_dt = Column(Date, default=default_data_de("inicio"))  # espelhos tipados de inicio/fim
+    fim_dt = Column(Date, default=default_data_de("fim"))
     responsavel_id = Column(Integer)
     criado_em = Column(String)
 
@@ -166,6 +185,9 @@ class TabelaDisciplinarConfig(Base):
 # Pontuação Bimestral
 class PontuacaoBimestral(Base):
     __tablename__ = "pontuacao_bimestral"
+    __table_args__ = (
+        Index("ix_pontuacao_bimestral_aluno_ano_bimestre", "aluno_id", "ano", "bimestre"),
+    )
     id = Column(Integer, primary_key=True)
     aluno_id = Column(Integer, ForeignKey("alunos.id"))
     ano = Column(Integer)
@@ -177,6 +199,12 @@ class PontuacaoBimestral(Base):
 # Pontuação Histórico
 class PontuacaoHistorico(Base):
     __tablename__ = "pontuacao_historico"
+    __table_args__ = (
+        Index("ix_pontuacao_historico_aluno_ano_bimestre", "aluno_id", "ano", "bimestre"),
+        Index("ix_pontuacao_historico_aluno_tipo_criado", "aluno_id", "tipo_evento", "criado_em"),
+        Index("ix_pontuacao_historico_tipo_criado", "tipo_evento", "criado_em"),
+        Index("ix_pontuacao_historico_aluno_criado_em_dt", "aluno_id", "criado_em_dt"),
+    )
     id = Column(Integer, primary_key=True)
     aluno_id = Column(Integer, ForeignKey("alunos.id"))
     ano = Column(Integer)
@@ -186,7 +214,21 @@ class PontuacaoHistorico(Base):
     tipo_evento = Column(String)
     valor_delta = Column(Integer)
     observacao = Column(String)
-    criado_em = Column(String)
+    criado_em = Column(String)  # texto: 'DD/MM/YYYY' ou 'YYYY-MM-DD'
+    criado_em_dt = Column(Date, default=default_data_de("criado_em"))  # espelho tipado (filtros por período)
+
+# Saldo acumulado de pontuação (mantido a partir do pontuacao_historico)
+class PontuacaoSaldo(Base):
+    __tablename__ = "pontuacao_saldo"
+    __table_args__ = (
+        UniqueConstraint("aluno_id", "data", name="uq_pontuacao_saldo_aluno_data"),
+    )
+    id = Column(Integer, primary_key=True)
+    aluno_id = Column(Integer, ForeignKey("alunos.id", ondelete="CASCADE"), nullable=False)
+    data = Column(Date, nullable=False)
+    saldo = Column(Float, nullable=False)  # soma acumulada de valor_delta até a data (inclusive)
+    ultima_perda = Column(Date)  # data do último valor_delta < 0 até a data
+    atualizado_em = Column(String)
 
 # Cabeçalhos
 class Cabecalho(Base):
@@ -304,6 +346,11 @@ class TACParticipante(Base):
 # Ficha Medida Disciplinar
 class FichaMedidaDisciplinar(Base):
     __tablename__ = "ficha_medida_disciplinar"
+    __table_args__ = (
+        Index("ix_ficha_medida_disciplinar_fmd_id", "fmd_id"),
+        Index("ix_ficha_medida_disciplinar_rfo_id", "rfo_id"),
+        Index("ix_ficha_medida_disciplinar_aluno_id", "aluno_id"),
+    )
     id = Column(Integer, primary_key=True)
     fmd_id = Column(Integer)
     aluno_id = Column(Integer, ForeignKey("alunos.id"))
@@ -341,6 +388,9 @@ class FichaMedidaDisciplinar(Base):
     email_enviado_para = Column(String)
     pontuacao_no_documento = Column(Numeric(4, 2))
     comportamento_no_documento = Column(String(30))
+    # envio por e-mail pela fila (services/fila_tarefas): pendente, enviando, enviado, erro
+    email_status = Column(String(20))
+    email_erro = Column(Text)
 
 # Ocorrências/Alunos (relação N para N)
 class OcorrenciaAluno(Base):
@@ -400,8 +450,102 @@ class LiderAluno(Base):
 # Médias Bimestrais
 class MediaBimestral(Base):
     __tablename__ = "medias_bimestrais"
+    __table_args__ = (
+        UniqueConstraint("aluno_id", "ano", "bimestre", name="uq_medias_bimestrais_aluno_ano_bimestre"),
+    )
     id = Column(Integer, primary_key=True)
     aluno_id = Column(Integer, ForeignKey("alunos.id", ondelete="CASCADE"))
     ano = Column(Integer, nullable=False)
     bimestre = Column(Integer, nullable=False)
     media = Column(Numeric(5, 2), nullable=False)
+
+# Índice das fotos em static/uploads/alunos (services/fotos_alunos)
+class FotoAluno(Base):
+    __tablename__ = "fotos_alunos"
+    __table_args__ = (
+        UniqueConstraint("arquivo", name="uq_fotos_alunos_arquivo"),
+        Index("ix_fotos_alunos_aluno_id", "aluno_id"),
+    )
+    id = Column(Integer, primary_key=True)
+    arquivo = Column(String, nullable=False)  # nome do arquivo na pasta de fotos
+    chave = Column(String)  # prefixo do nome do arquivo (matrícula ou id do aluno)
+    aluno_id = Column(Integer, ForeignKey("alunos.id", ondelete="SET NULL"))
+    mtime = Column(Float)
+    tamanho = Column(Integer)
+    atualizado_em = Column(String)
+
+# Fila de tarefas em segundo plano (services/fila_tarefas): envio de e-mails, geração de PDFs
+class TarefaFila(Base):
+    __tablename__ = "tarefas_fila"
+    __table_args__ = (
+        Index("ix_tarefas_fila_status_proxima", "status", "proxima_tentativa_em"),
+    )
+    id = Column(Integer, primary_key=True)
+    tipo = Column(String(50), nullable=False)
+    payload = Column(Text)  # JSON
+    status = Column(String(20), nullable=False, default="pendente")  # pendente, executando, concluida, erro
+    tentativas = Column(Integer, nullable=False, default=0)
+    max_tentativas = Column(Integer, nullable=False, default=5)
+    proxima_tentativa_em = Column(String)  # 'YYYY-MM-DD HH:MM:SS'
+    ultimo_erro = Column(Text)
+    progresso_atual = Column(Integer)
+    progresso_total = Column(Integer)
+    resultado = Column(Text)  # JSON com o retorno da função da tarefa
+    criado_em = Column(String)
+    iniciado_em = Column(String)
+    concluido_em = Column(String)
+
+class FechamentoBimestreParte(Base):
+    """
+    Bloco de alunos de um fechamento de bimestre (scripts/pontuacao_rotinas.fechar_bimestre_em_partes).
+    Cada parte grava seus dados e o status 'concluida' no mesmo commit; um fechamento
+    interrompido continua das partes que faltam.
+    """
+    __tablename__ = "fechamento_bimestre_partes"
+    __table_args__ = (
+        UniqueConstraint("ano", "bimestre", "etapa", "parte", name="uq_fechamento_bimestre_partes"),
+    )
+    id = Column(Integer, primary_key=True)
+    ano = Column(Integer, nullable=False)
+    bimestre = Column(Integer, nullable=False)
+    etapa = Column(String(20), nullable=False)  # pontuacao, bonus
+    parte = Column(Integer, nullable=False)
+    aluno_ids = Column(Text, nullable=False)  # ids separados por vírgula
+    alunos = Column(Integer, nullable=False, default=0)
+    status = Column(String(20), nullable=False, default="pendente")  # pendente, concluida, erro
+    processados = Column(Integer)  # médias gravadas / bônus lançados
+    erro = Column(Text)
+    criado_em = Column(String)
+    concluido_em = Column(String)
+
+# Índices de expressão para a paginação keyset das listagens (services/listagens.chave_texto):
+# a ordem é por coalesce(coluna, '') + id, decrescente
+Index("ix_ocorrencias_keyset_data_ocorrencia", func.coalesce(Ocorrencia.data_ocorrencia, ''), Ocorrencia.id)
+Index("ix_ocorrencias_keyset_data_registro", func.coalesce(Ocorrencia.data_registro, ''), Ocorrencia.id)
+Index("ix_ficha_medida_disciplinar_keyset", func.coalesce(FichaMedidaDisciplinar.data_fmd, ''),
+      func.coalesce(FichaMedidaDisciplinar.created_at, ''), FichaMedidaDisciplinar.id)
+Index("ix_prontuarios_keyset", func.coalesce(Prontuario.created_at, ''), Prontuario.id)
+
+# Colunas Date espelhadas das colunas texto: o INSERT usa o default da coluna;
+# aqui o UPDATE via ORM mantém o espelho em sincronia quando o texto muda.
+_ESPELHOS_DATA = {
+    Aluno: [("data_matricula", "data_matricula_dt")],
+    Ocorrencia: [("data_ocorrencia", "data_ocorrencia_dt"), ("data_tratamento", "data_tratamento_dt")],
+    Bimestre: [("inicio", "inicio_dt"), ("fim", "fim_dt")],
+    PontuacaoHistorico: [("criado_em", "criado_em_dt")],
+}
+
+def _sincronizar_datas(mapper, connection, target):
+    estado = inspect(target)
+    for origem, destino in _ESPELHOS_DATA[type(target)]:
+        if estado.attrs[origem].history.has_changes():
+            setattr(target, destino, parse_data(getattr(target, origem)))
+
+for _modelo in _ESPELHOS_DATA:
+    event.listen(_modelo, "before_update", _sincronizar_datas)
+
+# Nome normalizado para a busca de alunos, mantido em sincronia no UPDATE via ORM
+@event.listens_for(Aluno, "before_update")
+def _sincronizar_nome_busca(mapper, connection, target):
+    if inspect(target).attrs.nome.history.has_changes():
+        target.nome_busca = normalizar_busca(target.nome)
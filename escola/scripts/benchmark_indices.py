@@ -0,0 +1,199 @@
+# scripts/benchmark_indices.py
+"""
+Benchmark dos índices criados na migração 7c3d9a1e6f20 (consultas frequentes).
+
+Gera um banco SQLite sintético (por padrão 50.000 lançamentos no pontuacao_historico),
+roda as consultas mais usadas SEM índices secundários, cria os índices declarados nos
+modelos e roda de novo, mostrando o plano (EXPLAIN QUERY PLAN) e o tempo médio de cada uma.
+
+Não toca no banco configurado do sistema: usa um arquivo temporário (ou --arquivo).
+
+Uso:
+  py -m scripts.benchmark_indices [--eventos 50000] [--alunos 2000] [--repeticoes 200] [--arquivo bench.db]
+"""
+
+from __future__ import annotations
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, text, MetaData, Table, Column, Index, UniqueConstraint
+
+from models_sqlalchemy import Base
+
+TABELAS = [
+    "alunos", "ocorrencias", "ficha_medida_disciplinar",
+    "pontuacao_historico", "pontuacao_bimestral", "medias_bimestrais",
+]
+
+TIPOS_EVENTO = ["Advertência Oral", "Advertência Escrita", "Suspensão", "Elogio Individual", "NO_LOSS_DAILY"]
+
+# (descrição, SQL, gerador de parâmetros)
+def _consultas(n_alunos, n_ocorrencias, n_fmd):
+    def aluno():
+        return random.randint(1, n_alunos)
+
+    def data_br():
+        d = date(2025, 2, 1) + timedelta(days=random.randint(0, 300))
+        return d.strftime("%d/%m/%Y")
+
+    return [
+        ("histórico do aluno (compute_pontuacao_em_data / lote)",
+         "SELECT * FROM pontuacao_historico WHERE aluno_id = :a",
+         lambda: {"a": aluno()}),
+        ("histórico do aluno no bimestre (fechamento)",
+         "SELECT * FROM pontuacao_historico WHERE aluno_id = :a AND ano = 2025 AND bimestre = :b "
+         "AND tipo_evento NOT IN ('BIMESTRE_BONUS', 'TRANSFERENCIA_BIMESTRE')",
+         lambda: {"a": aluno(), "b": random.randint(1, 4)}),
+        ("INICIO_ANO do aluno",
+         "SELECT * FROM pontuacao_historico WHERE aluno_id = :a AND ano = 2025 AND tipo_evento = 'INICIO_ANO'",
+         lambda: {"a": aluno()}),
+        ("NO_LOSS_DAILY do dia (apply_no_loss_daily)",
+         "SELECT aluno_id FROM pontuacao_historico WHERE tipo_evento = 'NO_LOSS_DAILY' AND criado_em = :d",
+         lambda: {"d": data_br()}),
+        ("RFOs aguardando tratamento (dashboard)",
+         "SELECT COUNT(id) FROM ocorrencias WHERE status = 'AGUARDANDO TRATAMENTO'",
+         lambda: {}),
+        ("ocorrências do aluno",
+         "SELECT * FROM ocorrencias WHERE aluno_id = :a",
+         lambda: {"a": aluno()}),
+        ("ocorrência por rfo_id",
+         "SELECT * FROM ocorrencias WHERE rfo_id = :r",
+         lambda: {"r": f"RFO-{random.randint(1, n_ocorrencias):04d}/2025"}),
+        ("FMD por fmd_id",
+         "SELECT * FROM ficha_medida_disciplinar WHERE fmd_id = :f",
+         lambda: {"f": random.randint(1, n_fmd)}),
+        ("FMD por rfo_id",
+         "SELECT * FROM ficha_medida_disciplinar WHERE rfo_id = :r",
+         lambda: {"r": f"RFO-{random.randint(1, n_ocorrencias):04d}/2025"}),
+        ("aluno por matrícula",
+         "SELECT * FROM alunos WHERE matricula = :m",
+         lambda: {"m": str(100000 + aluno())}),
+        ("líder da turma (listar_rfo)",
+         "SELECT * FROM alunos WHERE serie = :s AND turma = :t AND lider = 1",
+         lambda: {"s": f"{random.randint(6, 9)}º", "t": random.choice("ABCDE")}),
+        ("média do aluno no bimestre",
+         "SELECT media FROM medias_bimestrais WHERE aluno_id = :a AND ano = 2025 AND bimestre = :b",
+         lambda: {"a": aluno(), "b": random.randint(1, 4)}),
+        ("pontuação bimestral do aluno (_apply_delta_pontuacao)",
+         "SELECT * FROM pontuacao_bimestral WHERE aluno_id = :a AND ano = 2025 AND bimestre = :b",
+         lambda: {"a": aluno(), "b": random.randint(1, 4)}),
+    ]
+
+def _tabelas_sem_indices(engine):
+    """Cria as tabelas só com as colunas (e PK) dos modelos, sem índices nem constraints extras."""
+    md = MetaData()
+    for nome in TABELAS:
+        origem = Base.metadata.tables[nome]
+        Table(nome, md, *[Column(c.name, c.type, primary_key=c.primary_key) for c in origem.columns])
+    md.create_all(engine)
+    return md
+
+def _criar_indices(engine, md):
+    """Cria os índices (e uniques) declarados nos modelos."""
+    for nome in TABELAS:
+        origem = Base.metadata.tables[nome]
+        destino = md.tables[nome]
+        for idx in origem.indexes:
+            Index(idx.name, *[destino.c[c.name] for c in idx.columns], unique=idx.unique).create(engine)
+        for uc in origem.constraints:
+            if isinstance(uc, UniqueConstraint) and uc.name:
+                Index(uc.name, *[destino.c[c.name] for c in uc.columns], unique=True).create(engine)
+
+def _popular(engine, n_eventos, n_alunos):
+    r = random.Random(42)
+    n_ocorrencias = max(1, n_eventos // 5)
+    n_fmd = max(1, n_eventos // 10)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO alunos (id, matricula, nome, serie, turma, lider, data_matricula) "
+            "VALUES (:id, :m, :n, :s, :t, :l, '2025-02-03')"
+        ), [
+            {"id": i, "m": str(100000 + i), "n": f"Aluno {i}", "s": f"{r.randint(6, 9)}º",
+             "t": r.choice("ABCDE"), "l": 1 if i % 35 == 0 else 0}
+            for i in range(1, n_alunos + 1)
+        ])
+        conn.execute(text(
+            "INSERT INTO ocorrencias (id, rfo_id, aluno_id, status) VALUES (:id, :r, :a, :s)"
+        ), [
+            {"id": i, "r": f"RFO-{i:04d}/2025", "a": r.randint(1, n_alunos),
+             "s": "AGUARDANDO TRATAMENTO" if r.random() < 0.1 else "TRATADO"}
+            for i in range(1, n_ocorrencias + 1)
+        ])
+        conn.execute(text(
+            "INSERT INTO ficha_medida_disciplinar (id, fmd_id, aluno_id, rfo_id, status) VALUES (:id, :f, :a, :r, 'ATIVA')"
+        ), [
+            {"id": i, "f": i, "a": r.randint(1, n_alunos), "r": f"RFO-{r.randint(1, n_ocorrencias):04d}/2025"}
+            for i in range(1, n_fmd + 1)
+        ])
+        eventos = []
+        for i in range(1, n_eventos + 1):
+            d = date(2025, 2, 1) + timedelta(days=r.randint(0, 300))
+            tipo = r.choice(TIPOS_EVENTO)
+            eventos.append({
+                "a": r.randint(1, n_alunos), "b": min(4, (d.month - 1) // 3 + 1), "t": tipo,
+                "v": 0.2 if tipo in ("NO_LOSS_DAILY", "Elogio Individual") else -0.3,
+                "c": d.strftime("%d/%m/%Y"),
+            })
+        conn.execute(text(
+            "INSERT INTO pontuacao_historico (aluno_id, ano, bimestre, tipo_evento, valor_delta, criado_em) "
+            "VALUES (:a, 2025, :b, :t, :v, :c)"
+        ), eventos)
+        conn.execute(text(
+            "INSERT INTO pontuacao_bimestral (aluno_id, ano, bimestre, pontuacao_inicial, pontuacao_atual) "
+            "VALUES (:a, 2025, :b, 8, 8)"
+        ), [{"a": a, "b": b} for a in range(1, n_alunos + 1) for b in range(1, 5)])
+        conn.execute(text(
+            "INSERT INTO medias_bimestrais (aluno_id, ano, bimestre, media) VALUES (:a, 2025, :b, 8.0)"
+        ), [{"a": a, "b": b} for a in range(1, n_alunos + 1) for b in range(1, 5)])
+    return n_ocorrencias, n_fmd
+
+def _medir(engine, consultas, repeticoes):
+    resultados = []
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+        for descricao, sql, params in consultas:
+            plano = " | ".join(row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql), params()))
+            random.seed(7)
+            t0 = time.perf_counter()
+            for _ in range(repeticoes):
+                conn.execute(text(sql), params()).fetchall()
+            ms = (time.perf_counter() - t0) * 1000.0 / repeticoes
+            resultados.append((descricao, plano, ms))
+    return resultados
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos índices das consultas frequentes (SQLite sintético)")
+    parser.add_argument('--eventos', type=int, default=50000, help='lançamentos no pontuacao_historico')
+    parser.add_argument('--alunos', type=int, default=2000)
+    parser.add_argument('--repeticoes', type=int, default=200, help='execuções de cada consulta')
+    parser.add_argument('--arquivo', type=str, default=None, help='arquivo SQLite a gerar (padrão: temporário)')
+    args = parser.parse_args()
+
+    arquivo = args.arquivo or os.path.join(tempfile.mkdtemp(prefix="bench_indices_"), "bench.db")
+    if os.path.exists(arquivo):
+        os.remove(arquivo)
+    engine = create_engine(f"sqlite:///{arquivo}")
+
+    print(f"[INFO] Gerando banco sintético em {arquivo} ({args.eventos} eventos, {args.alunos} alunos)...")
+    md = _tabelas_sem_indices(engine)
+    n_ocorrencias, n_fmd = _popular(engine, args.eventos, args.alunos)
+    consultas = _consultas(args.alunos, n_ocorrencias, n_fmd)
+
+    antes = _medir(engine, consultas, args.repeticoes)
+    _criar_indices(engine, md)
+    depois = _medir(engine, consultas, args.repeticoes)
+
+    for (descricao, plano_antes, ms_antes), (_, plano_depois, ms_depois) in zip(antes, depois):
+        ganho = ms_antes / ms_depois if ms_depois else float('inf')
+        print(f"\n{descricao}")
+        print(f"  sem índices: {ms_antes:8.3f} ms  | {plano_antes}")
+        print(f"  com índices: {ms_depois:8.3f} ms  | {plano_depois}")
+        print(f"  ganho: {ganho:.1f}x")
+    engine.dispose()
+
+if __name__ == '__main__':
+    main()
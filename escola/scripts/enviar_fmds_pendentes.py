@@ -0,0 +1,51 @@
+# scripts/enviar_fmds_pendentes.py
+"""
+Envia por e-mail todas as FMDs ativas ainda não enviadas (email_enviado_data vazio),
+numa única sessão SMTP (blueprints.disciplinar.enviar_fmds_em_lote).
+
+Mostra o resultado de cada destinatário; os envios ficam gravados nas FMDs
+(email_status, email_erro, email_enviado_para, email_enviado_data).
+
+Uso:
+  py -m scripts.enviar_fmds_pendentes [--simular] [--limite N] [--intervalo SEGUNDOS]
+"""
+
+import argparse
+
+from app import app
+from database import get_db
+from blueprints.disciplinar import fmds_pendentes_de_envio, enviar_fmds_em_lote
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--simular', action='store_true', help='só lista as FMDs que seriam enviadas')
+    parser.add_argument('--limite', type=int, help='envia no máximo N FMDs')
+    parser.add_argument('--intervalo', type=float, help='segundos entre mensagens (padrão: EMAIL_LOTE_INTERVALO)')
+    args = parser.parse_args()
+
+    # test_request_context: o HTML da FMD usa render_template/url_for
+    with app.test_request_context('/'):
+        if args.intervalo is not None:
+            app.config['EMAIL_LOTE_INTERVALO'] = args.intervalo
+        db = get_db()
+        pendentes = fmds_pendentes_de_envio(db)
+        if args.limite:
+            pendentes = pendentes[:args.limite]
+        print(f"[INFO] FMDs pendentes de envio: {len(pendentes)}")
+        if args.simular:
+            for fmd_id, email in pendentes:
+                print(f"  FMD {fmd_id}: {email or 'SEM E-MAIL'}")
+            return
+
+        def _mostrar(r):
+            detalhe = f" ({r['erro']})" if r['erro'] else ''
+            print(f"  FMD {r['fmd_id']} | {r['aluno'] or '-'} | {r['email'] or '-'}: {r['situacao'].upper()}{detalhe}")
+
+        resultados = enviar_fmds_em_lote(db, [fmd_id for fmd_id, _ in pendentes], ao_enviar=_mostrar)
+        resumo = {}
+        for r in resultados:
+            resumo[r['situacao']] = resumo.get(r['situacao'], 0) + 1
+        print("[INFO] Resumo: " + (", ".join(f"{k}: {v}" for k, v in sorted(resumo.items())) or "nada a enviar"))
+
+if __name__ == '__main__':
+    main()
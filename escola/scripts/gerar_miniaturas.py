@@ -0,0 +1,46 @@
+# scripts/gerar_miniaturas.py
+"""
+Backfill das miniaturas das fotos de alunos (services/miniaturas_fotos).
+
+Só gera o que falta ou ficou mais antigo que a foto original, então pode ser repetido;
+--forcar refaz todas (ex.: depois de mudar TAMANHOS ou a qualidade).
+
+Uso:
+  py -m scripts.gerar_miniaturas [--forcar]
+"""
+
+import argparse
+import os
+
+from app import app
+from services.fotos_alunos import pasta_fotos, EXTENSOES_FOTO
+from services.miniaturas_fotos import gerar_miniaturas
+
+def gerar_todas(forcar=False):
+    with app.app_context():
+        pasta = pasta_fotos()
+        if not os.path.isdir(pasta):
+            print(f"[INFO] Pasta não encontrada: {pasta}")
+            return {'fotos': 0, 'geradas': 0, 'erros': 0}
+        with os.scandir(pasta) as entradas:
+            arquivos = sorted(e.path for e in entradas if e.is_file() and e.name.lower().endswith(EXTENSOES_FOTO))
+        geradas = erros = 0
+        for n, caminho in enumerate(arquivos, start=1):
+            try:
+                geradas += len(gerar_miniaturas(caminho, forcar=forcar))
+            except Exception:
+                erros += 1
+                app.logger.exception("Erro ao gerar miniaturas de %s", caminho)
+            if n % 200 == 0:
+                print(f"[INFO] {n}/{len(arquivos)} fotos processadas")
+        print(f"[INFO] Fotos: {len(arquivos)} | Miniaturas geradas: {geradas} | Erros: {erros}")
+        return {'fotos': len(arquivos), 'geradas': geradas, 'erros': erros}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--forcar', action='store_true', help='refaz também as miniaturas já atualizadas')
+    args = parser.parse_args()
+    gerar_todas(args.forcar)
+
+if __name__ == '__main__':
+    main()
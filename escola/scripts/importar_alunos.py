@@ -0,0 +1,54 @@
+# scripts/importar_alunos.py
+"""
+Importação de alunos em lote pela linha de comando (mesmo pipeline da tela de importação).
+
+Uso:
+  py -m scripts.importar_alunos arquivo.xlsx [--atualizar] [--separador ';'] [--lote 500]
+"""
+
+import argparse
+import os
+
+from app import app
+from database import get_db
+from services.importacao_alunos import ler_planilha_alunos, importar_alunos_df, TAMANHO_LOTE
+from services.contadores_dashboard import invalidar_contadores
+from services.busca_alunos import atualizar_alunos_na_busca
+
+def importar_arquivo(caminho, atualizar=False, separador=';', tamanho_lote=TAMANHO_LOTE):
+    def _progresso(etapa, feitos, total):
+        print(f"[INFO] {etapa}: {feitos}/{total}")
+
+    with app.app_context():
+        db = get_db()
+        with open(caminho, 'rb') as f:
+            df = ler_planilha_alunos(f, os.path.basename(caminho), separador)
+        print(f"[INFO] {len(df)} linhas lidas de {caminho}")
+        try:
+            resultado = importar_alunos_df(db, df, atualizar=atualizar, tamanho_lote=tamanho_lote,
+                                           progresso=_progresso)
+            db.commit()
+            invalidar_contadores()
+            atualizar_alunos_na_busca(db, ids=resultado['ids_atualizados'],
+                                      matriculas=resultado['matriculas_inseridas'])
+        except Exception:
+            db.rollback()
+            app.logger.exception("Erro na importação de alunos")
+            raise
+        print(f"[INFO] Inseridos: {resultado['inseridos']} | Atualizados: {resultado['atualizados']} | "
+              f"Sem alteração: {resultado['inalterados']} | Erros: {len(resultado['erros'])}")
+        for erro in resultado['erros']:
+            print(f"[ERRO] linha {erro['linha']} ({erro['matricula']} - {erro['nome']}): {erro['erro']}")
+        return resultado
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('arquivo', help='CSV (separado por ;) ou XLSX')
+    parser.add_argument('--atualizar', action='store_true', help='atualiza alunos já cadastrados')
+    parser.add_argument('--separador', default=';', help='separador do CSV')
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='linhas por INSERT/UPDATE')
+    args = parser.parse_args()
+    importar_arquivo(args.arquivo, args.atualizar, args.separador, args.lote)
+
+if __name__ == '__main__':
+    main()
@@ -3,26 +3,48 @@
 Rotinas para bonificações de pontuação:
 - calcular_e_salvar_pontuacao_final_bimestre: calcula e salva a pontuação final do bimestre em medias_bimestrais
 - apply_bimestral_bonus: aplica +0.5 para alunos com pontuação final >= 8.0
+- fechar_bimestre: as duas anteriores em partes de alunos, em paralelo e retomável
+  (é o que a tela de gestão de bimestres executa, pela fila de tarefas)
 - apply_no_loss_daily: aplica +0.2/dia para alunos sem perda nos últimos 60 dias
+  (por padrão em lote: carrega o histórico uma vez e grava tudo numa única transação)
+- reconstruir_saldo_pontuacao: regenera a tabela pontuacao_saldo a partir do pontuacao_historico
+- corrigir_bonificacoes_retroativas / corrigir_bonificacoes_bimestrais_retroativas: conciliam
+  os NO_LOSS_DAILY / BIMESTRE_BONUS lançados com os devidos (lança os que faltam e apaga os
+  indevidos, em lote; --dry-run só mostra a diferença)
 
 Uso manual (ao fechar um bimestre):
   py -m scripts.pontuacao_rotinas calcular_e_salvar_pontuacao_final_bimestre 2025 1
   py -m scripts.pontuacao_rotinas apply_bimestral_bonus 2025 1
-  py -m scripts.pontuacao_rotinas apply_no_loss_daily 2025-04-04 [--ate 2025-04-11]
+  py -m scripts.pontuacao_rotinas fechar_bimestre 2025 1 [--workers N]
+  py -m scripts.pontuacao_rotinas apply_no_loss_daily 2025-04-04 [--ate 2025-04-11] [--por-aluno]
+  py -m scripts.pontuacao_rotinas reconstruir_saldo_pontuacao [aluno_id ...]
+  py -m scripts.pontuacao_rotinas corrigir_bonificacoes_retroativas [--de 2025-02-03] [--ate 2025-11-30] [--dry-run]
+  py -m scripts.pontuacao_rotinas corrigir_bonificacoes_bimestrais_retroativas [--dry-run]
+
+Opções gerais (antes do comando): --resumo (contagens e tempos ao final), --debug (log detalhado)
 
 Uso automático: basta importar e chamar as funções diretamente.
 """
 
 from __future__ import annotations
 import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, date, timedelta
 
+import numpy as np
+
 from app import app
-from database import get_db
+from database import get_db, SessionLocal
 from blueprints import alunos, disciplinar
-from models_sqlalchemy import PontuacaoBimestral, PontuacaoHistorico, Aluno
+from models_sqlalchemy import PontuacaoBimestral, PontuacaoHistorico, Aluno, FechamentoBimestreParte
+from services.saldo_pontuacao import reconstruir_saldos, registrar_eventos_no_saldo
+from services.simulador_pontuacao import carregar_historico, carregar_medias, pontuacao_final_bimestre, _ultima_perda
+from services import log_pontuacao
+from services.log_pontuacao import resumo_execucao
+from services.calendario_bimestres import calendario
 
-from sqlalchemy import text
+from sqlalchemy import text, insert, update, or_
 
 def apply_bimestral_bonus(ano: int, bimestre: int, force=False):
     """
@@ -35,108 +57,354 @@ def apply_bimestral_bonus(ano: int, bimestre: int, force=False):
     """
     with app.app_context():
         db = get_db()
-        fim_bimestre = db.execute(
-            text("SELECT fim FROM bimestres WHERE ano = :ano AND numero = :bimestre"),
-            {"ano": ano, "bimestre": bimestre}
-        ).fetchone()
-        
-        if not fim_bimestre or not fim_bimestre[0]:
+        data_bimestre_fim = _fim_do_bimestre(db, ano, bimestre)
+        if not data_bimestre_fim:
             print(f"[ERRO] Bimestre {bimestre}/{ano} não encontrado")
             return
-            
-        data_bimestre_fim = fim_bimestre[0]
-        
-        # Converte para date se necessário
-        if isinstance(data_bimestre_fim, str):
-            data_bimestre_fim = datetime.strptime(data_bimestre_fim[:10], "%Y-%m-%d").date()
-        
-        # Data do lançamento = 1 dia após o fim do bimestre
-        data_lancamento = data_bimestre_fim + timedelta(days=1)
-        
-        # Determina ano e bimestre do PRÓXIMO bimestre (onde será lançado o bônus)
-        if bimestre == 4:
-            ano_lancamento = ano + 1
-            bimestre_lancamento = 1
-        else:
-            ano_lancamento = ano
-            bimestre_lancamento = bimestre + 1
-        
-        # Verifica se próximo bimestre existe
-        proximo_bim = db.execute(
-            text("SELECT inicio FROM bimestres WHERE ano = :ano AND numero = :bim"),
-            {"ano": ano_lancamento, "bim": bimestre_lancamento}
-        ).fetchone()
-        
-        if not proximo_bim:
+
+        ano_lancamento, bimestre_lancamento = _proximo_bimestre(ano, bimestre)
+        lancamento = _lancamento_do_bonus(db, ano, bimestre)
+        if lancamento is None:
             print(f"[AVISO] Bimestre {bimestre_lancamento}/{ano_lancamento} não encontrado. Bônus não será aplicado.")
             return
 
-        alunos_data = db.query(Aluno.id, Aluno.data_matricula).all()
-        applied = 0
-        for aluno_id, data_matricula in alunos_data:
-            # Só alunos matriculados antes do fim do bimestre
-            if not data_matricula:
-                continue
-                
-            if isinstance(data_matricula, str):
-                data_matricula = datetime.strptime(data_matricula[:10], "%Y-%m-%d").date()
-                
-            if data_matricula > data_bimestre_fim:
-                continue
-                
-            # Evita duplicidade de lançamento (verifica no PRÓXIMO bimestre)
-            if not force:
-                h = (
-                    db.query(PontuacaoHistorico)
-                    .filter_by(aluno_id=aluno_id, ano=ano_lancamento, bimestre=bimestre_lancamento, tipo_evento='BIMESTRE_BONUS')
-                    .first()
-                )
-                if h:
-                    continue
-            
-            # Confirma pontuação >= 8.0 do aluno no bimestre QUE FECHOU
-            mb_row = db.execute(
-                text("SELECT media FROM medias_bimestrais WHERE aluno_id = :aluno_id AND ano = :ano AND bimestre = :bimestre"),
-                {"aluno_id": aluno_id, "ano": ano, "bimestre": bimestre}
-            ).fetchone()
-            if not mb_row or mb_row[0] < 8.0:
-                continue
-            try:
-                # Lança no PRÓXIMO bimestre (a data determina automaticamente o bimestre)
-                disciplinar._apply_delta_pontuacao(
-                    db, aluno_id, data_lancamento.strftime("%Y-%m-%d"), 0.5,
-                    ocorrencia_id=None, tipo_evento="BIMESTRE_BONUS",
-                    data_despacho=data_lancamento.strftime("%Y-%m-%d")  # ← Passa a data aqui!
-                )
-                applied += 1
-            except Exception:
-                app.logger.exception(f"Erro ao aplicar bonus bimestral para aluno_id={aluno_id}")
-        db.commit()
-        print(f"[INFO] Bônus de +0.5 do bimestre {bimestre}/{ano} aplicado para {applied} alunos no bimestre {bimestre_lancamento}/{ano_lancamento}.")
+        try:
+            devidos = bonus_bimestral_devidos(db, ano, bimestre, _alunos_matriculados_ate(db, data_bimestre_fim),
+                                              lancamento, force=force)
+            _gravar_deltas_em_lote(db, devidos, 0.5, "BIMESTRE_BONUS")
+            db.commit()
+        except Exception:
+            db.rollback()
+            app.logger.exception(f"Erro ao aplicar o bônus bimestral de {bimestre}/{ano}")
+            raise
+        print(f"[INFO] Bônus de +0.5 do bimestre {bimestre}/{ano} aplicado para {len(devidos)} alunos no bimestre {bimestre_lancamento}/{ano_lancamento}.")
 
 def aluno_sem_perda_periodo(db, aluno_id, data_inicio: date, data_fim: date) -> bool:
     """
     Retorna True se NÃO houver registro com valor_delta < 0 entre data_inicio e data_fim.
     """
     existe_perda = (
-        db.query(PontuacaoHistorico)
+        db.query(PontuacaoHistorico.id)
         .filter(
             PontuacaoHistorico.aluno_id == aluno_id,
-            PontuacaoHistorico.criado_em >= data_inicio.strftime("%Y-%m-%d"),
-            PontuacaoHistorico.criado_em < (data_fim + timedelta(days=1)).strftime("%Y-%m-%d"),
+            PontuacaoHistorico.criado_em_dt >= data_inicio,
+            PontuacaoHistorico.criado_em_dt <= data_fim,
             PontuacaoHistorico.valor_delta < 0
         )
         .first()
     )
-    return existe_perda is None
+    if existe_perda is not None:
+        return False
+    # Linhas ainda sem criado_em_dt (antes do backfill): compara pela data convertida
+    for (criado_em,) in db.query(PontuacaoHistorico.criado_em).filter(
+        PontuacaoHistorico.aluno_id == aluno_id,
+        PontuacaoHistorico.criado_em_dt.is_(None),
+        PontuacaoHistorico.valor_delta < 0
+    ).all():
+        d = _parse_data(criado_em)
+        if d and data_inicio <= d <= data_fim:
+            return False
+    return True
+
+# --- Motor em lote (set-based) ---
+
+def _parse_data(valor):
+    """Converte 'YYYY-MM-DD', 'DD/MM/YYYY' ou date em date. Retorna None se inválido."""
+    if not valor:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    s = str(valor)[:10]
+    for fmt in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def _calendario_dos_dias(db, data_inicio: date, data_fim: date):
+    """
+    Retorna lista de (dia, ano, bimestre, inicio_bimestre) para cada dia do intervalo.
+    Dias cujo bimestre não tem início cadastrado ficam de fora (mesma regra do modo por aluno).
+    """
+    dias = []
+    for i in range((data_fim - data_inicio).days + 1):
+        dia = data_inicio + timedelta(days=i)
+        ano, bimestre = disciplinar._get_bimestre_for_date(db, dia.strftime("%Y-%m-%d"))
+        inicio_bimestre = calendario.inicio_do_bimestre(db, ano, bimestre)
+        if inicio_bimestre is None:
+            continue
+        dias.append((dia, ano, bimestre, inicio_bimestre))
+    return dias
+
+def _carregar_perdas_por_aluno(db, ate: date):
+    """
+    Uma única consulta: datas (ordenadas) de todos os eventos com valor_delta < 0, por aluno,
+    anteriores a `ate`.
+    """
+    perdas = {}
+    rows = db.query(PontuacaoHistorico.aluno_id, PontuacaoHistorico.criado_em, PontuacaoHistorico.criado_em_dt)\
+        .filter(
+            PontuacaoHistorico.valor_delta < 0,
+            or_(PontuacaoHistorico.criado_em_dt < ate, PontuacaoHistorico.criado_em_dt.is_(None))
+        )\
+        .all()
+    for aluno_id, criado_em, criado_em_dt in rows:
+        d = criado_em_dt or _parse_data(criado_em)
+        if d is None or d >= ate:
+            continue
+        perdas.setdefault(aluno_id, []).append(d)
+    for datas in perdas.values():
+        datas.sort()
+    return perdas
+
+DIAS_POR_BLOCO = 31  # dias x alunos avaliados de uma vez em no_loss_daily_esperados
+
+def no_loss_daily_esperados(db, data_inicio: date, data_fim: date, alunos_data=None):
+    """
+    Todos os pares (aluno, dia) do intervalo com direito ao +0.2, já lançados ou não:
+    - referência = maior entre matrícula e início do bimestre do dia;
+    - só apto após 60 dias da referência (ou da última perda, se posterior a ela);
+    - os 60 dias anteriores ao dia precisam estar sem perda.
+
+    Vetorizado: cada bloco de dias é avaliado para todos os alunos de uma vez, com a última
+    perda anterior a cada dia tirada por busca binária (simulador_pontuacao._ultima_perda).
+    Retorna (dias, aluno_ids, devido): dias = lista (dia, ano, bimestre, inicio_bimestre) do
+    calendário, aluno_ids = array dos alunos com matrícula válida e devido = matriz booleana
+    dias x alunos.
+    """
+    if alunos_data is None:
+        alunos_data = db.query(Aluno.id, Aluno.data_matricula).all()
+    matriculas = [(aluno_id, _parse_data(dm)) for aluno_id, dm in alunos_data if dm]
+    matriculas = [(aluno_id, dm) for aluno_id, dm in matriculas if dm is not None]
+
+    dias = _calendario_dos_dias(db, data_inicio, data_fim)
+    aluno_ids = np.array([aluno_id for aluno_id, _ in matriculas], dtype=np.int64)
+    devido = np.zeros((len(dias), len(aluno_ids)), dtype=bool)
+    if not dias or not matriculas:
+        return dias, aluno_ids, devido
+
+    # perdas de cada aluno como arrays (posição do aluno, dia), ordenados
+    perdas = _carregar_perdas_por_aluno(db, data_fim)
+    perda_idx, perda_dias = [], []
+    for pos, (aluno_id, _) in enumerate(matriculas):
+        datas = perdas.get(aluno_id, ())
+        perda_idx.extend([pos] * len(datas))
+        perda_dias.extend(datas)
+    perda_idx = np.array(perda_idx, dtype=np.int64)
+    perda_dias = np.array(perda_dias, dtype='datetime64[D]')
+    ordem = np.lexsort((perda_dias, perda_idx))
+    perda_idx, perda_dias = perda_idx[ordem], perda_dias[ordem]
+
+    matricula = np.array([dm for _, dm in matriculas], dtype='datetime64[D]')
+    todos = np.arange(len(matriculas))
+    sessenta = np.timedelta64(60, 'D')
+    for b in range(0, len(dias), DIAS_POR_BLOCO):
+        bloco = dias[b:b + DIAS_POR_BLOCO]
+        dia = np.array([d for d, _, _, _ in bloco], dtype='datetime64[D]')[:, None]
+        inicio = np.array([i for _, _, _, i in bloco], dtype='datetime64[D]')[:, None]
+        referencia = np.maximum(inicio, matricula[None, :])
+
+        ultima = _ultima_perda(perda_idx, perda_dias, np.ones(len(perda_idx), dtype=bool),
+                               np.tile(todos, len(bloco)), np.repeat(dia[:, 0], len(todos)), 'left')
+        ultima = ultima.reshape(len(bloco), len(todos))
+        tem_perda = ~np.isnat(ultima)
+
+        apto = dia >= referencia + sessenta
+        # perda depois da referência: reinicia a contagem a partir dela
+        apto &= ~(tem_perda & (ultima >= referencia) & (dia < ultima + sessenta))
+        # 60 dias anteriores (dia-60 .. dia-1) sem perda
+        apto &= ~(tem_perda & (ultima >= dia - sessenta))
+        devido[b:b + len(bloco)] = apto
+    return dias, aluno_ids, devido
+
+def calcular_no_loss_daily_devidos(db, data_inicio: date, data_fim: date, alunos_data=None):
+    """
+    Pares (aluno, dia) do intervalo com direito ao +0.2 que ainda não foram lançados
+    (regras em no_loss_daily_esperados; não lança se já existir NO_LOSS_DAILY do aluno
+    para o dia).
+
+    Retorna lista de dicts {aluno_id, ano, bimestre, dia, criado_em} em ordem de dia.
+    Faz um número fixo de consultas, independente do número de alunos.
+    """
+    dias, aluno_ids, devido = no_loss_daily_esperados(db, data_inicio, data_fim, alunos_data)
+    if not devido.any():
+        return []
+
+    datas_br = [dia.strftime('%d/%m/%Y') for dia, _, _, _ in dias]
+    existentes = set(
+        db.query(
+            PontuacaoHistorico.aluno_id, PontuacaoHistorico.ano,
+            PontuacaoHistorico.bimestre, PontuacaoHistorico.criado_em
+        )
+        .filter(
+            PontuacaoHistorico.tipo_evento == "NO_LOSS_DAILY",
+            PontuacaoHistorico.criado_em.in_(datas_br)
+        )
+        .all()
+    )
+
+    devidos = []
+    for i, j in zip(*np.nonzero(devido)):
+        dia, ano, bimestre, _ = dias[i]
+        aluno_id = int(aluno_ids[j])
+        if (aluno_id, ano, bimestre, datas_br[i]) in existentes:
+            continue
+        devidos.append({
+            "aluno_id": aluno_id,
+            "ano": ano,
+            "bimestre": bimestre,
+            "dia": dia,
+            "criado_em": datas_br[i],
+        })
+    return devidos
 
-def apply_no_loss_daily(data_inicio: date, data_fim: date = None):
+def _gravar_deltas_em_lote(db, lancamentos, delta, tipo_evento):
+    """
+    Grava os lançamentos (dicts com aluno_id, ano, bimestre, criado_em) de uma só vez:
+    - INSERT em lote no pontuacao_historico;
+    - atualiza/cria pontuacao_bimestral aplicando o delta com os limites 0.0 .. 10.0,
+      na mesma ordem em que _apply_delta_pontuacao aplicaria um a um;
+    - soma os deltas ao pontuacao_saldo a partir da data de cada lançamento.
+    Não faz commit; o chamador decide a transação.
+    """
+    if not lancamentos:
+        return
+    agora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    db.execute(insert(PontuacaoHistorico), [
+        {
+            "aluno_id": l["aluno_id"],
+            "ano": l["ano"],
+            "bimestre": l["bimestre"],
+            "ocorrencia_id": None,
+            "tipo_evento": tipo_evento,
+            "valor_delta": float(delta),
+            "criado_em": l["criado_em"],
+        }
+        for l in lancamentos
+    ])
+
+    chaves = {(l["aluno_id"], l["ano"], l["bimestre"]) for l in lancamentos}
+    anos = {ano for _, ano, _ in chaves}
+    atuais = {}
+    for row in db.query(PontuacaoBimestral.id, PontuacaoBimestral.aluno_id, PontuacaoBimestral.ano,
+                        PontuacaoBimestral.bimestre, PontuacaoBimestral.pontuacao_atual)\
+            .filter(PontuacaoBimestral.ano.in_(anos)).all():
+        chave = (row.aluno_id, row.ano, row.bimestre)
+        if chave in chaves and chave not in atuais:
+            atuais[chave] = {"id": row.id, "pontuacao_atual": float(row.pontuacao_atual or 0)}
+
+    novos = {}
+    for l in lancamentos:
+        chave = (l["aluno_id"], l["ano"], l["bimestre"])
+        if chave in atuais:
+            reg = atuais[chave]
+            reg["pontuacao_atual"] = max(0.0, min(10.0, reg["pontuacao_atual"] + float(delta)))
+        elif chave in novos:
+            reg = novos[chave]
+            reg["pontuacao_atual"] = max(0.0, min(10.0, reg["pontuacao_atual"] + float(delta)))
+        else:
+            novos[chave] = {
+                "aluno_id": l["aluno_id"],
+                "ano": l["ano"],
+                "bimestre": l["bimestre"],
+                "pontuacao_inicial": 8.0,
+                "pontuacao_atual": max(0.0, min(10.0, 8.0 + float(delta))),
+                "atualizado_em": agora,
+            }
+
+    if atuais:
+        db.execute(update(PontuacaoBimestral), [
+            {"id": reg["id"], "pontuacao_atual": reg["pontuacao_atual"], "atualizado_em": agora}
+            for reg in atuais.values()
+        ])
+    if novos:
+        db.execute(insert(PontuacaoBimestral), list(novos.values()))
+
+    # Saldo materializado: aplica os deltas a partir da data de cada lançamento (sem reconstruir o aluno)
+    registrar_eventos_no_saldo(db, [(l["aluno_id"], l["criado_em"], delta) for l in lancamentos])
+
+IDS_POR_DELETE = 500  # ids por DELETE ... IN (...) ao desfazer lançamentos (limite de parâmetros do driver)
+
+def _remover_lancamentos_em_lote(db, lancamentos):
+    """
+    Desfaz de uma só vez lançamentos do pontuacao_historico (dicts com id, aluno_id, ano,
+    bimestre, valor_delta): DELETE por id, pontuacao_bimestral - valor_delta com os
+    limites 0.0 .. 10.0 e saldo dos alunos afetados regenerado. Não faz commit.
+    """
+    if not lancamentos:
+        return
+    agora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    ids = [l["id"] for l in lancamentos]
+    for i in range(0, len(ids), IDS_POR_DELETE):
+        db.query(PontuacaoHistorico).filter(PontuacaoHistorico.id.in_(ids[i:i + IDS_POR_DELETE]))\
+            .delete(synchronize_session=False)
+
+    removidos = {}
+    for l in lancamentos:
+        removidos.setdefault((l["aluno_id"], l["ano"], l["bimestre"]), []).append(float(l["valor_delta"]))
+    anos = {ano for _, ano, _ in removidos}
+    atualizados = {}
+    for row in db.query(PontuacaoBimestral.id, PontuacaoBimestral.aluno_id, PontuacaoBimestral.ano,
+                        PontuacaoBimestral.bimestre, PontuacaoBimestral.pontuacao_atual)\
+            .filter(PontuacaoBimestral.ano.in_(anos)).all():
+        chave = (row.aluno_id, row.ano, row.bimestre)
+        if chave in removidos and chave not in atualizados:
+            pontuacao = float(row.pontuacao_atual or 0)
+            for valor_delta in removidos[chave]:
+                pontuacao = max(0.0, min(10.0, pontuacao - valor_delta))
+            atualizados[chave] = {"id": row.id, "pontuacao_atual": pontuacao, "atualizado_em": agora}
+    if atualizados:
+        db.execute(update(PontuacaoBimestral), list(atualizados.values()))
+
+    reconstruir_saldos(db, {l["aluno_id"] for l in lancamentos})
+
+def apply_no_loss_daily_em_lote(data_inicio: date, data_fim: date = None):
+    """
+    Versão em lote de apply_no_loss_daily: mesmas regras e mesmas linhas gravadas,
+    mas com número fixo de consultas e uma única transação para todo o intervalo.
+    """
+    if data_fim is None:
+        data_fim = data_inicio
+    with app.app_context(), resumo_execucao(f"no-loss daily {data_inicio} a {data_fim}") as resumo:
+        db = get_db()
+        try:
+            with resumo.cronometro("calculo"):
+                devidos = calcular_no_loss_daily_devidos(db, data_inicio, data_fim)
+            with resumo.cronometro("gravacao"):
+                _gravar_deltas_em_lote(db, devidos, 0.2, "NO_LOSS_DAILY")
+                db.commit()
+            resumo.contar("lancamentos", len(devidos))
+        except Exception:
+            db.rollback()
+            app.logger.exception(f"Erro no no-loss daily em lote ({data_inicio} a {data_fim})")
+            raise
+
+        por_dia = {}
+        for d in devidos:
+            por_dia[d["dia"]] = por_dia.get(d["dia"], 0) + 1
+        for i in range((data_fim - data_inicio).days + 1):
+            check_date = data_inicio + timedelta(days=i)
+            print(f"[INFO] {check_date}: bônus diário +0.2 aplicado para {por_dia.get(check_date, 0)} alunos.")
+        print(f"[INFO] Total no-loss daily bônus lançados: {len(devidos)}")
+        return len(devidos)
+
+def apply_no_loss_daily(data_inicio: date, data_fim: date = None, em_lote=True):
     """
     Aplica +0.2 ao bimestre atual para cada aluno, a cada dia do intervalo [data_inicio, data_fim]
     desde que os 60 dias anteriores sejam sem perda,
     e o aluno já esteja apto (após 60 dias completos do referencial correto: maior entre matrícula e início do bimestre de cada dia).
     NUNCA lança duplicado para o mesmo dia/aluno!
+
+    em_lote=True (padrão) usa apply_no_loss_daily_em_lote; em_lote=False mantém o
+    processamento antigo aluno a aluno, dia a dia.
     """
+    if em_lote:
+        return apply_no_loss_daily_em_lote(data_inicio, data_fim)
+
     from datetime import datetime, timedelta
 
     with app.app_context():
@@ -151,17 +419,9 @@ def apply_no_loss_daily(data_inicio: date, data_fim: date = None):
         for i in range(dias):
             check_date = data_inicio + timedelta(days=i)
             ano, bimestre = disciplinar._get_bimestre_for_date(db, check_date.strftime("%Y-%m-%d"))
-            # Busca início do bimestre em curso para esse dia
-            from sqlalchemy import text
-            bim = db.execute(
-                text("SELECT inicio FROM bimestres WHERE ano = :ano AND numero = :bim"),
-                {"ano": ano, "bim": bimestre}
-            ).fetchone()
-            if not bim or not bim[0]:
-                continue
-            try:
-                inicio_bimestre = datetime.strptime(str(bim[0])[:10], '%Y-%m-%d').date()
-            except Exception:
+            # Início do bimestre em curso para esse dia
+            inicio_bimestre = calendario.inicio_do_bimestre(db, ano, bimestre)
+            if inicio_bimestre is None:
                 continue
 
             applied = 0
@@ -184,23 +444,16 @@ def apply_no_loss_daily(data_inicio: date, data_fim: date = None):
                     continue
 
                 # Se houve PERDA pós-referência e antes de check_date, reinicia ciclo após perda
-                evento_neg = db.query(PontuacaoHistorico)\
+                evento_neg = db.query(PontuacaoHistorico.criado_em_dt)\
                     .filter(
                         PontuacaoHistorico.aluno_id == aluno_id,
                         PontuacaoHistorico.valor_delta < 0,
-                        PontuacaoHistorico.criado_em < check_date.strftime('%Y-%m-%d')
+                        PontuacaoHistorico.criado_em_dt < check_date
                     )\
-                    .order_by(PontuacaoHistorico.criado_em.desc())\
+                    .order_by(PontuacaoHistorico.criado_em_dt.desc())\
                     .first()
                 if evento_neg:
-                    evt_data_str = evento_neg.criado_em
-                    try:
-                        if '-' in evt_data_str:
-                            evt_date = datetime.strptime(evt_data_str[:10], '%Y-%m-%d').date()
-                        else:
-                            evt_date = datetime.strptime(evt_data_str[:10], '%d/%m/%Y').date()
-                    except Exception:
-                        evt_date = None
+                    evt_date = evento_neg.criado_em_dt
                     if evt_date and evt_date >= data_referencia:
                         data_referencia = evt_date
                         if check_date < data_referencia + timedelta(days=60):
@@ -261,176 +514,249 @@ def executar_rotinas_automaticas():
 
 # --- Modo manual (terminal) ---
 
-def corrigir_bonificacoes_retroativas():
+def _chaves_de_lancamento(aluno_ids, dias, anos, bimestres):
+    """Chave inteira (aluno, dia, ano, bimestre) para comparar lançamentos com np.isin."""
+    dias = np.asarray(dias, dtype='datetime64[D]').astype(np.int64)
+    return (((np.asarray(aluno_ids, dtype=np.int64) * 100000 + dias) * 10000
+             + np.asarray(anos, dtype=np.int64)) * 10 + np.asarray(bimestres, dtype=np.int64))
+
+def _lancamentos_existentes(db, tipo_evento, filtro=None):
     """
-    Para TODOS os alunos matriculados,
-    verifica desde o 61º dia útil de referência (maior entre matrícula e início do bimestre de cada dia)
-    até ontem (ou hoje, se preferir),
-    e lança automaticamente TODO bônus diário (+0,2) devido e não lançado na tabela pontuacao_historico,
-    sem duplicidade, respeitando as regras já existentes.
+    Uma consulta: bônus do tipo no histórico (id, aluno_id, ano, bimestre, dia, criado_em,
+    valor_delta), em ordem de id. `filtro(dia)` escolhe os que entram na conciliação.
+    Linhas do tipo com valor_delta <= 0 ficam de fora: para o resto do sistema são perdas.
     """
-    from datetime import date, datetime
+    linhas = []
+    for id_, aluno_id, ano, bimestre, criado_em, criado_em_dt, valor_delta in db.query(
+            PontuacaoHistorico.id, PontuacaoHistorico.aluno_id, PontuacaoHistorico.ano,
+            PontuacaoHistorico.bimestre, PontuacaoHistorico.criado_em, PontuacaoHistorico.criado_em_dt,
+            PontuacaoHistorico.valor_delta)\
+            .filter(PontuacaoHistorico.tipo_evento == tipo_evento, PontuacaoHistorico.valor_delta > 0,
+                    PontuacaoHistorico.aluno_id.isnot(None))\
+            .order_by(PontuacaoHistorico.id).all():
+        dia = criado_em_dt or _parse_data(criado_em)
+        if filtro is not None and not filtro(dia):
+            continue
+        linhas.append({"id": id_, "aluno_id": aluno_id, "ano": ano or 0, "bimestre": bimestre or 0,
+                       "dia": dia, "criado_em": criado_em, "valor_delta": valor_delta})
+    return linhas
 
-    with app.app_context():
-        db = get_db()
-        total_bonificacoes = 0
-        alunos_data = db.query(Aluno.id, Aluno.data_matricula).all()
-
-        hoje = date.today()
-
-        for aluno_id, data_matricula in alunos_data:
-            if not data_matricula:
-                continue
+def _diferenca(esperados, chaves_esperadas, existentes, chaves_existentes):
+    """
+    (a inserir, a apagar): esperados sem linha existente com a mesma chave; existentes sem
+    esperado com a mesma chave e as repetições (fica a de menor id).
+    """
+    inserir = [e for e, ok in zip(esperados, np.isin(chaves_esperadas, chaves_existentes)) if not ok]
+    _, primeiras = np.unique(chaves_existentes, return_index=True)
+    manter = np.zeros(len(existentes), dtype=bool)
+    manter[primeiras] = True
+    manter &= np.isin(chaves_existentes, chaves_esperadas)
+    apagar = [l for l, ok in zip(existentes, manter) if not ok]
+    return inserir, apagar
 
-            # Garante datetime.date
-            if isinstance(data_matricula, str):
-                try:
-                    data_matricula_dt = datetime.strptime(data_matricula[:10], '%Y-%m-%d').date()
-                except Exception:
-                    data_matricula_dt = datetime.strptime(data_matricula[:10], '%d/%m/%Y').date()
-            else:
-                data_matricula_dt = data_matricula
-
-            # Checa até ontem
-            dia = data_matricula_dt
-            while dia <= hoje - timedelta(days=1):
-                # Busca início de bimestre do dia em questão
-                ano, bimestre = disciplinar._get_bimestre_for_date(db, dia.strftime("%Y-%m-%d"))
-                # Busca início do bimestre
-                from sqlalchemy import text
-                bim = db.execute(
-                    text("SELECT inicio FROM bimestres WHERE ano = :ano AND numero = :bim"),
-                    {"ano": ano, "bim": bimestre}
-                ).fetchone()
-                if not bim or not bim[0]:
-                    dia += timedelta(days=1)
-                    continue
-                try:
-                    inicio_bimestre = datetime.strptime(str(bim[0])[:10], '%Y-%m-%d').date()
-                except Exception:
-                    dia += timedelta(days=1)
-                    continue
+def _mostrar_diferenca(tipo_evento, inserir, apagar):
+    """Resumo da conciliação por bimestre do lançamento."""
+    por_bimestre = {}
+    for l, lado in [(l, 0) for l in inserir] + [(l, 1) for l in apagar]:
+        contagem = por_bimestre.setdefault((l["ano"], l["bimestre"]), [0, 0])
+        contagem[lado] += 1
+    print(f"[INFO] {tipo_evento}: {len(inserir)} a lançar, {len(apagar)} a apagar "
+          f"({len({l['aluno_id'] for l in inserir + apagar})} alunos)")
+    for (ano, bimestre), (n_inserir, n_apagar) in sorted(por_bimestre.items()):
+        print(f"  bimestre {bimestre}/{ano}: +{n_inserir} / -{n_apagar}")
 
-                # Regra: referência = maior entre matrícula e início do bimestre
-                data_referencia = max(inicio_bimestre, data_matricula_dt)
+def conciliar_no_loss_daily(db, data_inicio: date, data_fim: date):
+    """
+    Diferença entre os NO_LOSS_DAILY devidos no intervalo (no_loss_daily_esperados) e os
+    lançados com data no intervalo, só para os alunos com matrícula válida (os outros
+    não são avaliados e seus lançamentos ficam como estão). Retorna (a inserir, a apagar), no formato de
+    _gravar_deltas_em_lote / _remover_lancamentos_em_lote.
+    """
+    dias, aluno_ids, devido = no_loss_daily_esperados(db, data_inicio, data_fim)
+    i_dia, j_aluno = np.nonzero(devido)
+    esperados = [
+        {"aluno_id": int(aluno_ids[j]), "ano": dias[i][1], "bimestre": dias[i][2], "dia": dias[i][0],
+         "criado_em": dias[i][0].strftime('%d/%m/%Y')}
+        for i, j in zip(i_dia, j_aluno)
+    ]
+    chaves_esperadas = _chaves_de_lancamento(
+        aluno_ids[j_aluno], [dias[i][0] for i in i_dia], [dias[i][1] for i in i_dia], [dias[i][2] for i in i_dia])
 
-                # Só processar dias após 60 dias completos da referência
-                if dia < data_referencia + timedelta(days=60):
-                    dia += timedelta(days=1)
-                    continue
+    # só os alunos avaliados: sem matrícula válida o aluno fica de fora dos dois lados
+    avaliados = set(aluno_ids.tolist())
+    existentes = [
+        l for l in _lancamentos_existentes(db, "NO_LOSS_DAILY", lambda d: d is not None and data_inicio <= d <= data_fim)
+        if l["aluno_id"] in avaliados
+    ]
+    chaves_existentes = _chaves_de_lancamento(
+        [l["aluno_id"] for l in existentes], [l["dia"] for l in existentes],
+        [l["ano"] for l in existentes], [l["bimestre"] for l in existentes])
+    return _diferenca(esperados, chaves_esperadas, existentes, chaves_existentes)
 
-                # Se houver PERDA mais recente que essa referência, redenominamos o ciclo!
-                evento_neg = db.query(PontuacaoHistorico)\
-                    .filter(
-                        PontuacaoHistorico.aluno_id == aluno_id,
-                        PontuacaoHistorico.valor_delta < 0,
-                        PontuacaoHistorico.criado_em < dia.strftime('%Y-%m-%d')
-                    )\
-                    .order_by(PontuacaoHistorico.criado_em.desc())\
-                    .first()
-                if evento_neg:
-                    evt_data_str = evento_neg.criado_em
-                    try:
-                        if '-' in evt_data_str:
-                            evt_date = datetime.strptime(evt_data_str[:10], '%Y-%m-%d').date()
-                        else:
-                            evt_date = datetime.strptime(evt_data_str[:10], '%d/%m/%Y').date()
-                    except Exception:
-                        evt_date = None
-                    if evt_date and evt_date >= data_referencia:
-                        # só reinicia ciclo se a perda foi depois da data_referencia
-                        data_referencia = evt_date
-                        # só processa dias depois de 60 dias dessa perda
-                        if dia < data_referencia + timedelta(days=60):
-                            dia += timedelta(days=1)
-                            continue
+def conciliar_bonus_bimestral(db, ate: date):
+    """
+    Diferença entre os BIMESTRE_BONUS devidos pelos bimestres fechados (com médias em
+    medias_bimestrais) e encerrados antes de `ate` (mesma regra do fechamento: +0.5 para
+    média >= 8.0, lançado 1 dia após o fim, no bimestre seguinte) e os já lançados.
+    Cada bônus é identificado pelo bimestre que ele paga: o último bimestre com fim até a
+    data do lançamento (assim o bônus do 1º e o do 2º bimestre, ambos gravados no 2º quando
+    o 28/06 cai no recesso, não se confundem). Um bônus por aluno e bimestre pago.
+    Retorna (a inserir, a apagar).
+    """
+    # Só bimestres fechados (com médias gravadas): sem médias não há como saber quem tem direito
+    bimestres = db.execute(
+        text("""
+            SELECT DISTINCT b.ano, b.numero FROM bimestres b
+            WHERE b.fim < :ate
+              AND EXISTS (SELECT 1 FROM medias_bimestrais m WHERE m.ano = b.ano AND m.bimestre = b.numero)
+            ORDER BY b.ano, b.numero
+        """),
+        {"ate": ate.strftime("%Y-%m-%d")}
+    ).fetchall()
+    esperados, chaves_esperadas, conciliados = [], [], set()
+    for ano, numero in bimestres:
+        lancamento = _lancamento_do_bonus(db, ano, numero)
+        if lancamento is None:
+            continue
+        alunos_aptos = _alunos_matriculados_ate(db, _fim_do_bimestre(db, ano, numero))
+        devidos = bonus_bimestral_devidos(db, ano, numero, alunos_aptos, lancamento, force=True)
+        conciliados.add((ano, numero))
+        esperados.extend(devidos)
+        chaves_esperadas.extend((e["aluno_id"], ano, numero) for e in devidos)
+    # chave sem a data: (aluno, ano, bimestre) do bimestre pago
+    chaves_esperadas = _chaves_de_lancamento([c[0] for c in chaves_esperadas], np.zeros(len(chaves_esperadas)),
+                                             [c[1] for c in chaves_esperadas], [c[2] for c in chaves_esperadas])
 
-                # Controle de duplicidade
-                criado_em_str = dia.strftime('%d/%m/%Y')
-                existe = (
-                    db.query(PontuacaoHistorico)
-                    .filter_by(aluno_id=aluno_id, ano=ano, bimestre=bimestre, tipo_evento="NO_LOSS_DAILY")
-                    .filter(PontuacaoHistorico.criado_em == criado_em_str)
-                    .first()
-                )
-                if existe:
-                    dia += timedelta(days=1)
-                    continue
+    fins = sorted(
+        (d, ano, numero) for ano, numero, d in (
+            (ano, numero, _parse_data(fim)) for ano, numero, fim in
+            db.execute(text("SELECT ano, numero, fim FROM bimestres")).fetchall()
+        ) if d is not None
+    )
+    datas_fim = np.array([d for d, _, _ in fins], dtype='datetime64[D]')
+    existentes, pagos = [], []
+    for l in _lancamentos_existentes(db, "BIMESTRE_BONUS", lambda d: d is not None):
+        pos = int(np.searchsorted(datas_fim, np.datetime64(l["dia"], 'D'), side='right')) - 1
+        if pos >= 0 and fins[pos][1:] in conciliados:
+            existentes.append(l)
+            pagos.append(fins[pos][1:])
+    chaves_existentes = _chaves_de_lancamento([l["aluno_id"] for l in existentes], np.zeros(len(existentes)),
+                                              [p[0] for p in pagos], [p[1] for p in pagos])
+    return _diferenca(esperados, chaves_esperadas, existentes, chaves_existentes)
 
-                # Por último, só lança se os 60 dias anteriores forem limpos de perda
-                inicio_period = dia - timedelta(days=60)
-                fim_period = dia - timedelta(days=1)
-                if aluno_sem_perda_periodo(db, aluno_id, inicio_period, fim_period):
-                    try:
-                        disciplinar._apply_delta_pontuacao(
-                            db, aluno_id, dia.strftime("%Y-%m-%d"), 0.2,
-                            ocorrencia_id=None, tipo_evento="NO_LOSS_DAILY",
-                            data_despacho=dia.strftime("%Y-%m-%d")
-                        )
-                        total_bonificacoes += 1
-                    except Exception:
-                        app.logger.exception(f"[RETROATIVO] Erro no lançamento retroativo aluno_id={aluno_id}, dia={dia}")
-                dia += timedelta(days=1)
-            db.commit()
-        print(f"[INFO] Correção retroativa concluída. Bonificações diárias lançadas: {total_bonificacoes}")
+def _aplicar_conciliacao(db, tipo_evento, delta, inserir, apagar, dry_run):
+    _mostrar_diferenca(tipo_evento, inserir, apagar)
+    if dry_run:
+        print("[INFO] --dry-run: nada foi gravado.")
+        return
+    try:
+        _remover_lancamentos_em_lote(db, apagar)
+        _gravar_deltas_em_lote(db, inserir, delta, tipo_evento)
+        db.commit()
+    except Exception:
+        db.rollback()
+        app.logger.exception(f"Erro ao aplicar a correção retroativa de {tipo_evento}")
+        raise
 
-def corrigir_bonificacoes_bimestrais_retroativas():
+def corrigir_bonificacoes_retroativas(data_inicio: date = None, data_fim: date = None, dry_run=False):
     """
-    Para todos os alunos e todos os bimestres já passados,
-    lança automaticamente o bônus bimestral (+0,5) caso a média bimestral seja >= 8.0 e ainda não tenha sido lançado,
-    respeitando a data de matrícula e evitando duplicidade.
+    Concilia os bônus diários (+0,2) de TODOS os alunos com as regras de apply_no_loss_daily,
+    de data_inicio (padrão: início do primeiro bimestre cadastrado) até data_fim (padrão: ontem):
+    calcula o conjunto devido inteiro, compara com os NO_LOSS_DAILY lançados no período numa
+    única consulta, lança os que faltam e apaga os indevidos/duplicados numa só transação.
+    dry_run: só mostra a diferença.
+    Retorna (lançados, apagados).
     """
-    from datetime import date, datetime
+    with app.app_context(), resumo_execucao("correção retroativa no-loss daily") as resumo:
+        db = get_db()
+        if data_inicio is None:
+            primeiro = db.execute(text("SELECT MIN(inicio) FROM bimestres")).scalar()
+            data_inicio = _parse_data(primeiro)
+        data_fim = data_fim or date.today() - timedelta(days=1)
+        if data_inicio is None or data_inicio > data_fim:
+            print("[INFO] Nenhum período a corrigir.")
+            return 0, 0
+        print(f"[INFO] Conciliando NO_LOSS_DAILY de {data_inicio} a {data_fim}...")
+        with resumo.cronometro("calculo"):
+            inserir, apagar = conciliar_no_loss_daily(db, data_inicio, data_fim)
+        with resumo.cronometro("gravacao"):
+            _aplicar_conciliacao(db, "NO_LOSS_DAILY", 0.2, inserir, apagar, dry_run)
+        resumo.contar("lancamentos", len(inserir))
+        resumo.contar("remocoes", len(apagar))
+        if not dry_run:
+            print(f"[INFO] Correção retroativa concluída. Bonificações diárias lançadas: {len(inserir)}, "
+                  f"apagadas: {len(apagar)}")
+        return len(inserir), len(apagar)
 
-    with app.app_context():
+def corrigir_bonificacoes_bimestrais_retroativas(dry_run=False):
+    """
+    Concilia o bônus bimestral (+0,5) de todos os bimestres já encerrados com a regra do
+    fechamento (conciliar_bonus_bimestral): lança os que faltam e apaga os indevidos e os
+    repetidos, numa só transação. dry_run: só mostra a diferença.
+    Retorna (lançados, apagados).
+    """
+    with app.app_context(), resumo_execucao("correção retroativa bônus bimestral") as resumo:
         db = get_db()
-        total_bonificacoes = 0
-        hoje = date.today()
-        alunos_data = db.query(Aluno.id, Aluno.data_matricula).all()
+        with resumo.cronometro("calculo"):
+            inserir, apagar = conciliar_bonus_bimestral(db, date.today())
+        with resumo.cronometro("gravacao"):
+            _aplicar_conciliacao(db, "BIMESTRE_BONUS", 0.5, inserir, apagar, dry_run)
+        resumo.contar("lancamentos", len(inserir))
+        resumo.contar("remocoes", len(apagar))
+        if not dry_run:
+            print(f"[INFO] Correção retroativa bimestral concluída. Bonificações lançadas: {len(inserir)}, "
+                  f"apagadas: {len(apagar)}")
+        return len(inserir), len(apagar)
 
-        bimestres = db.execute(
-            text("SELECT ano, numero, fim FROM bimestres WHERE fim < :hoje ORDER BY ano, numero"),
-            {"hoje": hoje.strftime("%Y-%m-%d")}
-        ).fetchall()
+# INSERT ... ON CONFLICT (SQLite >= 3.24 e PostgreSQL) sobre a unique (aluno_id, ano, bimestre) de
+# medias_bimestrais. O "WHERE true" do SELECT é exigido pelo SQLite para não confundir o ON CONFLICT
+# com um ON de join.
+SQL_UPSERT_MEDIA = """
+    INSERT INTO medias_bimestrais (aluno_id, ano, bimestre, media) VALUES (:a, :y, :b, :m)
+    ON CONFLICT (aluno_id, ano, bimestre) DO UPDATE SET media = excluded.media
+"""
 
-        for aluno_id, data_matricula in alunos_data:
-            if not data_matricula:
-                continue
-            if isinstance(data_matricula, str):
-                from datetime import datetime
-                data_matricula = datetime.strptime(data_matricula[:10], "%Y-%m-%d").date()
-            for bimestre_row in bimestres:
-                ano, num, fim = bimestre_row
-                # Verifica se aluno estava matriculado antes do fim do bimestre
-                fim_dt = fim if isinstance(fim, date) else datetime.strptime(str(fim)[:10], '%Y-%m-%d').date()
-                if data_matricula > fim_dt:
-                    continue
-                # Verifica duplicidade -- se bônus já lançado
-                exists = (
-                    db.query(PontuacaoHistorico)
-                    .filter_by(aluno_id=aluno_id, ano=ano, bimestre=num, tipo_evento="BIMESTRE_BONUS")
-                    .first()
-                )
-                if exists:
-                    continue
-                # Checa média bimestral
-                mb_row = db.execute(
-                    text("SELECT media FROM medias_bimestrais WHERE aluno_id = :aluno_id AND ano = :ano AND bimestre = :bimestre"),
-                    {"aluno_id": aluno_id, "ano": ano, "bimestre": num}
-                ).fetchone()
-                if not mb_row or mb_row[0] < 8.0:
-                    continue
-                try:
-                    disciplinar._apply_delta_pontuacao(
-                        db, aluno_id, str(fim_dt), 0.5,
-                        ocorrencia_id=None, tipo_evento="BIMESTRE_BONUS"
-                    )
-                    total_bonificacoes += 1
-                    print(f"[RETRO BIMESTRE] aluno_id={aluno_id}, ano={ano}, bimestre={num}, lançado em {fim_dt}")
-                except Exception:
-                    app.logger.exception(f"[RETRO BIMESTRE] Erro para aluno_id={aluno_id}, ano={ano}, bimestre={num}")
-            db.commit()
-        print(f"[INFO] Correção retroativa bimestral concluída. Bonificações lançadas: {total_bonificacoes}")
+# Médias iniciais de todos os alunos em todos os bimestres (ver criar_media_bimestral_inicial_para_todos).
+# Um aluno entra num bimestre se a matrícula é até o fim dele. Cada sequência de bimestres consecutivos
+# em que o aluno entra (cadeia) começa com 8.0 no 1º bimestre ou com a média já gravada do bimestre
+# anterior (teto 10.0; 8.0 se não houver), e esse valor segue pelos bimestres seguintes da cadeia.
+SQL_MEDIAS_INICIAIS = """
+    INSERT INTO medias_bimestrais (aluno_id, ano, bimestre, media)
+    WITH bims AS (
+        SELECT ano, numero, MAX(fim) AS fim, MAX(fim_dt) AS fim_dt FROM bimestres
+        WHERE fim IS NOT NULL OR fim_dt IS NOT NULL
+        GROUP BY ano, numero
+    ),
+    elegiveis AS (
+        -- colunas Date; o texto só vale para linhas ainda sem o espelho preenchido
+        SELECT a.id AS aluno_id, b.ano, b.numero AS bimestre,
+               LAG(b.numero) OVER (PARTITION BY a.id, b.ano ORDER BY b.numero) AS anterior
+        FROM alunos a
+        JOIN bims b ON a.data_matricula_dt <= b.fim_dt
+                    OR ((a.data_matricula_dt IS NULL OR b.fim_dt IS NULL)
+                        AND substr(a.data_matricula, 1, 10) <= substr(b.fim, 1, 10))
+        WHERE a.data_matricula_dt IS NOT NULL OR (a.data_matricula IS NOT NULL AND a.data_matricula <> '')
+    ),
+    cadeias AS (
+        SELECT e.aluno_id, e.ano, e.bimestre,
+               SUM(CASE WHEN e.anterior = e.bimestre - 1 THEN 0 ELSE 1 END)
+                   OVER (PARTITION BY e.aluno_id, e.ano ORDER BY e.bimestre) AS cadeia,
+               CASE
+                   WHEN e.anterior = e.bimestre - 1 THEN NULL
+                   WHEN e.bimestre = 1 OR mb.media IS NULL THEN 8.0
+                   WHEN mb.media > 10.0 THEN 10.0
+                   ELSE mb.media
+               END AS media_inicio
+        FROM elegiveis e
+        LEFT JOIN medias_bimestrais mb
+               ON mb.aluno_id = e.aluno_id AND mb.ano = e.ano AND mb.bimestre = e.bimestre - 1
+    )
+    SELECT aluno_id, ano, bimestre,
+           FIRST_VALUE(media_inicio) OVER (PARTITION BY aluno_id, ano, cadeia ORDER BY bimestre) AS media
+    FROM cadeias
+    WHERE true
+    ON CONFLICT (aluno_id, ano, bimestre) DO UPDATE SET media = excluded.media
+"""
 
 def criar_media_bimestral_inicial_para_todos():
     """
@@ -438,73 +764,20 @@ def criar_media_bimestral_inicial_para_todos():
     - 1º bimestre: média inicial é 8.0.
     - Demais bimestres: média inicial = média final do bimestre anterior, nunca maior que 10.0.
     Atualiza registros se já existirem.
+
+    Uma única instrução (SQL_MEDIAS_INICIAIS): a média anterior é propagada com funções de
+    janela e gravada com INSERT ... ON CONFLICT DO UPDATE.
     """
     with app.app_context():
         db = get_db()
-        alunos_data = db.query(Aluno.id, Aluno.data_matricula).all()
-        bimestres = db.execute(text("SELECT ano, numero, fim FROM bimestres ORDER BY ano, numero")).fetchall()
-        total_novos = 0
-        for aluno_id, data_matricula in alunos_data:
-            if not data_matricula:
-                continue
-            if isinstance(data_matricula, str):
-                from datetime import datetime
-                data_matricula = datetime.strptime(data_matricula[:10], "%Y-%m-%d").date()
-            media_anterior = 8.0  # para o 1º bimestre
-            for idx, bimestre in enumerate(bimestres):
-                ano, num, fim = bimestre
-                if isinstance(fim, str):
-                    from datetime import datetime
-                    fim = datetime.strptime(fim[:10], "%Y-%m-%d").date()
-                if data_matricula > fim:
-                    continue
-                if num == 1:
-                    media_inicial = 8.0
-                else:
-                    # Busca a média FINAL do bimestre anterior para ser a inicial deste
-                    mb_ant = db.execute(
-                        text("SELECT media FROM medias_bimestrais WHERE aluno_id = :a AND ano = :y AND bimestre = :b"),
-                        {"a": aluno_id, "y": ano, "b": num - 1}
-                    ).fetchone()
-                    if mb_ant and mb_ant[0] is not None:
-                        media_inicial = float(mb_ant[0])
-                        if media_inicial > 10.0:  # Garante teto
-                            media_inicial = 10.0
-                    else:
-                        media_inicial = 8.0
-
-                # ATUALIZA/INSERE A MÉDIA INICIAL PARA O BIMESTRE ATUAL
-                # Verifica se já existe média para este aluno/ano/bimestre
-                mb = db.execute(
-                    text("SELECT 1 FROM medias_bimestrais WHERE aluno_id = :a AND ano = :y AND bimestre = :b"),
-                    {"a": aluno_id, "y": ano, "b": num}
-                ).fetchone()
-
-                if mb:
-                    # Atualiza média inicial se diferente
-                    db.execute(
-                        text("UPDATE medias_bimestrais SET media = :m WHERE aluno_id = :a AND ano = :y AND bimestre = :b"),
-                        {"m": media_inicial, "a": aluno_id, "y": ano, "b": num}
-                    )
-                else:
-                    db.execute(
-                        text("INSERT INTO medias_bimestrais (aluno_id, ano, bimestre, media) VALUES (:a, :y, :b, :m)"),
-                        {"a": aluno_id, "y": ano, "b": num, "m": media_inicial}
-                    )
-                if mb:
-                    # Atualiza média se diferente
-                    db.execute(
-                        text("UPDATE medias_bimestrais SET media = :m WHERE aluno_id = :a AND ano = :y AND bimestre = :b"),
-                        {"m": media_inicial, "a": aluno_id, "y": ano, "b": num}
-                    )
-                else:
-                    db.execute(
-                        text("INSERT INTO medias_bimestrais (aluno_id, ano, bimestre, media) VALUES (:a, :y, :b, :m)"),
-                        {"a": aluno_id, "y": ano, "b": num, "m": media_inicial}
-                    )
-                    total_novos += 1
-        db.commit()
-        print(f"[INFO] Médias corrigidas/garantidas para todos os alunos e bimestres")
+        try:
+            total = db.execute(text(SQL_MEDIAS_INICIAIS)).rowcount
+            db.commit()
+        except Exception:
+            db.rollback()
+            app.logger.exception("Erro ao criar as médias bimestrais iniciais")
+            raise
+        print(f"[INFO] Médias corrigidas/garantidas para todos os alunos e bimestres ({total} registros)")
 
 def calcular_e_salvar_pontuacao_final_bimestre(ano: int, bimestre: int, force=False):
     """
@@ -514,121 +787,273 @@ def calcular_e_salvar_pontuacao_final_bimestre(ano: int, bimestre: int, force=Fa
     Uso:
       py -m scripts.pontuacao_rotinas calcular_e_salvar_pontuacao_final_bimestre 2025 1
     """
-    with app.app_context():
+    with app.app_context(), resumo_execucao(f"pontuação final {ano} b{bimestre}") as resumo:
         db = get_db()
-        
-        # Busca fim do bimestre
-        fim_bimestre = db.execute(
-            text("SELECT fim FROM bimestres WHERE ano = :ano AND numero = :bimestre"),
-            {"ano": ano, "bimestre": bimestre}
-        ).fetchone()
-        
-        if not fim_bimestre or not fim_bimestre[0]:
+        data_fim = _fim_do_bimestre(db, ano, bimestre)
+        if not data_fim:
             print(f"[ERRO] Bimestre {bimestre}/{ano} não encontrado")
             return
-            
-        data_fim = fim_bimestre[0]
-        if isinstance(data_fim, str):
-            data_fim = datetime.strptime(data_fim[:10], "%Y-%m-%d").date()
-        
-        alunos_data = db.query(Aluno.id, Aluno.data_matricula).all()
-        total_salvos = 0
-        
-        for aluno_id, data_matricula in alunos_data:
-            if not data_matricula:
-                continue
-                
-            if isinstance(data_matricula, str):
-                data_matricula = datetime.strptime(data_matricula[:10], "%Y-%m-%d").date()
-                
-            # Só processa alunos matriculados antes do fim do bimestre
-            if data_matricula > data_fim:
-                continue
-            
-            # Verifica se já foi calculado
-            if not force:
-                existe = db.execute(
-                    text("SELECT 1 FROM medias_bimestrais WHERE aluno_id = :a AND ano = :y AND bimestre = :b"),
-                    {"a": aluno_id, "y": ano, "b": bimestre}
-                ).fetchone()
-                if existe:
-                    continue
-            
-            # ========================================
-            # CORREÇÃO: PONTUAÇÃO INICIAL DO BIMESTRE
-            # ========================================
-            if bimestre == 1:
-                # 1º bimestre sempre começa com 8.0
-                pontuacao_final = 8.0
-            else:
-                # Bimestres seguintes: busca pontuação final do anterior
-                anterior = db.execute(
-                    text("SELECT media FROM medias_bimestrais WHERE aluno_id = :a AND ano = :y AND bimestre = :b"),
-                    {"a": aluno_id, "y": ano, "b": bimestre-1}
-                ).fetchone()
-                
-                if anterior and anterior[0] is not None:
-                    pontuacao_final = float(anterior[0])
-                else:
-                    # Fallback: se não há registro anterior, usa 8.0
-                    pontuacao_final = 8.0
-            
-            # ========================================
-            # SOMA OS EVENTOS DO BIMESTRE (exceto BIMESTRE_BONUS e TRANSFERENCIA_BIMESTRE)
-            # ========================================
-            historico = db.query(PontuacaoHistorico).filter(
-                PontuacaoHistorico.aluno_id == aluno_id,
-                PontuacaoHistorico.ano == ano,
-                PontuacaoHistorico.bimestre == bimestre,
-                PontuacaoHistorico.tipo_evento.notin_(['BIMESTRE_BONUS', 'TRANSFERENCIA_BIMESTRE'])
-            ).all()
-            
-            for h in historico:
-                pontuacao_final += float(h.valor_delta or 0)
-            
-            # ========================================
-            # ADICIONA BÔNUS BIMESTRAL DO BIMESTRE ANTERIOR
-            # ========================================
-            if bimestre > 1:
-                media_anterior = db.execute(
-                    text("SELECT media FROM medias_bimestrais WHERE aluno_id = :a AND ano = :y AND bimestre = :b"),
-                    {"a": aluno_id, "y": ano, "b": bimestre-1}
-                ).fetchone()
-                
-                if media_anterior and float(media_anterior[0]) >= 8.0:
-                    pontuacao_final += 0.5
-            
-            # Aplica teto APENAS NO FINAL
-            pontuacao_final = min(10.0, max(0.0, pontuacao_final))
-            
-            # Salva ou atualiza em medias_bimestrais
-            try:
-                existe = db.execute(
-                    text("SELECT id FROM medias_bimestrais WHERE aluno_id = :a AND ano = :y AND bimestre = :b"),
-                    {"a": aluno_id, "y": ano, "b": bimestre}
-                ).fetchone()
-                
-                if existe:
-                    # Atualiza
-                    db.execute(
-                        text("UPDATE medias_bimestrais SET media = :m WHERE aluno_id = :a AND ano = :y AND bimestre = :b"),
-                        {"m": pontuacao_final, "a": aluno_id, "y": ano, "b": bimestre}
-                    )
-                else:
-                    # Insere
-                    db.execute(
-                        text("INSERT INTO medias_bimestrais (aluno_id, ano, bimestre, media) VALUES (:a, :y, :b, :m)"),
-                        {"a": aluno_id, "y": ano, "b": bimestre, "m": pontuacao_final}
-                    )
-                total_salvos += 1
-            except Exception as e:
-                print(f"[ERRO] Falha ao salvar pontuação final para aluno_id={aluno_id}: {e}")
-        
-        db.commit()
+
+        # Só processa alunos matriculados antes do fim do bimestre
+        aluno_ids = _alunos_matriculados_ate(db, data_fim)
+        if not force:
+            # pula os já calculados
+            ja_calculados = _medias_do_bimestre(db, ano, bimestre)
+            aluno_ids = [a for a in aluno_ids if a not in ja_calculados]
+        resumo.contar("alunos", len(aluno_ids))
+
+        try:
+            with resumo.cronometro("calculo"):
+                total_salvos = salvar_pontuacao_final_alunos(db, ano, bimestre, aluno_ids)
+            with resumo.cronometro("commit"):
+                db.commit()
+        except Exception:
+            db.rollback()
+            app.logger.exception(f"Erro ao salvar a pontuação final de {ano} b{bimestre}")
+            raise
+        resumo.contar("salvos", total_salvos)
         print(f"[INFO] Pontuação final calculada e salva para {total_salvos} alunos em {ano} b{bimestre}.")
 
+# --- Fechamento do bimestre (pontuação final + bônus) por blocos de alunos ---
+
+ALUNOS_POR_PARTE = 500
+ETAPAS_FECHAMENTO = ('pontuacao', 'bonus')  # o bônus lê as médias gravadas na primeira etapa
+
+def _fim_do_bimestre(db, ano, bimestre):
+    row = db.execute(
+        text("SELECT fim FROM bimestres WHERE ano = :ano AND numero = :bimestre"),
+        {"ano": ano, "bimestre": bimestre}
+    ).fetchone()
+    return _parse_data(row[0]) if row else None
+
+def _proximo_bimestre(ano, bimestre):
+    return (ano + 1, 1) if bimestre == 4 else (ano, bimestre + 1)
+
+def _lancamento_do_bonus(db, ano, bimestre):
+    """
+    (data do lançamento, ano, bimestre) do bônus: 1 dia após o fim do bimestre, no próximo
+    bimestre. None se o bimestre ou o próximo não estiverem cadastrados.
+    """
+    data_fim = _fim_do_bimestre(db, ano, bimestre)
+    ano_lancamento, bimestre_lancamento = _proximo_bimestre(ano, bimestre)
+    proximo = db.execute(
+        text("SELECT inicio FROM bimestres WHERE ano = :ano AND numero = :bim"),
+        {"ano": ano_lancamento, "bim": bimestre_lancamento}
+    ).fetchone()
+    if not data_fim or not proximo:
+        return None
+    return data_fim + timedelta(days=1), ano_lancamento, bimestre_lancamento
+
+def _alunos_matriculados_ate(db, data_fim):
+    """ids, em ordem, dos alunos com matrícula até data_fim."""
+    aluno_ids = []
+    for aluno_id, data_matricula in db.query(Aluno.id, Aluno.data_matricula).order_by(Aluno.id).all():
+        data_matricula = _parse_data(data_matricula)
+        if data_matricula and data_matricula <= data_fim:
+            aluno_ids.append(aluno_id)
+    return aluno_ids
+
+def _medias_do_bimestre(db, ano, bimestre):
+    """{aluno_id: média} gravadas em medias_bimestrais para o bimestre."""
+    return dict(db.execute(
+        text("SELECT aluno_id, media FROM medias_bimestrais WHERE ano = :y AND bimestre = :b"),
+        {"y": ano, "b": bimestre}
+    ).fetchall())
+
+def salvar_pontuacao_final_alunos(db, ano, bimestre, aluno_ids):
+    """
+    Calcula a pontuação final dos alunos informados e grava em medias_bimestrais
+    (SQL_UPSERT_MEDIA). Não faz commit. Retorna quantos alunos foram gravados.
+
+    Regra (simulador_pontuacao.pontuacao_final_bimestre, todos os alunos de uma vez):
+    média do bimestre anterior (ou 8.0 no 1º bimestre / sem registro) + eventos lançados
+    no bimestre, exceto BIMESTRE_BONUS e TRANSFERENCIA_BIMESTRE, + 0.5 se a média anterior
+    for >= 8.0; limite 0.0 .. 10.0 APENAS NO FINAL.
+    """
+    if not aluno_ids:
+        return 0
+    # Só os eventos do bimestre e as médias anteriores destes alunos
+    hist = carregar_historico(db, aluno_ids, ano=ano, bimestre=bimestre)
+    medias_anteriores = carregar_medias(db, ano, bimestre - 1, aluno_ids) if bimestre > 1 else {}
+    pontuacoes = pontuacao_final_bimestre(hist, ano, bimestre, medias_anteriores)
+
+    linhas = [{"m": float(p), "a": int(a), "y": ano, "b": bimestre} for a, p in zip(hist.alunos, pontuacoes)]
+    db.execute(text(SQL_UPSERT_MEDIA), linhas)
+    return len(linhas)
+
+def bonus_bimestral_devidos(db, ano, bimestre, aluno_ids, lancamento, force=False):
+    """
+    Lançamentos (no formato de _gravar_deltas_em_lote) do +0.5 para os alunos informados
+    com média >= 8.0 no bimestre. lancamento: retorno de _lancamento_do_bonus.
+    Sem force, pula quem já tem BIMESTRE_BONUS no próximo bimestre.
+    """
+    data_lancamento, ano_lancamento, bimestre_lancamento = lancamento
+    # A data determina o bimestre do lançamento (mesma regra de _apply_delta_pontuacao)
+    ano_evento, bimestre_evento = disciplinar._get_bimestre_for_date(db, data_lancamento.strftime("%Y-%m-%d"))
+    medias = _medias_do_bimestre(db, ano, bimestre)
+    ja_lancados = set() if force else {
+        r[0] for r in db.query(PontuacaoHistorico.aluno_id).filter_by(
+            ano=ano_lancamento, bimestre=bimestre_lancamento, tipo_evento='BIMESTRE_BONUS'
+        ).all()
+    }
+    criado_em = data_lancamento.strftime('%d/%m/%Y')
+    return [
+        {"aluno_id": aluno_id, "ano": ano_evento, "bimestre": bimestre_evento, "criado_em": criado_em}
+        for aluno_id in aluno_ids
+        if aluno_id not in ja_lancados and medias.get(aluno_id) is not None and float(medias[aluno_id]) >= 8.0
+    ]
+
+def planejar_fechamento(db, ano, bimestre, tamanho=ALUNOS_POR_PARTE):
+    """
+    Partes do fechamento em fechamento_bimestre_partes. Se houver partes não concluídas
+    (fechamento interrompido), continua delas; senão apaga as de um fechamento anterior e
+    divide os alunos elegíveis em blocos de `tamanho`, uma parte por bloco e por etapa
+    (sem o próximo bimestre cadastrado não há etapa de bônus). Faz commit.
+    """
+    partes = db.query(FechamentoBimestreParte).filter_by(ano=ano, bimestre=bimestre)\
+        .order_by(FechamentoBimestreParte.id).all()
+    if any(p.status != 'concluida' for p in partes):
+        return partes
+
+    data_fim = _fim_do_bimestre(db, ano, bimestre)
+    if not data_fim:
+        raise ValueError(f"Bimestre {bimestre}/{ano} não encontrado")
+    db.query(FechamentoBimestreParte).filter_by(ano=ano, bimestre=bimestre).delete()
+    aluno_ids = _alunos_matriculados_ate(db, data_fim)
+    etapas = ETAPAS_FECHAMENTO if _lancamento_do_bonus(db, ano, bimestre) else ETAPAS_FECHAMENTO[:1]
+    agora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    for etapa in etapas:
+        for parte, inicio in enumerate(range(0, len(aluno_ids), tamanho), start=1):
+            bloco = aluno_ids[inicio:inicio + tamanho]
+            db.add(FechamentoBimestreParte(
+                ano=ano, bimestre=bimestre, etapa=etapa, parte=parte, aluno_ids=','.join(map(str, bloco)),
+                alunos=len(bloco), status='pendente', criado_em=agora
+            ))
+    db.commit()
+    return db.query(FechamentoBimestreParte).filter_by(ano=ano, bimestre=bimestre)\
+        .order_by(FechamentoBimestreParte.id).all()
+
+def _executar_parte(parte_id):
+    """
+    Executa uma parte numa sessão própria (roda nas threads do fechamento). Os dados e o
+    status 'concluida' da parte vão no mesmo commit. Retorna quantos registros gravou.
+    """
+    db = SessionLocal()
+    try:
+        with app.app_context():
+            return _gravar_parte(db, parte_id)
+    except Exception as e:
+        db.rollback()
+        db.execute(
+            update(FechamentoBimestreParte).where(FechamentoBimestreParte.id == parte_id)
+            .values(status='erro', erro=f"{type(e).__name__}: {e}")
+        )
+        db.commit()
+        raise
+    finally:
+        db.close()
+
+def _gravar_parte(db, parte_id):
+    parte = db.get(FechamentoBimestreParte, parte_id)
+    aluno_ids = [int(a) for a in parte.aluno_ids.split(',') if a]
+    if parte.etapa == 'pontuacao':
+        processados = salvar_pontuacao_final_alunos(db, parte.ano, parte.bimestre, aluno_ids)
+    else:
+        lancamento = _lancamento_do_bonus(db, parte.ano, parte.bimestre)
+        devidos = bonus_bimestral_devidos(db, parte.ano, parte.bimestre, aluno_ids, lancamento) if lancamento else []
+        _gravar_deltas_em_lote(db, devidos, 0.5, "BIMESTRE_BONUS")
+        processados = len(devidos)
+    parte.status = 'concluida'
+    parte.processados = processados
+    parte.erro = None
+    parte.concluido_em = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    db.commit()
+    return processados
+
+def fechar_bimestre_em_partes(db, ano, bimestre, workers=None, ao_progredir=None):
+    """
+    Fecha o bimestre (pontuação final em medias_bimestrais e bônus de +0.5 no próximo
+    bimestre) em partes de ALUNOS_POR_PARTE alunos, executadas em paralelo
+    (FECHAMENTO_WORKERS threads, cada uma com sua sessão; 1 no SQLite). Uma etapa só
+    começa com todas as partes da anterior concluídas. Se alguma parte falhar, levanta
+    RuntimeError depois de terminar as outras; chamar de novo continua das que faltam.
+
+    ao_progredir(alunos, total) é chamada a cada parte concluída (as duas etapas contam).
+    Retorna {'alunos', 'medias', 'bonus', 'retomado'}.
+    """
+    partes = planejar_fechamento(db, ano, bimestre)
+    retomado = any(p.status == 'concluida' for p in partes)
+    total = sum(p.alunos for p in partes)
+    feitos = sum(p.alunos for p in partes if p.status == 'concluida')
+    if workers is None:
+        workers = int(app.config.get('FECHAMENTO_WORKERS', 4))
+    if db.get_bind().dialect.name == 'sqlite':
+        workers = 1  # um escritor por vez
+    if ao_progredir:
+        ao_progredir(feitos, total)
+
+    for etapa in ETAPAS_FECHAMENTO:
+        pendentes = [p for p in partes if p.etapa == etapa and p.status != 'concluida']
+        falhas = []
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futuros = {executor.submit(_executar_parte, p.id): p for p in pendentes}
+            for futuro in as_completed(futuros):
+                parte = futuros[futuro]
+                try:
+                    futuro.result()
+                except Exception as e:
+                    app.logger.exception(f"Erro na parte {parte.parte} ({etapa}) do fechamento de {bimestre}/{ano}")
+                    falhas.append(f"parte {parte.parte}: {type(e).__name__}: {e}")
+                    continue
+                feitos += parte.alunos
+                if ao_progredir:
+                    ao_progredir(feitos, total)
+        if falhas:
+            raise RuntimeError(f"{len(falhas)} parte(s) da etapa '{etapa}' falharam ({falhas[0]})")
+
+    db.expire_all()
+    partes = db.query(FechamentoBimestreParte).filter_by(ano=ano, bimestre=bimestre).all()
+    return {
+        'alunos': sum(p.alunos for p in partes if p.etapa == 'pontuacao'),
+        'medias': sum(p.processados or 0 for p in partes if p.etapa == 'pontuacao'),
+        'bonus': sum(p.processados or 0 for p in partes if p.etapa == 'bonus'),
+        'retomado': retomado,
+    }
+
+def fechar_bimestre(ano: int, bimestre: int, workers=None):
+    """Fechamento em partes pelo terminal; executado de novo, continua um fechamento interrompido."""
+    with app.app_context():
+        db = get_db()
+        r = fechar_bimestre_em_partes(
+            db, ano, bimestre, workers,
+            ao_progredir=lambda feitos, total: print(f"[INFO] {feitos}/{total} alunos processados")
+        )
+        if r['retomado']:
+            print("[INFO] Fechamento interrompido retomado das partes pendentes.")
+        print(f"[INFO] Bimestre {bimestre}/{ano} fechado: {r['medias']} médias gravadas, {r['bonus']} bônus lançados.")
+        return r
+
+def reconstruir_saldo_pontuacao(aluno_ids=None):
+    """
+    Regenera pontuacao_saldo (saldo acumulado por aluno/data) a partir do pontuacao_historico.
+    Sem aluno_ids, reconstrói a tabela inteira (usar após a migração ou correções manuais no histórico).
+    """
+    with app.app_context():
+        db = get_db()
+        try:
+            total = reconstruir_saldos(db, aluno_ids or None)
+            db.commit()
+        except Exception:
+            db.rollback()
+            app.logger.exception("Erro ao reconstruir pontuacao_saldo")
+            raise
+        print(f"[INFO] Saldo de pontuação reconstruído: {total} linhas gravadas.")
+        return total
+
 def main():
     parser = argparse.ArgumentParser()
+    parser.add_argument('--resumo', action='store_true', help='mostra ao final contagens e tempos da execução')
+    parser.add_argument('--debug', action='store_true', help='log detalhado (uma linha por evento/aluno)')
     sub = parser.add_subparsers(dest='cmd')
     p1 = sub.add_parser('apply_bimestral_bonus')
     p1.add_argument('ano', type=int)
@@ -637,31 +1062,52 @@ def main():
     p2 = sub.add_parser('apply_no_loss_daily')
     p2.add_argument('date', type=str, help='data inicial YYYY-MM-DD (ou data única)')
     p2.add_argument('--ate', type=str, default=None, help='data final YYYY-MM-DD (opcional)')
+    p2.add_argument('--por-aluno', action='store_true', help='usa o processamento antigo, aluno a aluno (sem lote)')
     p3 = sub.add_parser('executar_rotinas_automaticas')
     p4 = sub.add_parser('corrigir_bonificacoes_retroativas')
+    p4.add_argument('--de', type=str, default=None, help='data inicial YYYY-MM-DD (padrão: início do 1º bimestre)')
+    p4.add_argument('--ate', type=str, default=None, help='data final YYYY-MM-DD (padrão: ontem)')
+    p4.add_argument('--dry-run', action='store_true', help='só mostra o que seria lançado/apagado')
     p5 = sub.add_parser('corrigir_bonificacoes_bimestrais_retroativas')
+    p5.add_argument('--dry-run', action='store_true', help='só mostra o que seria lançado/apagado')
     p6 = sub.add_parser('criar_media_bimestral_inicial_para_todos')
     p8 = sub.add_parser('calcular_e_salvar_pontuacao_final_bimestre')
     p8.add_argument('ano', type=int, help='Ano do bimestre')
     p8.add_argument('bimestre', type=int, help='Número do bimestre (1-4)')
     p8.add_argument('--force', action='store_true', help='Recalcula mesmo que já exista')
+    p10 = sub.add_parser('fechar_bimestre')
+    p10.add_argument('ano', type=int)
+    p10.add_argument('bimestre', type=int)
+    p10.add_argument('--workers', type=int, default=None, help='partes em paralelo (padrão: FECHAMENTO_WORKERS)')
+    p9 = sub.add_parser('reconstruir_saldo_pontuacao')
+    p9.add_argument('aluno_ids', type=int, nargs='*', help='IDs de alunos (padrão: todos)')
     args = parser.parse_args()
+    if args.debug:
+        log_pontuacao.ativar(logging.DEBUG)
+    elif args.resumo:
+        log_pontuacao.ativar(logging.INFO)
     if args.cmd == 'apply_bimestral_bonus':
         apply_bimestral_bonus(args.ano, args.bimestre, force=args.force)
     elif args.cmd == 'apply_no_loss_daily':
         data_inicio = datetime.strptime(args.date, "%Y-%m-%d").date()
         data_fim = datetime.strptime(args.ate, "%Y-%m-%d").date() if args.ate else None
-        apply_no_loss_daily(data_inicio, data_fim)
+        apply_no_loss_daily(data_inicio, data_fim, em_lote=not args.por_aluno)
     elif args.cmd == 'executar_rotinas_automaticas':
         executar_rotinas_automaticas()
     elif args.cmd == 'corrigir_bonificacoes_retroativas':
-        corrigir_bonificacoes_retroativas()
+        data_inicio = datetime.strptime(args.de, "%Y-%m-%d").date() if args.de else None
+        data_fim = datetime.strptime(args.ate, "%Y-%m-%d").date() if args.ate else None
+        corrigir_bonificacoes_retroativas(data_inicio, data_fim, dry_run=args.dry_run)
     elif args.cmd == 'corrigir_bonificacoes_bimestrais_retroativas':
-        corrigir_bonificacoes_bimestrais_retroativas()
+        corrigir_bonificacoes_bimestrais_retroativas(dry_run=args.dry_run)
     elif args.cmd == 'criar_media_bimestral_inicial_para_todos':
         criar_media_bimestral_inicial_para_todos()
     elif args.cmd == 'calcular_e_salvar_pontuacao_final_bimestre':
         calcular_e_salvar_pontuacao_final_bimestre(args.ano, args.bimestre, force=args.force)
+    elif args.cmd == 'fechar_bimestre':
+        fechar_bimestre(args.ano, args.bimestre, args.workers)
+    elif args.cmd == 'reconstruir_saldo_pontuacao':
+        reconstruir_saldo_pontuacao(args.aluno_ids)
     else:
         parser.print_help()
 
@@ -0,0 +1,39 @@
+# scripts/preencher_datas.py
+"""
+Backfill online das colunas Date espelhadas (_dt) a partir das datas em texto.
+
+Processa em lotes por id com commit a cada lote, então pode rodar com o sistema no ar
+e ser repetido sem efeito colateral (só toca linhas com _dt ainda NULL).
+
+Uso:
+  py -m scripts.preencher_datas [--lote 5000]
+"""
+
+import argparse
+
+from app import app
+from database import engine
+from services.datas import preencher_colunas_data, TAMANHO_LOTE
+
+def preencher_datas(tamanho_lote=TAMANHO_LOTE):
+    with app.app_context():
+        with engine.connect() as conn:
+            try:
+                totais = preencher_colunas_data(conn, tamanho_lote, ao_fim_do_lote=conn.commit)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                app.logger.exception("Erro no backfill das colunas de data")
+                raise
+        for coluna, total in totais.items():
+            print(f"[INFO] {coluna}: {total} linhas preenchidas.")
+        return totais
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='linhas por lote/commit')
+    args = parser.parse_args()
+    preencher_datas(args.lote)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+# scripts/processar_fila.py
+"""
+Worker da fila de tarefas (services/fila_tarefas) fora do servidor web.
+
+O servidor já processa a fila em threads (FILA_WORKERS); este script serve para rodar
+a fila num processo separado (com FILA_WORKERS=0 no servidor) ou para esvaziá-la à mão.
+
+Uso:
+  py -m scripts.processar_fila            # fica processando até Ctrl+C
+  py -m scripts.processar_fila --uma-vez  # executa o que estiver vencido e sai
+"""
+
+import argparse
+import time
+
+from app import app
+from services.fila_tarefas import processar_pendentes, INTERVALO_SEGUNDOS
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--uma-vez', action='store_true', help='executa as tarefas vencidas e sai')
+    args = parser.parse_args()
+
+    if args.uma_vez:
+        print(f"[INFO] Tarefas executadas: {processar_pendentes(app)}")
+        return
+    print("[INFO] Processando a fila de tarefas (Ctrl+C para sair)...")
+    try:
+        while True:
+            executadas = processar_pendentes(app)
+            if executadas:
+                print(f"[INFO] Tarefas executadas: {executadas}")
+            time.sleep(INTERVALO_SEGUNDOS)
+    except KeyboardInterrupt:
+        print("[INFO] Encerrado.")
+
+if __name__ == '__main__':
+    main()
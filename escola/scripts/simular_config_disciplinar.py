@@ -0,0 +1,70 @@
+# scripts/simular_config_disciplinar.py
+"""
+Simula uma mudança na tabela disciplinar (tabela_disciplinar_config) sem gravar nada:
+recalcula a pontuação corrente de todos os alunos com o histórico inteiro e os pesos
+novos (services.simulador_pontuacao.simular_config) e mostra a mudança na distribuição
+por comportamento e os alunos que mudam de faixa.
+
+Mesma simulação do POST /formularios/api/config/simular.
+
+Uso:
+  py -m scripts.simular_config_disciplinar --advertencia_escrita -0.5 --suspensao_dia -1.0
+                                           [--data 2025-11-30] [--listar 50]
+"""
+
+import argparse
+from datetime import datetime
+
+from app import app
+from database import get_db
+from services.escolar_helper import _get_config_values
+from services.simulador_pontuacao import simular_config, ConfigInvalida
+
+CHAVES = ('advertencia_oral', 'advertencia_escrita', 'suspensao_dia', 'acao_educativa_dia',
+          'elogio_individual', 'elogio_coletivo')
+
+def main():
+    parser = argparse.ArgumentParser()
+    for chave in CHAVES:
+        parser.add_argument(f'--{chave}', type=float, help='novo peso')
+    parser.add_argument('--data', help='data de referência YYYY-MM-DD (padrão: hoje)')
+    parser.add_argument('--listar', type=int, default=30, help='alunos que mudam de faixa a mostrar (0 = todos)')
+    args = parser.parse_args()
+
+    config_nova = {chave: getattr(args, chave) for chave in CHAVES if getattr(args, chave) is not None}
+    data_referencia = datetime.strptime(args.data, '%Y-%m-%d').date() if args.data else None
+
+    with app.app_context():
+        db = get_db()
+        if not config_nova:
+            print("[INFO] Nenhum peso informado. Pesos atuais:")
+            for chave, valor in _get_config_values(db).items():
+                print(f"  {chave}: {valor}")
+            return
+        try:
+            r = simular_config(db, config_nova, data_referencia)
+        except ConfigInvalida as e:
+            print(f"[ERRO] {e}")
+            return
+
+    print(f"[INFO] Simulação em {r['data_referencia']} para {r['alunos']} alunos")
+    for chave in CHAVES:
+        if r['config_atual'][chave] != r['config_simulada'][chave]:
+            print(f"  {chave}: {r['config_atual'][chave]} -> {r['config_simulada'][chave]}")
+    print(f"[INFO] Pontuação média: {r['media_atual']} -> {r['media_simulada']} "
+          f"({r['alunos_com_pontuacao_alterada']} aluno(s) com pontuação alterada)")
+    print(f"  {'Comportamento':<14}{'Atual':>8}{'Simulada':>10}{'Diferença':>11}")
+    for d in r['distribuicao']:
+        print(f"  {d['comportamento']:<14}{d['atual']:>8}{d['simulada']:>10}{d['diferenca']:>+11}")
+
+    mudancas = r['mudancas']
+    print(f"[INFO] Alunos que mudam de comportamento: {len(mudancas)}")
+    for m in (mudancas[:args.listar] if args.listar else mudancas):
+        print(f"  {m.get('serie') or '-'}/{m.get('turma') or '-'} {m.get('nome') or m['aluno_id']}: "
+              f"{m['pontuacao_atual']} {m['comportamento_atual']} -> "
+              f"{m['pontuacao_simulada']} {m['comportamento_simulado']}")
+    if args.listar and len(mudancas) > args.listar:
+        print(f"  ... e mais {len(mudancas) - args.listar} (use --listar 0 para ver todos)")
+
+if __name__ == '__main__':
+    main()
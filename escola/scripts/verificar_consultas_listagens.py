@@ -0,0 +1,87 @@
+# scripts/verificar_consultas_listagens.py
+"""
+Confere que as listagens de RFOs e de prontuários fazem um número fixo de consultas,
+qualquer que seja o tamanho da página (sem consulta por linha: aluno do prontuário no mesmo
+SELECT, líder dos elogios coletivos pelo mapa (serie_numerica, turma) carregado uma vez).
+
+Conta os comandos enviados ao banco (evento before_cursor_execute do engine) em cada
+requisição, para cada tamanho de página, e sai com código 1 se a contagem mudar.
+Usa o banco configurado (SQLALCHEMY_DATABASE_URI); com poucos registros o tamanho da página
+não faz diferença e a conferência é avisada como inconclusiva. O mapa de líderes só é
+consultado se a página tiver elogio coletivo: use tamanhos em que todas as páginas tenham um.
+
+Uso:
+  py -m scripts.verificar_consultas_listagens [--tamanhos 5 50 200]
+"""
+
+import argparse
+import sys
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app import app
+from database import engine
+
+LISTAGENS = [
+    # (nome, rota da página, rota JSON com os mesmos itens)
+    ('listar_rfo', '/disciplinar/listar_rfo', '/disciplinar/api/listar_rfo'),
+    ('listar_prontuarios', '/formularios/prontuarios', '/formularios/api/prontuarios'),
+]
+
+@contextmanager
+def contar_consultas():
+    """Lista com um item por comando executado enquanto o bloco roda."""
+    comandos = []
+
+    def _contar(conn, cursor, statement, parameters, context, executemany):
+        comandos.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', _contar)
+    try:
+        yield comandos
+    finally:
+        event.remove(engine, 'before_cursor_execute', _contar)
+
+def _cliente():
+    cliente = app.test_client()
+    with cliente.session_transaction() as s:
+        s['logged_in'] = True
+        s['user_id'] = 1
+        s['nivel'] = 1
+        s['username'] = 'verificacao'
+    return cliente
+
+def conferir(cliente, nome, rota, rota_api, tamanhos):
+    # Primeira requisição fora da contagem: carrega os caches do processo (calendário, configuração...)
+    cliente.get(f"{rota}?por_pagina={tamanhos[0]}")
+    contagens, linhas = [], []
+    for tamanho in tamanhos:
+        with contar_consultas() as comandos:
+            resposta = cliente.get(f"{rota}?por_pagina={tamanho}")
+        if resposta.status_code != 200:
+            print(f"[ERRO] {nome}: {rota} respondeu {resposta.status_code}")
+            return False
+        contagens.append(len(comandos))
+        linhas.append(len(cliente.get(f"{rota_api}?por_pagina={tamanho}").get_json()['itens']))
+        print(f"  {nome} por_pagina={tamanho}: {linhas[-1]} linha(s), {contagens[-1]} consulta(s)")
+
+    if len(set(linhas)) == 1:
+        print(f"[AVISO] {nome}: todas as páginas têm {linhas[0]} linha(s); cadastre mais registros para conferir")
+    if len(set(contagens)) > 1:
+        print(f"[ERRO] {nome}: o número de consultas muda com o tamanho da página: {contagens}")
+        return False
+    print(f"[INFO] {nome}: {contagens[0]} consulta(s) em todas as páginas")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[5, 50, 200], help='tamanhos de página (por_pagina)')
+    args = parser.parse_args()
+
+    cliente = _cliente()
+    ok = all([conferir(cliente, nome, rota, rota_api, args.tamanhos) for nome, rota, rota_api in LISTAGENS])
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
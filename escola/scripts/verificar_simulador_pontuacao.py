@@ -0,0 +1,112 @@
+# scripts/verificar_simulador_pontuacao.py
+"""
+Confere o simulador vetorizado (services/simulador_pontuacao) com as funções originais:
+- pontuacao_em_datas x compute_pontuacao_em_data, para uma amostra de alunos em cada data;
+- pontuacao_do_bimestre x calcular_pontuacao_lote, se --bimestre for informado.
+
+Mostra as divergências (aluno, data, original x simulado) e sai com código 1 se houver alguma.
+Comportamento diferente com a mesma pontuação exatamente numa fronteira de faixa (9.0, 2.0...)
+é listado à parte e não conta como divergência: a soma original em ponto flutuante pode
+parar em 8.999999999999998, e o simulador classifica a soma arredondada em 9 casas.
+
+Uso:
+  py -m scripts.verificar_simulador_pontuacao [--amostra 500] [--data 2025-06-30 ...]
+                                              [--bimestre 2025 2] [--semente 0]
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime
+
+from app import app
+from database import get_db
+from models_sqlalchemy import Aluno
+from services.escolar_helper import compute_pontuacao_em_data
+from services.automated_pontuacao import calcular_pontuacao_lote
+from services.simulador_pontuacao import (
+    carregar_historico, carregar_medias, carregar_bimestres, pontuacao_em_datas, pontuacao_do_bimestre,
+    FAIXAS_COMPORTAMENTO,
+)
+
+MAX_DIVERGENCIAS_MOSTRADAS = 20
+
+def _mostrar(divergencias, titulo):
+    print(f"[INFO] {titulo}: {len(divergencias)} divergência(s)")
+    for d in divergencias[:MAX_DIVERGENCIAS_MOSTRADAS]:
+        print("  " + d)
+
+def _na_fronteira(original, simulado):
+    return original == simulado and any(original == limite for limite, _ in FAIXAS_COMPORTAMENTO)
+
+def conferir_pontuacao_em_datas(db, aluno_ids, datas):
+    inicio = time.perf_counter()
+    hist = carregar_historico(db)
+    pontuacoes, classes = pontuacao_em_datas(hist, datas)
+    print(f"[INFO] Simulador: {len(hist.alunos)} alunos x {len(datas)} data(s) em {time.perf_counter() - inicio:.2f}s")
+
+    posicoes = hist.posicao(aluno_ids)
+    divergencias, fronteira = [], []
+    inicio = time.perf_counter()
+    for aluno_id, pos in zip(aluno_ids, posicoes):
+        for j, data in enumerate(datas):
+            original = compute_pontuacao_em_data(aluno_id, datetime.combine(data, datetime.min.time()))
+            simulado = (float(pontuacoes[pos, j]), classes[pos, j])
+            if original['pontuacao'] is not None and original['pontuacao'] == simulado[0] \
+                    and original['comportamento'] == simulado[1]:
+                continue
+            texto = (f"aluno {aluno_id} em {data}: {original['pontuacao']} {original['comportamento']}"
+                     f" x {simulado[0]} {simulado[1]}")
+            if _na_fronteira(original['pontuacao'], simulado[0]):
+                fronteira.append(texto)
+            else:
+                divergencias.append(texto)
+    print(f"[INFO] compute_pontuacao_em_data: {len(aluno_ids)} alunos em {time.perf_counter() - inicio:.2f}s")
+    _mostrar(divergencias, "pontuacao_em_datas x compute_pontuacao_em_data")
+    if fronteira:
+        _mostrar(fronteira, "Comportamento diferente na fronteira de faixa (ponto flutuante, não conta)")
+    return divergencias
+
+def conferir_pontuacao_do_bimestre(db, aluno_ids, ano, bimestre):
+    originais = calcular_pontuacao_lote(aluno_ids, ano, bimestre)
+
+    hist = carregar_historico(db, aluno_ids)
+    bimestres = carregar_bimestres(db, ano)
+    bim = next((b for b in bimestres if b[0] == bimestre), None)
+    data_final = bim[2] if bim else datetime.now().date()
+    medias = carregar_medias(db, ano, bimestre - 1, aluno_ids) if bimestre > 1 else {}
+    pontuacoes, classes = pontuacao_do_bimestre(hist, ano, bimestre, data_final, medias, bimestres)
+
+    divergencias = []
+    for aluno_id, pos in zip(aluno_ids, hist.posicao(aluno_ids)):
+        original = originais[aluno_id]
+        if abs(original['pontuacao'] - float(pontuacoes[pos])) > 1e-9 or original['comportamento'] != classes[pos]:
+            divergencias.append(f"aluno {aluno_id} em {ano}/{bimestre}: {original['pontuacao']} "
+                                f"{original['comportamento']} x {float(pontuacoes[pos])} {classes[pos]}")
+    _mostrar(divergencias, "pontuacao_do_bimestre x calcular_pontuacao_lote")
+    return divergencias
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--amostra', type=int, default=500, help='alunos conferidos (0 = todos)')
+    parser.add_argument('--data', action='append', help='data de referência YYYY-MM-DD (pode repetir; padrão: hoje)')
+    parser.add_argument('--bimestre', nargs=2, type=int, metavar=('ANO', 'BIMESTRE'),
+                        help='também confere a pontuação do bimestre')
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+
+    datas = [datetime.strptime(d, '%Y-%m-%d').date() for d in args.data] if args.data else [datetime.now().date()]
+    with app.app_context():
+        db = get_db()
+        aluno_ids = [a for (a,) in db.query(Aluno.id).order_by(Aluno.id).all()]
+        if args.amostra and args.amostra < len(aluno_ids):
+            aluno_ids = sorted(random.Random(args.semente).sample(aluno_ids, args.amostra))
+
+        divergencias = conferir_pontuacao_em_datas(db, aluno_ids, datas)
+        if args.bimestre:
+            divergencias += conferir_pontuacao_do_bimestre(db, aluno_ids, *args.bimestre)
+    sys.exit(1 if divergencias else 0)
+
+if __name__ == '__main__':
+    main()
@@ -8,253 +8,205 @@ from models_sqlalchemy import (
     Aluno
 )
 from database import get_db
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
+from services.log_pontuacao import logger, contar
 
-def calcular_pontuacao_aluno(aluno_id, data_final=None, ano=None, bimestre=None):
+# Tamanho dos blocos de IN (...) nas consultas em lote
+TAMANHO_LOTE = 500
+
+def _para_date(valor):
+    """Converte 'YYYY-MM-DD...' em date (valores date/datetime passam direto)."""
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, str):
+        return datetime.strptime(valor[:10], '%Y-%m-%d').date()
+    return valor
+
+def _blocos(ids):
+    ids = list(ids)
+    for i in range(0, len(ids), TAMANHO_LOTE):
+        yield ids[i:i + TAMANHO_LOTE]
+
+def carregar_dados_pontuacao_lote(db, aluno_ids, ano, bimestre):
     """
-    Calcula a pontuação do aluno com TODAS as regras corretas:
-    
-    1. Pontuação inicial = pontuação final do bimestre anterior (ou 8.0 se for o 1º)
-    2. Bônus de 60 dias ACUMULATIVO desde o início do ANO LETIVO (não desde matrícula)
-    3. Bonificação bimestral APENAS do bimestre imediatamente anterior
-    4. Data de referência = início do 1º bimestre (ou matrícula se posterior)
+    Busca, para todos os alunos informados, o que o cálculo de pontuação precisa
+    (número fixo de consultas por bloco de alunos, em vez de ~6 por aluno):
+    - bimestres: linhas da tabela bimestres do ano, ordenadas por número
+    - medias_anteriores: {aluno_id: média do bimestre anterior}
+    - matriculas: {aluno_id: data_matricula (date) ou None}
+    - eventos: {aluno_id: [linhas do pontuacao_historico em ordem de id]}
     """
-    print(f"DEBUG - aluno_id: {aluno_id}, data_final: {data_final}, ano: {ano}, bimestre: {bimestre}")
-    db = get_db()
-    
-    # ========================================
-    # DETERMINAR DATA LIMITE PARA CÁLCULO
-    # ========================================
-    if ano and bimestre:
-        bim_obj = db.query(Bimestre).filter_by(ano=int(ano), numero=int(bimestre)).first()
-        if bim_obj:
-            data_final = bim_obj.fim
-            if isinstance(data_final, str):
-                data_final = datetime.strptime(data_final[:10], '%Y-%m-%d').date()
-            print(f"DEBUG - Calculando para bimestre {ano}/{bimestre}, data_final ajustada: {data_final}")
-        else:
-            if data_final is None:
-                data_final = datetime.now().date()
-            elif isinstance(data_final, str):
-                data_final = datetime.strptime(data_final, '%Y-%m-%d').date()
-    else:
-        if data_final is None:
-            data_final = datetime.now().date()
-        elif isinstance(data_final, str):
-            data_final = datetime.strptime(data_final, '%Y-%m-%d').date()
+    aluno_ids = [int(a) for a in aluno_ids]
+    dados = {
+        "bimestres": db.query(Bimestre).filter_by(ano=int(ano)).order_by(Bimestre.numero).all(),
+        "medias_anteriores": {},
+        "matriculas": {},
+        "eventos": {a: [] for a in aluno_ids},
+    }
+    for bloco in _blocos(aluno_ids):
+        if int(bimestre) > 1:
+            medias = db.execute(
+                text("SELECT aluno_id, media FROM medias_bimestrais WHERE ano = :ano AND bimestre = :bimestre "
+                     "AND aluno_id IN :ids").bindparams(bindparam("ids", expanding=True)),
+                {"ano": int(ano), "bimestre": int(bimestre) - 1, "ids": bloco}
+            ).fetchall()
+            for aluno_id, media in medias:
+                dados["medias_anteriores"].setdefault(aluno_id, media)
+
+        for aluno_id, data_matricula in db.query(Aluno.id, Aluno.data_matricula).filter(Aluno.id.in_(bloco)).all():
+            try:
+                dados["matriculas"][aluno_id] = _para_date(data_matricula) if data_matricula else None
+            except Exception:
+                dados["matriculas"][aluno_id] = None
+
+        for evt in db.query(
+            PontuacaoHistorico.aluno_id, PontuacaoHistorico.ano, PontuacaoHistorico.bimestre,
+            PontuacaoHistorico.tipo_evento, PontuacaoHistorico.valor_delta, PontuacaoHistorico.criado_em
+        ).filter(PontuacaoHistorico.aluno_id.in_(bloco)).order_by(PontuacaoHistorico.id).all():
+            dados["eventos"][evt.aluno_id].append(evt)
+    return dados
+
+def _classificar(pontuacao):
+    if pontuacao == 10.0:
+        return "Excepcional"
+    elif pontuacao >= 9.0:
+        return "Ótimo"
+    elif pontuacao >= 7.0:
+        return "Bom"
+    elif pontuacao >= 5.0:
+        return "Regular"
+    elif pontuacao >= 2.0:
+        return "Insuficiente"
+    return "Incompatível"
+
+def _calcular_pontuacao_com_dados(aluno_id, ano, bimestre, data_final, dados):
+    """Regras de calcular_pontuacao_aluno aplicadas sobre os dados já carregados."""
+    bimestre = int(bimestre)
+    media_ant = dados["medias_anteriores"].get(aluno_id)
 
     # ========================================
-    # DETERMINAR PONTUAÇÃO INICIAL DO BIMESTRE
+    # PONTUAÇÃO INICIAL DO BIMESTRE
     # ========================================
     if bimestre == 1:
         # Primeiro bimestre sempre começa com 8.0
         pontuacao = 8.0
-        print(f"DEBUG - Pontuação inicial (1º bimestre): 8.0")
+    elif media_ant is not None:
+        # Bimestres seguintes: média final do bimestre anterior
+        pontuacao = float(media_ant)
     else:
-        # Bimestres seguintes: pega média final do bimestre anterior
-        media_ant = db.execute(
-            text("SELECT media FROM medias_bimestrais WHERE aluno_id = :aluno_id AND ano = :ano AND bimestre = :bimestre"),
-            {"aluno_id": aluno_id, "ano": int(ano), "bimestre": int(bimestre)-1}
-        ).fetchone()
-        
-        if media_ant and media_ant[0] is not None:
-            pontuacao = float(media_ant[0])
-            print(f"DEBUG - Pontuação inicial (do bim anterior {int(bimestre)-1}): {pontuacao:.2f}")
-        else:
-            pontuacao = 8.0
-            print(f"DEBUG - Pontuação inicial (sem registro anterior): 8.0")
+        pontuacao = 8.0
 
     # ========================================
-    # 1. EVENTOS DISCIPLINARES (PENALIDADES/ELOGIOS)
+    # 1. EVENTOS DISCIPLINARES (PENALIDADES/ELOGIOS) até a data_final
     # ========================================
-    eventos = db.query(PontuacaoHistorico).filter(
-        PontuacaoHistorico.aluno_id == aluno_id
-    ).all()
-
-    eventos_aplicados = []
-    for evt in eventos:
-        evt_date = evt.criado_em
-        if isinstance(evt_date, str):
-            try:
-                evt_date = datetime.strptime(evt_date[:10], '%Y-%m-%d').date()
-            except:
-                continue
-        
-        # Só aplicar eventos até a data_final
-        if evt_date > data_final:
+    eventos_negativos = []
+    for evt in dados["eventos"].get(aluno_id, []):
+        try:
+            evt_date = _para_date(evt.criado_em)
+        except Exception:
+            continue
+        if evt_date is None or evt_date > data_final:
             continue
-            
-        eventos_aplicados.append(evt)
-        
-        # Ignorar TRANSFERENCIA_BIMESTRE na soma direta
+        delta = float(evt.valor_delta or 0)
+        if delta < 0:
+            eventos_negativos.append(evt_date)
+        # Ignorar TRANSFERENCIA_BIMESTRE e BIMESTRE_BONUS na soma direta
         if evt.tipo_evento not in ["TRANSFERENCIA_BIMESTRE", "BIMESTRE_BONUS"]:
-            pontuacao += float(evt.valor_delta)
+            pontuacao += delta
             pontuacao = min(10.0, max(0.0, pontuacao))
-            print(f"DEBUG - Evento aplicado: {evt.tipo_evento}, delta: {evt.valor_delta}, pontuação: {pontuacao:.2f}")
-        else:
-            print(f"DEBUG - Evento ignorado na soma: {evt.tipo_evento} em {evt_date}")
 
     # ========================================
-    # 2. BONIFICAÇÃO BIMESTRAL (média >= 8.0)
-    # REGRA: Apenas do bimestre IMEDIATAMENTE ANTERIOR
+    # 2. BONIFICAÇÃO BIMESTRAL (média >= 8.0) APENAS do bimestre imediatamente anterior
     # ========================================
-    if bimestre > 1:
-        # Pega média do bimestre anterior
-        mb = db.execute(
-            text("SELECT media FROM medias_bimestrais WHERE aluno_id = :aluno_id AND ano = :ano AND bimestre = :bimestre"),
-            {"aluno_id": aluno_id, "ano": int(ano), "bimestre": int(bimestre)-1}
-        ).fetchone()
-        
-        if mb and mb[0] >= 8.0:
-            pontuacao += 0.5
-            pontuacao = min(10.0, max(0.0, pontuacao))
-            print(f"DEBUG - Bônus bimestral aplicado (bim {int(bimestre)-1}): +0.5, média: {mb[0]:.2f}")
+    if bimestre > 1 and media_ant is not None and media_ant >= 8.0:
+        pontuacao += 0.5
+        pontuacao = min(10.0, max(0.0, pontuacao))
 
     # ========================================
     # 3. BONIFICAÇÃO DOS 60 DIAS SEM PERDER PONTO
-    # REGRA CRÍTICA: Acumulativo desde INÍCIO DO 1º BIMESTRE do ano
+    # Acumulativo desde o INÍCIO DO 1º BIMESTRE do ano (ou matrícula, se posterior)
     # ========================================
-    
-    # Busca o 1º bimestre do ano
-    bim_1 = db.query(Bimestre).filter_by(ano=int(ano), numero=1).first()
-    if not bim_1:
-        print("DEBUG - ERRO: 1º bimestre não encontrado!")
-        data_inicio_ano = data_final
-    else:
-        data_inicio_ano = bim_1.inicio
-        if isinstance(data_inicio_ano, str):
-            data_inicio_ano = datetime.strptime(data_inicio_ano[:10], '%Y-%m-%d').date()
-    
-    # Busca data de matrícula
-    matricula_row = db.execute(
-        text("SELECT data_matricula FROM alunos WHERE id = :aluno_id"),
-        {"aluno_id": aluno_id}
-    ).fetchone()
-    
-    data_matricula = None
-    if matricula_row and matricula_row[0]:
-        data_matricula = matricula_row[0]
-        if isinstance(data_matricula, str):
-            data_matricula = datetime.strptime(data_matricula[:10], '%Y-%m-%d').date()
-    
-    # REGRA: Se matriculado ANTES do 1º bim, referência = início do 1º bim
-    #        Se matriculado DEPOIS, referência = data de matrícula
-    if data_matricula and data_matricula < data_inicio_ano:
-        data_referencia_inicial = data_inicio_ano
-        tipo_referencia = f"início do 1º bimestre (matrícula anterior: {data_matricula})"
-    elif data_matricula:
+    bimestres = dados["bimestres"]
+    bim_1 = next((b for b in bimestres if b.numero == 1), None)
+    data_inicio_ano = _para_date(bim_1.inicio) if bim_1 else data_final
+
+    data_matricula = dados["matriculas"].get(aluno_id)
+    if data_matricula and data_matricula >= data_inicio_ano:
         data_referencia_inicial = data_matricula
-        tipo_referencia = "matrícula (posterior ao início do ano)"
     else:
         data_referencia_inicial = data_inicio_ano
-        tipo_referencia = "início do 1º bimestre (sem data de matrícula)"
-    
-    # Verifica se houve alguma falta que reseta a contagem
-    eventos_negativos = [
-        (evt.criado_em if not isinstance(evt.criado_em, str) 
-         else datetime.strptime(evt.criado_em[:10], '%Y-%m-%d').date())
-        for evt in eventos_aplicados
-        if float(evt.valor_delta) < 0
-    ]
 
-    if eventos_negativos:
-        # Última falta reseta a contagem
-        data_referencia = max(eventos_negativos)
-        tipo_referencia = f"última falta em {data_referencia}"
-    else:
-        # Sem faltas: usa referência inicial
-        data_referencia = data_referencia_inicial
+    # Última falta reseta a contagem
+    data_referencia = max(eventos_negativos) if eventos_negativos else data_referencia_inicial
 
-    # ========================================
-    # CORREÇÃO: SOMA DIAS DE CADA BIMESTRE
-    # ========================================
-    
-    # Busca todos os bimestres do ano até o bimestre atual
-    bimestres_ano = db.query(Bimestre).filter_by(ano=int(ano)).filter(
-        Bimestre.numero <= int(bimestre)
-    ).order_by(Bimestre.numero).all()
-    
+    # Soma os dias de cada bimestre do ano até o bimestre atual
     total_dias = 0
-    detalhes_dias = []
-    
-    for bim in bimestres_ano:
-        bim_inicio = bim.inicio
-        bim_fim = bim.fim
-        
-        # Converte para date se necessário
-        if isinstance(bim_inicio, str):
-            bim_inicio = datetime.strptime(bim_inicio[:10], '%Y-%m-%d').date()
-        if isinstance(bim_fim, str):
-            bim_fim = datetime.strptime(bim_fim[:10], '%Y-%m-%d').date()
-        
-        # Ajusta as datas conforme a referência e o bimestre atual
-        if bim.numero == 1:
-            # 1º bimestre: usar a data de referência como início
-            inicio_calculo = max(data_referencia, bim_inicio)
-        else:
-            # Demais bimestres: usar início do bimestre
-            inicio_calculo = bim_inicio
-        
-        # Se for o bimestre atual, usar data_final
-        if bim.numero == int(bimestre):
-            fim_calculo = data_final
-        else:
-            fim_calculo = bim_fim
-        
-        # Calcula dias deste bimestre
+    for bim in bimestres:
+        if bim.numero is None or bim.numero > bimestre:
+            continue
+        bim_inicio = _para_date(bim.inicio)
+        bim_fim = _para_date(bim.fim)
+        inicio_calculo = max(data_referencia, bim_inicio) if bim.numero == 1 else bim_inicio
+        fim_calculo = data_final if bim.numero == bimestre else bim_fim
         dias_bimestre = (fim_calculo - inicio_calculo).days + 1
-        
-        # Só conta se for positivo
         if dias_bimestre > 0:
             total_dias += dias_bimestre
-            detalhes_dias.append(f"{bim.numero}º:{dias_bimestre}d")
-    
-    # Atualiza variável para manter compatibilidade
-    dias_sem_perda = total_dias
-    
-    print(f"DEBUG - Início do 1º bimestre: {data_inicio_ano}")
-    print(f"DEBUG - Data de matrícula: {data_matricula}")
-    print(f"DEBUG - Referência para bônus: {tipo_referencia}")
-    print(f"DEBUG - Bimestres: {' + '.join(detalhes_dias)} = {dias_sem_perda} dias")
 
-    if dias_sem_perda > 60:
-        dias_bonus = dias_sem_perda - 60
-        bonus_bruto = dias_bonus * 0.2
-        
-        # Aplicar o bônus respeitando o teto de 10.0
-        espaco_disponivel = 10.0 - pontuacao
-        bonus_aplicado = min(bonus_bruto, espaco_disponivel)
-        
-        pontuacao += bonus_aplicado
+    if total_dias > 60:
+        # Aplica o bônus respeitando o teto de 10.0
+        bonus_bruto = (total_dias - 60) * 0.2
+        pontuacao += min(bonus_bruto, 10.0 - pontuacao)
         pontuacao = min(10.0, max(0.0, pontuacao))
-        
-        print(f"DEBUG - Dias de bônus: {dias_bonus}")
-        print(f"DEBUG - Bônus bruto calculado: {bonus_bruto:.2f} pontos")
-        print(f"DEBUG - Espaço disponível até 10.0: {espaco_disponivel:.2f}")
-        print(f"DEBUG - Bônus aplicado (limitado): {bonus_aplicado:.2f} pontos")
-    else:
-        print(f"DEBUG - Menos de 60 dias, sem bônus aplicado")
+
+    logger.debug("aluno %s %s/%s: pontuação %.2f, dias sem perda %s, referência %s",
+                 aluno_id, ano, bimestre, pontuacao, total_dias, data_referencia)
 
     # ========================================
     # 4. CLASSIFICAÇÃO
     # ========================================
-    if pontuacao == 10.0:
-        comportamento = "Excepcional"
-    elif pontuacao >= 9.0:
-        comportamento = "Ótimo"
-    elif pontuacao >= 7.0:
-        comportamento = "Bom"
-    elif pontuacao >= 5.0:
-        comportamento = "Regular"
-    elif pontuacao >= 2.0:
-        comportamento = "Insuficiente"
-    else:
-        comportamento = "Incompatível"
+    return {
+        "pontuacao": round(pontuacao, 2),
+        "comportamento": _classificar(pontuacao)
+    }
 
-    print(f"DEBUG - Pontuação final: {pontuacao:.2f}, Comportamento: {comportamento}")
-    print("=" * 80)
+def calcular_pontuacao_lote(aluno_ids, ano, bimestre, data_final=None):
+    """
+    Calcula a pontuação de vários alunos no mesmo bimestre de uma só vez.
+    Mesmas regras de calcular_pontuacao_aluno, mas bimestres, médias, matrículas
+    e eventos são buscados em lote. Retorna {aluno_id: {"pontuacao", "comportamento"}}.
+    """
+    db = get_db()
+    aluno_ids = [int(a) for a in aluno_ids]
+    if not aluno_ids:
+        return {}
+    dados = carregar_dados_pontuacao_lote(db, aluno_ids, ano, bimestre)
 
+    # Data limite: fim do bimestre (ou data_final/hoje se o bimestre não estiver cadastrado)
+    bim_obj = next((b for b in dados["bimestres"] if b.numero == int(bimestre)), None)
+    if bim_obj:
+        data_final = _para_date(bim_obj.fim)
+    elif data_final is None:
+        data_final = datetime.now().date()
+    else:
+        data_final = _para_date(data_final)
+
+    contar("alunos_calculados", len(aluno_ids))
     return {
-        "pontuacao": round(pontuacao, 2),
-        "comportamento": comportamento
-    }
\ No newline at end of file
+        aluno_id: _calcular_pontuacao_com_dados(aluno_id, ano, bimestre, data_final, dados)
+        for aluno_id in aluno_ids
+    }
+
+def calcular_pontuacao_aluno(aluno_id, data_final=None, ano=None, bimestre=None):
+    """
+    Calcula a pontuação do aluno com TODAS as regras corretas:
+    
+    1. Pontuação inicial = pontuação final do bimestre anterior (ou 8.0 se for o 1º)
+    2. Bônus de 60 dias ACUMULATIVO desde o início do ANO LETIVO (não desde matrícula)
+    3. Bonificação bimestral APENAS do bimestre imediatamente anterior
+    4. Data de referência = início do 1º bimestre (ou matrícula se posterior)
+
+    Para turmas inteiras use calcular_pontuacao_lote (mesmas regras, consultas em lote).
+    """
+    return calcular_pontuacao_lote([aluno_id], ano, bimestre, data_final=data_final)[int(aluno_id)]
@@ -0,0 +1,267 @@
+# services/busca_alunos.py
+"""
+Cadastro de alunos em memória para os autocompletes (RFO, FMD, TAC, ATA, prontuário).
+
+Cada processo mantém um registro compacto (__slots__) por aluno, com os campos que os
+autocompletes devolvem, e dois índices sobre o nome normalizado (alunos.nome_busca):
+  - lista ordenada de palavras, para o prefixo de cada palavra buscada (bisect)
+  - trigramas do nome e da matrícula, para achar o termo no meio de uma palavra
+Assim a busca não vai ao banco: "joao sil" encontra "João da Silva"; "JOAO" encontra "João".
+
+Ordem dos resultados:
+  1. matrícula igual ao termo
+  2. matrícula começando pelo termo
+  3. nome começando pelo termo
+  4. todas as palavras do termo são início de palavras do nome (mais à esquerda primeiro)
+  5. termo contido no nome ou na matrícula (mesma abrangência do antigo ILIKE, a partir de 3 letras)
+e, dentro de cada grupo, ordem alfabética.
+
+- buscar_alunos(db, termo, limite) / aluno_em_cache(db, id) / ultimos_alunos(db, limite) /
+  alunos_em_ordem_alfabetica(db):
+  registros com id, matricula, nome, serie, turma, turno, email, telefone, responsavel, photo
+- atualizar_alunos_na_busca(db, ids=None, matriculas=None): recarrega só esses alunos, após o commit
+- remover_alunos_da_busca(ids): após excluir
+- invalidar_busca_alunos: descarta tudo (próxima busca recarrega), para exclusões em massa
+
+Como o cache é por processo, ele também expira após TTL_SEGUNDOS, para que outros
+workers vejam alterações feitas em outro processo.
+"""
+
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+
+from models_sqlalchemy import Aluno
+from services.texto import normalizar_busca
+
+TTL_SEGUNDOS = 300
+# acima disso, recarregar tudo sai mais barato que atualizar aluno a aluno
+LIMITE_INCREMENTAL = 1000
+
+CAMPOS = ('id', 'matricula', 'nome', 'serie', 'turma', 'turno', 'email', 'telefone', 'responsavel', 'photo')
+
+class RegistroAluno:
+    """Dados do aluno usados pelos autocompletes (lido como um Aluno: a.nome, a.serie...)."""
+    __slots__ = CAMPOS + ('nome_busca', 'matricula_busca')
+
+    def __init__(self, linha):
+        for campo, valor in zip(CAMPOS, linha):
+            setattr(self, campo, valor)
+        self.nome_busca = linha.nome_busca if linha.nome_busca is not None else (normalizar_busca(self.nome) or '')
+        self.matricula_busca = (self.matricula or '').strip().lower()
+
+    def palavras(self):
+        return self.nome_busca.split()
+
+def _trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+def _consulta(db):
+    return db.query(*[getattr(Aluno, c) for c in CAMPOS], Aluno.nome_busca)
+
+class _Indice:
+    def __init__(self, registros):
+        self.registros = {}
+        self.palavras = []       # (palavra, id, ordem da palavra no nome), ordenada
+        self.matriculas = []     # (matricula, id), ordenada
+        self.tri_nome = {}       # trigrama -> {ids}
+        self.tri_matricula = {}
+        for r in registros:
+            self._indexar(r, ordenar=False)
+        self.palavras.sort()
+        self.matriculas.sort()
+        self.carregado_em = time.monotonic()
+
+    def _indexar(self, r, ordenar=True):
+        self.registros[r.id] = r
+        novas = [(p, r.id, ordem) for ordem, p in enumerate(r.palavras())]
+        if ordenar:
+            for item in novas:
+                insort(self.palavras, item)
+            insort(self.matriculas, (r.matricula_busca, r.id))
+        else:
+            self.palavras.extend(novas)
+            self.matriculas.append((r.matricula_busca, r.id))
+        for t in _trigramas(r.nome_busca):
+            self.tri_nome.setdefault(t, set()).add(r.id)
+        for t in _trigramas(r.matricula_busca):
+            self.tri_matricula.setdefault(t, set()).add(r.id)
+
+    def remover(self, aluno_id):
+        r = self.registros.pop(aluno_id, None)
+        if r is None:
+            return
+        for item in [(p, r.id, ordem) for ordem, p in enumerate(r.palavras())]:
+            k = bisect_left(self.palavras, item)
+            if k < len(self.palavras) and self.palavras[k] == item:
+                del self.palavras[k]
+        k = bisect_left(self.matriculas, (r.matricula_busca, r.id))
+        if k < len(self.matriculas) and self.matriculas[k] == (r.matricula_busca, r.id):
+            del self.matriculas[k]
+        for tri, texto in ((self.tri_nome, r.nome_busca), (self.tri_matricula, r.matricula_busca)):
+            for t in _trigramas(texto):
+                ids = tri.get(t)
+                if ids is not None:
+                    ids.discard(r.id)
+                    if not ids:
+                        del tri[t]
+
+    def substituir(self, r):
+        self.remover(r.id)
+        self._indexar(r)
+
+    def _por_prefixo(self, lista, prefixo):
+        k = bisect_left(lista, (prefixo,))
+        while k < len(lista) and lista[k][0].startswith(prefixo):
+            yield lista[k]
+            k += 1
+
+    def _por_trecho(self, tri, trecho, atributo):
+        """ids cujo texto contém trecho (len >= 3): interseção dos trigramas e conferência."""
+        candidatos = None
+        for t in sorted(_trigramas(trecho), key=lambda t: len(tri.get(t, ()))):
+            ids = tri.get(t)
+            if not ids:
+                return set()
+            candidatos = set(ids) if candidatos is None else candidatos & ids
+            if not candidatos:
+                return set()
+        return {i for i in candidatos if trecho in getattr(self.registros[i], atributo)}
+
+    def buscar(self, termo, limite, incluir_matricula=True):
+        normalizado = normalizar_busca(termo) or ''
+        bruto = termo.strip().lower()
+        rank = {}
+
+        def _classificar(aluno_id, chave):
+            if aluno_id not in rank or chave < rank[aluno_id]:
+                rank[aluno_id] = chave
+
+        if incluir_matricula and bruto:
+            for matricula, aluno_id in self._por_prefixo(self.matriculas, bruto):
+                _classificar(aluno_id, (0, 0) if matricula == bruto else (1, 0))
+            if len(bruto) >= 3:
+                for aluno_id in self._por_trecho(self.tri_matricula, bruto, 'matricula_busca'):
+                    _classificar(aluno_id, (4, 0))
+
+        tokens = normalizado.split()
+        if tokens:
+            # Interseção começando pela palavra mais longa (normalmente a mais seletiva)
+            candidatos = None
+            for token in sorted(tokens, key=len, reverse=True):
+                achados = {}
+                for _, aluno_id, ordem in self._por_prefixo(self.palavras, token):
+                    if ordem < achados.get(aluno_id, ordem + 1):
+                        achados[aluno_id] = ordem
+                if candidatos is None:
+                    candidatos = achados
+                else:
+                    candidatos = {i: min(o, achados[i]) for i, o in candidatos.items() if i in achados}
+                if not candidatos:
+                    break
+            for aluno_id, ordem in (candidatos or {}).items():
+                nome = self.registros[aluno_id].nome_busca
+                _classificar(aluno_id, (2, 0) if nome.startswith(normalizado) else (3, ordem))
+
+            # Parte do nome no meio de uma palavra ("ilva" em "silva"): só se ainda faltam resultados
+            if len(rank) < limite and len(normalizado) >= 3:
+                for aluno_id in self._por_trecho(self.tri_nome, normalizado, 'nome_busca'):
+                    _classificar(aluno_id, (4, 0))
+
+        ordenados = sorted(rank, key=lambda i: (rank[i], self.registros[i].nome_busca, i))
+        return [self.registros[i] for i in ordenados[:limite]]
+
+class BuscaAlunos:
+    def __init__(self, ttl=TTL_SEGUNDOS):
+        self.ttl = ttl
+        self._indice = None
+        self._lock = threading.RLock()
+
+    def _valido(self, indice):
+        return indice is not None and time.monotonic() - indice.carregado_em < self.ttl
+
+    def indice(self, db):
+        indice = self._indice
+        if self._valido(indice):
+            return indice
+        with self._lock:
+            if not self._valido(self._indice):
+                self._indice = _Indice(RegistroAluno(l) for l in _consulta(db))
+            return self._indice
+
+    def buscar(self, db, termo, limite=20, incluir_matricula=True):
+        indice = self.indice(db)
+        with self._lock:
+            return indice.buscar(termo or '', limite, incluir_matricula)
+
+    def por_id(self, db, aluno_id):
+        return self.indice(db).registros.get(aluno_id)
+
+    def em_ordem_alfabetica(self, db):
+        indice = self.indice(db)
+        with self._lock:
+            return sorted(indice.registros.values(), key=lambda r: (r.nome or '', r.id))
+
+    def ultimos(self, db, limite):
+        indice = self.indice(db)
+        with self._lock:
+            return [indice.registros[i] for i in heapq.nlargest(limite, indice.registros)]
+
+    def atualizar(self, db, ids=None, matriculas=None):
+        """Recarrega os alunos indicados (inseridos ou alterados). Sem índice carregado, não faz nada."""
+        ids = list(ids or [])
+        matriculas = list(matriculas or [])
+        with self._lock:
+            indice = self._indice
+            if not self._valido(indice):
+                return
+            if len(ids) + len(matriculas) > LIMITE_INCREMENTAL:
+                self._indice = None
+                return
+            linhas = []
+            if ids:
+                linhas += _consulta(db).filter(Aluno.id.in_(ids)).all()
+            if matriculas:
+                linhas += _consulta(db).filter(Aluno.matricula.in_(matriculas)).all()
+            encontrados = set()
+            for linha in linhas:
+                indice.substituir(RegistroAluno(linha))
+                encontrados.add(linha.id)
+            for aluno_id in set(ids) - encontrados:
+                indice.remover(aluno_id)
+
+    def remover(self, ids):
+        with self._lock:
+            if self._indice is not None:
+                for aluno_id in ids:
+                    self._indice.remover(aluno_id)
+
+    def invalidar(self):
+        with self._lock:
+            self._indice = None
+
+busca_alunos = BuscaAlunos()
+
+def buscar_alunos(db, termo, limite=20, incluir_matricula=True):
+    return busca_alunos.buscar(db, termo, limite, incluir_matricula)
+
+def aluno_em_cache(db, aluno_id):
+    return busca_alunos.por_id(db, aluno_id)
+
+def alunos_em_ordem_alfabetica(db):
+    """Todos os alunos ordenados pelo nome (listas de seleção dos formulários)."""
+    return busca_alunos.em_ordem_alfabetica(db)
+
+def ultimos_alunos(db, limite):
+    """Últimos alunos cadastrados (maior id primeiro)."""
+    return busca_alunos.ultimos(db, limite)
+
+def atualizar_alunos_na_busca(db, ids=None, matriculas=None):
+    busca_alunos.atualizar(db, ids, matriculas)
+
+def remover_alunos_da_busca(ids):
+    busca_alunos.remover(ids)
+
+def invalidar_busca_alunos():
+    busca_alunos.invalidar()
@@ -0,0 +1,147 @@
+# services/calendario_bimestres.py
+"""
+Calendário de bimestres em memória (cache por processo).
+
+Cada ano é carregado uma vez da tabela bimestres e guardado como listas ordenadas de
+intervalos; a resolução data -> bimestre é uma busca binária (bisect).
+
+- get_bimestre_for_date: mesma regra do antigo _get_bimestre_for_date (com fallback de 4 bimestres)
+- calendario.inicio_do_bimestre / fim_do_bimestre: datas do bimestre sem ir ao banco
+- invalidar_calendario: chamar sempre que a tabela bimestres mudar (bimestres_bp já chama)
+
+Como o cache é por processo, cada ano também expira após TTL_SEGUNDOS, para que outros
+workers vejam alterações feitas em outro processo.
+"""
+
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime, date
+
+from models_sqlalchemy import Bimestre
+
+TTL_SEGUNDOS = 300
+
+def _data_iso(valor_dt, valor_texto):
+    """Prefere a coluna Date; sem ela, converte o texto 'YYYY-MM-DD' (outros formatos = sem limite)."""
+    if valor_dt:
+        return valor_dt
+    if not valor_texto:
+        return None
+    try:
+        return datetime.strptime(str(valor_texto)[:10], '%Y-%m-%d').date()
+    except Exception:
+        return None
+
+class _AnoLetivo:
+    """Bimestres de um ano: intervalos na ordem do número e, se possível, índice ordenado por início."""
+
+    def __init__(self, linhas):
+        # linhas: (numero, inicio_date|None, fim_date|None) em ordem de número
+        self.intervalos = [(n, i, f) for n, i, f in linhas if n is not None]
+        self.por_numero = {n: (i, f) for n, i, f in reversed(self.intervalos)}
+        self.carregado_em = time.monotonic()
+
+        # Busca binária só vale para intervalos fechados e sem sobreposição
+        fechados = sorted((i, f, n) for n, i, f in self.intervalos if i and f)
+        self.ordenado = len(fechados) == len(self.intervalos) and all(
+            fechados[k][1] < fechados[k + 1][0] for k in range(len(fechados) - 1)
+        )
+        self.inicios = [i for i, _, _ in fechados]
+        self.fins = [f for _, f, _ in fechados]
+        self.numeros = [n for _, _, n in fechados]
+
+    def bimestre_da_data(self, d):
+        if self.ordenado:
+            k = bisect_right(self.inicios, d) - 1
+            if k >= 0 and self.fins[k] >= d:
+                return self.numeros[k]
+            return None
+        # Intervalos abertos/sobrepostos: primeiro que contém a data, na ordem do número
+        for n, inicio, fim in self.intervalos:
+            if (inicio is None or inicio <= d) and (fim is None or fim >= d):
+                return n
+        return None
+
+class CalendarioBimestres:
+    def __init__(self, ttl=TTL_SEGUNDOS):
+        self.ttl = ttl
+        self._anos = {}
+        self._lock = threading.Lock()
+        # Incrementadas por invalidar(): um ano lido antes da invalidação não é guardado
+        self._geracao = 0        # invalidar() de todos os anos
+        self._geracoes = {}      # ano -> invalidar(ano)
+
+    def _geracao_do_ano(self, ano):
+        return self._geracao, self._geracoes.get(ano, 0)
+
+    def _ano(self, db, ano):
+        ano = int(ano)
+        cache = self._anos.get(ano)
+        if cache is not None and time.monotonic() - cache.carregado_em < self.ttl:
+            return cache
+        with self._lock:
+            geracao = self._geracao_do_ano(ano)
+        rows = (
+            db.query(Bimestre.numero, Bimestre.inicio, Bimestre.fim, Bimestre.inicio_dt, Bimestre.fim_dt)
+            .filter_by(ano=ano)
+            .order_by(Bimestre.numero)
+            .all()
+        )
+        cache = _AnoLetivo([
+            (int(numero) if numero is not None else None, _data_iso(inicio_dt, inicio), _data_iso(fim_dt, fim))
+            for numero, inicio, fim, inicio_dt, fim_dt in rows
+        ])
+        with self._lock:
+            if self._geracao_do_ano(ano) == geracao:
+                self._anos[ano] = cache
+        return cache
+
+    def bimestre_da_data(self, db, d):
+        """Número do bimestre cadastrado que contém a data, ou None."""
+        return self._ano(db, d.year).bimestre_da_data(d)
+
+    def inicio_do_bimestre(self, db, ano, numero):
+        return self._ano(db, ano).por_numero.get(int(numero), (None, None))[0]
+
+    def fim_do_bimestre(self, db, ano, numero):
+        return self._ano(db, ano).por_numero.get(int(numero), (None, None))[1]
+
+    def invalidar(self, ano=None):
+        with self._lock:
+            if ano is None:
+                self._anos.clear()
+                self._geracao += 1
+            else:
+                ano = int(ano)
+                self._anos.pop(ano, None)
+                self._geracoes[ano] = self._geracoes.get(ano, 0) + 1
+
+calendario = CalendarioBimestres()
+
+def invalidar_calendario(ano=None):
+    """Descarta o cache do ano (ou de todos). Chamar após gravar/excluir bimestres."""
+    calendario.invalidar(ano)
+
+def get_bimestre_for_date(db, data_str):
+    """
+    Determina (ano_int, bimestre_int) pela tabela 'bimestres' (via cache).
+    Se não encontrar ou erro, faz fallback para 4 bimestres por ano.
+    """
+    try:
+        d = datetime.strptime(data_str[:10], '%Y-%m-%d').date()
+    except Exception:
+        d = date.today()
+    ano = d.year
+    try:
+        numero = calendario.bimestre_da_data(db, d)
+        if numero is not None:
+            return ano, numero
+    except Exception:
+        try:
+            from flask import current_app
+            current_app.logger.debug("Erro ao consultar tabela bimestres; usando fallback.")
+        except Exception:
+            pass
+    b = ((d.month - 1) // 3) + 1
+    return ano, b
@@ -0,0 +1,71 @@
+# services/contadores_dashboard.py
+"""
+Contadores do dashboard (alunos, RFOs tratados/pendentes, usuários, FMDs) em cache por processo.
+
+- obter_contadores: devolve os números do cache ou refaz os COUNT(*) se expirou/invalidou
+- invalidar_contadores: chamar após gravar RFO, tratamento, FMD ou importação de alunos
+- etag / atualizado_em: para respostas condicionais (304) do /api/dashboard_stats
+
+Como o cache é por processo, os contadores também expiram após TTL_SEGUNDOS; a ETag é
+derivada dos próprios números, então workers diferentes com os mesmos valores geram a mesma.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import func
+
+from models_sqlalchemy import Aluno, Ocorrencia, Usuario, FichaMedidaDisciplinar
+
+TTL_SEGUNDOS = 60
+
+def _contar(db):
+    return {
+        'total_alunos': db.query(func.count(Aluno.id)).scalar(),
+        'total_ocorrencias': db.query(func.count(Ocorrencia.id)).filter(Ocorrencia.status == 'TRATADO').scalar(),
+        'rfos_pendentes': db.query(func.count(Ocorrencia.id)).filter(Ocorrencia.status == 'AGUARDANDO TRATAMENTO').scalar(),
+        'total_usuarios': db.query(func.count(Usuario.id)).scalar(),
+        'total_fmd': db.query(func.count(FichaMedidaDisciplinar.id)).scalar(),
+    }
+
+class ContadoresDashboard:
+    def __init__(self, ttl=TTL_SEGUNDOS):
+        self.ttl = ttl
+        self._valores = None
+        self._carregado_em = 0.0
+        self.etag = None
+        # Momento (UTC, sem microssegundos) em que os números mudaram pela última vez neste processo
+        self.atualizado_em = None
+        self._lock = threading.Lock()
+
+    def obter(self, db):
+        """Retorna (contadores, etag, atualizado_em)."""
+        with self._lock:
+            if self._valores is not None and time.monotonic() - self._carregado_em < self.ttl:
+                return dict(self._valores), self.etag, self.atualizado_em
+        valores = _contar(db)
+        etag = hashlib.md5(json.dumps(valores, sort_keys=True).encode()).hexdigest()
+        with self._lock:
+            if etag != self.etag or self.atualizado_em is None:
+                self.atualizado_em = datetime.now(timezone.utc).replace(microsecond=0)
+            self._valores = valores
+            self.etag = etag
+            self._carregado_em = time.monotonic()
+            return dict(valores), etag, self.atualizado_em
+
+    def invalidar(self):
+        with self._lock:
+            self._valores = None
+
+contadores = ContadoresDashboard()
+
+def obter_contadores(db):
+    """Dict com os cinco contadores do dashboard (do cache, se ainda válido)."""
+    return contadores.obter(db)[0]
+
+def invalidar_contadores():
+    """Descarta os contadores em cache; a próxima leitura refaz os COUNT(*)."""
+    contadores.invalidar()
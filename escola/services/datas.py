@@ -0,0 +1,83 @@
+# services/datas.py
+"""
+Datas gravadas como texto em formatos mistos ('YYYY-MM-DD', 'DD/MM/YYYY', com ou sem hora)
+e suas colunas Date equivalentes (sufixo _dt).
+
+- parse_data: converte o texto (ou date/datetime) em date
+- default_data_de: default de coluna que preenche o _dt a partir da coluna texto no INSERT
+- COLUNAS_DATA: pares (tabela, coluna texto, coluna Date) mantidos em sincronia
+- preencher_colunas_data: backfill em lotes das colunas _dt ainda vazias
+"""
+
+from datetime import datetime, date
+
+from sqlalchemy import text
+
+FORMATOS_DATA = ('%Y-%m-%d', '%d/%m/%Y', '%Y/%m/%d', '%d-%m-%Y')
+
+# (tabela, coluna texto, coluna Date)
+COLUNAS_DATA = [
+    ('pontuacao_historico', 'criado_em', 'criado_em_dt'),
+    ('ocorrencias', 'data_ocorrencia', 'data_ocorrencia_dt'),
+    ('ocorrencias', 'data_tratamento', 'data_tratamento_dt'),
+    ('alunos', 'data_matricula', 'data_matricula_dt'),
+    ('bimestres', 'inicio', 'inicio_dt'),
+    ('bimestres', 'fim', 'fim_dt'),
+]
+
+TAMANHO_LOTE = 5000
+
+def parse_data(valor):
+    """Converte 'YYYY-MM-DD[ hh:mm:ss]', 'DD/MM/YYYY' (e variações) ou date/datetime em date. None se inválido."""
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    s = str(valor).strip()[:10]
+    if not s:
+        return None
+    for fmt in FORMATOS_DATA:
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def default_data_de(coluna):
+    """Default de Column(Date) calculado a partir da coluna texto do mesmo INSERT (vale para INSERT em lote)."""
+    def _default(context):
+        return parse_data(context.get_current_parameters().get(coluna))
+    return _default
+
+def preencher_colunas_data(conn, tamanho_lote=TAMANHO_LOTE, ao_fim_do_lote=None):
+    """
+    Preenche, em lotes por id, as colunas _dt ainda NULL a partir do texto.
+    Linhas com texto em formato não reconhecido ficam NULL (e não travam o avanço).
+    ao_fim_do_lote: callback opcional chamado após cada lote (ex.: commit no script online).
+    Retorna {"tabela.coluna_dt": linhas preenchidas}.
+    """
+    totais = {}
+    for tabela, origem, destino in COLUNAS_DATA:
+        ultimo_id = 0
+        total = 0
+        while True:
+            linhas = conn.execute(
+                text(f"SELECT id, {origem} FROM {tabela} "
+                     f"WHERE {destino} IS NULL AND {origem} IS NOT NULL AND id > :ultimo "
+                     f"ORDER BY id LIMIT :lote"),
+                {"ultimo": ultimo_id, "lote": tamanho_lote}
+            ).fetchall()
+            if not linhas:
+                break
+            ultimo_id = linhas[-1][0]
+            valores = [{"id": i, "d": parse_data(v)} for i, v in linhas]
+            valores = [v for v in valores if v["d"] is not None]
+            if valores:
+                conn.execute(text(f"UPDATE {tabela} SET {destino} = :d WHERE id = :id"), valores)
+                total += len(valores)
+            if ao_fim_do_lote:
+                ao_fim_do_lote()
+        totais[f"{tabela}.{destino}"] = total
+    return totais
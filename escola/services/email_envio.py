@@ -0,0 +1,114 @@
+# services/email_envio.py
+"""
+Envio de e-mails da escola (FMD, recuperação de senha).
+
+As credenciais continuam em DadosEscola (email_remetente / senha_email_app); o servidor
+vem da configuração (app.config ou variáveis de ambiente de mesmo nome):
+  EMAIL_BACKEND     'smtp' (padrão) ou 'arquivo': grava cada mensagem como .eml em
+                    EMAIL_PASTA_SAIDA em vez de enviar (testes / homologação)
+  SMTP_HOST         padrão smtp.gmail.com
+  SMTP_PORT         padrão 587
+  SMTP_SEGURANCA    'starttls' (padrão), 'ssl' ou 'nenhuma' (servidor local de testes,
+                    ex.: py -m aiosmtpd -n -l localhost:1025; sem login)
+  SMTP_TIMEOUT      segundos (padrão 30)
+
+- credenciais_escola(db): (remetente, senha) ou (None, None)
+- montar_mensagem(...): EmailMessage com corpo texto/HTML e anexos
+- ConexaoSMTP(remetente, senha): uma sessão autenticada para várias mensagens
+- enviar_mensagem(msg, remetente, senha): abre a sessão, envia uma mensagem e fecha
+"""
+
+import os
+import smtplib
+import ssl
+import time
+from email.message import EmailMessage
+from email.utils import make_msgid
+
+from flask import current_app
+
+from models_sqlalchemy import DadosEscola
+
+def _config(nome, padrao=None):
+    valor = current_app.config.get(nome) or os.environ.get(nome)
+    return valor if valor not in (None, '') else padrao
+
+def credenciais_escola(db):
+    dados = db.query(DadosEscola).first()
+    remetente = getattr(dados, 'email_remetente', None)
+    senha = getattr(dados, 'senha_email_app', None)
+    if not remetente or not senha:
+        return None, None
+    return remetente, senha
+
+def montar_mensagem(remetente, destinatario, assunto, corpo_html, corpo_texto=None, anexos=()):
+    """anexos: [(nome_arquivo, bytes, mimetype)]"""
+    msg = EmailMessage()
+    msg['Subject'] = assunto
+    msg['From'] = remetente
+    msg['To'] = destinatario
+    msg['Message-ID'] = make_msgid()
+    msg.set_content(corpo_texto or 'Esta mensagem precisa de um leitor de e-mail com suporte a HTML.')
+    msg.add_alternative(corpo_html, subtype='html')
+    for nome, dados, mimetype in anexos:
+        maintype, subtype = (mimetype or 'application/octet-stream').split('/', 1)
+        msg.add_attachment(dados, maintype=maintype, subtype=subtype, filename=nome)
+    return msg
+
+class ConexaoSMTP:
+    """
+    Sessão SMTP autenticada reaproveitada entre mensagens:
+        with ConexaoSMTP(remetente, senha) as conexao:
+            conexao.enviar(msg)
+    """
+
+    def __init__(self, remetente, senha):
+        self.remetente = remetente
+        self.senha = senha
+        self.backend = str(_config('EMAIL_BACKEND', 'smtp')).lower()
+        self._smtp = None
+
+    def abrir(self):
+        if self.backend == 'arquivo':
+            self._pasta = _config('EMAIL_PASTA_SAIDA') or os.path.join(current_app.root_path, 'tmp', 'emails')
+            os.makedirs(self._pasta, exist_ok=True)
+            return self
+        host = _config('SMTP_HOST', 'smtp.gmail.com')
+        porta = int(_config('SMTP_PORT', 587))
+        seguranca = str(_config('SMTP_SEGURANCA', 'starttls')).lower()
+        timeout = float(_config('SMTP_TIMEOUT', 30))
+        if seguranca == 'ssl':
+            self._smtp = smtplib.SMTP_SSL(host, porta, timeout=timeout, context=ssl._create_unverified_context())
+        else:
+            self._smtp = smtplib.SMTP(host, porta, timeout=timeout)
+            if seguranca == 'starttls':
+                self._smtp.starttls()
+        if seguranca != 'nenhuma':
+            self._smtp.login(self.remetente, self.senha)
+        return self
+
+    def enviar(self, msg):
+        if self.backend == 'arquivo':
+            nome = f"{time.time():.6f}_{msg['To']}.eml".replace('/', '_').replace('\\', '_')
+            with open(os.path.join(self._pasta, nome), 'wb') as f:
+                f.write(msg.as_bytes())
+            return
+        self._smtp.send_message(msg)
+
+    def fechar(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                self._smtp.close()
+            self._smtp = None
+
+    def __enter__(self):
+        return self.abrir()
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+def enviar_mensagem(msg, remetente, senha):
+    with ConexaoSMTP(remetente, senha) as conexao:
+        conexao.enviar(msg)
@@ -13,6 +13,9 @@ from models_sqlalchemy import (
     # Se criar futuramente: NMDSequencia, OcorrenciaAluno, etc.
 )
 from database import get_db  # Deve retornar a session do SQLAlchemy
+from services.saldo_pontuacao import aluno_tem_saldo, consultar_saldo, registrar_evento_no_saldo, data_do_evento
+from services.log_pontuacao import logger, contar
+from services.calendario_bimestres import get_bimestre_for_date
 from unidecode import unidecode
 import re
 from flask import current_app
@@ -261,48 +264,55 @@ def compute_pontuacao_em_data(aluno_id, data_referencia, congelar=False):
         hist_abertura = db.query(PontuacaoHistorico).filter_by(
             aluno_id=aluno_id, ano=ano_letivo, tipo_evento="INICIO_ANO"
         ).order_by(PontuacaoHistorico.bimestre.asc(), PontuacaoHistorico.id.asc()).first()
-        data_abertura = None
+        data_abertura_date = None
         if hist_abertura:
             pontuacao_base = float(hist_abertura.valor_delta)
             # só vão entrar lançamentos a partir da data desse evento
-            data_abertura = hist_abertura.criado_em if hist_abertura.criado_em else None
+            # (datas sempre por criado_em_dt / data_do_evento, como no saldo materializado)
+            data_abertura_date = hist_abertura.criado_em_dt or data_do_evento(hist_abertura.criado_em)
 
-        def string_to_date(s):
-            try:
-                return datetime.strptime(s, '%d/%m/%Y').date()
-            except Exception:
-                try:
-                    return datetime.strptime(s, '%Y-%m-%d').date()
-                except Exception:
-                    return None
-
-        # Busca TODOS os lançamentos até a data de referência (inclusive)
-        historico_ate_data = []
-        for h in db.query(PontuacaoHistorico).filter(
-            PontuacaoHistorico.aluno_id == aluno_id
-        ).all():
-            h_date = string_to_date(h.criado_em)
-            # NOVO: só lançamentos do novo ano (a partir do INICIO_ANO)
-            if not h_date:
-                continue
-            if data_abertura and string_to_date(hist_abertura.criado_em):
-                # Ignora eventos anteriores ao saldo lançado no início do ano
-                if h_date < string_to_date(hist_abertura.criado_em):
-                    continue
-            if h_date <= data_ref.date():
-                historico_ate_data.append((h_date, float(h.valor_delta)))
-
-        # Ordena por data
-        historico_ate_data.sort(key=lambda x: x[0])
-
-        # Aplica todos os deltas até a data de referência
         pontuacao_acumulada = pontuacao_base
         ultima_perda_date = None
 
-        for h_date, delta in historico_ate_data:
-            pontuacao_acumulada += delta
-            if delta < 0:
-                ultima_perda_date = h_date
+        if aluno_tem_saldo(db, aluno_id):
+            # Saldo materializado: soma dos deltas entre a abertura e a data de referência
+            # = saldo(data_ref) - saldo(véspera da abertura)
+            saldo_ref = consultar_saldo(db, aluno_id, data_ref.date())
+            if saldo_ref:
+                pontuacao_acumulada += float(saldo_ref.saldo)
+                ultima_perda_date = saldo_ref.ultima_perda
+                if data_abertura_date:
+                    saldo_antes = consultar_saldo(db, aluno_id, data_abertura_date, inclusive=False)
+                    if saldo_antes:
+                        pontuacao_acumulada -= float(saldo_antes.saldo)
+                    # Ignora perdas anteriores ao saldo lançado no início do ano
+                    if ultima_perda_date and ultima_perda_date < data_abertura_date:
+                        ultima_perda_date = None
+        else:
+            # Aluno ainda sem saldo materializado: percorre o histórico completo
+            historico_ate_data = []
+            for h in db.query(PontuacaoHistorico).filter(
+                PontuacaoHistorico.aluno_id == aluno_id
+            ).all():
+                h_date = h.criado_em_dt or data_do_evento(h.criado_em)
+                # NOVO: só lançamentos do novo ano (a partir do INICIO_ANO)
+                if not h_date:
+                    continue
+                if data_abertura_date:
+                    # Ignora eventos anteriores ao saldo lançado no início do ano
+                    if h_date < data_abertura_date:
+                        continue
+                if h_date <= data_ref.date():
+                    historico_ate_data.append((h_date, float(h.valor_delta)))
+
+            # Ordena por data
+            historico_ate_data.sort(key=lambda x: x[0])
+
+            # Aplica todos os deltas até a data de referência
+            for h_date, delta in historico_ate_data:
+                pontuacao_acumulada += delta
+                if delta < 0:
+                    ultima_perda_date = h_date
 
         # Se não houve nenhuma perda, considera data de matrícula (só para novos!)
         if not ultima_perda_date:
@@ -345,7 +355,7 @@ def compute_pontuacao_em_data(aluno_id, data_referencia, congelar=False):
             pontuacao_acumulada += bonus_bimestral
             pontuacao_acumulada = min(10.0, pontuacao_acumulada)
         except Exception as ex_bonus:
-            print(f"DEBUG ERRO NO BÔNUS BIMESTRAL: {ex_bonus}")
+            logger.debug("erro no bônus bimestral (aluno %s): %s", aluno_id, ex_bonus)
 
         pontuacao_acumulada = max(0.0, pontuacao_acumulada)
         comportamento = _infer_comportamento_por_faixa(pontuacao_acumulada)
@@ -362,10 +372,10 @@ def _calcular_delta_por_medida(medida_aplicada, qtd, config):
     Calcula o delta (positivo/negativo) aplicável à pontuação a partir do texto da medida e quantidade.
     Aceita variações como advertencia oral, advertência oral, adv oral, advert oral, etc.
     Diferencia elogio individual (+0,5) de coletivo (+0,3).
-    Também faz print dos valores de depuração.
+    Os valores de depuração vão para o log de pontuação (nível DEBUG).
     """
     if not medida_aplicada:
-        print("DEBUG - medida_aplicada vazia.")
+        logger.debug("medida_aplicada vazia")
         return 0.0
 
     # Remove acentos, coloca maiúsculo e remove espaços duplicados
@@ -378,35 +388,35 @@ def _calcular_delta_por_medida(medida_aplicada, qtd, config):
     # Formas mais comuns de cada medida
     if 'ADVERTENCIA ORAL' in m or 'ADV ORAL' in m or ('ORAL' in m and 'ADVERT' in m):
         delta = qtd * float(config.get('advertencia_oral', -0.1))
-        print("DEBUG - delta calculado para ADVERTÊNCIA ORAL:", delta)
+        logger.debug("delta calculado para ADVERTÊNCIA ORAL: %s", delta)
         return delta
     if 'ADVERTENCIA ESCRITA' in m or 'ADV ESCRITA' in m or ('ESCRITA' in m and 'ADVERT' in m):
         delta = qtd * float(config.get('advertencia_escrita', -0.3))
-        print("DEBUG - delta calculado para ADVERTÊNCIA ESCRITA:", delta)
+        logger.debug("delta calculado para ADVERTÊNCIA ESCRITA: %s", delta)
         return delta
     if 'SUSPENS' in m or 'SUSPENSAO' in m:
         nums = re.findall(r'(\d+)', m)
         dias = int(nums[0]) if nums else int(qtd)
         delta = dias * float(config.get('suspensao_dia', -0.5))
-        print("DEBUG - delta calculado para SUSPENSÃO:", delta)
+        logger.debug("delta calculado para SUSPENSÃO: %s", delta)
         return delta
     if 'ACAO EDUCATIVA' in m or 'EDUCATIVA' in m:
         nums = re.findall(r'(\d+)', m)
         dias = int(nums[0]) if nums else int(qtd)
         delta = dias * float(config.get('acao_educativa_dia', -1.0))
-        print("DEBUG - delta calculado para AÇÃO EDUCATIVA:", delta)
+        logger.debug("delta calculado para AÇÃO EDUCATIVA: %s", delta)
         return delta
     if 'ELOGIO' in m:
         if 'COLETIVO' in m:
             delta = qtd * float(config.get('elogio_coletivo', 0.3))
-            print("DEBUG - delta calculado para ELOGIO COLETIVO:", delta)
+            logger.debug("delta calculado para ELOGIO COLETIVO: %s", delta)
             return delta
         else:
             delta = qtd * float(config.get('elogio_individual', 0.5))
-            print("DEBUG - delta calculado para ELOGIO INDIVIDUAL:", delta)
+            logger.debug("delta calculado para ELOGIO INDIVIDUAL: %s", delta)
             return delta
 
-    print("DEBUG - Nenhum caso identificado. Retornando delta 0.0")
+    logger.debug("nenhum caso identificado para %r; delta 0.0", medida_aplicada)
     return 0.0
 
 def _get_config_values(db):
@@ -429,39 +439,10 @@ def _get_config_values(db):
 
 def _get_bimestre_for_date(db, data_str):
     """
-    Determina (ano_int, bimestre_int) consultando a tabela 'bimestres' com SQLAlchemy.
+    Determina (ano_int, bimestre_int) pelo calendário de bimestres (cache compartilhado).
     Se não encontrar ou erro, faz fallback para 4 bimestres por ano.
     """
-    try:
-        d = datetime.strptime(data_str[:10], '%Y-%m-%d').date()
-    except Exception:
-        d = date.today()
-    ano = d.year
-    try:
-        rows = db.query(Bimestre).filter_by(ano=ano).order_by(Bimestre.numero).all()
-        if rows:
-            for r in rows:
-                num = int(getattr(r, 'numero')) if getattr(r, 'numero') is not None else None
-                inicio = getattr(r, 'inicio')
-                fim = getattr(r, 'fim')
-                try:
-                    inicio_date = datetime.strptime(str(inicio)[:10], '%Y-%m-%d').date() if inicio else None
-                except Exception:
-                    inicio_date = None
-                try:
-                    fim_date = datetime.strptime(str(fim)[:10], '%Y-%m-%d').date() if fim else None
-                except Exception:
-                    fim_date = None
-                if (inicio_date is None or inicio_date <= d) and (fim_date is None or fim_date >= d):
-                    if num is not None:
-                        return ano, num
-    except Exception:
-        try:
-            current_app.logger.debug("Erro ao consultar tabela bimestres; usando fallback.")
-        except Exception:
-            pass
-    b = ((d.month - 1) // 3) + 1
-    return ano, b
+    return get_bimestre_for_date(db, data_str)
 
 def _apply_delta_pontuacao(db, aluno_id, data_tratamento_str, delta, ocorrencia_id=None, tipo_evento=None, data_despacho=None):
     """
@@ -551,11 +532,13 @@ def _apply_delta_pontuacao(db, aluno_id, data_tratamento_str, delta, ocorrencia_
                 criado_em=criado_em
             )
             db.add(hist)
+            registrar_evento_no_saldo(db, aluno_id, criado_em, inicial)
             db.commit()
-            print(f"DEBUG pontuação inicial lançada para novo aluno {aluno_id} em {criado_em}")
+            logger.debug("pontuação inicial lançada para novo aluno %s em %s", aluno_id, criado_em)
+            contar("deltas_aplicados")
             return
 
-        print(f"DEBUG _apply_delta_pontuacao: aluno_id={aluno_id}, delta={delta}, criado_em={criado_em}")
+        logger.debug("_apply_delta_pontuacao: aluno_id=%s, delta=%s, criado_em=%s", aluno_id, delta, criado_em)
         if row:
             atual = float(row.pontuacao_atual)
             novo = max(0.0, min(10.0, atual + float(delta)))
@@ -584,7 +567,9 @@ def _apply_delta_pontuacao(db, aluno_id, data_tratamento_str, delta, ocorrencia_
             criado_em=criado_em
         )
         db.add(hist)
+        registrar_evento_no_saldo(db, aluno_id, criado_em, delta)
         db.commit()
+        contar("deltas_aplicados")
     except Exception:
         print("EXCEPTION _apply_delta_pontuacao:", aluno_id, delta, criado_em)
         from flask import current_app
@@ -624,6 +609,7 @@ def fechamento_ano_letivo(aluno_id, ano_encerrado):
             criado_em=f"{proximo_ano}-01-01"
         )
         db.add(hist)
+        registrar_evento_no_saldo(db, aluno_id, hist.criado_em, saldo)
         db.commit()
     return saldo  # opcional, para debug/uso
 
@@ -671,6 +657,7 @@ def fechamento_ano_letivo_em_lote(ano_encerrado):
                 criado_em=f"{proximo_ano}-01-01"
             )
             db.add(hist)
+            registrar_evento_no_saldo(db, aluno_id, hist.criado_em, saldo)
             total += 1
     db.commit()
     print(f"Rotina de fechamento: {total} saldos de alunos transferidos para {ano_encerrado + 1}")
\ No newline at end of file
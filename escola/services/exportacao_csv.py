@@ -0,0 +1,57 @@
+# services/exportacao_csv.py
+"""
+Exportação CSV em streaming: as linhas vêm de um cursor no servidor (yield_per) e são
+enviadas em blocos, sem montar o arquivo inteiro em memória.
+
+- linhas_csv: gerador de blocos de texto CSV a partir de um iterável de linhas
+- resposta_csv: Response Flask em streaming, opcionalmente compactada (.csv.gz)
+"""
+
+import csv
+import io
+import zlib
+
+from flask import Response, stream_with_context
+
+LINHAS_POR_BLOCO = 1000
+
+def linhas_csv(cabecalho, linhas, delimitador=',', linhas_por_bloco=LINHAS_POR_BLOCO):
+    """Gera o CSV em blocos de até linhas_por_bloco linhas (o cabeçalho vai no primeiro bloco)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimitador)
+    writer.writerow(cabecalho)
+    pendentes = 0
+    for linha in linhas:
+        writer.writerow(linha)
+        pendentes += 1
+        if pendentes >= linhas_por_bloco:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pendentes = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def _gzip(blocos):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    for bloco in blocos:
+        dados = compressor.compress(bloco)
+        if dados:
+            yield dados
+    yield compressor.flush()
+
+def resposta_csv(cabecalho, linhas, nome_arquivo, delimitador=',', compactar=False):
+    """
+    Response em streaming com o CSV (UTF-8). Com compactar=True, envia nome_arquivo + '.gz'.
+    'linhas' é consumido durante o envio, então deve vir de uma query com yield_per.
+    """
+    blocos = (b.encode('utf-8') for b in linhas_csv(cabecalho, linhas, delimitador))
+    if compactar:
+        blocos = _gzip(blocos)
+        nome_arquivo += '.gz'
+        content_type = 'application/gzip'
+    else:
+        content_type = 'text/csv; charset=utf-8'
+    resp = Response(stream_with_context(blocos), content_type=content_type)
+    resp.headers["Content-Disposition"] = f"attachment; filename={nome_arquivo}"
+    return resp
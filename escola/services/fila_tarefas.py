@@ -0,0 +1,253 @@
+# services/fila_tarefas.py
+"""
+Fila de tarefas em segundo plano (tabela tarefas_fila) para o que não deve segurar a
+requisição: envio de e-mails e geração de PDFs.
+
+- tarefa(tipo, ao_falhar=None): registra a função que executa as tarefas do tipo
+      @tarefa('email_fmd', ao_falhar=marcar_falha)
+      def enviar(db, payload): ...
+  A função recebe uma sessão própria (o commit é feito pela fila) e roda num contexto de
+  requisição de teste, então render_template/url_for funcionam. Se levantar exceção, a
+  tarefa volta para a fila com espera exponencial (ESPERA_BASE_SEGUNDOS, 2x, 4x...) até
+  max_tentativas; ErroDefinitivo encerra sem novas tentativas.
+  ao_falhar(db, payload, erro, nova_tentativa) é chamada a cada falha. O retorno da função
+  (serializável em JSON) fica em tarefas_fila.resultado.
+- registrar_progresso(atual, total): chamada de dentro da tarefa, grava o andamento na
+  hora (sessão própria) e renova a reserva, para tarefas longas não parecerem travadas
+- situacao_tarefa(db, tarefa_id): status, progresso, erro e resultado, para as telas
+- enfileirar(db, tipo, payload): insere a tarefa; o commit fica com quem chamou
+- acordar_fila(): depois do commit; sobe os workers deste processo se ainda não subiram
+- iniciar_fila(app): liga a fila ao app (os workers sobem na primeira requisição, não
+  no import, para que scripts que importam o app não processem a fila sem querer)
+- processar_pendentes(app): executa as tarefas vencidas e retorna (scripts/testes)
+
+A tarefa é reservada com UPDATE ... WHERE status = 'pendente', que só um worker consegue,
+então vários processos (workers do servidor, py -m scripts.processar_fila) dividem a fila.
+
+Configuração: FILA_WORKERS (threads por processo, padrão 2; 0 = só pelo script).
+"""
+
+import json
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from database import SessionLocal
+from models_sqlalchemy import TarefaFila
+
+FORMATO_DATA = '%Y-%m-%d %H:%M:%S'
+MAX_TENTATIVAS = 5
+ESPERA_BASE_SEGUNDOS = 30
+ESPERA_MAX_SEGUNDOS = 3600
+# sem aviso de tarefa nova, os workers olham a fila nesse intervalo (novas tentativas,
+# tarefas enfileiradas por outro processo)
+INTERVALO_SEGUNDOS = 5
+# 'executando' há mais tempo que isso: o processo caiu no meio; a tarefa volta para a fila
+TRAVADA_APOS_SEGUNDOS = 900
+
+class ErroDefinitivo(Exception):
+    """Falha que não adianta repetir (ex.: aluno sem e-mail cadastrado)."""
+
+_TAREFAS = {}
+_atual = threading.local()  # tarefa em execução nesta thread (registrar_progresso)
+
+def tarefa(tipo, ao_falhar=None):
+    def registrar(func):
+        _TAREFAS[tipo] = (func, ao_falhar)
+        return func
+    return registrar
+
+def _agora(segundos=0):
+    return (datetime.now() + timedelta(seconds=segundos)).strftime(FORMATO_DATA)
+
+def espera_para(tentativas):
+    return min(ESPERA_BASE_SEGUNDOS * 2 ** max(tentativas - 1, 0), ESPERA_MAX_SEGUNDOS)
+
+def enfileirar(db, tipo, payload, max_tentativas=MAX_TENTATIVAS):
+    """Insere a tarefa (flush, sem commit) e a retorna."""
+    agora = _agora()
+    t = TarefaFila(tipo=tipo, payload=json.dumps(payload, default=str), status='pendente', tentativas=0,
+                   max_tentativas=max_tentativas, proxima_tentativa_em=agora, criado_em=agora)
+    db.add(t)
+    db.flush()
+    return t
+
+class FilaTarefas:
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+        self._aviso = threading.Event()
+        self._parar = threading.Event()
+        self._workers = []
+
+    def iniciar(self, app):
+        self.app = app
+        app.before_request(self.garantir_workers)
+
+    def garantir_workers(self):
+        if self._workers or self.app is None:
+            return
+        with self._lock:
+            if self._workers:
+                return
+            quantidade = int(self.app.config.get('FILA_WORKERS', 2))
+            if quantidade <= 0:
+                return
+            self._liberar_travadas()
+            self._parar.clear()
+            for i in range(quantidade):
+                t = threading.Thread(target=self._executar_em_loop, name=f"fila-tarefas-{i + 1}", daemon=True)
+                t.start()
+                self._workers.append(t)
+
+    def acordar(self):
+        self.garantir_workers()
+        self._aviso.set()
+
+    def parar(self):
+        self._parar.set()
+        self._aviso.set()
+        for t in self._workers:
+            t.join(timeout=INTERVALO_SEGUNDOS * 2)
+        self._workers = []
+
+    def _executar_em_loop(self):
+        while not self._parar.is_set():
+            try:
+                executou = self.executar_proxima()
+            except Exception:
+                self.app.logger.exception("Erro no worker da fila de tarefas")
+                executou = False
+            if not executou:
+                self._aviso.wait(INTERVALO_SEGUNDOS)
+                self._aviso.clear()
+
+    def _liberar_travadas(self):
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(TarefaFila)
+                .where(TarefaFila.status == 'executando', TarefaFila.iniciado_em < _agora(-TRAVADA_APOS_SEGUNDOS))
+                .values(status='pendente', proxima_tentativa_em=_agora())
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _reservar(self, db):
+        agora = _agora()
+        candidatas = db.execute(
+            select(TarefaFila.id)
+            .where(TarefaFila.status == 'pendente', TarefaFila.proxima_tentativa_em <= agora)
+            .order_by(TarefaFila.proxima_tentativa_em, TarefaFila.id)
+            .limit(10)
+        ).scalars().all()
+        for tarefa_id in candidatas:
+            reservada = db.execute(
+                update(TarefaFila)
+                .where(TarefaFila.id == tarefa_id, TarefaFila.status == 'pendente')
+                .values(status='executando', iniciado_em=agora, tentativas=TarefaFila.tentativas + 1)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            if reservada:
+                return db.get(TarefaFila, tarefa_id)
+        return None
+
+    def executar_proxima(self):
+        """Reserva e executa uma tarefa vencida. Retorna False se não havia nenhuma."""
+        db = SessionLocal()
+        try:
+            t = self._reservar(db)
+            if t is None:
+                return False
+            self._executar(db, t)
+            return True
+        finally:
+            db.close()
+
+    def _executar(self, db, t):
+        tarefa_id, tipo = t.id, t.tipo
+        payload = json.loads(t.payload or '{}')
+        func, ao_falhar = _TAREFAS.get(tipo, (None, None))
+        try:
+            if func is None:
+                raise ErroDefinitivo(f"Tipo de tarefa desconhecido: {tipo}")
+            _atual.tarefa_id = tarefa_id
+            with self.app.test_request_context('/'):
+                resultado = func(db, payload)
+            db.commit()
+            db.execute(update(TarefaFila).where(TarefaFila.id == tarefa_id)
+                       .values(status='concluida', concluido_em=_agora(), ultimo_erro=None,
+                               resultado=json.dumps(resultado, default=str) if resultado is not None else None))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            t = db.get(TarefaFila, tarefa_id)
+            erro = f"{type(e).__name__}: {e}"
+            nova_tentativa = not isinstance(e, ErroDefinitivo) and t.tentativas < t.max_tentativas
+            t.ultimo_erro = erro
+            if nova_tentativa:
+                t.status = 'pendente'
+                t.proxima_tentativa_em = _agora(espera_para(t.tentativas))
+                self.app.logger.warning("Tarefa %s (%s) falhou na tentativa %s: %s", tarefa_id, tipo, t.tentativas, erro)
+            else:
+                t.status = 'erro'
+                t.concluido_em = _agora()
+                self.app.logger.error("Tarefa %s (%s) desistiu após %s tentativa(s): %s", tarefa_id, tipo, t.tentativas, erro)
+            db.commit()
+            if ao_falhar is not None:
+                try:
+                    with self.app.test_request_context('/'):
+                        ao_falhar(db, payload, erro, nova_tentativa)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    self.app.logger.exception("Erro ao registrar a falha da tarefa %s", tarefa_id)
+        finally:
+            _atual.tarefa_id = None
+
+    def processar_pendentes(self, app, limite=None):
+        """Executa as tarefas vencidas (no próprio processo) e retorna quantas executou."""
+        self.app = self.app or app
+        self._liberar_travadas()
+        executadas = 0
+        while (limite is None or executadas < limite) and self.executar_proxima():
+            executadas += 1
+        return executadas
+
+fila = FilaTarefas()
+
+def registrar_progresso(atual, total=None):
+    tarefa_id = getattr(_atual, 'tarefa_id', None)
+    if tarefa_id is None:  # fora da fila (ex.: chamada direta por um script)
+        return
+    valores = {'progresso_atual': atual, 'iniciado_em': _agora()}
+    if total is not None:
+        valores['progresso_total'] = total
+    db = SessionLocal()
+    try:
+        db.execute(update(TarefaFila).where(TarefaFila.id == tarefa_id).values(**valores))
+        db.commit()
+    finally:
+        db.close()
+
+def situacao_tarefa(db, tarefa_id):
+    t = db.get(TarefaFila, tarefa_id)
+    if t is None:
+        return None
+    return {
+        'id': t.id, 'tipo': t.tipo, 'status': t.status, 'tentativas': t.tentativas, 'erro': t.ultimo_erro,
+        'atual': t.progresso_atual or 0, 'total': t.progresso_total,
+        'resultado': json.loads(t.resultado) if t.resultado else None,
+    }
+
+def iniciar_fila(app):
+    fila.iniciar(app)
+
+def acordar_fila():
+    fila.acordar()
+
+def processar_pendentes(app, limite=None):
+    return fila.processar_pendentes(app, limite)
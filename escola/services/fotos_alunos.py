@@ -0,0 +1,182 @@
+# services/fotos_alunos.py
+"""
+Índice das fotos de alunos (static/uploads/alunos) na tabela fotos_alunos.
+
+Cada arquivo tem uma linha com a chave tirada do nome (parte antes do primeiro '_' ou '.',
+que é a matrícula nos arquivos gravados pelo upload), o aluno resolvido, mtime e tamanho.
+Com isso, achar a foto de um aluno sem Aluno.photo é uma consulta a um dict em memória,
+em vez de listar a pasta a cada aluno.
+
+- arquivo_da_foto(db, aluno_id): arquivo mais recente do aluno, ou None
+- mtime_da_foto(db, arquivo): mtime registrado do arquivo, ou None
+- registrar_foto: grava/atualiza a linha de um arquivo (upload_foto); não faz commit
+- sincronizar_fotos: varre a pasta uma vez e aplica só as diferenças (arquivos novos,
+  alterados ou apagados) com uma consulta de alunos e atualizações em lote; preenche
+  Aluno.photo com a foto mais recente de cada aluno
+- invalidar_fotos: chamar após o commit de registrar_foto / sincronizar_fotos
+
+Arquivos copiados direto para a pasta só entram no índice pela sincronização:
+  py sync_fotos_alunos.py
+"""
+
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import insert, update, delete
+
+from models_sqlalchemy import Aluno, FotoAluno
+
+TTL_SEGUNDOS = 300
+EXTENSOES_FOTO = ('.jpg', '.jpeg', '.png', '.gif')
+
+def pasta_fotos():
+    return os.path.join(current_app.static_folder, 'uploads', 'alunos')
+
+def chave_do_arquivo(arquivo):
+    return re.split(r'[_.]', arquivo, maxsplit=1)[0]
+
+def _agora():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+class IndiceFotos:
+    def __init__(self, ttl=TTL_SEGUNDOS):
+        self.ttl = ttl
+        self._dados = None  # (aluno_id -> arquivo mais recente, arquivo -> mtime)
+        self._carregado_em = 0.0
+        self._lock = threading.Lock()
+
+    def _mapas(self, db):
+        dados = self._dados
+        if dados is not None and time.monotonic() - self._carregado_em < self.ttl:
+            return dados
+        with self._lock:
+            if self._dados is None or time.monotonic() - self._carregado_em >= self.ttl:
+                mais_recente = {}
+                mtimes = {}
+                for aluno_id, arquivo, mtime in db.query(FotoAluno.aluno_id, FotoAluno.arquivo, FotoAluno.mtime):
+                    mtimes[arquivo] = mtime
+                    if aluno_id is None:
+                        continue
+                    chave = (mtime or 0, arquivo)
+                    if aluno_id not in mais_recente or chave > mais_recente[aluno_id]:
+                        mais_recente[aluno_id] = chave
+                por_aluno = {aluno_id: arquivo for aluno_id, (_, arquivo) in mais_recente.items()}
+                self._dados = (por_aluno, mtimes)
+                self._carregado_em = time.monotonic()
+            return self._dados
+
+    def arquivo_do_aluno(self, db, aluno_id):
+        return self._mapas(db)[0].get(aluno_id)
+
+    def mtime_do_arquivo(self, db, arquivo):
+        return self._mapas(db)[1].get(arquivo)
+
+    def invalidar(self):
+        with self._lock:
+            self._dados = None
+
+indice_fotos = IndiceFotos()
+
+def arquivo_da_foto(db, aluno_id):
+    return indice_fotos.arquivo_do_aluno(db, aluno_id)
+
+def mtime_da_foto(db, arquivo):
+    """mtime registrado no índice para o arquivo (usado como versão na URL), ou None."""
+    return indice_fotos.mtime_do_arquivo(db, arquivo)
+
+def invalidar_fotos():
+    indice_fotos.invalidar()
+
+def registrar_foto(db, aluno_id, arquivo, caminho):
+    """Grava (ou atualiza) no índice o arquivo recém-salvo em caminho. Não faz commit."""
+    st = os.stat(caminho)
+    dados = {'chave': chave_do_arquivo(arquivo), 'aluno_id': aluno_id, 'mtime': st.st_mtime,
+             'tamanho': st.st_size, 'atualizado_em': _agora()}
+    foto = db.query(FotoAluno).filter_by(arquivo=arquivo).first()
+    if foto is None:
+        db.add(FotoAluno(arquivo=arquivo, **dados))
+    else:
+        for campo, valor in dados.items():
+            setattr(foto, campo, valor)
+
+def _varrer(pasta):
+    """{arquivo: (mtime, tamanho)} das imagens da pasta (uma única listagem)."""
+    arquivos = {}
+    with os.scandir(pasta) as entradas:
+        for e in entradas:
+            if e.is_file() and e.name.lower().endswith(EXTENSOES_FOTO):
+                st = e.stat()
+                arquivos[e.name] = (st.st_mtime, st.st_size)
+    return arquivos
+
+def sincronizar_fotos(db, pasta=None):
+    """
+    Atualiza fotos_alunos e Aluno.photo a partir da pasta. Não faz commit.
+    Retorna {'arquivos', 'novos', 'alterados', 'removidos', 'fotos_atualizadas', 'sem_aluno',
+    'alunos_atualizados'} ('sem_aluno': arquivos cuja chave não é matrícula nem id de aluno).
+    """
+    pasta = pasta or pasta_fotos()
+    arquivos = _varrer(pasta) if os.path.isdir(pasta) else {}
+
+    # Uma consulta para os alunos: a chave é a matrícula ou, em arquivos antigos, o id
+    por_matricula = {}
+    photo_atual = {}
+    for aluno_id, matricula, photo in db.query(Aluno.id, Aluno.matricula, Aluno.photo):
+        if matricula:
+            por_matricula.setdefault(str(matricula).strip(), aluno_id)
+        photo_atual[aluno_id] = photo
+
+    def _aluno_da_chave(chave):
+        if chave in por_matricula:
+            return por_matricula[chave]
+        if chave.isdigit() and int(chave) in photo_atual:
+            return int(chave)
+        return None
+
+    indexados = {arquivo: (foto_id, aluno_id, mtime, tamanho) for foto_id, arquivo, aluno_id, mtime, tamanho in
+                 db.query(FotoAluno.id, FotoAluno.arquivo, FotoAluno.aluno_id, FotoAluno.mtime, FotoAluno.tamanho)}
+
+    agora = _agora()
+    novos, alterados, sem_aluno = [], [], []
+    mais_recente = {}
+    for arquivo, (mtime, tamanho) in arquivos.items():
+        chave = chave_do_arquivo(arquivo)
+        aluno_id = _aluno_da_chave(chave)
+        if aluno_id is None:
+            sem_aluno.append(arquivo)
+        elif aluno_id not in mais_recente or (mtime, arquivo) > mais_recente[aluno_id]:
+            mais_recente[aluno_id] = (mtime, arquivo)
+        linha = {'chave': chave, 'aluno_id': aluno_id, 'mtime': mtime, 'tamanho': tamanho, 'atualizado_em': agora}
+        atual = indexados.get(arquivo)
+        if atual is None:
+            novos.append({'arquivo': arquivo, **linha})
+        elif atual[1:] != (aluno_id, mtime, tamanho):
+            alterados.append({'id': atual[0], **linha})
+    removidos = [foto_id for arquivo, (foto_id, *_) in indexados.items() if arquivo not in arquivos]
+
+    if novos:
+        db.execute(insert(FotoAluno.__table__), novos)
+    if alterados:
+        db.execute(update(FotoAluno), alterados)
+    if removidos:
+        db.execute(delete(FotoAluno).where(FotoAluno.id.in_(removidos)))
+
+    # Aluno.photo passa a apontar para a foto mais recente (só onde muda)
+    fotos = [{'id': aluno_id, 'photo': arquivo} for aluno_id, (_, arquivo) in mais_recente.items()
+             if photo_atual.get(aluno_id) != arquivo]
+    if fotos:
+        db.execute(update(Aluno), fotos)
+
+    return {
+        'arquivos': len(arquivos),
+        'novos': len(novos),
+        'alterados': len(alterados),
+        'removidos': len(removidos),
+        'fotos_atualizadas': len(fotos),
+        'sem_aluno': sorted(sem_aluno),
+        'alunos_atualizados': [f['id'] for f in fotos],
+    }
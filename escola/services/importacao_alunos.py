@@ -0,0 +1,199 @@
+# services/importacao_alunos.py
+"""
+Importação de alunos em lote (CSV/XLSX) baseada em conjuntos.
+
+- ler_planilha_alunos: lê o arquivo num DataFrame de texto com cabeçalhos em MAIÚSCULAS
+- normalizar_alunos: mapeia os cabeçalhos aceitos (com e sem acento) para as colunas de Aluno
+- validar_alunos: validação vetorizada (obrigatórios, matrícula repetida no arquivo, já cadastrada)
+- importar_alunos_df: pipeline completo; INSERT multi-VALUES por lote e, no modo 'atualizar',
+  UPDATE em lote só dos alunos cujos dados mudaram
+
+As matrículas já cadastradas são carregadas uma única vez num set, em vez de uma consulta por linha.
+"""
+
+import io
+
+import pandas as pd
+from sqlalchemy import insert, update
+
+from models_sqlalchemy import Aluno
+from services.datas import parse_data
+from services.texto import normalizar_busca
+
+TAMANHO_LOTE = 500
+
+# coluna de Aluno -> cabeçalhos aceitos, em ordem de preferência
+COLUNAS_IMPORTACAO = {
+    'matricula': ('MATRICULA', 'MATRÍCULA'),
+    'nome': ('NOME',),
+    'data_nascimento': ('DATA_NASCIMENTO',),
+    'data_matricula': ('DATA_MATRICULA', 'DATA_MATRÍCULA'),
+    'serie': ('SERIE', 'SÉRIE'),
+    'turma': ('TURMA',),
+    'turno': ('TURNO',),
+    'pai': ('PAI',),
+    'mae': ('MAE', 'MÃE'),
+    'responsavel': ('RESPONSAVEL', 'RESPONSÁVEL'),
+    'email': ('E-MAIL', 'EMAIL'),
+    'rua': ('RUA', 'ENDERECO', 'ENDEREÇO'),
+    'numero': ('NUMERO', 'NÚMERO'),
+    'complemento': ('COMPLEMENTO',),
+    'bairro': ('BAIRRO',),
+    'cidade': ('CIDADE',),
+    'estado': ('ESTADO',),
+}
+
+COLUNAS_TELEFONE = [(f'TELEFONE {j}', f'TELEFONE{j}') for j in range(1, 4)]
+
+def ler_planilha_alunos(arquivo, nome_arquivo, separador=';'):
+    """DataFrame só de texto ('' no lugar de vazio). ValueError se a extensão não for suportada."""
+    nome_arquivo = (nome_arquivo or '').lower()
+    if nome_arquivo.endswith(('.xls', '.xlsx')):
+        df = pd.read_excel(arquivo, dtype=str, engine='openpyxl')
+    elif nome_arquivo.endswith('.csv'):
+        conteudo = arquivo.read()
+        try:
+            texto = conteudo.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            texto = conteudo.decode('latin-1')
+        df = pd.read_csv(io.StringIO(texto), sep=separador or ';', dtype=str, keep_default_na=False)
+    else:
+        raise ValueError('Formato de arquivo não suportado. Use CSV, XLSX ou XLS.')
+    df = df.fillna('').dropna(how='all')
+    df.columns = df.columns.astype(str).str.strip().str.upper()
+    return df
+
+def _coluna(df, nomes):
+    for nome in nomes:
+        if nome in df.columns:
+            return df[nome].astype(str).str.strip()
+    return None
+
+def normalizar_alunos(df):
+    """
+    Retorna (alunos, colunas_presentes): DataFrame com as colunas de Aluno + 'linha' (linha no
+    arquivo, contando o cabeçalho) e o conjunto de colunas que vieram no arquivo.
+    """
+    alunos = pd.DataFrame(index=df.index)
+    presentes = set()
+    for campo, nomes in COLUNAS_IMPORTACAO.items():
+        serie = _coluna(df, nomes)
+        if serie is not None:
+            presentes.add(campo)
+        alunos[campo] = serie if serie is not None else ''
+
+    # Telefones: TELEFONE 1..3 (ou TELEFONE1..3); sem eles, TELEFONE/TELEFONES separados por vírgula
+    partes = [_coluna(df, nomes) for nomes in COLUNAS_TELEFONE]
+    partes = [p for p in partes if p is not None]
+    unico = _coluna(df, ('TELEFONE', 'TELEFONES'))
+    if partes or unico is not None:
+        presentes.add('telefone')
+    telefone = pd.Series('', index=df.index)
+    if partes:
+        telefone = pd.concat(partes, axis=1).apply(lambda r: ', '.join(t for t in r if t), axis=1)
+    if unico is not None:
+        separados = unico.str.split(',').apply(lambda ts: ', '.join([t.strip() for t in ts if t.strip()][:3]))
+        telefone = telefone.where(telefone != '', separados)
+    alunos['telefone'] = telefone
+
+    if 'serie' in presentes:
+        presentes.add('serie_numerica')
+    alunos['serie_numerica'] = alunos['serie'].str.extract(r'^(\d+)', expand=False).fillna('')
+    alunos['linha'] = range(2, len(alunos) + 2)
+    return alunos.reset_index(drop=True), presentes
+
+def validar_alunos(alunos, matriculas_existentes, atualizar=False):
+    """
+    Separa as linhas válidas das inválidas sem laço por linha.
+    Retorna (novos, existentes, erros): novos a inserir, existentes a atualizar (vazio se
+    atualizar=False) e lista de erros no formato do relatório de importação.
+    """
+    erros = []
+
+    def _registrar(mascara, mensagens):
+        if isinstance(mensagens, str):
+            mensagens = pd.Series(mensagens, index=alunos.index)
+        for linha, matricula, nome, msg in alunos.loc[mascara, ['linha', 'matricula', 'nome']].assign(
+                msg=mensagens[mascara]).itertuples(index=False):
+            erros.append({'linha': int(linha), 'matricula': matricula or 'N/A', 'nome': nome or 'N/A', 'erro': msg})
+
+    validas = (alunos['matricula'] != '') & (alunos['nome'] != '')
+    _registrar(~validas, 'Matrícula e Nome são obrigatórios.')
+
+    # Repetidas no próprio arquivo: vale a primeira ocorrência
+    repetidas = validas & alunos['matricula'].where(validas).duplicated(keep='first')
+    primeira_linha = alunos.loc[validas].groupby('matricula')['linha'].transform('min').reindex(alunos.index)
+    _registrar(repetidas, 'Matrícula repetida no arquivo (primeira ocorrência na linha '
+               + primeira_linha.fillna(0).astype(int).astype(str) + ').')
+    validas &= ~repetidas
+
+    ja_cadastradas = validas & alunos['matricula'].isin(matriculas_existentes)
+    if not atualizar:
+        _registrar(ja_cadastradas, 'Matrícula já existente.')
+
+    erros.sort(key=lambda e: e['linha'])
+    novos = alunos[validas & ~ja_cadastradas]
+    existentes = alunos[ja_cadastradas] if atualizar else alunos.iloc[0:0]
+    return novos, existentes, erros
+
+def _blocos(itens, tamanho):
+    for i in range(0, len(itens), tamanho):
+        yield itens[i:i + tamanho]
+
+def _alteracoes(db, existentes, colunas, tamanho_lote):
+    """Linhas {'id': ..., coluna: valor} dos alunos existentes cujos dados do arquivo diferem do banco."""
+    if existentes.empty:
+        return []
+    por_matricula = existentes.set_index('matricula')[colunas].to_dict('index')
+    atributos = [getattr(Aluno, c) for c in colunas]
+    alteracoes = []
+    for lote in _blocos(list(por_matricula), tamanho_lote):
+        for aluno_id, matricula, *atuais in (
+            db.query(Aluno.id, Aluno.matricula, *atributos).filter(Aluno.matricula.in_(lote))
+        ):
+            novo = por_matricula[matricula]
+            if any((atual or '') != novo[c] for c, atual in zip(colunas, atuais)):
+                alteracoes.append({'id': aluno_id, **novo})
+    return alteracoes
+
+def importar_alunos_df(db, df, atualizar=False, tamanho_lote=TAMANHO_LOTE, progresso=None, usuario_id=None):
+    """
+    Importa o DataFrame lido por ler_planilha_alunos. Não faz commit.
+    progresso(etapa, feitos, total) é chamado ao fim de cada lote ('inserir' / 'atualizar').
+    Retorna {'inseridos', 'atualizados', 'inalterados', 'erros', 'matriculas_inseridas', 'ids_atualizados'}.
+    """
+    alunos, presentes = normalizar_alunos(df)
+    matriculas_existentes = {m for (m,) in db.query(Aluno.matricula).filter(Aluno.matricula.isnot(None))}
+    novos, existentes, erros = validar_alunos(alunos, matriculas_existentes, atualizar=atualizar)
+
+    colunas = list(COLUNAS_IMPORTACAO) + ['telefone', 'serie_numerica']
+    registros = novos[colunas].to_dict('records')
+    for r in registros:
+        r['usuario_cadastro_id'] = usuario_id
+    for n, lote in enumerate(_blocos(registros, tamanho_lote), start=1):
+        db.execute(insert(Aluno.__table__).values(lote))
+        if progresso:
+            progresso('inserir', min(n * tamanho_lote, len(registros)), len(registros))
+
+    # Só as colunas que vieram no arquivo são atualizadas (cabeçalho ausente não apaga dado)
+    colunas_atualizaveis = [c for c in colunas if c in presentes and c != 'matricula']
+    alteracoes = _alteracoes(db, existentes, colunas_atualizaveis, tamanho_lote) if colunas_atualizaveis else []
+    for r in alteracoes:
+        # UPDATE em lote não passa pelos before_update que sincronizam o espelho tipado e o nome_busca
+        if 'data_matricula' in r:
+            r['data_matricula_dt'] = parse_data(r['data_matricula'])
+        if 'nome' in r:
+            r['nome_busca'] = normalizar_busca(r['nome'])
+    for n, lote in enumerate(_blocos(alteracoes, tamanho_lote), start=1):
+        db.execute(update(Aluno), lote)
+        if progresso:
+            progresso('atualizar', min(n * tamanho_lote, len(alteracoes)), len(alteracoes))
+
+    return {
+        'inseridos': len(registros),
+        'atualizados': len(alteracoes),
+        'inalterados': len(existentes) - len(alteracoes),
+        'erros': erros,
+        'matriculas_inseridas': [r['matricula'] for r in registros],
+        'ids_atualizados': [r['id'] for r in alteracoes],
+    }
@@ -0,0 +1,104 @@
+# services/listagens.py
+"""
+Paginação keyset (seek) e filtros em SQL para as listagens de RFO, FMD e prontuário.
+
+Em vez de OFFSET, cada página continua a partir da chave da última linha da anterior
+(ex.: data_ocorrencia, id), então o custo de uma página não cresce com o tamanho da tabela.
+
+- filtros_da_requisicao: lê q, serie, turma, data_inicio, data_fim (e status) dos args
+- filtrar_texto / filtrar_periodo: aplicam os filtros na query
+- pagina_keyset: aplica o cursor, busca TAMANHO_PAGINA linhas e devolve o próximo cursor
+"""
+
+import base64
+import json
+from datetime import timedelta
+
+from sqlalchemy import or_, and_, func
+
+from services.datas import parse_data
+
+TAMANHO_PAGINA = 50
+TAMANHO_PAGINA_MAX = 200
+
+def codificar_cursor(valores):
+    return base64.urlsafe_b64encode(json.dumps(valores, default=str).encode()).decode().rstrip('=')
+
+def decodificar_cursor(token):
+    """Lista de valores da chave ou None (cursor ausente/inválido = primeira página)."""
+    if not token:
+        return None
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return valores if isinstance(valores, list) else None
+    except Exception:
+        return None
+
+def filtros_da_requisicao(args):
+    filtros = {c: (args.get(c) or '').strip() for c in ('q', 'serie', 'turma', 'data_inicio', 'data_fim', 'status')}
+    filtros['status'] = filtros['status'].upper()
+    return filtros
+
+def tamanho_da_pagina(args):
+    try:
+        return max(1, min(int(args.get('por_pagina') or TAMANHO_PAGINA), TAMANHO_PAGINA_MAX))
+    except (TypeError, ValueError):
+        return TAMANHO_PAGINA
+
+def filtrar_texto(query, q, colunas):
+    """ILIKE '%q%' em qualquer uma das colunas."""
+    if not q:
+        return query
+    padrao = f"%{q}%"
+    return query.filter(or_(*[c.ilike(padrao) for c in colunas]))
+
+def filtrar_serie_turma(query, serie, turma, col_serie, col_turma):
+    if serie:
+        query = query.filter(col_serie == serie)
+    if turma:
+        query = query.filter(col_turma == turma)
+    return query
+
+def filtrar_periodo(query, data_inicio, data_fim, col_texto, col_dt=None):
+    """
+    Filtra pelo período (datas 'YYYY-MM-DD' ou 'DD/MM/YYYY'). Com col_dt, usa a coluna Date
+    e cai na comparação de texto só para linhas ainda sem o espelho preenchido.
+    """
+    for valor, maior in ((data_inicio, True), (data_fim, False)):
+        d = parse_data(valor)
+        if not d:
+            continue
+        # data_fim inclui o dia todo quando a coluna texto tem hora ('YYYY-MM-DD hh:mm')
+        texto = col_texto >= d.isoformat() if maior else col_texto < (d + timedelta(days=1)).isoformat()
+        if col_dt is None:
+            query = query.filter(texto)
+        else:
+            tipado = col_dt >= d if maior else col_dt <= d
+            query = query.filter(or_(tipado, and_(col_dt.is_(None), texto)))
+    return query
+
+def chave_texto(coluna):
+    """Coluna texto como chave de ordenação: NULL vira '' (fica por último na ordem decrescente)."""
+    return func.coalesce(coluna, '')
+
+def pagina_keyset(query, chaves, chave_de, cursor=None, tamanho=TAMANHO_PAGINA):
+    """
+    Página em ordem decrescente de 'chaves' (expressões não nulas; a última deve ser única, ex. id).
+    chave_de(linha) -> lista com os valores das chaves na linha (mesma ordem).
+    Retorna (linhas, proximo_cursor); proximo_cursor é None na última página.
+    """
+    valores = decodificar_cursor(cursor)
+    if valores is not None and len(valores) == len(chaves):
+        # (k1, k2, ...) < (v1, v2, ...) expandido, para funcionar igual no SQLite e no PostgreSQL
+        condicoes = []
+        for i, (chave, valor) in enumerate(zip(chaves, valores)):
+            iguais = [chaves[j] == valores[j] for j in range(i)]
+            condicoes.append(and_(*iguais, chave < valor))
+        query = query.filter(or_(*condicoes))
+    query = query.order_by(*[c.desc() for c in chaves])
+    linhas = query.limit(tamanho + 1).all()
+    proximo = None
+    if len(linhas) > tamanho:
+        linhas = linhas[:tamanho]
+        proximo = codificar_cursor(chave_de(linhas[-1]))
+    return linhas, proximo
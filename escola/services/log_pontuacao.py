@@ -0,0 +1,93 @@
+# services/log_pontuacao.py
+"""
+Log das rotinas de pontuação (cálculo, lançamentos, prontuário automático).
+
+Desligado por padrão: nada é formatado nem escrito enquanto o nível não for ativado.
+- PONTUACAO_LOG_LEVEL=DEBUG  -> uma linha por evento/aluno (diagnóstico)
+- PONTUACAO_LOG_LEVEL=INFO   -> só o resumo de cada execução (contagens e tempos)
+
+Uso:
+    from services.log_pontuacao import logger, resumo_execucao, contar
+
+    logger.debug("delta calculado: %s", delta)      # formatação preguiçosa (%s), nunca f-string
+
+    with resumo_execucao("fechamento 2025 b1") as resumo:
+        with resumo.cronometro("calculo"):
+            ...
+        contar("alunos")                            # incrementa o resumo ativo (se houver)
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger("escola.pontuacao")
+
+def _configurar():
+    nivel = os.environ.get("PONTUACAO_LOG_LEVEL", "").strip().upper()
+    if not nivel:
+        # Desligado: só avisos/erros passam
+        logger.setLevel(logging.WARNING)
+        return
+    logger.setLevel(getattr(logging, nivel, logging.INFO))
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("[%(levelname)s] %(name)s: %(message)s"))
+        logger.addHandler(handler)
+    logger.propagate = False
+
+_configurar()
+
+def ativar(nivel=logging.INFO):
+    """Liga o log em tempo de execução (ex.: opção --resumo dos scripts)."""
+    os.environ["PONTUACAO_LOG_LEVEL"] = logging.getLevelName(nivel)
+    _configurar()
+
+_resumo_atual = ContextVar("resumo_pontuacao", default=None)
+
+class ResumoExecucao:
+    """Contagens e tempos acumulados de uma execução; escrito numa única linha ao final."""
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.contagens = {}
+        self.tempos = {}
+        self.inicio = time.perf_counter()
+
+    def contar(self, chave, n=1):
+        self.contagens[chave] = self.contagens.get(chave, 0) + n
+
+    @contextmanager
+    def cronometro(self, etapa):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tempos[etapa] = self.tempos.get(etapa, 0.0) + (time.perf_counter() - t0)
+
+    def texto(self):
+        total = time.perf_counter() - self.inicio
+        partes = [f"{k}={v}" for k, v in sorted(self.contagens.items())]
+        partes += [f"{k}={v:.3f}s" for k, v in self.tempos.items()]
+        partes.append(f"total={total:.3f}s")
+        return f"{self.nome}: " + ", ".join(partes)
+
+@contextmanager
+def resumo_execucao(nome):
+    """Abre um resumo para a execução; ao sair, registra uma linha INFO (se o log estiver ativo)."""
+    resumo = ResumoExecucao(nome)
+    token = _resumo_atual.set(resumo)
+    try:
+        yield resumo
+    finally:
+        _resumo_atual.reset(token)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("%s", resumo.texto())
+
+def contar(chave, n=1):
+    """Incrementa a contagem no resumo ativo; sem resumo aberto não faz nada."""
+    resumo = _resumo_atual.get()
+    if resumo is not None:
+        resumo.contar(chave, n)
@@ -0,0 +1,106 @@
+# services/miniaturas_fotos.py
+"""
+Miniaturas das fotos de alunos (Pillow), em tamanhos fixos e nos formatos WebP e JPEG.
+
+As miniaturas ficam em static/uploads/alunos/miniaturas/<tamanho>/<nome do arquivo>.<webp|jpg>
+e são geradas no upload, pelo backfill (py -m scripts.gerar_miniaturas) ou, na falta delas,
+na primeira vez que forem pedidas.
+
+- TAMANHOS: 'p' (listas/autocomplete), 'm' (telas), 'g' (impressão) -> lado maior em pixels
+- gerar_miniaturas(caminho): gera todos os tamanhos/formatos de uma foto original
+- miniatura(arquivo, tamanho, formato): caminho da miniatura, gerando se faltar ou estiver velha
+- formato_aceito(accept_mimetypes): 'webp' quando o navegador aceita, senão 'jpg'
+- mimetype_do_arquivo: mimetype pela extensão (a foto original pode ser png/gif)
+- url_foto_aluno(db, aluno_id, arquivo, tamanho): URL da miniatura com a versão (mtime) na query,
+  para que o navegador possa guardá-la por CACHE_VERSIONADA_SEGUNDOS
+"""
+
+import mimetypes
+import os
+
+from flask import url_for
+from PIL import Image, ImageOps
+
+from services.fotos_alunos import pasta_fotos, mtime_da_foto
+
+TAMANHOS = {'p': 96, 'm': 240, 'g': 640}
+CACHE_VERSIONADA_SEGUNDOS = 365 * 24 * 3600
+
+# formato -> (formato Pillow, mimetype, opções de gravação)
+FORMATOS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+def pasta_miniaturas():
+    return os.path.join(pasta_fotos(), 'miniaturas')
+
+def caminho_miniatura(arquivo, tamanho, formato):
+    base = os.path.splitext(os.path.basename(arquivo))[0]
+    return os.path.join(pasta_miniaturas(), tamanho, f"{base}.{formato}")
+
+def _atualizada(destino, origem):
+    return os.path.exists(destino) and os.path.getmtime(destino) >= os.path.getmtime(origem)
+
+def _abrir_rgb(caminho):
+    with Image.open(caminho) as img:
+        img = ImageOps.exif_transpose(img)  # fotos de celular vêm giradas pela tag EXIF
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGBA')
+            fundo = Image.new('RGB', img.size, (255, 255, 255))
+            fundo.paste(img, mask=img.getchannel('A'))
+            return fundo
+        return img.convert('RGB')
+
+def gerar_miniaturas(caminho, forcar=False, tamanhos=None, formatos=None):
+    """Gera as miniaturas da foto original em caminho. Retorna a lista de arquivos gravados."""
+    tamanhos = tamanhos or list(TAMANHOS)
+    formatos = formatos or list(FORMATOS)
+    arquivo = os.path.basename(caminho)
+    pendentes = [(t, f) for t in tamanhos for f in formatos
+                 if forcar or not _atualizada(caminho_miniatura(arquivo, t, f), caminho)]
+    if not pendentes:
+        return []
+    original = _abrir_rgb(caminho)
+    gravados = []
+    # do maior para o menor: cada redução parte da anterior, que já é pequena
+    atual = original
+    for tamanho in sorted({t for t, _ in pendentes}, key=lambda t: TAMANHOS[t], reverse=True):
+        lado = TAMANHOS[tamanho]
+        atual = atual.copy()
+        atual.thumbnail((lado, lado), Image.LANCZOS)
+        for t, formato in pendentes:
+            if t != tamanho:
+                continue
+            destino = caminho_miniatura(arquivo, tamanho, formato)
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            formato_pil, _, opcoes = FORMATOS[formato]
+            temporario = destino + '.tmp'
+            atual.save(temporario, formato_pil, **opcoes)
+            os.replace(temporario, destino)  # quem estiver lendo nunca vê arquivo pela metade
+            gravados.append(destino)
+    return gravados
+
+def miniatura(arquivo, tamanho, formato):
+    """Caminho da miniatura do arquivo original (gera se preciso); None se o original não existir."""
+    original = os.path.join(pasta_fotos(), os.path.basename(arquivo))
+    if not os.path.isfile(original):
+        return None
+    destino = caminho_miniatura(arquivo, tamanho, formato)
+    if not _atualizada(destino, original):
+        gerar_miniaturas(original, tamanhos=[tamanho], formatos=[formato])
+    return destino
+
+def formato_aceito(accept_mimetypes):
+    # só quando pedido explicitamente: '*/*' também vem de geradores de PDF que não leem WebP
+    return 'webp' if any(m == 'image/webp' for m, _ in accept_mimetypes) else 'jpg'
+
+def mimetype_do_arquivo(caminho):
+    return mimetypes.guess_type(caminho)[0] or 'application/octet-stream'
+
+def url_foto_aluno(db, aluno_id, arquivo=None, tamanho='m'):
+    params = {'aluno_id': aluno_id, 'tamanho': tamanho}
+    mtime = mtime_da_foto(db, arquivo) if arquivo else None
+    if mtime:
+        params['v'] = str(int(mtime))
+    return url_for('formularios_prontuario.api_aluno_foto', **params)
@@ -0,0 +1,282 @@
+# services/renderizador_pdf.py
+"""
+Serviço único de geração de PDF para os documentos (FMD, prontuário do RFO, ATA, TAC,
+relatório disciplinar).
+
+- Motor "quente" por processo: o WeasyPrint é importado uma vez e cada thread reaproveita a
+  sua configuração de fontes (renderizações em threads diferentes rodam em paralelo);
+  arquivos de /static/ (CSS, logos, fotos) são lidos direto do disco, com cache em memória
+  limitado (LRU por bytes), em vez de uma requisição HTTP ao próprio servidor por render.
+  O binário do wkhtmltopdf é localizado uma vez (WKHTMLTOPDF_PATH, PATH ou caminhos
+  padrão do Windows).
+- Cache em disco endereçado por conteúdo: a chave é o SHA-256 do HTML renderizado, das
+  opções e da assinatura (caminho, mtime, tamanho) dos arquivos locais referenciados.
+  Reimpressões e envios por e-mail do mesmo documento reaproveitam o PDF.
+
+Configuração (app.config, com as variáveis de ambiente de mesmo nome):
+  PDF_BACKEND       'weasyprint' ou 'wkhtmltopdf'; vazio = motor padrão de cada documento
+  WKHTMLTOPDF_PATH  caminho do executável do wkhtmltopdf
+  PDF_CACHE_DIR     pasta do cache (padrão: tmp/pdf_cache)
+  PDF_CACHE_MAX_MB  tamanho máximo do cache; os PDFs menos usados saem primeiro (padrão: 500)
+  PDF_ASSETS_MAX_MB tamanho máximo do cache em memória dos arquivos de /static/ (padrão: 32)
+
+- gerar_pdf(html, ...): bytes do PDF
+- gerar_pdf_com_chave(html, ...): (bytes do PDF, chave)
+- resposta_pdf(html, nome_arquivo, ...): Response com ETag (= chave) e 304 condicional
+
+O PDF é sempre devolvido em memória, nunca o caminho no cache: a limpeza do cache (em outra
+requisição ou processo) pode apagar o arquivo a qualquer momento.
+"""
+
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from urllib.parse import urljoin, urlparse, unquote
+
+from flask import current_app, send_file
+
+WEASYPRINT = 'weasyprint'
+WKHTMLTOPDF = 'wkhtmltopdf'
+CACHE_MAX_MB = 500
+ASSETS_MAX_MB = 32
+LIMPAR_CACHE_A_CADA = 50  # gravações
+
+CAMINHOS_WKHTMLTOPDF = (
+    r'C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe',
+    r'C:\Arquivos de Programas\wkhtmltopdf\bin\wkhtmltopdf.exe',
+)
+
+_REFERENCIAS = re.compile(r'''(?:src|href)\s*=\s*["']([^"']+)["']|url\(\s*["']?([^"')]+)["']?\s*\)''', re.I)
+
+def _config(nome, padrao=None):
+    valor = current_app.config.get(nome) or os.environ.get(nome)
+    return valor if valor not in (None, '') else padrao
+
+class RenderizadorPDF:
+    def __init__(self):
+        self._lock_motores = threading.Lock()
+        self._lock_assets = threading.Lock()
+        self._weasyprint = None      # (HTML, CSS, default_url_fetcher, FontConfiguration)
+        self._pdfkit = None          # (módulo pdfkit, configuração) ou False se não houver binário
+        self._por_thread = threading.local()  # configuração de fontes de cada thread
+        self._assets = OrderedDict()  # caminho -> (mtime_ns, tamanho, bytes), do menos ao mais usado
+        self._assets_bytes = 0
+        self._gravacoes = 0
+
+    # ---------- motores ----------
+
+    def _motor_weasyprint(self):
+        with self._lock_motores:
+            if self._weasyprint is None:
+                from weasyprint import HTML, CSS, default_url_fetcher
+                try:
+                    from weasyprint.text.fonts import FontConfiguration
+                except ImportError:  # WeasyPrint < 53
+                    from weasyprint.fonts import FontConfiguration
+                self._weasyprint = (HTML, CSS, default_url_fetcher, FontConfiguration)
+        return self._weasyprint
+
+    def _fontes(self):
+        """FontConfiguration desta thread (não é compartilhada entre renderizações simultâneas)."""
+        fontes = getattr(self._por_thread, 'fontes', None)
+        if fontes is None:
+            fontes = self._por_thread.fontes = self._motor_weasyprint()[3]()
+        return fontes
+
+    def _motor_wkhtmltopdf(self):
+        with self._lock_motores:
+            if self._pdfkit is None:
+                caminho = _config('WKHTMLTOPDF_PATH') or shutil.which('wkhtmltopdf')
+                if not caminho:
+                    caminho = next((c for c in CAMINHOS_WKHTMLTOPDF if os.path.isfile(c)), None)
+                if caminho and os.path.isfile(caminho):
+                    import pdfkit
+                    self._pdfkit = (pdfkit, pdfkit.configuration(wkhtmltopdf=caminho))
+                else:
+                    current_app.logger.warning("wkhtmltopdf não encontrado; os PDFs serão gerados com o WeasyPrint.")
+                    self._pdfkit = False
+        return self._pdfkit
+
+    def _backend(self, padrao):
+        backend = (_config('PDF_BACKEND') or padrao or WEASYPRINT).lower()
+        if backend == WKHTMLTOPDF and not self._motor_wkhtmltopdf():
+            return WEASYPRINT
+        return backend
+
+    # ---------- arquivos locais ----------
+
+    def _arquivo_local(self, url, base_url=None):
+        """Caminho em disco de uma URL file:// ou /static/... (do próprio servidor), ou None."""
+        if not url or url.startswith('data:'):
+            return None
+        url = urljoin(base_url, url) if base_url else url
+        partes = urlparse(url)
+        if partes.scheme == 'file':
+            caminho = unquote(partes.path)
+            if re.match(r'^/[A-Za-z]:/', caminho):  # file:///C:/...
+                caminho = caminho[1:]
+        elif partes.scheme in ('', 'http', 'https') and partes.path.startswith('/static/'):
+            if partes.netloc and base_url and partes.netloc != urlparse(base_url).netloc:
+                return None
+            pasta = os.path.realpath(current_app.static_folder)
+            caminho = os.path.realpath(os.path.join(pasta, unquote(partes.path[len('/static/'):])))
+            if not caminho.startswith(pasta + os.sep):
+                return None
+        else:
+            return None
+        return caminho if os.path.isfile(caminho) else None
+
+    def _ler_asset(self, caminho):
+        st = os.stat(caminho)
+        with self._lock_assets:
+            cache = self._assets.get(caminho)
+            if cache and cache[0] == st.st_mtime_ns and cache[1] == st.st_size:
+                self._assets.move_to_end(caminho)
+                return cache[2]
+        with open(caminho, 'rb') as f:
+            dados = f.read()
+
+        limite = int(_config('PDF_ASSETS_MAX_MB', ASSETS_MAX_MB)) * 1024 * 1024
+        with self._lock_assets:
+            antigo = self._assets.pop(caminho, None)
+            if antigo:
+                self._assets_bytes -= len(antigo[2])
+            if len(dados) <= limite:
+                self._assets[caminho] = (st.st_mtime_ns, st.st_size, dados)
+                self._assets_bytes += len(dados)
+            while self._assets_bytes > limite:
+                _, (_, _, removido) = self._assets.popitem(last=False)
+                self._assets_bytes -= len(removido)
+        return dados
+
+    def _buscar_url(self, base_url):
+        def buscar(url, *args, **kwargs):
+            caminho = self._arquivo_local(url, base_url)
+            if caminho:
+                return {'string': self._ler_asset(caminho), 'redirected_url': url,
+                        'mime_type': mimetypes.guess_type(caminho)[0] or 'application/octet-stream'}
+            return self._motor_weasyprint()[2](url, *args, **kwargs)
+        return buscar
+
+    def _assinatura_assets(self, html, base_url):
+        assinatura = []
+        for m in _REFERENCIAS.finditer(html):
+            url = (m.group(1) or m.group(2) or '').strip()
+            caminho = self._arquivo_local(url, base_url)
+            if caminho:
+                st = os.stat(caminho)
+                assinatura.append(f"{caminho}:{st.st_mtime_ns}:{st.st_size}")
+        return sorted(set(assinatura))
+
+    # ---------- cache ----------
+
+    def _pasta_cache(self):
+        return _config('PDF_CACHE_DIR') or os.path.join(current_app.root_path, 'tmp', 'pdf_cache')
+
+    def chave(self, html, backend, base_url=None, margens=None, tamanho=None, opcoes_wkhtmltopdf=None):
+        dados = json.dumps([backend, base_url, margens, tamanho, opcoes_wkhtmltopdf or {},
+                            self._assinatura_assets(html, base_url)], sort_keys=True, default=str)
+        return hashlib.sha256(dados.encode('utf-8') + b'\0' + html.encode('utf-8')).hexdigest()
+
+    def _limpar_cache(self, pasta):
+        limite = int(_config('PDF_CACHE_MAX_MB', CACHE_MAX_MB)) * 1024 * 1024
+        arquivos = []
+        for raiz, _, nomes in os.walk(pasta):
+            for nome in nomes:
+                if nome.endswith('.pdf'):
+                    caminho = os.path.join(raiz, nome)
+                    st = os.stat(caminho)
+                    arquivos.append((st.st_mtime, st.st_size, caminho))
+        total = sum(t for _, t, _ in arquivos)
+        for _, tamanho_arquivo, caminho in sorted(arquivos):
+            if total <= limite:
+                break
+            try:
+                os.remove(caminho)
+                total -= tamanho_arquivo
+            except OSError:
+                pass
+
+    # ---------- geração ----------
+
+    def _renderizar(self, html, backend, base_url, margens, tamanho, opcoes_wkhtmltopdf):
+        if backend == WKHTMLTOPDF:
+            pdfkit, configuracao = self._motor_wkhtmltopdf()
+            opcoes = {'encoding': 'UTF-8', 'enable-local-file-access': None}
+            if tamanho:
+                opcoes['page-size'] = tamanho
+            if margens:
+                for lado, valor in zip(('top', 'right', 'bottom', 'left'), margens):
+                    opcoes[f'margin-{lado}'] = valor
+            opcoes.update(opcoes_wkhtmltopdf or {})
+            return pdfkit.from_string(html, False, configuration=configuracao, options=opcoes)
+
+        HTML, CSS, _, _ = self._motor_weasyprint()
+        fontes = self._fontes()
+        folhas = []
+        if margens or tamanho:
+            regras = []
+            if tamanho:
+                regras.append(f"size: {tamanho};")
+            if margens:
+                regras.append(f"margin: {' '.join(margens)};")
+            folhas.append(CSS(string="@page { %s }" % ' '.join(regras), font_config=fontes))
+        return HTML(string=html, base_url=base_url, url_fetcher=self._buscar_url(base_url)).write_pdf(
+            stylesheets=folhas, font_config=fontes)
+
+    def gerar(self, html, base_url=None, margens=None, tamanho=None, backend=None, opcoes_wkhtmltopdf=None):
+        """(bytes do PDF, chave): lido do cache ou gerado (e gravado no cache)."""
+        backend = self._backend(backend)
+        chave = self.chave(html, backend, base_url, margens, tamanho, opcoes_wkhtmltopdf)
+        pasta = self._pasta_cache()
+        caminho = os.path.join(pasta, chave[:2], f"{chave}.pdf")
+        try:
+            with open(caminho, 'rb') as f:
+                pdf = f.read()
+        except FileNotFoundError:  # ainda não gerado, ou removido pela limpeza do cache
+            pass
+        else:
+            try:
+                os.utime(caminho)  # marca como usado (a limpeza remove os mais antigos)
+            except OSError:
+                pass
+            return pdf, chave
+
+        pdf = self._renderizar(html, backend, base_url, margens, tamanho, opcoes_wkhtmltopdf)
+        if not pdf:
+            raise RuntimeError("Falha ao gerar o PDF.")
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, 'wb') as f:
+            f.write(pdf)
+        os.replace(temporario, caminho)
+
+        self._gravacoes += 1
+        if self._gravacoes % LIMPAR_CACHE_A_CADA == 0:
+            self._limpar_cache(pasta)
+        return pdf, chave
+
+renderizador = RenderizadorPDF()
+
+def gerar_pdf_com_chave(html, base_url=None, margens=None, tamanho=None, backend=None, opcoes_wkhtmltopdf=None):
+    """
+    (bytes, chave) do PDF, do cache ou gerado.
+    margens: (topo, direita, baixo, esquerda) em unidades CSS; backend: motor padrão do documento.
+    """
+    return renderizador.gerar(html, base_url, margens, tamanho, backend, opcoes_wkhtmltopdf)
+
+def gerar_pdf(html, **kwargs):
+    return gerar_pdf_com_chave(html, **kwargs)[0]
+
+def resposta_pdf(html, nome_arquivo, anexo=False, **kwargs):
+    pdf, chave = gerar_pdf_com_chave(html, **kwargs)
+    resp = send_file(io.BytesIO(pdf), mimetype='application/pdf', as_attachment=anexo, download_name=nome_arquivo,
+                     conditional=True, etag=chave)
+    resp.cache_control.private = True
+    return resp
@@ -0,0 +1,230 @@
+# services/saldo_pontuacao.py
+"""
+Saldo acumulado de pontuação por aluno (tabela pontuacao_saldo).
+
+Cada linha guarda, para um aluno e uma data em que houve lançamento:
+- saldo: soma de todos os valor_delta do pontuacao_historico até a data (inclusive);
+- ultima_perda: data do último lançamento negativo até a data.
+
+Com isso a pontuação em qualquer data vira uma busca pelo índice (aluno_id, data)
+em vez de reler e somar todo o histórico do aluno.
+
+- registrar_evento_no_saldo: chamado a cada lançamento inserido no histórico
+- registrar_eventos_no_saldo: o mesmo para lançamentos inseridos em lote
+- consultar_saldo: linha do saldo na data (ou na última data anterior)
+- reconstruir_saldos: regenera a tabela a partir do pontuacao_historico
+"""
+
+from datetime import date, datetime
+
+from sqlalchemy import or_, and_, func, insert, update
+from models_sqlalchemy import PontuacaoHistorico, PontuacaoSaldo
+from services.datas import parse_data
+
+# Tamanho dos blocos de IN (...) e de INSERT em lote
+TAMANHO_LOTE = 500
+
+def data_do_evento(criado_em):
+    """
+    Data de um lançamento do histórico a partir do criado_em (services.datas.parse_data:
+    mesma conversão que preenche criado_em_dt). None se o formato não for reconhecido.
+    Use `criado_em_dt or data_do_evento(criado_em)` quando a linha já tiver o espelho.
+    """
+    return parse_data(criado_em)
+
+def _agora():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def aluno_tem_saldo(db, aluno_id):
+    return db.query(PontuacaoSaldo.id).filter(PontuacaoSaldo.aluno_id == aluno_id).first() is not None
+
+def registrar_evento_no_saldo(db, aluno_id, criado_em, delta):
+    """
+    Atualiza o saldo acumulado após a inserção de um lançamento no histórico.
+    Se o aluno ainda não tem saldo materializado, reconstrói o dele a partir do histórico
+    (o lançamento precisa já estar na sessão/flush). Não faz commit.
+    """
+    d = data_do_evento(criado_em)
+    if not aluno_id or d is None:
+        return
+    if not aluno_tem_saldo(db, aluno_id):
+        db.flush()
+        reconstruir_saldos(db, [aluno_id])
+        return
+
+    delta = float(delta or 0)
+    atual = db.query(PontuacaoSaldo).filter_by(aluno_id=aluno_id, data=d).first()
+    if atual is None:
+        anterior = (
+            db.query(PontuacaoSaldo)
+            .filter(PontuacaoSaldo.aluno_id == aluno_id, PontuacaoSaldo.data < d)
+            .order_by(PontuacaoSaldo.data.desc())
+            .first()
+        )
+        saldo_anterior = float(anterior.saldo) if anterior else 0.0
+        perda_anterior = anterior.ultima_perda if anterior else None
+        db.add(PontuacaoSaldo(
+            aluno_id=aluno_id,
+            data=d,
+            saldo=saldo_anterior + delta,
+            ultima_perda=d if delta < 0 else perda_anterior,
+            atualizado_em=_agora()
+        ))
+    else:
+        atual.saldo = float(atual.saldo) + delta
+        if delta < 0 and (atual.ultima_perda is None or atual.ultima_perda < d):
+            atual.ultima_perda = d
+        atual.atualizado_em = _agora()
+    db.flush()
+
+    # Lançamento retroativo: propaga para as datas posteriores
+    if delta:
+        db.query(PontuacaoSaldo)\
+            .filter(PontuacaoSaldo.aluno_id == aluno_id, PontuacaoSaldo.data > d)\
+            .update({PontuacaoSaldo.saldo: PontuacaoSaldo.saldo + delta}, synchronize_session=False)
+    if delta < 0:
+        db.query(PontuacaoSaldo)\
+            .filter(
+                PontuacaoSaldo.aluno_id == aluno_id,
+                PontuacaoSaldo.data > d,
+                or_(PontuacaoSaldo.ultima_perda.is_(None), PontuacaoSaldo.ultima_perda < d)
+            )\
+            .update({PontuacaoSaldo.ultima_perda: d}, synchronize_session=False)
+
+def registrar_eventos_no_saldo(db, eventos):
+    """
+    Versão em lote de registrar_evento_no_saldo, para lançamentos já inseridos no histórico.
+    eventos: (aluno_id, criado_em, delta). Lê só as linhas de saldo a partir da menor data
+    nova (e a anterior a ela), propaga os deltas em memória e grava com um UPDATE e um
+    INSERT em lote por bloco de alunos. Alunos ainda sem saldo são reconstruídos.
+    Não faz commit.
+    """
+    novos_por_aluno = {}
+    for aluno_id, criado_em, delta in eventos:
+        d = criado_em if isinstance(criado_em, date) else data_do_evento(criado_em)
+        if not aluno_id or d is None:
+            continue
+        novos_por_aluno.setdefault(aluno_id, {}).setdefault(d, []).append(float(delta or 0))
+    aluno_ids = sorted(novos_por_aluno)
+    agora = _agora()
+
+    for i in range(0, len(aluno_ids), TAMANHO_LOTE):
+        bloco = aluno_ids[i:i + TAMANHO_LOTE]
+        inicio = min(min(novos_por_aluno[a]) for a in bloco)
+
+        # Última linha antes de `inicio` (base do acumulado) e todas a partir dela
+        ultima = db.query(PontuacaoSaldo.aluno_id, func.max(PontuacaoSaldo.data).label("data"))\
+            .filter(PontuacaoSaldo.aluno_id.in_(bloco), PontuacaoSaldo.data < inicio)\
+            .group_by(PontuacaoSaldo.aluno_id).subquery()
+        base = {
+            r.aluno_id: (float(r.saldo), r.ultima_perda)
+            for r in db.query(PontuacaoSaldo.aluno_id, PontuacaoSaldo.saldo, PontuacaoSaldo.ultima_perda)
+            .join(ultima, and_(PontuacaoSaldo.aluno_id == ultima.c.aluno_id, PontuacaoSaldo.data == ultima.c.data))
+        }
+        existentes = {}
+        for r in db.query(PontuacaoSaldo.id, PontuacaoSaldo.aluno_id, PontuacaoSaldo.data,
+                          PontuacaoSaldo.saldo, PontuacaoSaldo.ultima_perda)\
+                .filter(PontuacaoSaldo.aluno_id.in_(bloco), PontuacaoSaldo.data >= inicio):
+            existentes.setdefault(r.aluno_id, {})[r.data] = r
+
+        sem_saldo, alterar, inserir = [], [], []
+        for aluno_id in bloco:
+            linhas = existentes.get(aluno_id, {})
+            if aluno_id not in base and not linhas:
+                sem_saldo.append(aluno_id)
+                continue
+            novos = novos_por_aluno[aluno_id]
+            saldo_anterior, perda_anterior = base.get(aluno_id, (0.0, None))  # valores antes dos novos lançamentos
+            acrescimo, perda_nova = 0.0, None
+            for d in sorted(set(linhas) | set(novos)):
+                for delta in novos.get(d, ()):
+                    acrescimo += delta
+                    if delta < 0:
+                        perda_nova = d
+                linha = linhas.get(d)
+                if linha is not None:
+                    saldo_anterior, perda_anterior = float(linha.saldo), linha.ultima_perda
+                perda = perda_anterior if perda_nova is None or (perda_anterior and perda_anterior >= perda_nova) else perda_nova
+                if linha is None:
+                    inserir.append({"aluno_id": aluno_id, "data": d, "saldo": saldo_anterior + acrescimo,
+                                    "ultima_perda": perda, "atualizado_em": agora})
+                elif acrescimo or perda != linha.ultima_perda:
+                    alterar.append({"id": linha.id, "saldo": saldo_anterior + acrescimo,
+                                    "ultima_perda": perda, "atualizado_em": agora})
+        if alterar:
+            db.execute(update(PontuacaoSaldo), alterar)
+        if inserir:
+            db.execute(insert(PontuacaoSaldo), inserir)
+        if sem_saldo:
+            reconstruir_saldos(db, sem_saldo)
+
+def consultar_saldo(db, aluno_id, ate, inclusive=True):
+    """
+    Retorna a linha de pontuacao_saldo do aluno na data `ate` ou na última data anterior
+    (inclusive=False: estritamente anterior). None se não houver lançamento até lá.
+    """
+    filtro = PontuacaoSaldo.data <= ate if inclusive else PontuacaoSaldo.data < ate
+    return (
+        db.query(PontuacaoSaldo)
+        .filter(PontuacaoSaldo.aluno_id == aluno_id, filtro)
+        .order_by(PontuacaoSaldo.data.desc())
+        .first()
+    )
+
+def _linhas_de_saldo(eventos, agora):
+    """eventos: lista (date, delta) de UM aluno. Retorna as linhas acumuladas por data."""
+    por_data = {}
+    for d, delta in eventos:
+        por_data.setdefault(d, []).append(delta)
+    linhas = []
+    saldo = 0.0
+    ultima_perda = None
+    for d in sorted(por_data):
+        for delta in por_data[d]:
+            saldo += delta
+            if delta < 0:
+                ultima_perda = d
+        linhas.append({"data": d, "saldo": saldo, "ultima_perda": ultima_perda, "atualizado_em": agora})
+    return linhas
+
+def reconstruir_saldos(db, aluno_ids=None):
+    """
+    Regenera pontuacao_saldo a partir do pontuacao_historico.
+    aluno_ids=None reconstrói a tabela inteira; caso contrário, só os alunos informados.
+    Não faz commit. Retorna o número de linhas gravadas.
+    """
+    if aluno_ids is not None:
+        aluno_ids = sorted({int(a) for a in aluno_ids if a})
+        if not aluno_ids:
+            return 0
+        blocos = [aluno_ids[i:i + TAMANHO_LOTE] for i in range(0, len(aluno_ids), TAMANHO_LOTE)]
+    else:
+        blocos = [None]
+
+    agora = _agora()
+    total = 0
+    for bloco in blocos:
+        q = db.query(PontuacaoHistorico.aluno_id, PontuacaoHistorico.criado_em,
+                     PontuacaoHistorico.criado_em_dt, PontuacaoHistorico.valor_delta)
+        apagar = db.query(PontuacaoSaldo)
+        if bloco is not None:
+            q = q.filter(PontuacaoHistorico.aluno_id.in_(bloco))
+            apagar = apagar.filter(PontuacaoSaldo.aluno_id.in_(bloco))
+        apagar.delete(synchronize_session=False)
+
+        eventos_por_aluno = {}
+        for aluno_id, criado_em, criado_em_dt, valor_delta in q.all():
+            d = criado_em_dt or data_do_evento(criado_em)
+            if aluno_id is None or d is None:
+                continue
+            eventos_por_aluno.setdefault(aluno_id, []).append((d, float(valor_delta or 0)))
+
+        linhas = []
+        for aluno_id, eventos in eventos_por_aluno.items():
+            for linha in _linhas_de_saldo(eventos, agora):
+                linha["aluno_id"] = aluno_id
+                linhas.append(linha)
+        for i in range(0, len(linhas), TAMANHO_LOTE):
+            db.execute(insert(PontuacaoSaldo), linhas[i:i + TAMANHO_LOTE])
+        total += len(linhas)
+    return total
@@ -0,0 +1,475 @@
+# services/simulador_pontuacao.py
+"""
+Simulador vetorizado (NumPy) das regras de pontuação sobre o histórico inteiro.
+
+O histórico (pontuacao_historico) é carregado uma vez em arrays ordenados por
+(aluno, data, id) e as regras são aplicadas a todos os alunos de uma vez:
+
+- carregar_historico(db, aluno_ids=None, ano=None, bimestre=None): arrays do histórico e
+  das matrículas (todos os alunos, ou só os informados / só os eventos de um bimestre)
+- pontuacao_em_datas(hist, datas): regras de compute_pontuacao_em_data (pontuação corrente)
+  em qualquer conjunto de datas; soma por cumsum + busca binária, última perda por máximo
+  acumulado dentro de cada aluno
+- pontuacao_do_bimestre(hist, ano, bimestre, data_final, medias_anteriores, bimestres):
+  regras de calcular_pontuacao_aluno (limite 0..10 após cada evento)
+- pontuacao_final_bimestre(hist, ano, bimestre, medias_anteriores): regras do fechamento
+  (scripts.pontuacao_rotinas.salvar_pontuacao_final_alunos)
+- ultima_perda_antes(hist, aluno_ids, dias): data da última perda estritamente anterior a cada dia
+- reponderar(hist, config_atual, config_nova): deltas do histórico refeitos com outra
+  tabela_disciplinar_config (simulação de mudança de pesos)
+- simular_config(db, config_nova, data_referencia=None): impacto de uma tabela candidata na
+  pontuação corrente de todos os alunos (distribuição por comportamento e quem muda de faixa);
+  usado por formularios_bp.api_config_simular e scripts/simular_config_disciplinar.py
+
+O limite 0..10 a cada evento é uma varredura por posição: a k-ésima iteração aplica o
+k-ésimo evento de todos os alunos ao mesmo tempo (tantas iterações quanto o maior número
+de eventos de um aluno, não quanto o total de eventos). A ordem das somas é a mesma dos
+laços originais, então os resultados batem até o último bit.
+
+A conferência com as funções originais fica em scripts/verificar_simulador_pontuacao.py.
+"""
+
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+from models_sqlalchemy import Aluno, PontuacaoHistorico
+from services.escolar_helper import _calcular_delta_por_medida, _get_config_values
+from services.datas import FORMATOS_DATA
+
+# Tamanho dos blocos de IN (...) nas consultas por aluno
+TAMANHO_LOTE = 500
+# Eventos que não entram na soma direta do bimestre
+TIPOS_FORA_DA_SOMA = ('TRANSFERENCIA_BIMESTRE', 'BIMESTRE_BONUS')
+# Faixas de _infer_comportamento_por_faixa, da maior para a menor
+FAIXAS_COMPORTAMENTO = ((10.0, "Excepcional"), (9.0, "Ótimo"), (7.0, "Bom"),
+                        (5.0, "Regular"), (2.0, "Insuficiente"))
+
+NAT = np.datetime64('NaT', 'D')
+
+class ConfigInvalida(ValueError):
+    """Tabela candidata com chave desconhecida ou valor não numérico."""
+
+class HistoricoVetorizado:
+    """
+    Histórico em arrays paralelos, ordenados por (aluno, dia, id); eventos com data
+    inválida ficam no fim de cada aluno.
+    - alunos: ids dos alunos simulados (ordenados); matricula / matricula_iso: data de
+      matrícula de cada um, lida como em compute_pontuacao_em_data / calcular_pontuacao_aluno
+    - aluno, idx (posição do aluno em `alunos`), id, ano, bimestre, tipo, tem_tipo, delta
+    - dia: data do evento como em compute_pontuacao_em_data (services.datas.parse_data)
+    - dia_iso: data como em calcular_pontuacao_aluno (só 'YYYY-MM-DD...'; NaT nos demais)
+    """
+
+    def __init__(self, alunos, matriculas, eventos):
+        self.alunos = np.asarray(alunos, dtype=np.int64)
+        self.matricula = _datas(matriculas, ('%Y-%m-%d', '%d/%m/%Y'))
+        self.matricula_iso = _datas([m[:10] if m else None for m in matriculas], ('%Y-%m-%d',))
+        self.tem_matricula = np.array([bool(m) for m in matriculas], dtype=bool)
+
+        ids, aluno, ano, bimestre, tipo, delta, criado_em = (list(c) for c in zip(*eventos)) if eventos \
+            else ([] for _ in range(7))
+        # como criado_em_dt / saldo_pontuacao.data_do_evento (services.datas.parse_data)
+        dia = _datas([str(c).strip()[:10] if c is not None else None for c in criado_em], FORMATOS_DATA)
+        dia_iso = _datas([c[:10] if c else None for c in criado_em], ('%Y-%m-%d',))
+        aluno = np.asarray(aluno, dtype=np.int64)
+        ids = np.asarray(ids, dtype=np.int64)
+        # NaT no fim: ordena pela data com NaT trocado pelo maior valor possível
+        chave_dia = np.where(np.isnat(dia), np.iinfo(np.int64).max, dia.astype(np.int64))
+        ordem = np.lexsort((ids, chave_dia, aluno))
+
+        self.aluno = aluno[ordem]
+        self.idx = np.searchsorted(self.alunos, self.aluno)
+        self.id = ids[ordem]
+        self.ano = np.array([a if a is not None else -1 for a in ano], dtype=np.int64)[ordem]
+        self.bimestre = np.array([b if b is not None else -1 for b in bimestre], dtype=np.int64)[ordem]
+        self.tipo = np.array(tipo, dtype=object)[ordem]
+        self.tem_tipo = np.array([t is not None for t in tipo], dtype=bool)[ordem]
+        self.delta = np.array([float(d or 0) for d in delta], dtype=np.float64)[ordem]
+        self.dia = dia[ordem]
+        self.dia_iso = dia_iso[ordem]
+
+    def __len__(self):
+        return len(self.id)
+
+    def posicao(self, aluno_ids):
+        """Posições de aluno_ids em self.alunos (-1 para quem não foi carregado)."""
+        aluno_ids = np.asarray(aluno_ids, dtype=np.int64)
+        if not len(self.alunos):
+            return np.full(len(aluno_ids), -1)
+        pos = np.minimum(np.searchsorted(self.alunos, aluno_ids), len(self.alunos) - 1)
+        return np.where(self.alunos[pos] == aluno_ids, pos, -1)
+
+def _datas(valores, formatos):
+    """Converte textos em datetime64[D] tentando os formatos em ordem (NaT se nenhum servir)."""
+    serie = pd.Series(valores, dtype=object)
+    resultado = pd.Series(pd.NaT, index=serie.index, dtype='datetime64[ns]')
+    for formato in formatos:
+        faltando = resultado.isna()
+        if not faltando.any():
+            break
+        resultado[faltando] = pd.to_datetime(serie[faltando], format=formato, errors='coerce')
+    return resultado.to_numpy().astype('datetime64[D]')
+
+def _blocos(ids):
+    ids = list(ids)
+    for i in range(0, len(ids), TAMANHO_LOTE):
+        yield ids[i:i + TAMANHO_LOTE]
+
+def carregar_historico(db, aluno_ids=None, ano=None, bimestre=None):
+    """
+    Carrega o histórico e as matrículas num HistoricoVetorizado.
+    Sem aluno_ids: todos os alunos (uma consulta para o histórico inteiro).
+    ano/bimestre: só os eventos lançados naquele bimestre (o fechamento não precisa do resto).
+    """
+    colunas = (PontuacaoHistorico.id, PontuacaoHistorico.aluno_id, PontuacaoHistorico.ano,
+               PontuacaoHistorico.bimestre, PontuacaoHistorico.tipo_evento,
+               PontuacaoHistorico.valor_delta, PontuacaoHistorico.criado_em)
+
+    def consulta():
+        q = db.query(*colunas).filter(PontuacaoHistorico.aluno_id.isnot(None))
+        if ano is not None:
+            q = q.filter(PontuacaoHistorico.ano == int(ano), PontuacaoHistorico.bimestre == int(bimestre))
+        return q
+
+    if aluno_ids is None:
+        alunos = db.query(Aluno.id, Aluno.data_matricula).order_by(Aluno.id).all()
+        eventos = [tuple(e) for e in consulta().all()]
+        ids_validos = {a for a, _ in alunos}
+        eventos = [e for e in eventos if e[1] in ids_validos]
+    else:
+        aluno_ids = sorted({int(a) for a in aluno_ids})
+        alunos, eventos = [], []
+        for bloco in _blocos(aluno_ids):
+            alunos.extend(db.query(Aluno.id, Aluno.data_matricula).filter(Aluno.id.in_(bloco)).all())
+            eventos.extend(tuple(e) for e in consulta().filter(PontuacaoHistorico.aluno_id.in_(bloco)).all())
+        # alunos sem cadastro entram sem matrícula (como nas funções originais)
+        cadastrados = dict(alunos)
+        alunos = [(a, cadastrados.get(a)) for a in aluno_ids]
+        alunos.sort()
+    return HistoricoVetorizado([a for a, _ in alunos], [m for _, m in alunos], eventos)
+
+def carregar_medias(db, ano, bimestre, aluno_ids=None):
+    """{aluno_id: média} de medias_bimestrais no bimestre (todos os alunos ou só os informados)."""
+    sql = "SELECT aluno_id, media FROM medias_bimestrais WHERE ano = :ano AND bimestre = :bimestre"
+    params = {"ano": int(ano), "bimestre": int(bimestre)}
+    if aluno_ids is None:
+        return dict(db.execute(text(sql), params).fetchall())
+    medias = {}
+    consulta = text(sql + " AND aluno_id IN :ids").bindparams(bindparam("ids", expanding=True))
+    for bloco in _blocos(aluno_ids):
+        medias.update(db.execute(consulta, dict(params, ids=[int(a) for a in bloco])).fetchall())
+    return medias
+
+def carregar_bimestres(db, ano):
+    """[(numero, inicio, fim)] do ano em ordem de número, como em carregar_dados_pontuacao_lote."""
+    rows = db.execute(
+        text("SELECT numero, inicio, fim FROM bimestres WHERE ano = :ano ORDER BY numero"), {"ano": int(ano)}
+    ).fetchall()
+    return [(numero, _data_iso(inicio), _data_iso(fim)) for numero, inicio, fim in rows]
+
+def _data_iso(valor):
+    if valor is None or isinstance(valor, date):
+        return valor.date() if isinstance(valor, datetime) else valor
+    return datetime.strptime(str(valor)[:10], '%Y-%m-%d').date()
+
+def _como_dia(valor):
+    if isinstance(valor, datetime):
+        valor = valor.date()
+    return np.datetime64(valor, 'D')
+
+def comportamentos(pontuacoes):
+    """_infer_comportamento_por_faixa aplicada a um array."""
+    pontuacoes = np.asarray(pontuacoes, dtype=np.float64)
+    return np.select([pontuacoes >= limite for limite, _ in FAIXAS_COMPORTAMENTO],
+                     [nome for _, nome in FAIXAS_COMPORTAMENTO], default="Incompatível").astype(object)
+
+# --- Blocos vetorizados ---
+
+def _posicao_no_grupo(idx):
+    """Para idx ordenado (eventos agrupados por aluno): posição de cada evento dentro do seu aluno."""
+    if not len(idx):
+        return np.zeros(0, dtype=np.int64)
+    inicio_grupo = np.r_[0, np.flatnonzero(np.diff(idx)) + 1]
+    tamanhos = np.diff(np.r_[inicio_grupo, len(idx)])
+    return np.arange(len(idx)) - np.repeat(inicio_grupo, tamanhos)
+
+def _varredura(inicio, idx, deltas, limitar):
+    """
+    Soma acumulada segmentada: acc[aluno] = inicio[aluno] + deltas do aluno, na ordem dada,
+    com limite 0..10 após cada evento se `limitar`. idx precisa estar agrupado por aluno.
+    """
+    acc = np.array(inicio, dtype=np.float64)
+    if not len(idx):
+        return acc
+    pos = _posicao_no_grupo(idx)
+    ordem = np.argsort(pos, kind='stable')
+    cortes = np.searchsorted(pos[ordem], np.arange(pos.max() + 2))
+    for k in range(len(cortes) - 1):
+        sel = ordem[cortes[k]:cortes[k + 1]]
+        alvo = idx[sel]
+        soma = acc[alvo] + deltas[sel]
+        acc[alvo] = np.minimum(10.0, np.maximum(0.0, soma)) if limitar else soma
+    return acc
+
+def _ordem_por_id(hist, mascara):
+    """Índices dos eventos selecionados em ordem de (aluno, id), como os laços originais."""
+    sel = np.flatnonzero(mascara)
+    return sel[np.lexsort((hist.id[sel], hist.idx[sel]))]
+
+def _ultima_perda(idx, dias, perda, consulta_idx, consulta_dias, lado):
+    """
+    Última data de perda de cada aluno consultado até o dia (lado='right': inclusive;
+    'left': estritamente antes). idx/dias ordenados por (aluno, dia).
+    Máximo acumulado de uma chave aluno * D + dia: como a chave cresce com o aluno,
+    o máximo global é o máximo dentro do aluno, sem laço por grupo.
+    """
+    n = len(consulta_idx)
+    if not len(idx):
+        return np.full(n, NAT)
+    base = dias.astype(np.int64).min() - 1
+    largura = int(max(dias.astype(np.int64).max(), consulta_dias.astype(np.int64).max()) - base + 2)
+    chave = idx * largura + (dias.astype(np.int64) - base)
+    chave_perda = np.maximum.accumulate(np.where(perda, chave, -1))
+    consulta = consulta_idx * largura + np.clip(consulta_dias.astype(np.int64) - base, 0, largura - 1)
+    pos = np.searchsorted(chave, consulta, side=lado) - 1
+    valor = np.where(pos >= 0, chave_perda[np.maximum(pos, 0)], -1)
+    do_aluno = valor >= consulta_idx * largura
+    return np.where(do_aluno, (valor - consulta_idx * largura + base).astype('datetime64[D]'), NAT)
+
+# --- Regras ---
+
+def pontuacao_em_datas(hist, datas):
+    """
+    Pontuação e comportamento de todos os alunos de `hist` em cada data (regras de
+    compute_pontuacao_em_data, sem o bônus de médias, que já chega ao histórico como
+    BIMESTRE_BONUS). Retorna (pontuacoes, comportamentos), matrizes alunos x datas;
+    a pontuação já arredondada em 2 casas, o comportamento pela pontuação sem arredondar.
+    """
+    n = len(hist.alunos)
+    datas = [_como_dia(d) for d in datas]
+    pontuacoes = np.zeros((n, len(datas)))
+    classes = np.empty((n, len(datas)), dtype=object)
+    todos = np.arange(n)
+
+    validos = ~np.isnat(hist.dia)
+    idx, dias, deltas = hist.idx[validos], hist.dia[validos], hist.delta[validos]
+    dias_int = dias.astype(np.int64)
+    # soma dos deltas do aluno até cada posição (busca por chave aluno * D + dia)
+    acumulado = np.r_[0.0, np.cumsum(deltas)]
+    base_dia = (dias_int.min() - 1) if len(dias_int) else 0
+    largura = int(max([dias_int.max() if len(dias_int) else 0] + [d.astype(np.int64) for d in datas])
+                  - base_dia + 2)
+    chave = idx * largura + (dias_int - base_dia)
+
+    # INICIO_ANO: o primeiro de cada (aluno, ano) por (bimestre, id)
+    abertura = np.flatnonzero(hist.tipo == "INICIO_ANO")
+    abertura = abertura[np.lexsort((hist.id[abertura], hist.bimestre[abertura],
+                                    hist.ano[abertura], hist.idx[abertura]))]
+    pares = np.c_[hist.idx[abertura], hist.ano[abertura]]
+    _, primeiros = np.unique(pares, axis=0, return_index=True) if len(abertura) else (None, [])
+    abertura = abertura[np.sort(primeiros)] if len(abertura) else abertura
+
+    for j, data_ref in enumerate(datas):
+        ano_ref = data_ref.astype('datetime64[Y]').astype(int) + 1970
+        do_ano = abertura[hist.ano[abertura] == ano_ref]
+        base = np.full(n, 8.0)
+        base[hist.idx[do_ano]] = hist.delta[do_ano]
+        inicio = np.full(n, NAT)
+        inicio[hist.idx[do_ano]] = hist.dia[do_ano]
+
+        ref_int = data_ref.astype(np.int64)
+        fim = np.searchsorted(chave, todos * largura + max(ref_int - base_dia, 0), side='right')
+        inicio_int = np.where(np.isnat(inicio), base_dia, inicio.astype(np.int64))
+        ini = np.searchsorted(chave, todos * largura + np.maximum(inicio_int - base_dia, 0), side='left')
+        soma = np.where(fim > ini, acumulado[fim] - acumulado[np.minimum(ini, fim)], 0.0)
+        pontuacao = base + soma
+
+        ultima = _ultima_perda(idx, dias, deltas < 0, todos, np.full(n, data_ref), 'right')
+        ultima = np.where(~np.isnat(inicio) & (ultima < inicio), NAT, ultima)
+        sem_perda = np.isnat(ultima)
+        # sem perda: conta da matrícula (matrícula ilegível = a própria data, sem bônus)
+        ultima = np.where(sem_perda & hist.tem_matricula,
+                          np.where(np.isnat(hist.matricula), data_ref, hist.matricula), ultima)
+        dias_sem_perda = (data_ref - ultima).astype(np.int64)
+        com_bonus = ~np.isnat(ultima) & (dias_sem_perda > 60)
+        pontuacao = np.where(com_bonus, np.minimum(10.0, pontuacao + (dias_sem_perda - 60) * 0.2), pontuacao)
+
+        pontuacao = np.maximum(0.0, pontuacao)
+        pontuacoes[:, j] = np.round(pontuacao, 2)
+        classes[:, j] = comportamentos(np.round(pontuacao, 9))
+    return pontuacoes, classes
+
+def pontuacao_do_bimestre(hist, ano, bimestre, data_final, medias_anteriores, bimestres):
+    """
+    Regras de calcular_pontuacao_aluno para todos os alunos de `hist`:
+    início em 8.0 (ou na média do bimestre anterior), eventos até data_final com limite
+    0..10 após cada um, +0.5 pela média anterior >= 8.0 e bônus de 60 dias contado desde
+    a última perda (ou início do ano / matrícula) pelos bimestres até o atual.
+    Retorna (pontuacoes arredondadas, comportamentos).
+    """
+    bimestre = int(bimestre)
+    n = len(hist.alunos)
+    data_final = _como_dia(data_final)
+    media_ant = np.array([medias_anteriores.get(int(a)) for a in hist.alunos], dtype=object) \
+        if bimestre > 1 else np.full(n, None, dtype=object)
+    tem_media = np.array([m is not None for m in media_ant], dtype=bool)
+    media_ant = np.array([float(m) if m is not None else 0.0 for m in media_ant])
+    inicio = np.where(tem_media, media_ant, 8.0)
+
+    no_periodo = ~np.isnat(hist.dia_iso) & (hist.dia_iso <= data_final)
+    somados = _ordem_por_id(hist, no_periodo & ~np.isin(hist.tipo, TIPOS_FORA_DA_SOMA))
+    pontuacao = _varredura(inicio, hist.idx[somados], hist.delta[somados], limitar=True)
+
+    com_bonus = tem_media & (media_ant >= 8.0)
+    pontuacao = np.where(com_bonus, np.minimum(10.0, np.maximum(0.0, pontuacao + 0.5)), pontuacao)
+
+    # data de referência dos 60 dias
+    bim_1 = next((b for b in bimestres if b[0] == 1), None)
+    inicio_ano = _como_dia(bim_1[1]) if bim_1 else data_final
+    referencia = np.where(~np.isnat(hist.matricula_iso) & (hist.matricula_iso >= inicio_ano),
+                          hist.matricula_iso, inicio_ano)
+    negativos = no_periodo & (hist.delta < 0)
+    ultima_negativa = np.full(n, NAT)
+    if negativos.any():
+        sel = np.flatnonzero(negativos)
+        # maior data negativa de cada aluno (grupos delimitados pela diferença de idx)
+        ultimo = np.r_[np.flatnonzero(np.diff(hist.idx[sel])), len(sel) - 1]
+        maiores = np.maximum.reduceat(hist.dia_iso[sel].astype(np.int64),
+                                      np.r_[0, ultimo[:-1] + 1])
+        ultima_negativa[hist.idx[sel[ultimo]]] = maiores.astype('datetime64[D]')
+    referencia = np.where(np.isnat(ultima_negativa), referencia, ultima_negativa)
+
+    total_dias = np.zeros(n, dtype=np.int64)
+    for numero, bim_inicio, bim_fim in bimestres:
+        if numero is None or numero > bimestre:
+            continue
+        inicio_calculo = np.maximum(referencia, _como_dia(bim_inicio)) if numero == 1 \
+            else np.full(n, _como_dia(bim_inicio))
+        fim_calculo = data_final if numero == bimestre else _como_dia(bim_fim)
+        dias_bim = (fim_calculo - inicio_calculo).astype(np.int64) + 1
+        total_dias += np.where(dias_bim > 0, dias_bim, 0)
+
+    bonus = (total_dias - 60) * 0.2
+    pontuacao = np.where(total_dias > 60,
+                         np.minimum(10.0, np.maximum(0.0, pontuacao + np.minimum(bonus, 10.0 - pontuacao))),
+                         pontuacao)
+    return np.round(pontuacao, 2), comportamentos(pontuacao)
+
+def pontuacao_final_bimestre(hist, ano, bimestre, medias_anteriores):
+    """
+    Pontuação final do bimestre (regra do fechamento) para todos os alunos de `hist`:
+    média anterior (ou 8.0) + eventos lançados no bimestre, exceto BIMESTRE_BONUS e
+    TRANSFERENCIA_BIMESTRE, + 0.5 pela média anterior >= 8.0; limite 0..10 só no final.
+    """
+    ano, bimestre = int(ano), int(bimestre)
+    media_ant = [medias_anteriores.get(int(a)) if bimestre > 1 else None for a in hist.alunos]
+    inicio = np.array([float(m) if m is not None else 8.0 for m in media_ant])
+    com_bonus = np.array([m is not None and float(m) >= 8.0 for m in media_ant], dtype=bool)
+
+    somados = _ordem_por_id(hist, (hist.ano == ano) & (hist.bimestre == bimestre) & hist.tem_tipo
+                            & ~np.isin(hist.tipo, TIPOS_FORA_DA_SOMA))
+    pontuacao = _varredura(inicio, hist.idx[somados], hist.delta[somados], limitar=False)
+    pontuacao = np.where(com_bonus, pontuacao + 0.5, pontuacao)
+    return np.minimum(10.0, np.maximum(0.0, pontuacao))
+
+def ultima_perda_antes(hist, aluno_ids, dias):
+    """Data (datetime64[D], NaT se não houver) da última perda de cada aluno antes de cada dia."""
+    pos = hist.posicao(aluno_ids)
+    validos = ~np.isnat(hist.dia)
+    resultado = _ultima_perda(hist.idx[validos], hist.dia[validos], hist.delta[validos] < 0,
+                              np.maximum(pos, 0), np.asarray(dias, dtype='datetime64[D]'), 'left')
+    return np.where(pos >= 0, resultado, NAT)
+
+def reponderar(hist, config_atual, config_nova, calcular_delta=_calcular_delta_por_medida):
+    """
+    Novo array de deltas com os pesos de config_nova no lugar dos de config_atual.
+    Os lançamentos de medida guardam a medida em tipo_evento e o delta = quantidade x peso;
+    a quantidade (ou os dias de suspensão) não é gravada, então o delta é reescalado pela
+    razão entre os pesos da medida. Eventos que não são de medida (bônus, INICIO_ANO...)
+    ficam como estão.
+    """
+    deltas = hist.delta.copy()
+    tipos, inverso = np.unique(hist.tipo.astype(str), return_inverse=True)
+    razoes = np.ones(len(tipos))
+    for i, tipo in enumerate(tipos):
+        if tipo == 'None':
+            continue
+        atual = calcular_delta(tipo, 1, config_atual)
+        if atual:
+            razoes[i] = calcular_delta(tipo, 1, config_nova) / atual
+    return deltas * razoes[inverso]
+
+def _config_candidata(config_atual, config_nova):
+    """config_atual com os valores de config_nova (só chaves conhecidas, valores numéricos)."""
+    desconhecidas = sorted(set(config_nova) - set(config_atual))
+    if desconhecidas:
+        raise ConfigInvalida(f"Chave(s) desconhecida(s): {', '.join(desconhecidas)}")
+    candidata = dict(config_atual)
+    for chave, valor in config_nova.items():
+        try:
+            candidata[chave] = float(valor)
+        except (TypeError, ValueError):
+            raise ConfigInvalida(f"Valor inválido para {chave}: {valor!r}")
+    return candidata
+
+def simular_config(db, config_nova, data_referencia=None):
+    """
+    Recalcula a pontuação corrente de todos os alunos com a tabela disciplinar atual e com
+    a candidata (config_nova: só as chaves que mudam) sobre o mesmo histórico e compara.
+    Retorna dict com data, configs, distribuição por comportamento (atual, simulada,
+    diferença), média das pontuações e a lista dos alunos que mudam de comportamento.
+    Levanta ConfigInvalida se a candidata tiver chave desconhecida ou valor inválido.
+    """
+    config_atual = _get_config_values(db)
+    candidata = _config_candidata(config_atual, config_nova)
+    data_referencia = data_referencia or datetime.now().date()
+
+    hist = carregar_historico(db)
+    pontuacao_atual, classe_atual = pontuacao_em_datas(hist, [data_referencia])
+    deltas_atuais = hist.delta
+    hist.delta = reponderar(hist, config_atual, candidata)
+    try:
+        pontuacao_nova, classe_nova = pontuacao_em_datas(hist, [data_referencia])
+    finally:
+        hist.delta = deltas_atuais
+    pontuacao_atual, classe_atual = pontuacao_atual[:, 0], classe_atual[:, 0]
+    pontuacao_nova, classe_nova = pontuacao_nova[:, 0], classe_nova[:, 0]
+
+    nomes = [nome for _, nome in FAIXAS_COMPORTAMENTO] + ["Incompatível"]
+    distribuicao = []
+    for nome in nomes:
+        atual, simulada = int((classe_atual == nome).sum()), int((classe_nova == nome).sum())
+        distribuicao.append({"comportamento": nome, "atual": atual, "simulada": simulada,
+                             "diferenca": simulada - atual})
+
+    mudaram = np.flatnonzero(classe_atual != classe_nova)
+    cadastro = {}
+    ids = [int(a) for a in hist.alunos[mudaram]]
+    for bloco in _blocos(ids):
+        for aluno_id, matricula, nome, serie, turma in db.query(
+                Aluno.id, Aluno.matricula, Aluno.nome, Aluno.serie, Aluno.turma).filter(Aluno.id.in_(bloco)).all():
+            cadastro[aluno_id] = {"matricula": matricula, "nome": nome, "serie": serie, "turma": turma}
+    mudancas = []
+    for pos in mudaram:
+        aluno_id = int(hist.alunos[pos])
+        mudancas.append(dict(
+            {"aluno_id": aluno_id}, **cadastro.get(aluno_id, {}),
+            pontuacao_atual=float(pontuacao_atual[pos]), pontuacao_simulada=float(pontuacao_nova[pos]),
+            comportamento_atual=classe_atual[pos], comportamento_simulado=classe_nova[pos],
+        ))
+    mudancas.sort(key=lambda m: (str(m.get("serie") or ""), str(m.get("turma") or ""), m.get("nome") or ""))
+
+    return {
+        "data_referencia": data_referencia.strftime('%Y-%m-%d'),
+        "config_atual": config_atual,
+        "config_simulada": candidata,
+        "alunos": len(hist.alunos),
+        "distribuicao": distribuicao,
+        "media_atual": round(float(pontuacao_atual.mean()), 2) if len(hist.alunos) else None,
+        "media_simulada": round(float(pontuacao_nova.mean()), 2) if len(hist.alunos) else None,
+        "alunos_com_pontuacao_alterada": int((pontuacao_atual != pontuacao_nova).sum()),
+        "mudancas": mudancas,
+    }
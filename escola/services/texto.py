@@ -0,0 +1,49 @@
+# services/texto.py
+"""
+Normalização de texto para busca: sem acentos (unidecode), minúsculo, só letras/dígitos
+separados por um espaço. "João  D'Ávila" -> "joao d avila".
+
+- normalizar_busca: a normalização em si (usada na coluna alunos.nome_busca e nos termos buscados)
+- default_normalizado_de: default de Column que normaliza outra coluna do mesmo INSERT
+- preencher_nome_busca: backfill em lotes de alunos.nome_busca
+"""
+
+import re
+
+from sqlalchemy import text
+from unidecode import unidecode
+
+TAMANHO_LOTE = 1000
+
+_NAO_ALFANUMERICO = re.compile(r'[^a-z0-9]+')
+
+def normalizar_busca(texto):
+    if texto is None:
+        return None
+    return _NAO_ALFANUMERICO.sub(' ', unidecode(str(texto)).lower()).strip()
+
+def default_normalizado_de(coluna):
+    """Default de Column calculado a partir da coluna texto do mesmo INSERT (vale para INSERT em lote)."""
+    def _default(context):
+        return normalizar_busca(context.get_current_parameters().get(coluna))
+    return _default
+
+def preencher_nome_busca(conn, tamanho_lote=TAMANHO_LOTE, ao_fim_do_lote=None):
+    """Preenche, em lotes por id, alunos.nome_busca ainda NULL. Retorna o número de linhas preenchidas."""
+    ultimo_id = 0
+    total = 0
+    while True:
+        linhas = conn.execute(
+            text("SELECT id, nome FROM alunos WHERE nome_busca IS NULL AND nome IS NOT NULL AND id > :ultimo "
+                 "ORDER BY id LIMIT :lote"),
+            {"ultimo": ultimo_id, "lote": tamanho_lote}
+        ).fetchall()
+        if not linhas:
+            break
+        ultimo_id = linhas[-1][0]
+        conn.execute(text("UPDATE alunos SET nome_busca = :n WHERE id = :id"),
+                     [{"id": i, "n": normalizar_busca(nome)} for i, nome in linhas])
+        total += len(linhas)
+        if ao_fim_do_lote:
+            ao_fim_do_lote()
+    return total
@@ -3,6 +3,7 @@
 // - /disciplinar/buscar_alunos_json?q=...            (já presente)
 // - /formularios/api/bimestres                       (criado)
 // - /formularios/api/config                           (GET/POST)
+// - /formularios/api/config/simular                   (POST, impacto dos valores editados)
 // - /formularios/api/aluno_pontuacao?aluno_id=&bimestre=
 
 document.addEventListener('DOMContentLoaded', function() {
@@ -25,6 +26,8 @@ document.addEventListener('DOMContentLoaded', function() {
     const btnEdit = document.getElementById('btn_edit_valores');
     const btnSalvar = document.getElementById('btn_salvar_valores');
     const btnCancelar = document.getElementById('btn_cancelar_edicao');
+    const btnSimular = document.getElementById('btn_simular_valores');
+    const simulacaoBox = document.getElementById('simulacao_config');
 
     const medidaInputs = {
         'advertencia_oral': document.getElementById('val_advertencia_oral'),
@@ -263,6 +266,7 @@ document.addEventListener('DOMContentLoaded', function() {
         btnEdit.style.display='none';
         btnSalvar.style.display='inline-block';
         btnCancelar.style.display='inline-block';
+        btnSimular.style.display='inline-block';
     });
 
     btnCancelar.addEventListener('click', function(e){
@@ -274,11 +278,12 @@ document.addEventListener('DOMContentLoaded', function() {
         btnEdit.style.display='inline-block';
         btnSalvar.style.display='none';
         btnCancelar.style.display='none';
+        btnSimular.style.display='none';
+        simulacaoBox.style.display='none';
     });
 
-    btnSalvar.addEventListener('click', function(e){
-        e.preventDefault();
-        const payload = {
+    function valoresEditados() {
+        return {
             advertencia_oral: Number(medidaInputs.advertencia_oral.value) || -0.1,
             advertencia_escrita: Number(medidaInputs.advertencia_escrita.value) || -0.3,
             suspensao_dia: Number(medidaInputs.suspensao_dia.value) || -0.5,
@@ -286,6 +291,59 @@ document.addEventListener('DOMContentLoaded', function() {
             elogio_individual: Number(medidaInputs.elogio_individual.value) || 0.5,
             elogio_coletivo: Number(medidaInputs.elogio_coletivo.value) || 0.3
         };
+    }
+
+    function linhaTabela(celulas) {
+        const tr = document.createElement('tr');
+        celulas.forEach(function(texto) {
+            const td = document.createElement('td');
+            td.textContent = texto;
+            tr.appendChild(td);
+        });
+        return tr;
+    }
+
+    // Impacto dos valores editados na pontuação atual de todos os alunos (não grava)
+    btnSimular.addEventListener('click', function(e){
+        e.preventDefault();
+        btnSimular.disabled = true;
+        const resumo = document.getElementById('simulacao_resumo');
+        const distribuicao = document.getElementById('simulacao_distribuicao');
+        const mudancas = document.getElementById('simulacao_mudancas');
+        simulacaoBox.style.display = 'block';
+        resumo.textContent = 'Simulando...';
+        distribuicao.innerHTML = '';
+        mudancas.innerHTML = '';
+        fetch('/formularios/api/config/simular', {
+            method: 'POST',
+            headers: {'Content-Type':'application/json'},
+            body: JSON.stringify(valoresEditados())
+        }).then(r => r.json())
+        .then(resp => {
+            if (!resp.success) {
+                resumo.textContent = 'Erro na simulação: ' + (resp.error || '');
+                return;
+            }
+            resumo.textContent = `${resp.alunos} alunos em ${resp.data_referencia}: pontuação média ` +
+                `${resp.media_atual} -> ${resp.media_simulada}; ${resp.mudancas.length} aluno(s) mudam de comportamento.`;
+            resp.distribuicao.forEach(function(d) {
+                distribuicao.appendChild(linhaTabela([d.comportamento, d.atual, d.simulada,
+                    (d.diferenca > 0 ? '+' : '') + d.diferenca]));
+            });
+            document.getElementById('simulacao_titulo_mudancas').textContent =
+                `Alunos que mudam de comportamento (${resp.mudancas.length})`;
+            resp.mudancas.forEach(function(m) {
+                mudancas.appendChild(linhaTabela([`${m.serie || '-'}/${m.turma || '-'}`, m.nome || m.aluno_id,
+                    `${m.pontuacao_atual} ${m.comportamento_atual}`, `${m.pontuacao_simulada} ${m.comportamento_simulado}`]));
+            });
+        })
+        .catch(() => { resumo.textContent = 'Erro na simulação.'; })
+        .finally(() => { btnSimular.disabled = false; });
+    });
+
+    btnSalvar.addEventListener('click', function(e){
+        e.preventDefault();
+        const payload = valoresEditados();
         fetch('/formularios/api/config', {
             method: 'POST',
             headers: {'Content-Type':'application/json'},
@@ -300,6 +358,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 btnEdit.style.display='inline-block';
                 btnSalvar.style.display='none';
                 btnCancelar.style.display='none';
+                btnSimular.style.display='none';
+                simulacaoBox.style.display='none';
             } else {
                 alert('Erro ao salvar valores.');
             }
@@ -1,6 +1,6 @@
 """
 Script para sincronizar fotos de alunos.
-Atualiza o campo 'photo' no banco de dados com base nos arquivos existentes em static/uploads/alunos/
+Atualiza o índice fotos_alunos e o campo 'photo' no banco de dados com base nos arquivos existentes em static/uploads/alunos/
 """
 import os
 import sys
@@ -14,88 +14,47 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 from app import app
 from database import get_db
-from models_sqlalchemy import Aluno
+from services.fotos_alunos import sincronizar_fotos, pasta_fotos, invalidar_fotos
+from services.busca_alunos import atualizar_alunos_na_busca
 
 def sync_fotos():
     """
-    Sincroniza fotos de alunos:
-    - Lista arquivos em static/uploads/alunos/
+    Sincroniza fotos de alunos (services/fotos_alunos.sincronizar_fotos):
+    - Lista uma vez os arquivos em static/uploads/alunos/
     - Extrai matrícula do nome do arquivo (formato: MATRICULA_nome.ext)
-    - Atualiza campo photo no banco de dados
+    - Atualiza o índice fotos_alunos só para arquivos novos, alterados ou apagados
+    - Atualiza campo photo no banco de dados (uma consulta de alunos e um UPDATE em lote)
     """
-    uploads_dir = os.path.join(app.root_path, 'static', 'uploads', 'alunos')
-    
-    if not os.path.exists(uploads_dir):
-        print(f"❌ Pasta não encontrada: {uploads_dir}")
-        return
-    
-    print(f"📂 Verificando arquivos em: {uploads_dir}\n")
-    
-    # Lista todos os arquivos de imagem
-    extensoes_validas = ('.jpg', '.jpeg', '.png', '.gif')
-    arquivos = [f for f in os.listdir(uploads_dir) if f.lower().endswith(extensoes_validas)]
-    
-    print(f"📊 Total de arquivos encontrados: {len(arquivos)}\n")
-    
-    if not arquivos:
-        print("⚠️  Nenhum arquivo de imagem encontrado.")
-        return
-    
     with app.app_context():
+        uploads_dir = pasta_fotos()
+
+        if not os.path.exists(uploads_dir):
+            print(f"❌ Pasta não encontrada: {uploads_dir}")
+            return
+
+        print(f"📂 Verificando arquivos em: {uploads_dir}\n")
+
         db = get_db()
-        
-        atualizados = 0
-        nao_encontrados = 0
-        ja_preenchidos = 0
-        
-        for filename in arquivos:
-            # Extrai matrícula (parte antes do primeiro underscore)
-            partes = filename.split('_')
-            if not partes:
-                print(f"⚠️  Formato inválido: {filename}")
-                continue
-            
-            matricula_candidata = partes[0]
-            
-            # Busca aluno por matrícula
-            aluno = db.query(Aluno).filter_by(matricula=matricula_candidata).first()
-            
-            if not aluno:
-                print(f"⚠️  Aluno não encontrado: {filename} (matrícula: {matricula_candidata})")
-                nao_encontrados += 1
-                continue
-            
-            # Verifica se já tem foto cadastrada
-            if aluno.photo and aluno.photo.strip():
-                # Só atualiza se for diferente
-                if aluno.photo != filename:
-                    print(f"🔄 Atualizando: {aluno.nome} ({matricula_candidata})")
-                    print(f"   Anterior: {aluno.photo}")
-                    print(f"   Nova: {filename}")
-                    aluno.photo = filename
-                    atualizados += 1
-                else:
-                    ja_preenchidos += 1
-            else:
-                print(f"✅ Cadastrando: {aluno.nome} ({matricula_candidata}) → {filename}")
-                aluno.photo = filename
-                atualizados += 1
-        
-        if atualizados > 0:
-            try:
-                db.commit()
-                print(f"\n✅ {atualizados} registro(s) atualizado(s) com sucesso!")
-            except Exception as e:
-                db.rollback()
-                print(f"\n❌ Erro ao salvar: {e}")
-        else:
-            print(f"\n✅ Nenhuma atualização necessária.")
-        
+        try:
+            resumo = sincronizar_fotos(db, uploads_dir)
+            db.commit()
+            invalidar_fotos()
+            atualizar_alunos_na_busca(db, ids=resumo['alunos_atualizados'])
+        except Exception as e:
+            db.rollback()
+            print(f"\n❌ Erro ao salvar: {e}")
+            return
+
+        for filename in resumo['sem_aluno']:
+            print(f"⚠️  Aluno não encontrado: {filename}")
+
         print(f"\n📊 RESUMO:")
-        print(f"   - Atualizados: {atualizados}")
-        print(f"   - Já preenchidos: {ja_preenchidos}")
-        print(f"   - Não encontrados: {nao_encontrados}")
-        print(f"   - Total processado: {len(arquivos)}")
+        print(f"   - Arquivos na pasta: {resumo['arquivos']}")
+        print(f"   - Novos no índice: {resumo['novos']}")
+        print(f"   - Alterados no índice: {resumo['alterados']}")
+        print(f"   - Removidos do índice: {resumo['removidos']}")
+        print(f"   - Fotos de alunos atualizadas: {resumo['fotos_atualizadas']}")
+        print(f"   - Não encontrados: {len(resumo['sem_aluno'])}")
 
 if __name__ == '__main__':
     print("=" * 60)